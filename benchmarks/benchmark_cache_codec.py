@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark the binary Redis cache codec against the previous JSON path
+
+Compares encode/decode time and payload size of df.to_json() / pd.read_json()
+with the Arrow and numpy formats under each available compression, on a
+synthetic OHLCV frame shaped like HKStrategy.yf_history output.
+
+Usage:
+    python benchmarks/benchmark_cache_codec.py --rows 250 --repeat 50
+"""
+
+import io
+import os
+import sys
+import time
+import argparse
+import warnings
+from statistics import median
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'src'))
+import numpy as np
+import pandas as pd
+from dateutil import tz
+from src import cache_codec
+
+
+def make_frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(7)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+    dates = pd.bdate_range('2024-01-02', periods=rows).tz_localize(tz.gettz('Asia/Hong_Kong'))
+    return pd.DataFrame({
+        'Date': dates,
+        'Open': close * (1 + rng.normal(0, 0.002, rows)),
+        'High': close * 1.01,
+        'Low': close * 0.99,
+        'Close': close,
+        'Volume': rng.integers(1_000_000, 50_000_000, rows),
+    })
+
+
+def round_trips(original: pd.DataFrame, decoded: pd.DataFrame) -> bool:
+    """Same columns, dtypes and values (tz-aware columns compared as instants)"""
+    if list(decoded.columns) != list(original.columns):
+        return False
+    for column in original.columns:
+        left, right = original[column], decoded[column]
+        if isinstance(left.dtype, pd.DatetimeTZDtype):
+            if not isinstance(right.dtype, pd.DatetimeTZDtype):
+                return False
+            left, right = left.dt.tz_convert('UTC'), right.dt.tz_convert('UTC')
+        elif left.dtype != right.dtype:
+            return False
+        if not left.reset_index(drop=True).equals(right.reset_index(drop=True)):
+            return False
+    return True
+
+
+def timed(fn, repeat: int):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Redis cache codec')
+    parser.add_argument('--rows', type=int, default=250)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    frame = make_frame(args.rows)
+    print(f"📊 {args.rows} rows x {len(frame.columns)} columns, median of {args.repeat} runs")
+    print(f"{'path':<22}{'encode ms':>11}{'decode ms':>11}{'bytes':>10}  round-trips")
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        encode_ms, payload = timed(lambda: frame.to_json().encode('utf-8'), args.repeat)
+        decode_ms, decoded = timed(lambda: pd.read_json(io.StringIO(payload.decode('utf-8'))), args.repeat)
+    kept = round_trips(frame, decoded)
+    print(f"{'json (current)':<22}{encode_ms:>11.3f}{decode_ms:>11.3f}{len(payload):>10}  {kept}")
+
+    formats = [('arrow', cache_codec.FORMAT_ARROW)] if cache_codec.PYARROW_AVAILABLE else []
+    formats.append(('numpy', cache_codec.FORMAT_NUMPY))
+    compressions = [('none', cache_codec.COMPRESSION_NONE), ('zlib', cache_codec.COMPRESSION_ZLIB)]
+    if cache_codec.ZSTD_AVAILABLE:
+        compressions.append(('zstd', cache_codec.COMPRESSION_ZSTD))
+    if cache_codec.LZ4_AVAILABLE:
+        compressions.append(('lz4', cache_codec.COMPRESSION_LZ4))
+
+    for format_name, fmt in formats:
+        for compression_name, compression in compressions:
+            encode_ms, payload = timed(
+                lambda: cache_codec.encode(frame, compression=compression, frame_format=fmt), args.repeat)
+            decode_ms, decoded = timed(lambda: cache_codec.decode(payload), args.repeat)
+            kept = round_trips(frame, decoded)
+            label = f"{format_name}+{compression_name}"
+            print(f"{label:<22}{encode_ms:>11.3f}{decode_ms:>11.3f}{len(payload):>10}  {kept}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark the local columnar price cache against direct database reads
+
+Reports cold (empty cache), warm (memory-mapped, unchanged watermarks) and
+uncached read latency plus process RSS for a set of symbols and a date range.
+
+Usage:
+    python benchmarks/benchmark_price_cache.py --symbols 0700.HK 0005.HK --start 2024-01-01 --end 2025-06-30
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from datetime import date, datetime, timedelta
+from statistics import median
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'src'))
+from src.database import DatabaseManager
+from src.price_cache import PriceCache, PYARROW_AVAILABLE
+
+
+def rss_mb() -> float:
+    """Current resident set size in MB (Linux), falling back to peak RSS"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def timed(fn, repeat: int):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the local columnar price cache')
+    parser.add_argument('--symbols', nargs='*', help='Symbols to read (default: every stored symbol)')
+    parser.add_argument('--start', type=lambda s: datetime.strptime(s, '%Y-%m-%d').date(),
+                        default=date.today() - timedelta(days=2 * 365))
+    parser.add_argument('--end', type=lambda s: datetime.strptime(s, '%Y-%m-%d').date(), default=date.today())
+    parser.add_argument('--columns', nargs='*', default=['close_price'])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if not PYARROW_AVAILABLE:
+        print("❌ pyarrow is not installed; the price cache is disabled")
+        return
+
+    db = DatabaseManager()
+    symbols = args.symbols
+    if not symbols:
+        with db.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT DISTINCT symbol FROM daily_equity_technicals ORDER BY symbol")
+                symbols = [row[0] for row in cur.fetchall()]
+
+    print(f"📊 {len(symbols)} symbols, {args.start} to {args.end}, columns={args.columns}")
+    baseline_rss = rss_mb()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = PriceCache(db, cache_dir, enabled=True)
+
+        uncached_ms, frame = timed(lambda: cache._read_database(symbols, args.start, args.end, args.columns), args.repeat)
+        uncached_rss = rss_mb()
+
+        def cold_read():
+            cache.invalidate()
+            return cache.read(symbols, args.start, args.end, args.columns)
+
+        cold_ms, _ = timed(cold_read, args.repeat)
+        warm_ms, warm = timed(lambda: cache.read(symbols, args.start, args.end, args.columns), args.repeat)
+        cached_rss = rss_mb()
+
+        print(f"Rows returned:            {len(warm)} (database: {len(frame)})")
+        print(f"Uncached database read:   {uncached_ms:8.1f} ms")
+        print(f"Cold cache read:          {cold_ms:8.1f} ms")
+        print(f"Warm cache read:          {warm_ms:8.1f} ms")
+        print(f"RSS baseline/uncached/cached: {baseline_rss:.1f} / {uncached_rss:.1f} / {cached_rss:.1f} MB")
+        print(f"Cache stats: {cache.stats}")
+
+
+if __name__ == "__main__":
+    main()
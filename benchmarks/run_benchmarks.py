@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Benchmark the portfolio analysis pipeline on synthetic data
+
+Times PortfolioAnalysisManager.get_analysis_timeline_data (a read of the
+materialized timelines, as in production once they are stored),
+TimelineStore.refresh rebuilding them from scratch,
+_get_timeline_data_cost_basis, PortfolioCalculator.run_portfolio_analysis
+and calculate_performance_metrics at several dataset sizes against an
+in-memory database stand-in (no PostgreSQL, Redis or network needed).
+
+Each result records the median and best wall time of --repeat runs and
+the peak traced memory of one extra run; the scaling exponent is the
+log-log slope of median wall time against timeline points (analyses x
+trading days). Baseline comparisons use the best time, which is the least
+sensitive to scheduling noise.
+
+Usage:
+    python benchmarks/run_benchmarks.py --sizes xs small medium
+    python benchmarks/run_benchmarks.py --save benchmarks/baselines/baseline.json
+    python benchmarks/run_benchmarks.py --compare benchmarks/baselines/baseline.json --threshold 1.25
+"""
+
+import gc
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tracemalloc
+from datetime import datetime
+from statistics import median
+from typing import Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'src'))
+
+# Direct reads only: the columnar cache has its own benchmark (benchmark_price_cache.py)
+os.environ['PRICE_CACHE_ENABLED'] = 'false'
+logging.disable(logging.INFO)  # provider/Redis start-up messages while importing
+
+import numpy as np
+import pandas as pd
+from src.portfolio_analysis_manager import PortfolioAnalysisManager
+from src.portfolio_calculator import PortfolioCalculator
+from synthetic import SIZES, SyntheticDataset, SyntheticDatabase
+
+BENCHMARKS = [
+    'get_analysis_timeline_data',
+    'timeline_store_rebuild',
+    '_get_timeline_data_cost_basis',
+    'run_portfolio_analysis',
+    'calculate_performance_metrics',
+]
+
+
+def build_cases(size: str, seed: int) -> Dict[str, Callable[[], object]]:
+    """Benchmark name -> zero-argument callable for one dataset size"""
+    dataset = SyntheticDataset.generate(seed=seed, **SIZES[size])
+    db = SyntheticDatabase(dataset)
+
+    manager = PortfolioAnalysisManager(db)
+    calculator = PortfolioCalculator(market_data=object(), db=db)
+    analysis_ids = dataset.analysis_ids()
+    first = dataset.analyses[0]
+    positions = dataset.held_positions(first['id'])
+    daily_values, _ = calculator.run_portfolio_analysis(positions, first['start_date'], first['end_date'], 50_000.0)
+
+    return {
+        'get_analysis_timeline_data': lambda: manager.get_analysis_timeline_data(analysis_ids),
+        'timeline_store_rebuild': lambda: (db.clear_timelines(), manager.timelines.refresh(analysis_ids)),
+        '_get_timeline_data_cost_basis': lambda: manager._get_timeline_data_cost_basis(analysis_ids),
+        'run_portfolio_analysis': lambda: calculator.run_portfolio_analysis(
+            positions, first['start_date'], first['end_date'], 50_000.0),
+        'calculate_performance_metrics': lambda: calculator.calculate_performance_metrics(daily_values),
+    }
+
+
+def measure(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """Median/best wall time (untraced runs) and peak traced memory (one traced run)"""
+    fn()  # warm-up: imports, calendar and connection setup
+    samples = []
+    gc.collect()
+    gc.disable()  # as timeit does: collections triggered by earlier garbage add noise
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - started) * 1000)
+    finally:
+        gc.enable()
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'wall_ms': round(median(samples), 3),
+        'min_ms': round(min(samples), 3),
+        'peak_mb': round(peak / 1024 / 1024, 3),
+    }
+
+
+def scaling(results: List[Dict], sizes: List[str]) -> Dict[str, Dict]:
+    """Wall time against timeline points per benchmark, with the fitted log-log exponent"""
+    curves = {}
+    for name in BENCHMARKS:
+        points = [
+            (SIZES[r['size']]['analyses'] * SIZES[r['size']]['days'], r['wall_ms'])
+            for r in results if r['benchmark'] == name and r['size'] in sizes
+        ]
+        exponent = None
+        if len(points) >= 2 and all(ms > 0 for _, ms in points):
+            x, y = np.log([p[0] for p in points]), np.log([p[1] for p in points])
+            exponent = round(float(np.polyfit(x, y, 1)[0]), 3)
+        curves[name] = {'points': points, 'exponent': exponent}
+    return curves
+
+
+def run(sizes: List[str], repeat: int, seed: int) -> Dict:
+    results = []
+    for size in sizes:
+        cases = build_cases(size, seed)
+        print(f"📊 {size}: {SIZES[size]}")
+        for name in BENCHMARKS:
+            measured = measure(cases[name], repeat)
+            results.append({'benchmark': name, 'size': size, **measured})
+            print(f"   {name:<32}{measured['wall_ms']:>11.2f} ms{measured['peak_mb']:>10.2f} MB")
+
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+        },
+        'repeat': repeat,
+        'seed': seed,
+        'sizes': {size: SIZES[size] for size in sizes},
+        'results': results,
+        'scaling': scaling(results, sizes),
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Print current vs baseline per benchmark and size; returns the regressions"""
+    previous = {(r['benchmark'], r['size']): r for r in baseline.get('results', [])}
+    regressions = []
+    print(f"\n🔍 Compared with baseline from {baseline.get('created', '?')} (threshold {threshold:.2f}x)")
+    print(f"{'benchmark (best ms)':<32}{'size':<8}{'baseline':>10}{'current':>10}{'ratio':>8}{'peak MB':>10}")
+    for result in current['results']:
+        key = (result['benchmark'], result['size'])
+        if key not in previous:
+            print(f"{key[0]:<32}{key[1]:<8}{'-':>10}{result['min_ms']:>10.2f}{'new':>8}{result['peak_mb']:>10.2f}")
+            continue
+        base_ms = previous[key]['min_ms']
+        ratio = result['min_ms'] / base_ms if base_ms else float('inf')
+        flag = ''
+        if ratio > threshold:
+            flag = '  ⚠️'
+            regressions.append(f"{key[0]} [{key[1]}] {base_ms:.2f} -> {result['min_ms']:.2f} ms ({ratio:.2f}x)")
+        print(f"{key[0]:<32}{key[1]:<8}{base_ms:>10.2f}{result['min_ms']:>10.2f}{ratio:>8.2f}"
+              f"{result['peak_mb']:>10.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the portfolio analysis pipeline on synthetic data')
+    parser.add_argument('--sizes', nargs='*', choices=list(SIZES), default=['xs', 'small', 'medium'])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', help='Write the results as a JSON baseline to this path')
+    parser.add_argument('--compare', help='JSON baseline to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25, help='Slowdown ratio reported as a regression')
+    parser.add_argument('--verbose', action='store_true', help='Keep application logging')
+    args = parser.parse_args()
+
+    logging.disable(logging.NOTSET if args.verbose else logging.CRITICAL)
+
+    current = run(args.sizes, args.repeat, args.seed)
+
+    print("\n📈 Scaling (exponent of wall time vs analyses x days)")
+    for name, curve in current['scaling'].items():
+        exponent = f"{curve['exponent']:.2f}" if curve['exponent'] is not None else '-'
+        print(f"   {name:<32}{exponent:>8}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w') as f:
+            json.dump(current, f, indent=2, default=str)
+        print(f"\n💾 Baseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s):")
+            for regression in regressions:
+                print(f"   {regression}")
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""
+Synthetic Benchmark Data
+
+Deterministic N symbols x M trading days x K transactions x A analyses
+datasets, and an in-memory stand-in for DatabaseManager that answers the
+queries issued by the benchmarked portfolio analysis paths:
+- closes from daily_equity_technicals (price cache disabled, direct reads)
+- analysis metadata, trading-day ranges and state-change joins
+- calculator write-back inserts (accepted and dropped)
+- the materialized timeline tables TimelineStore plans, stores and reads
+  (portfolio_analysis_daily_values, portfolio_analysis_timeline_state)
+
+Anything else raises, so callers fall back to their live computation
+exactly as they do when a table is unavailable.
+"""
+
+import re
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.hkex_calendar import get_hkex_trading_days
+
+FIRST_DAY = date(2021, 1, 4)
+PRICES_UPDATED_AT = datetime(2021, 1, 1)  # updated_at of every stored close
+WARMUP_DAYS = 30  # trading days of closes before the earliest analysis start
+
+# name -> (symbols, trading days, transactions per analysis, analyses)
+SIZES = {
+    'xs': dict(symbols=10, days=60, transactions=20, analyses=2),
+    'small': dict(symbols=25, days=125, transactions=50, analyses=4),
+    'medium': dict(symbols=50, days=250, transactions=100, analyses=8),
+    'large': dict(symbols=100, days=500, transactions=200, analyses=16),
+}
+
+
+@dataclass
+class SyntheticDataset:
+    """Closes, analyses and state changes generated from a seed"""
+    symbols: List[str]
+    trading_days: List[date]
+    closes: np.ndarray                     # days x symbols
+    analyses: List[Dict] = field(default_factory=list)
+    transactions: Dict[int, List[Dict]] = field(default_factory=dict)
+
+    @classmethod
+    def generate(cls, symbols: int, days: int, transactions: int, analyses: int,
+                 seed: int = 0) -> 'SyntheticDataset':
+        """
+        Build a dataset.
+
+        Args:
+            symbols: Number of symbols with closes
+            days: Trading days per analysis window (closes cover WARMUP_DAYS more)
+            transactions: State changes per analysis, INITIAL positions included
+            analyses: Number of analyses
+
+        Returns:
+            SyntheticDataset (identical for identical arguments)
+        """
+        rng = np.random.default_rng(seed)
+        calendar = get_hkex_trading_days(FIRST_DAY, date(FIRST_DAY.year + 10, 1, 1))[:days + WARMUP_DAYS]
+        names = [f"{i + 1:04d}.HK" for i in range(symbols)]
+        drift = rng.normal(0.0002, 0.0003, symbols)
+        returns = rng.normal(drift, 0.015, (len(calendar), symbols))
+        closes = np.round(rng.uniform(5, 400, symbols) * np.exp(np.cumsum(returns, axis=0)), 3)
+        dataset = cls(names, calendar, closes)
+
+        for analysis_id in range(1, analyses + 1):
+            start = WARMUP_DAYS + int(rng.integers(0, max(1, days // 4)))
+            end = len(calendar) - 1 - int(rng.integers(0, max(1, days // 4)))
+            dataset.analyses.append({
+                'id': analysis_id,
+                'analysis_name': f"Synthetic {analysis_id}",
+                'start_date': calendar[start],
+                'end_date': calendar[end],
+                'start_cash': 1_000_000.0,
+            })
+            dataset.transactions[analysis_id] = dataset._transactions(rng, start, end, transactions)
+        return dataset
+
+    def _transactions(self, rng, start: int, end: int, count: int) -> List[Dict]:
+        held: Dict[int, int] = {}
+        rows = []
+        initial = rng.choice(len(self.symbols), size=min(5, len(self.symbols), count), replace=False)
+        for column in sorted(initial):
+            held[column] = 1000
+            rows.append(self._row(start, column, 'INITIAL', 1000))
+
+        for day in np.sort(rng.integers(start, end + 1, size=max(0, count - len(rows)))):
+            column = int(rng.integers(0, len(self.symbols)))
+            if held.get(column, 0) > 0 and rng.random() < 0.4:
+                quantity = -int(rng.integers(1, held[column] // 100 + 1)) * 100
+                trans_type = 'SELL'
+            else:
+                quantity = int(rng.integers(1, 20)) * 100
+                trans_type = 'BUY'
+            held[column] = held.get(column, 0) + quantity
+            rows.append(self._row(int(day), column, trans_type, quantity))
+        return rows
+
+    def _row(self, day: int, column: int, trans_type: str, quantity: int) -> Dict:
+        price = float(self.closes[day, column])
+        return {
+            'transaction_date': self.trading_days[day],
+            'symbol': self.symbols[column],
+            'transaction_type': trans_type,
+            'quantity_change': quantity,
+            'price': price,
+            'cash_change': -quantity * price,
+        }
+
+    def analysis_ids(self) -> List[int]:
+        return [analysis['id'] for analysis in self.analyses]
+
+    def price_frame(self) -> pd.DataFrame:
+        """Long frame of every close (symbol, trade_date, close_price)"""
+        days, cols = np.meshgrid(np.arange(len(self.trading_days)), np.arange(len(self.symbols)), indexing='ij')
+        return pd.DataFrame({
+            'symbol': np.asarray(self.symbols)[cols.ravel()],
+            'trade_date': np.asarray(self.trading_days, dtype=object)[days.ravel()],
+            'close_price': self.closes.ravel(),
+        })
+
+    def held_positions(self, analysis_id: int) -> Dict[str, int]:
+        """Quantities left at the end of an analysis"""
+        positions: Dict[str, int] = {}
+        for row in self.transactions[analysis_id]:
+            positions[row['symbol']] = positions.get(row['symbol'], 0) + row['quantity_change']
+        return {symbol: quantity for symbol, quantity in positions.items() if quantity > 0}
+
+
+class SyntheticDatabase:
+    """In-memory DatabaseManager stand-in backed by a SyntheticDataset"""
+
+    def __init__(self, dataset: SyntheticDataset):
+        self.dataset = dataset
+        self.prices = dataset.price_frame()
+        self.queries = 0
+        self.trade_dates = {symbol: list(dataset.trading_days) for symbol in dataset.symbols}  # sorted, per symbol
+        self.daily_values: Dict[Tuple[int, date], tuple] = {}
+        self.timeline_state: Dict[int, Dict] = {}
+
+    def clear_timelines(self):
+        """Drop every materialized timeline, so the next read rebuilds them"""
+        self.daily_values.clear()
+        self.timeline_state.clear()
+
+    def get_connection(self):
+        return _Connection(self)
+
+    @contextmanager
+    def connection(self):
+        yield _Connection(self)
+
+
+class _Connection:
+    encoding = 'UTF8'
+
+    def __init__(self, db: SyntheticDatabase):
+        self.db = db
+
+    def cursor(self, cursor_factory=None):
+        return _Cursor(self, dict_rows=cursor_factory is not None)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Cursor:
+    def __init__(self, connection: _Connection, dict_rows: bool):
+        self.connection = connection
+        self.dict_rows = dict_rows
+        self._rows: List = []
+        self._values: List[tuple] = []  # rows rendered by mogrify for the next execute_values page
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def mogrify(self, template, args):
+        self._values.append(tuple(args))
+        return b'(0)'
+
+    def fetchall(self):
+        return self._rows
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def execute(self, sql, params=None):
+        sql = sql.decode() if isinstance(sql, bytes) else sql
+        text = ' '.join(sql.split()).lower()
+        db = self.connection.db
+        db.queries += 1
+
+        if 'portfolio_analysis_daily_values' in text or 'portfolio_analysis_timeline_state' in text:
+            self._timeline(text, params)
+        elif 'from unnest(' in text and 'join daily_equity_technicals t' in text:
+            self._set(['analysis_id', 'max', 'min', 'localtimestamp'], self._price_corrections(params))
+        elif text.startswith('select distinct on (t.symbol)'):
+            self._set(['symbol', 'trade_date', 'close_price'], self._carry_in(params))
+        elif text.startswith('select analysis_id, transaction_date, symbol'):
+            self._set(['analysis_id', 'transaction_date', 'symbol', 'transaction_type', 'quantity_change',
+                       'cash_change'], [
+                [a['id'], t['transaction_date'], t['symbol'], t['transaction_type'], t['quantity_change'],
+                 t['cash_change']]
+                for a in self._analyses(params) for t in db.dataset.transactions[a['id']]
+            ])
+        elif text.startswith('insert into daily_equity_technicals'):
+            self._values = []
+            self._rows = []
+        elif 'from daily_equity_technicals' in text and 'symbol = any' in text:
+            self._set(*self._closes(text, params))
+        elif 'array_agg(distinct sc.symbol)' in text:
+            self._set(['analysis_id', 'analysis_name', 'start_date', 'end_date', 'symbols'], [
+                [a['id'], a['analysis_name'], a['start_date'], a['end_date'],
+                 sorted({t['symbol'] for t in db.dataset.transactions[a['id']]})]
+                for a in self._analyses(params)
+            ])
+        elif text.startswith('select id, start_date, end_date from portfolio_analyses'):
+            self._set(['id', 'start_date', 'end_date'],
+                      [[a['id'], a['start_date'], a['end_date']] for a in self._analyses(params)])
+        elif 'left join portfolio_analysis_state_changes sc' in text and 'sc.transaction_date' in text:
+            columns = ['analysis_id', 'analysis_name', 'start_date', 'end_date', 'start_cash',
+                       'transaction_date', 'symbol', 'transaction_type', 'quantity_change', 'cash_change', 'price']
+            rows = []
+            for a in self._analyses(params):
+                head = [a['id'], a['analysis_name'], a['start_date'], a['end_date'], a['start_cash']]
+                for t in db.dataset.transactions[a['id']] or [None]:
+                    rows.append(head + ([t['transaction_date'], t['symbol'], t['transaction_type'],
+                                         t['quantity_change'], t['cash_change'], t['price']] if t else [None] * 6))
+            self._set(columns, rows)
+        else:
+            raise NotImplementedError(f"Synthetic database does not answer: {text[:80]}")
+
+    def _timeline(self, text: str, params):
+        """TimelineStore's DDL, plan, store and read statements"""
+        db = self.connection.db
+        if text.startswith('create table'):
+            self._rows = []
+        elif 'left join portfolio_analysis_timeline_state ts' in text:
+            rows = []
+            for a in self._analyses(params):
+                state = db.timeline_state.get(a['id'])
+                transactions = db.dataset.transactions[a['id']]
+                stored = [state[k] for k in ('computed_through', 'start_date', 'end_date', 'start_cash',
+                                             'transaction_count', 'max_transaction_id', 'price_watermark',
+                                             'price_checked_at')] if state else [None] * 8
+                rows.append([a['id'], a['start_date'], a['end_date'], a['start_cash']] + stored
+                            + [len(transactions), len(transactions), sorted({t['symbol'] for t in transactions})])
+            self._set(['id', 'start_date', 'end_date', 'start_cash', 'computed_through', 'state_start_date',
+                       'state_end_date', 'state_start_cash', 'transaction_count', 'max_transaction_id',
+                       'price_watermark', 'price_checked_at', 'count', 'max_id', 'symbols'], rows)
+        elif text.startswith('delete from portfolio_analysis_daily_values'):
+            analysis_id, from_date = params[0], params[1] if len(params) > 1 else date.min
+            for key in [key for key in db.daily_values if key[0] == analysis_id and key[1] >= from_date]:
+                del db.daily_values[key]
+            self._rows = []
+        elif text.startswith('insert into portfolio_analysis_daily_values'):
+            for row in self._values:
+                db.daily_values[(row[0], row[1])] = row
+            self._values = []
+            self._rows = []
+        elif text.startswith('insert into portfolio_analysis_timeline_state'):
+            keys = ['computed_through', 'start_date', 'end_date', 'start_cash', 'transaction_count',
+                    'max_transaction_id', 'price_watermark', 'price_checked_at']
+            db.timeline_state[params[0]] = dict(zip(keys, params[1:]))
+            self._rows = []
+        elif 'from portfolio_analysis_daily_values dv' in text:
+            names = {a['id']: a['analysis_name'] for a in db.dataset.analyses}
+            ids = set(params[0])
+            self._set(['analysis_id', 'analysis_name', 'trade_date', 'total_value', 'cash_position',
+                       'equity_value', 'transaction_details'], [
+                [row[0], names[row[0]], *row[1:]]
+                for _, row in sorted(db.daily_values.items()) if row[0] in ids
+            ])
+        else:
+            raise NotImplementedError(f"Synthetic database does not answer: {text[:80]}")
+
+    def _price_corrections(self, params) -> List[list]:
+        """MAX(updated_at), earliest corrected stored day and LOCALTIMESTAMP per analysis"""
+        window, analysis_ids, symbols, starts, ends, computed, watermarks, checked = params
+        trade_dates = self.connection.db.trade_dates
+        now = datetime.now()
+        results: Dict[int, list] = {}
+        for analysis_id, symbol, start, end, through, watermark, checked_at in zip(
+                analysis_ids, symbols, starts, ends, computed, watermarks, checked):
+            dates = trade_dates.get(symbol, [])
+            first, last = bisect_left(dates, start), bisect_right(dates, end)
+            if first >= last:
+                continue
+            result = results.setdefault(analysis_id, [analysis_id, PRICES_UPDATED_AT, None, now])
+            cutoffs = [c for c in (watermark, checked_at - window if checked_at else datetime.min) if c is not None]
+            if through is not None and PRICES_UPDATED_AT > min(cutoffs) and dates[first] <= through:
+                result[2] = min(d for d in (result[2], dates[first]) if d is not None)
+        return list(results.values())
+
+    def _carry_in(self, params) -> List[list]:
+        """Last close of each symbol on or after its first date and before `before`"""
+        symbols, first_dates, before = params
+        prices = self.connection.db.prices
+        rows = []
+        for symbol, first_date in zip(symbols, first_dates):
+            closes = prices[(prices['symbol'] == symbol) & (prices['trade_date'] >= first_date)
+                            & (prices['trade_date'] < before)]
+            if not closes.empty:
+                last = closes.iloc[-1]
+                rows.append([symbol, last['trade_date'], last['close_price']])
+        return rows
+
+    def _analyses(self, params) -> List[Dict]:
+        ids = set(params[0] if params and isinstance(params[0], (list, tuple)) else params or [])
+        return [a for a in self.connection.db.dataset.analyses if a['id'] in ids]
+
+    def _closes(self, text: str, params):
+        selected = re.search(r'select (.*?) from', text).group(1)
+        columns = [c.strip() for c in selected.split(',')]
+        if columns != ['symbol', 'trade_date', 'close_price']:
+            raise NotImplementedError(f"Synthetic database only stores closes, not {columns}")
+        symbols, start_date, end_date = params
+        prices = self.connection.db.prices
+        mask = prices['symbol'].isin(symbols) & (prices['trade_date'] >= start_date) & (prices['trade_date'] <= end_date)
+        selected_rows = prices[mask]
+        return columns, list(zip(selected_rows['symbol'], selected_rows['trade_date'], selected_rows['close_price']))
+
+    def _set(self, columns: List[str], rows: List):
+        self._rows = [dict(zip(columns, row)) for row in rows] if self.dict_rows else [tuple(row) for row in rows]
@@ -0,0 +1,30 @@
+-- Materialized Analysis Timeline Tables
+-- Daily values of each portfolio analysis stored by TimelineStore so the PV
+-- Analysis timeline only recomputes from the earliest affected trading day.
+-- (The store also creates these tables on first use.)
+
+CREATE TABLE IF NOT EXISTS portfolio_analysis_daily_values (
+    analysis_id INT NOT NULL REFERENCES portfolio_analyses(id) ON DELETE CASCADE,
+    trade_date DATE NOT NULL,
+    total_value DOUBLE PRECISION NOT NULL,
+    cash_position DOUBLE PRECISION NOT NULL,
+    equity_value DOUBLE PRECISION NOT NULL,
+    transaction_details TEXT,
+    PRIMARY KEY (analysis_id, trade_date)
+);
+
+CREATE TABLE IF NOT EXISTS portfolio_analysis_timeline_state (
+    analysis_id INT PRIMARY KEY REFERENCES portfolio_analyses(id) ON DELETE CASCADE,
+    computed_through DATE,                 -- Last trading day with a stored value
+    start_date DATE NOT NULL,              -- Analysis parameters the values cover
+    end_date DATE NOT NULL,
+    start_cash DECIMAL(15,2) NOT NULL,
+    transaction_count INT NOT NULL,        -- (count, max id) of the state changes covered
+    max_transaction_id INT NOT NULL,
+    price_watermark TIMESTAMP,             -- MAX(updated_at) of the analysis' closes when computed
+    price_checked_at TIMESTAMP,            -- Database time the watermark was read
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Tables created before price_checked_at was added
+ALTER TABLE portfolio_analysis_timeline_state ADD COLUMN IF NOT EXISTS price_checked_at TIMESTAMP;
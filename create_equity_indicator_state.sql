@@ -0,0 +1,11 @@
+-- Incremental Indicator State Table
+-- Per-symbol state used by PriceDataPopulator.populate_symbol_incremental so the
+-- end-of-day update only computes and upserts newly appended bars.
+-- (The populator also creates this table on first use.)
+
+CREATE TABLE IF NOT EXISTS equity_indicator_state (
+    symbol VARCHAR(10) PRIMARY KEY,
+    last_trade_date DATE NOT NULL,     -- Last bar covered by the state
+    state JSONB NOT NULL,              -- EWM carry values and the last 252 raw OHLCV bars
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
@@ -27,10 +27,20 @@ try:
     from src.database import DatabaseManager
     from src.analysis_manager import AnalysisManager
     from src.hkex_calendar import validate_hkex_analysis_period, hkex_calendar
+    from src.fetch_planner import plan_from_database, plan_missing_ranges, record_empty_ranges
+    from src.price_cache import get_price_cache, CACHE_COLUMNS
+    from src.market_data import get_market_data_provider, split_history
+    from src.strategic_database_manager import StrategicDatabaseManager
+    from src.signal_backtest import get_signal_backtester
 except ImportError:
     from database import DatabaseManager
     from analysis_manager import AnalysisManager
     from hkex_calendar import validate_hkex_analysis_period, hkex_calendar
+    from fetch_planner import plan_from_database, plan_missing_ranges, record_empty_ranges
+    from price_cache import get_price_cache, CACHE_COLUMNS
+    from market_data import get_market_data_provider, split_history
+    from strategic_database_manager import StrategicDatabaseManager
+    from signal_backtest import get_signal_backtester
 
 @st.dialog("Select Technical Indicators")
 def select_indicators_dialog():
@@ -820,15 +830,26 @@ if 'selected_portfolio_for_pv' not in st.session_state:
 if 'current_analysis' not in st.session_state:
     st.session_state.current_analysis = None
 
+def history_frame(history: pd.DataFrame, symbol: str) -> pd.DataFrame:
+    """One symbol of a provider history frame as a Date-indexed frame (yfinance layout)"""
+    bars = split_history(history).get(symbol)
+    if bars is None:
+        return pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+    return bars.set_index(pd.DatetimeIndex(pd.to_datetime(bars['Date']), name='Date')).drop(columns='Date')
+
+def fetch_history_frame(symbol: str, start_date: date, end_date: date) -> pd.DataFrame:
+    """Daily bars from the market data provider as a Date-indexed frame (yfinance layout, end inclusive)"""
+    return history_frame(get_market_data_provider().history([symbol], start_date, end_date, adjusted=True), symbol)
+
 def fetch_hk_price(hk_symbol):
     """Fetch current price for Hong Kong stock"""
     try:
-        stock = yf.Ticker(hk_symbol)
-        hist = stock.history(period="2d")
-        if not hist.empty:
-            price = float(hist['Close'].iloc[-1])
-            return price, f"✅ {hk_symbol}: HK${price:.2f} (from history)"
+        quote = get_market_data_provider().quotes([hk_symbol]).get(hk_symbol)
+        if quote and quote.price:
+            price = float(quote.price)
+            return price, f"✅ {hk_symbol}: HK${price:.2f} (latest quote)"
         
+        stock = yf.Ticker(hk_symbol)
         info = stock.info
         current_price = info.get('currentPrice', info.get('regularMarketPrice', info.get('previousClose')))
         if current_price and current_price > 0:
@@ -850,8 +871,8 @@ def fetch_hk_price(hk_symbol):
 def fetch_hk_historical_prices(hk_symbol):
     """Fetch current and previous day prices for Hong Kong stock"""
     try:
-        stock = yf.Ticker(hk_symbol)
-        hist = stock.history(period="5d")  # Get 5 days to ensure we have previous trading day
+        # Last ~5 sessions to ensure we have the previous trading day
+        hist = fetch_history_frame(hk_symbol, date.today() - timedelta(days=10), date.today())
         if not hist.empty and len(hist) >= 2:
             current_price = float(hist['Close'].iloc[-1])
             previous_price = float(hist['Close'].iloc[-2])
@@ -862,7 +883,7 @@ def fetch_hk_historical_prices(hk_symbol):
             return price, price, f"⚠️ {hk_symbol}: Only one day available HK${price:.2f}"
         else:
             # No historical data, fall back to info
-            info = stock.info
+            info = yf.Ticker(hk_symbol).info
             current_price = info.get('currentPrice', info.get('regularMarketPrice', info.get('previousClose')))
             if current_price and current_price > 0:
                 price = float(current_price)
@@ -1131,6 +1152,8 @@ def convert_for_database(value):
         except:
             return None
 
+INDICATOR_WARMUP_DAYS = 60  # Calendar days fetched before a gap so SMA/EMA/RSI are warm
+
 @st.cache_data
 def fetch_and_store_yahoo_data(symbol: str, start_date: str, end_date: str):
     """Fetch data from Yahoo Finance and store in database if missing"""
@@ -1140,122 +1163,123 @@ def fetch_and_store_yahoo_data(symbol: str, start_date: str, end_date: str):
         import pandas as pd
         import numpy as np
         
-        # Check existing data coverage in database
+        # Work out the exact missing trading days from the HKEX calendar
         db = st.session_state.db_manager
         conn = db.get_connection()
         
         with conn.cursor() as cur:
-            cur.execute("""
-                SELECT MIN(trade_date), MAX(trade_date), COUNT(*)
-                FROM daily_equity_technicals
-                WHERE symbol = %s
-                  AND trade_date >= %s
-                  AND trade_date <= %s
-            """, (symbol, start_date, end_date))
-            
-            result = cur.fetchone()
-            existing_start, existing_end, count = result
-            
             # Convert dates to datetime objects
             start_dt = datetime.strptime(start_date, '%Y-%m-%d')
             end_dt = datetime.strptime(end_date, '%Y-%m-%d')
             
-            # Calculate expected trading days (rough estimate)
-            expected_days = (end_dt - start_dt).days
-            data_coverage = count / max(expected_days * 0.7, 1)  # Assume ~70% are trading days
-            
-            needs_fetching = False
-            if count == 0 or data_coverage < 0.8:  # Less than 80% coverage
-                needs_fetching = True
-            elif existing_start is None or existing_end is None:
-                needs_fetching = True
-            elif existing_start > start_dt.date() or existing_end < end_dt.date():
-                needs_fetching = True
-            
-            if needs_fetching:
-                # Fetch data from Yahoo Finance
-                st.info(f"📊 Fetching data for {symbol} from Yahoo Finance...")
+            plan = plan_from_database(cur, [symbol], start_dt.date(), end_dt.date())
+            
+            if plan.is_complete:
+                st.info(f"✅ Data for {symbol} already available in database")
+                return True
+            
+            # Fetch only the missing ranges from Yahoo Finance
+            st.info(f"📊 Fetching {plan.missing_days[symbol]} missing trading days for {symbol} from Yahoo Finance "
+                    f"({len(plan.ranges)} range(s), {plan.covered_days[symbol]} days already stored)...")
+            
+            stored = 0
+            
+            for fetch_range in plan.ranges:
+                # Include warm-up history so rolling indicators are defined on the first missing day
+                result = get_market_data_provider().history_result(
+                    [symbol],
+                    fetch_range.start_date - timedelta(days=INDICATOR_WARMUP_DAYS),
+                    fetch_range.end_date,
+                    adjusted=True
+                )
+                hist_data = history_frame(result.bars, symbol)
+                record_empty_ranges([fetch_range], {symbol: [idx.date() for idx in hist_data.index]},
+                                    failed_symbols=result.failed)
                 
-                ticker = yf.Ticker(symbol)
-                hist_data = ticker.history(start=start_dt, end=end_dt + timedelta(days=1))
+                if hist_data.empty:
+                    continue
                 
-                if not hist_data.empty:
-                    # Calculate technical indicators
-                    hist_data['rsi_14'] = calculate_rsi(hist_data['Close'], 14)
-                    hist_data['sma_20'] = hist_data['Close'].rolling(window=20).mean()
-                    hist_data['ema_12'] = hist_data['Close'].ewm(span=12).mean()
-                    hist_data['ema_26'] = hist_data['Close'].ewm(span=26).mean()
-                    
-                    # Calculate MACD
-                    hist_data['macd'] = hist_data['ema_12'] - hist_data['ema_26']
-                    hist_data['macd_signal'] = hist_data['macd'].ewm(span=9).mean()
-                    
-                    # Calculate Bollinger Bands
-                    bb_period = 20
-                    bb_std = 2
-                    sma = hist_data['Close'].rolling(window=bb_period).mean()
-                    std = hist_data['Close'].rolling(window=bb_period).std()
-                    hist_data['bollinger_upper'] = sma + (std * bb_std)
-                    hist_data['bollinger_middle'] = sma  # Middle band is the 20-day SMA
-                    hist_data['bollinger_lower'] = sma - (std * bb_std)
-                    
-                    # Volume SMA
-                    hist_data['volume_sma_20'] = hist_data['Volume'].rolling(window=20).mean()
-                    
-                    # Insert/update data in database
-                    for date, row in hist_data.iterrows():
-                        cur.execute("""
-                            INSERT INTO daily_equity_technicals (
-                                symbol, trade_date, open_price, close_price, high_price, low_price, volume,
-                                rsi_14, macd, macd_signal, bollinger_upper, bollinger_middle, bollinger_lower, 
-                                sma_20, ema_12, ema_26, volume_sma_20
-                            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                            ON CONFLICT (symbol, trade_date) 
-                            DO UPDATE SET
-                                open_price = EXCLUDED.open_price,
-                                close_price = EXCLUDED.close_price,
-                                high_price = EXCLUDED.high_price,
-                                low_price = EXCLUDED.low_price,
-                                volume = EXCLUDED.volume,
-                                rsi_14 = EXCLUDED.rsi_14,
-                                macd = EXCLUDED.macd,
-                                macd_signal = EXCLUDED.macd_signal,
-                                bollinger_upper = EXCLUDED.bollinger_upper,
-                                bollinger_middle = EXCLUDED.bollinger_middle,
-                                bollinger_lower = EXCLUDED.bollinger_lower,
-                                sma_20 = EXCLUDED.sma_20,
-                                ema_12 = EXCLUDED.ema_12,
-                                ema_26 = EXCLUDED.ema_26,
-                                volume_sma_20 = EXCLUDED.volume_sma_20
-                        """, (
-                            symbol, 
-                            convert_for_database(date.date()), 
-                            convert_for_database(row['Open']), 
-                            convert_for_database(row['Close']), 
-                            convert_for_database(row['High']), 
-                            convert_for_database(row['Low']), 
-                            convert_for_database(row['Volume']),
-                            convert_for_database(row.get('rsi_14')), 
-                            convert_for_database(row.get('macd')), 
-                            convert_for_database(row.get('macd_signal')),
-                            convert_for_database(row.get('bollinger_upper')), 
-                            convert_for_database(row.get('bollinger_middle')),
-                            convert_for_database(row.get('bollinger_lower')),
-                            convert_for_database(row.get('sma_20')), 
-                            convert_for_database(row.get('ema_12')), 
-                            convert_for_database(row.get('ema_26')), 
-                            convert_for_database(row.get('volume_sma_20'))
-                        ))
-                    
-                    conn.commit()
-                    st.success(f"✅ Successfully fetched and stored {len(hist_data)} days of data for {symbol}")
-                    return True
-                else:
-                    st.warning(f"⚠️ No data available for {symbol} in Yahoo Finance")
-                    return False
-            else:
-                st.info(f"✅ Data for {symbol} already available in database")
+                # Calculate technical indicators
+                hist_data['rsi_14'] = calculate_rsi(hist_data['Close'], 14)
+                hist_data['sma_20'] = hist_data['Close'].rolling(window=20).mean()
+                hist_data['ema_12'] = hist_data['Close'].ewm(span=12).mean()
+                hist_data['ema_26'] = hist_data['Close'].ewm(span=26).mean()
+                
+                # Calculate MACD
+                hist_data['macd'] = hist_data['ema_12'] - hist_data['ema_26']
+                hist_data['macd_signal'] = hist_data['macd'].ewm(span=9).mean()
+                
+                # Calculate Bollinger Bands
+                bb_period = 20
+                bb_std = 2
+                sma = hist_data['Close'].rolling(window=bb_period).mean()
+                std = hist_data['Close'].rolling(window=bb_period).std()
+                hist_data['bollinger_upper'] = sma + (std * bb_std)
+                hist_data['bollinger_middle'] = sma  # Middle band is the 20-day SMA
+                hist_data['bollinger_lower'] = sma - (std * bb_std)
+                
+                # Volume SMA
+                hist_data['volume_sma_20'] = hist_data['Volume'].rolling(window=20).mean()
+                
+                # Insert/update only the missing days; warm-up rows are already stored
+                in_range = [fetch_range.contains(idx.date()) for idx in hist_data.index]
+                for date, row in hist_data[in_range].iterrows():
+                    cur.execute("""
+                        INSERT INTO daily_equity_technicals (
+                            symbol, trade_date, open_price, close_price, high_price, low_price, volume,
+                            rsi_14, macd, macd_signal, bollinger_upper, bollinger_middle, bollinger_lower, 
+                            sma_20, ema_12, ema_26, volume_sma_20
+                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                        ON CONFLICT (symbol, trade_date) 
+                        DO UPDATE SET
+                            open_price = EXCLUDED.open_price,
+                            close_price = EXCLUDED.close_price,
+                            high_price = EXCLUDED.high_price,
+                            low_price = EXCLUDED.low_price,
+                            volume = EXCLUDED.volume,
+                            rsi_14 = EXCLUDED.rsi_14,
+                            macd = EXCLUDED.macd,
+                            macd_signal = EXCLUDED.macd_signal,
+                            bollinger_upper = EXCLUDED.bollinger_upper,
+                            bollinger_middle = EXCLUDED.bollinger_middle,
+                            bollinger_lower = EXCLUDED.bollinger_lower,
+                            sma_20 = EXCLUDED.sma_20,
+                            ema_12 = EXCLUDED.ema_12,
+                            ema_26 = EXCLUDED.ema_26,
+                            volume_sma_20 = EXCLUDED.volume_sma_20,
+                            updated_at = CURRENT_TIMESTAMP
+                    """, (
+                        symbol, 
+                        convert_for_database(date.date()), 
+                        convert_for_database(row['Open']), 
+                        convert_for_database(row['Close']), 
+                        convert_for_database(row['High']), 
+                        convert_for_database(row['Low']), 
+                        convert_for_database(row['Volume']),
+                        convert_for_database(row.get('rsi_14')), 
+                        convert_for_database(row.get('macd')), 
+                        convert_for_database(row.get('macd_signal')),
+                        convert_for_database(row.get('bollinger_upper')), 
+                        convert_for_database(row.get('bollinger_middle')),
+                        convert_for_database(row.get('bollinger_lower')),
+                        convert_for_database(row.get('sma_20')), 
+                        convert_for_database(row.get('ema_12')), 
+                        convert_for_database(row.get('ema_26')), 
+                        convert_for_database(row.get('volume_sma_20'))
+                    ))
+                    stored += 1
+            
+            conn.commit()
+            
+            if stored > 0:
+                st.success(f"✅ Successfully fetched and stored {stored} days of data for {symbol}")
+                return True
+            elif plan.covered_days[symbol] > 0:
+                st.info(f"ℹ️ No new data from Yahoo Finance for {symbol}; using {plan.covered_days[symbol]} stored days")
                 return True
+            else:
+                st.warning(f"⚠️ No data available for {symbol} in Yahoo Finance")
+                return False
                 
     except Exception as e:
         # Enhanced error handling with specific error types
@@ -1393,6 +1417,32 @@ def get_analysis_period_for_equity(analysis_id: int):
     except:
         return None
 
+def load_price_history(symbol: str, start_dt: datetime, end_dt: datetime) -> pd.DataFrame:
+    """
+    OHLCV history for the price chart (end_dt exclusive, like yfinance)
+    
+    Served from the local columnar price cache when the database covers every
+    trading day of the period, otherwise fetched from Yahoo Finance.
+    """
+    try:
+        last_dt = end_dt - timedelta(days=1)
+        frame = get_price_cache(st.session_state.db_manager).read(
+            [symbol], start_dt.date(), last_dt.date(),
+            columns=['open_price', 'high_price', 'low_price', 'close_price', 'volume']
+        )
+        stored_dates = {symbol: set(frame['trade_date'].dt.date)}
+        if not frame.empty and plan_missing_ranges(stored_dates, [symbol], start_dt.date(), last_dt.date()).is_complete:
+            hist_data = frame.rename(columns={
+                'open_price': 'Open', 'high_price': 'High', 'low_price': 'Low',
+                'close_price': 'Close', 'volume': 'Volume'
+            }).set_index('trade_date')
+            hist_data.index.name = 'Date'
+            return hist_data[['Open', 'High', 'Low', 'Close', 'Volume']]
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"Price cache unavailable for {symbol}: {e}")
+    
+    return fetch_history_frame(symbol, start_dt.date(), (end_dt - timedelta(days=1)).date())
+
 @st.cache_data
 def fetch_technical_analysis_data(symbol: str):
     """Fetch technical analysis data from daily_equity_technicals table"""
@@ -1462,8 +1512,7 @@ def get_fallback_technical_data(symbol: str):
     """Provide fallback technical data when database data is unavailable"""
     # Try to fetch some basic price data from Yahoo Finance
     try:
-        ticker = yf.Ticker(symbol)
-        hist = ticker.history(period="1y")
+        hist = fetch_history_frame(symbol, date.today() - timedelta(days=365), date.today())
         
         if not hist.empty:
             current_price = hist['Close'].iloc[-1]
@@ -1608,7 +1657,6 @@ def fetch_equity_prices_by_date(symbol: str, target_date):
 def get_yahoo_finance_price_fallback(symbol: str, target_date):
     """Fallback to Yahoo Finance for specific date price data"""
     try:
-        import yfinance as yf
         from datetime import timedelta
         
         # Convert target_date to date object if needed
@@ -1622,8 +1670,7 @@ def get_yahoo_finance_price_fallback(symbol: str, target_date):
         start_date = date_obj - timedelta(days=5)
         end_date = date_obj + timedelta(days=2)
         
-        ticker = yf.Ticker(symbol)
-        hist = ticker.history(start=start_date, end=end_date)
+        hist = fetch_history_frame(symbol, start_date, end_date - timedelta(days=1))
         
         if not hist.empty:
             # Try to find data for the exact date first
@@ -1735,7 +1782,8 @@ def load_sample_technical_data():
                     volume_ratio = EXCLUDED.volume_ratio,
                     atr_14 = EXCLUDED.atr_14,
                     support_level = EXCLUDED.support_level,
-                    volume = EXCLUDED.volume
+                    volume = EXCLUDED.volume,
+                    updated_at = CURRENT_TIMESTAMP
             """, (symbol, date, open_price, close, high, low, w52h, w52l, rsi, ema12, ema26, sma20, macd, vol_ratio, atr, support, volume))
         
         conn.commit()
@@ -2764,7 +2812,14 @@ redis-cli ping
             with st.expander("🔍 Yahoo Finance Details", expanded=not yf_results["status"]):
                 for detail in yf_results["details"]:
                     st.text(detail)
-        
+
+        # Request coalescing counters (shared by every session in this process)
+        provider_stats = getattr(get_market_data_provider(), 'stats', None)
+        if provider_stats:
+            with st.expander("🔁 Market Data Request Coalescing", expanded=False):
+                for kind, counters in provider_stats.items():
+                    st.text(f"{kind}: " + ", ".join(f"{name}={value}" for name, value in counters.items()))
+
         # Show troubleshooting if there are issues
         if yf_results["troubleshooting"]:
             with st.expander("🛠️ Yahoo Finance Troubleshooting", expanded=True):
@@ -3330,6 +3385,63 @@ elif st.session_state.current_page == 'pv_analysis':
                 # Display chart
                 st.plotly_chart(fig, use_container_width=True)
                 
+                # Rolling risk metrics - computed once per timeline fetch, reused on reruns
+                st.markdown("### 📉 Rolling Risk Metrics")
+                rolling_key = f"rolling_{sorted(st.session_state.selected_for_compare)}"
+                if (rolling_key not in st.session_state.price_data_cache or
+                        st.session_state.cache_expiry.get(rolling_key) != st.session_state.cache_expiry[cache_key]):
+                    with st.spinner("📉 Calculating rolling metrics..."):
+                        st.session_state.price_data_cache[rolling_key] = (
+                            st.session_state.portfolio_analysis_manager.get_analysis_rolling_metrics(
+                                st.session_state.selected_for_compare, timeline_df))
+                        st.session_state.cache_expiry[rolling_key] = st.session_state.cache_expiry[cache_key]
+                rolling_df = st.session_state.price_data_cache[rolling_key]
+                
+                if rolling_df.empty:
+                    st.info("Rolling metrics are not available for the selected analyses")
+                else:
+                    metric_labels = {
+                        'volatility': 'Volatility (annualized)',
+                        'sharpe_ratio': 'Sharpe Ratio',
+                        'sortino_ratio': 'Sortino Ratio',
+                        'max_drawdown_pct': 'Max Drawdown (%)',
+                        'drawdown_days': 'Days Since High',
+                        'beta': 'Beta vs HSI',
+                    }
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        rolling_window = st.selectbox(
+                            "Window:", options=sorted(rolling_df['window'].unique()),
+                            format_func=lambda w: f"{w} trading days", key="rolling_window_selector"
+                        )
+                    with col2:
+                        rolling_metric = st.selectbox(
+                            "Metric:", options=list(metric_labels),
+                            format_func=lambda m: metric_labels[m], key="rolling_metric_selector"
+                        )
+                    
+                    window_df = rolling_df[rolling_df['window'] == rolling_window].dropna(subset=[rolling_metric])
+                    if window_df.empty:
+                        st.info(f"Analyses are shorter than {rolling_window} trading days")
+                    else:
+                        names = timeline_df.drop_duplicates('analysis_id').set_index('analysis_id')['analysis_name']
+                        rolling_fig = go.Figure()
+                        for analysis_id, analysis_metrics in window_df.groupby('analysis_id'):
+                            rolling_fig.add_trace(go.Scatter(
+                                x=analysis_metrics['date'],
+                                y=analysis_metrics[rolling_metric],
+                                mode='lines',
+                                name=names.get(analysis_id, str(analysis_id))
+                            ))
+                        rolling_fig.update_layout(
+                            title=f"Rolling {rolling_window}-Day {metric_labels[rolling_metric]}",
+                            xaxis_title="Date",
+                            yaxis_title=metric_labels[rolling_metric],
+                            height=400,
+                            hovermode='x unified'
+                        )
+                        st.plotly_chart(rolling_fig, use_container_width=True)
+                
                 # Portfolio Analysis Summary - Interactive equity analysis
                 st.markdown("---")
                 st.markdown("### 📈 Portfolio Analysis Summary")
@@ -3412,7 +3524,18 @@ elif st.session_state.current_page == 'pv_analysis':
                             st.session_state.price_data_cache.clear()
                             st.session_state.cache_expiry.clear()
                         st.rerun()
-                
+
+                # Once analyzed, follow the selected analysis/date (as-of state comes from cached snapshots)
+                current_state = st.session_state.get('portfolio_state_analysis')
+                if (current_state and st.session_state.get('selected_analysis_id')
+                        and st.session_state.get('selected_analysis_date')
+                        and (current_state['analysis_id'] != st.session_state.selected_analysis_id
+                             or current_state['target_date'] != st.session_state.selected_analysis_date)):
+                    st.session_state.portfolio_state_analysis = st.session_state.portfolio_analysis_manager.get_portfolio_state_at_date(
+                        st.session_state.selected_analysis_id,
+                        st.session_state.selected_analysis_date
+                    )
+
                 # Show portfolio analysis results
                 if st.session_state.get('portfolio_state_analysis'):
                     portfolio_state = st.session_state.portfolio_state_analysis
@@ -4017,9 +4140,8 @@ elif st.session_state.current_page == 'equity_analysis':
             end_dt = datetime.strptime(equity_ctx['end_date'], '%Y-%m-%d')
             
             with st.spinner(f"Loading price data for {equity_ctx['symbol']}..."):
-                # Fetch stock data using yfinance
-                ticker = yf.Ticker(equity_ctx['symbol'])
-                hist_data = ticker.history(start=start_dt, end=end_dt)
+                # Stored history from the local price cache, Yahoo Finance otherwise
+                hist_data = load_price_history(equity_ctx['symbol'], start_dt, end_dt)
             
             # Always display basic price chart first
             if hist_data.empty:
@@ -4101,28 +4223,21 @@ elif st.session_state.current_page == 'equity_analysis':
                                 use_realtime = False
                         
                         if not use_realtime:
-                            # Database lookup (original method)
+                            # Database lookup through the local price cache (one read for all indicators)
                             try:
-                                conn = st.session_state.db_manager.get_connection()
-                                with conn:
-                                    with conn.cursor() as cur:
-                                        for indicator_code in selected_indicator_codes:
-                                            # Query technical indicators from daily_equity_technicals table
-                                            cur.execute(f"""
-                                                SELECT trade_date, {indicator_code}
-                                                FROM daily_equity_technicals
-                                                WHERE symbol = %s
-                                                  AND trade_date >= %s
-                                                  AND trade_date <= %s
-                                                  AND {indicator_code} IS NOT NULL
-                                                ORDER BY trade_date
-                                            """, (equity_ctx['symbol'], equity_ctx['start_date'], equity_ctx['end_date']))
-                                            
-                                            results = cur.fetchall()
-                                            if results:
-                                                dates = [r[0] for r in results]
-                                                values = [r[1] for r in results]
-                                                indicator_data[indicator_code] = {'dates': dates, 'values': values}
+                                stored_codes = [code for code in selected_indicator_codes if code in CACHE_COLUMNS]
+                                if stored_codes:
+                                    stored = get_price_cache(st.session_state.db_manager).read(
+                                        [equity_ctx['symbol']], equity_ctx['start_date'], equity_ctx['end_date'],
+                                        columns=stored_codes
+                                    )
+                                    for indicator_code in stored_codes:
+                                        values = stored[['trade_date', indicator_code]].dropna()
+                                        if not values.empty:
+                                            indicator_data[indicator_code] = {
+                                                'dates': values['trade_date'].dt.date.tolist(),
+                                                'values': values[indicator_code].tolist()
+                                            }
                             except Exception as e:
                                 st.warning(f"⚠️ Could not load technical indicators: {str(e)}")
                 
@@ -4330,11 +4445,12 @@ elif st.session_state.current_page == 'strategy_editor':
         st.stop()
     
     # Tab navigation for different areas
-    tab1, tab2, tab3, tab4 = st.tabs([
+    tab1, tab2, tab3, tab4, tab5 = st.tabs([
         "🎯 Strategy Bases", 
         "📊 Signal Magnitudes", 
         "📈 Recent Signals", 
-        "⚙️ Configuration"
+        "⚙️ Configuration",
+        "🧪 Backtest"
     ])
     
     with tab1:
@@ -4823,6 +4939,73 @@ elif st.session_state.current_page == 'strategy_editor':
         except Exception as e:
             st.error(f"Error loading system configuration: {str(e)}")
     
+    with tab5:
+        # Forward-return backtest of stored signal runs
+        st.markdown("### Signal Run Backtest")
+        st.markdown("*Forward 1/5/20-day returns, hit rate, MAE/MFE and ATR-normalized payoff per strategy and strength*")
+        
+        try:
+            strategic_db = StrategicDatabaseManager()
+            runs_df = strategic_db.list_signal_runs(limit=50)
+            
+            if runs_df.empty:
+                st.info("No signal runs found. Backfill signals to create one.")
+            else:
+                run_labels = {
+                    row['run_id']: f"{row['universe_name']} {row['start_date']} → {row['end_date']} "
+                                   f"({int(row['signal_count'])} signals, {row['parameter_set_name'] or 'default'})"
+                    for _, row in runs_df.iterrows()
+                }
+                col1, col2 = st.columns([4, 1])
+                with col1:
+                    selected_run = st.selectbox("Signal Run:", list(run_labels), format_func=run_labels.get)
+                with col2:
+                    refresh_backtest = st.button("🔄 Recompute", key="refresh_signal_backtest")
+                
+                result = get_signal_backtester(strategic_db).backtest_run(selected_run, refresh=refresh_backtest)
+                
+                if result is None:
+                    st.error("❌ Backtest failed - check the logs for details")
+                elif result.outcomes.empty:
+                    st.info("This run has no signals to backtest.")
+                else:
+                    evaluated = int(result.outcomes['return_1d'].notna().sum())
+                    col1, col2, col3, col4 = st.columns(4)
+                    with col1:
+                        st.metric("Signals", len(result.outcomes))
+                    with col2:
+                        st.metric("Evaluated", evaluated)
+                    with col3:
+                        hit_rate = (result.outcomes['return_20d'] > 0)[result.outcomes['return_20d'].notna()].mean()
+                        st.metric("20D Hit Rate", f"{hit_rate:.1%}" if pd.notna(hit_rate) else "N/A")
+                    with col4:
+                        st.metric("Computed In", f"{result.seconds * 1000:.0f} ms")
+                    
+                    summary_display = result.summary.copy()
+                    percent_columns = [c for c in summary_display.columns
+                                       if c.startswith(('hit_rate_', 'avg_return_')) or c.endswith(('_mae', '_mfe'))]
+                    for column in percent_columns:
+                        summary_display[column] = summary_display[column] * 100
+                    st.dataframe(
+                        summary_display,
+                        use_container_width=True,
+                        hide_index=True,
+                        column_config={
+                            column: st.column_config.NumberColumn(column, format="%.2f%%")
+                            for column in percent_columns
+                        }
+                    )
+                    
+                    chart_df = result.summary.dropna(subset=['payoff_atr_20d'])
+                    if not chart_df.empty:
+                        fig = px.bar(chart_df, x='strategy_key', y='payoff_atr_20d', color='base_strategy',
+                                     title="20-Day Payoff in ATR Units by Strategy Key")
+                        fig.update_layout(height=350, showlegend=True)
+                        st.plotly_chart(fig, use_container_width=True)
+        
+        except Exception as e:
+            st.error(f"Error loading signal backtest: {str(e)}")
+    
     # Close database connection
     try:
         conn.close()
@@ -12,10 +12,10 @@ from typing import Dict, List, Optional, Tuple, Any
 import logging
 
 try:
-    from .portfolio_calculator import portfolio_calculator, PortfolioMetrics
+    from .portfolio_calculator import PortfolioCalculator, PortfolioMetrics
     from .hkex_calendar import validate_hkex_analysis_period
 except ImportError:
-    from portfolio_calculator import portfolio_calculator, PortfolioMetrics
+    from portfolio_calculator import PortfolioCalculator, PortfolioMetrics
     from hkex_calendar import validate_hkex_analysis_period
 
 logger = logging.getLogger(__name__)
@@ -34,6 +34,7 @@ class AnalysisManager:
             db_manager: DatabaseManager instance for data persistence
         """
         self.db_manager = db_manager
+        self.calculator = PortfolioCalculator(db=db_manager)
     
     def create_analysis(
         self,
@@ -73,7 +74,7 @@ class AnalysisManager:
             start_date, end_date = adj_start, adj_end
         
         # Run portfolio analysis
-        daily_values_df, metrics = portfolio_calculator.run_portfolio_analysis(
+        daily_values_df, metrics = self.calculator.run_portfolio_analysis(
             positions, start_date, end_date, cash_amount
         )
         
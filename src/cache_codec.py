@@ -0,0 +1,275 @@
+"""
+Binary Cache Codec
+
+Serialization for values stored in Redis through DatabaseManager.get_cache /
+set_cache. Every payload starts with a versioned header:
+
+    b'HKC' | version (1 byte) | format (1 byte) | compression (1 byte) | raw length (4 bytes)
+
+Formats:
+- text: UTF-8 strings (JSON documents, plain values)
+- arrow: DataFrames as Arrow IPC streams (dtypes, timezones and index kept)
+- numpy: DataFrames as raw column buffers plus a small JSON schema, used
+  when pyarrow is not installed
+
+Compression is zstd or lz4 when those packages are installed, otherwise
+zlib; payloads smaller than COMPRESSION_THRESHOLD are stored uncompressed.
+Values written before the codec existed (no header) decode as text.
+"""
+
+import os
+import json
+import zlib
+import struct
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    PYARROW_AVAILABLE = True
+except ImportError:
+    pa = None
+    ipc = None
+    PYARROW_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+try:
+    import lz4.frame as lz4_frame
+    LZ4_AVAILABLE = True
+except ImportError:
+    lz4_frame = None
+    LZ4_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'HKC'
+VERSION = 1
+_HEADER = struct.Struct('<3sBBBI')
+
+FORMAT_TEXT = 0
+FORMAT_BYTES = 1
+FORMAT_ARROW = 2
+FORMAT_NUMPY = 3
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_ZSTD = 2
+COMPRESSION_LZ4 = 3
+
+COMPRESSION_NAMES = {
+    'none': COMPRESSION_NONE, 'zlib': COMPRESSION_ZLIB,
+    'zstd': COMPRESSION_ZSTD, 'lz4': COMPRESSION_LZ4,
+}
+
+# Payloads below this size are not worth compressing
+COMPRESSION_THRESHOLD = 1024
+
+
+def default_compression() -> int:
+    """Compression from REDIS_CACHE_COMPRESSION (auto picks zstd, then lz4, then zlib)"""
+    name = os.getenv('REDIS_CACHE_COMPRESSION', 'auto').lower()
+    if name == 'auto':
+        if ZSTD_AVAILABLE:
+            return COMPRESSION_ZSTD
+        if LZ4_AVAILABLE:
+            return COMPRESSION_LZ4
+        return COMPRESSION_ZLIB
+    if name not in COMPRESSION_NAMES:
+        raise ValueError(f"Unknown cache compression: {name}")
+    return COMPRESSION_NAMES[name]
+
+
+def default_frame_format() -> int:
+    """DataFrame format from REDIS_CACHE_FORMAT (arrow when pyarrow is installed)"""
+    name = os.getenv('REDIS_CACHE_FORMAT', 'arrow' if PYARROW_AVAILABLE else 'numpy').lower()
+    if name == 'arrow' and PYARROW_AVAILABLE:
+        return FORMAT_ARROW
+    return FORMAT_NUMPY
+
+
+# ------------------------------------------------------------------ compression
+
+def _compress(data: bytes, compression: int) -> Tuple[bytes, int]:
+    if compression == COMPRESSION_NONE or len(data) < COMPRESSION_THRESHOLD:
+        return data, COMPRESSION_NONE
+    if compression == COMPRESSION_ZSTD and ZSTD_AVAILABLE:
+        return zstandard.ZstdCompressor(level=3).compress(data), COMPRESSION_ZSTD
+    if compression == COMPRESSION_LZ4 and LZ4_AVAILABLE:
+        return lz4_frame.compress(data), COMPRESSION_LZ4
+    return zlib.compress(data, 1), COMPRESSION_ZLIB
+
+
+def _decompress(data: bytes, compression: int, raw_length: int) -> bytes:
+    if compression == COMPRESSION_NONE:
+        return data
+    if compression == COMPRESSION_ZLIB:
+        return zlib.decompress(data)
+    if compression == COMPRESSION_ZSTD:
+        if not ZSTD_AVAILABLE:
+            raise ValueError("Cached value is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(data, max_output_size=raw_length)
+    if compression == COMPRESSION_LZ4:
+        if not LZ4_AVAILABLE:
+            raise ValueError("Cached value is lz4-compressed but lz4 is not installed")
+        return lz4_frame.decompress(data)
+    raise ValueError(f"Unknown cache compression id: {compression}")
+
+
+# ----------------------------------------------------------------- DataFrames
+
+def _frame_to_arrow(frame: pd.DataFrame) -> bytes:
+    table = pa.Table.from_pandas(frame)
+    sink = pa.BufferOutputStream()
+    with ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _frame_from_arrow(data: bytes) -> pd.DataFrame:
+    return ipc.open_stream(pa.py_buffer(data)).read_all().to_pandas()
+
+
+def _tz_name(tzinfo) -> str:
+    """IANA name for pytz, zoneinfo and dateutil zones"""
+    for attribute in ('zone', 'key'):
+        name = getattr(tzinfo, attribute, None)
+        if name:
+            return name
+    filename = getattr(tzinfo, '_filename', None)
+    if filename and 'zoneinfo/' in filename:
+        return filename.split('zoneinfo/', 1)[1]
+    return str(tzinfo)
+
+
+def _frame_to_numpy(frame: pd.DataFrame) -> bytes:
+    index_names: List[str] = []
+    if not isinstance(frame.index, pd.RangeIndex) or frame.index.name is not None:
+        index_names = [name if name is not None else f'level_{i}' for i, name in enumerate(frame.index.names)]
+        frame = frame.reset_index(names=index_names)
+
+    columns, buffers = [], []
+    for name, series in frame.items():
+        spec: Dict[str, Any] = {'name': str(name)}
+        dtype = series.dtype
+        if isinstance(dtype, pd.DatetimeTZDtype):
+            values = series.dt.tz_convert('UTC').dt.tz_localize(None).to_numpy()
+            spec['tz'] = _tz_name(dtype.tz)
+        elif dtype.kind in 'biufcmM':
+            values = series.to_numpy()
+        else:
+            values = None
+
+        if values is None:
+            spec['json'] = True
+            buffer = json.dumps(series.tolist(), default=str).encode('utf-8')
+        else:
+            values = np.ascontiguousarray(values)
+            spec['dtype'] = values.dtype.str
+            buffer = values.tobytes()
+        spec['nbytes'] = len(buffer)
+        columns.append(spec)
+        buffers.append(buffer)
+
+    meta = json.dumps({'rows': len(frame), 'columns': columns, 'index': index_names}).encode('utf-8')
+    return b''.join([struct.pack('<I', len(meta)), meta] + buffers)
+
+
+def _frame_from_numpy(data: bytes) -> pd.DataFrame:
+    (meta_length,) = struct.unpack_from('<I', data)
+    meta = json.loads(data[4:4 + meta_length])
+    offset = 4 + meta_length
+
+    columns = {}
+    for spec in meta['columns']:
+        chunk = data[offset:offset + spec['nbytes']]
+        offset += spec['nbytes']
+        if spec.get('json'):
+            columns[spec['name']] = pd.Series(json.loads(chunk), dtype=object)
+            continue
+        values = np.frombuffer(chunk, dtype=np.dtype(spec['dtype'])).copy()
+        series = pd.Series(values)
+        if 'tz' in spec:
+            series = series.dt.tz_localize('UTC').dt.tz_convert(spec['tz'])
+        columns[spec['name']] = series
+
+    frame = pd.DataFrame(columns, index=pd.RangeIndex(meta['rows']))
+    if meta['index']:
+        frame = frame.set_index(meta['index'])
+        if frame.index.names == ['level_0']:
+            frame.index.name = None
+    return frame
+
+
+# --------------------------------------------------------------------- public
+
+def encode(value: Any, compression: Optional[int] = None, frame_format: Optional[int] = None) -> bytes:
+    """
+    Serialize a cache value.
+
+    Args:
+        value: str, bytes or pandas DataFrame
+        compression: COMPRESSION_* id (defaults to REDIS_CACHE_COMPRESSION)
+        frame_format: FORMAT_ARROW or FORMAT_NUMPY for DataFrames (defaults to REDIS_CACHE_FORMAT)
+
+    Returns:
+        Payload with the versioned header
+    """
+    if isinstance(value, pd.DataFrame):
+        fmt = frame_format if frame_format is not None else default_frame_format()
+        if fmt == FORMAT_ARROW and not PYARROW_AVAILABLE:
+            fmt = FORMAT_NUMPY
+        raw = _frame_to_arrow(value) if fmt == FORMAT_ARROW else _frame_to_numpy(value)
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        fmt, raw = FORMAT_BYTES, bytes(value)
+    elif isinstance(value, str):
+        fmt, raw = FORMAT_TEXT, value.encode('utf-8')
+    else:
+        raise TypeError(f"Unsupported cache value type: {type(value).__name__}")
+
+    body, used = _compress(raw, default_compression() if compression is None else compression)
+    return _HEADER.pack(MAGIC, VERSION, fmt, used, len(raw)) + body
+
+
+def decode(payload: Optional[bytes]) -> Any:
+    """
+    Deserialize a cache payload.
+
+    Args:
+        payload: Bytes read from Redis (None passes through)
+
+    Returns:
+        str, bytes or DataFrame; payloads without a header are returned as text
+    """
+    if payload is None:
+        return None
+    if isinstance(payload, str):
+        return payload
+    if len(payload) < _HEADER.size or payload[:3] != MAGIC:
+        return payload.decode('utf-8')
+
+    _, version, fmt, compression, raw_length = _HEADER.unpack_from(payload)
+    if version != VERSION:
+        raise ValueError(f"Unsupported cache codec version: {version}")
+
+    raw = _decompress(payload[_HEADER.size:], compression, raw_length)
+    if fmt == FORMAT_TEXT:
+        return raw.decode('utf-8')
+    if fmt == FORMAT_BYTES:
+        return raw
+    if fmt == FORMAT_ARROW:
+        if not PYARROW_AVAILABLE:
+            raise ValueError("Cached value is Arrow-encoded but pyarrow is not installed")
+        return _frame_from_arrow(raw)
+    if fmt == FORMAT_NUMPY:
+        return _frame_from_numpy(raw)
+    raise ValueError(f"Unknown cache format id: {fmt}")
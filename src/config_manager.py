@@ -168,7 +168,8 @@ class ConfigManager:
             'password': self.get('database.password'),
             'min_connections': self.get('database.min_connections', 1),
             'max_connections': self.get('database.max_connections', 10),
-            'connection_timeout': self.get('database.connection_timeout', 30)
+            'connection_timeout': self.get('database.connection_timeout', 30),
+            'health_check_interval': self.get('database.health_check_interval', 30)
         }
     
     def get_redis_config(self) -> Dict[str, Any]:
@@ -14,6 +14,11 @@ import json
 import logging
 from enum import Enum
 
+try:
+    from .db_pool import get_connection_pool
+except ImportError:
+    from db_pool import get_connection_pool
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -52,14 +57,21 @@ class DatabaseManager:
         self._schema_capabilities = None
         
     def get_connection(self):
-        """Get database connection with enhanced error handling"""
+        """Borrow a pooled database connection; close() returns it to the shared pool"""
         try:
-            conn = psycopg2.connect(self.db_url)
-            return conn
+            return get_connection_pool(self.db_url).get_connection()
         except Exception as e:
             logger.error(f"Database connection failed: {e}")
             raise
     
+    def connection(self):
+        """Context manager borrowing a pooled connection (commit on success, rollback on error)"""
+        return get_connection_pool(self.db_url).connection()
+    
+    def get_pool_metrics(self) -> Dict:
+        """Connection pool usage metrics for this manager's database"""
+        return get_connection_pool(self.db_url).get_metrics()
+    
     def detect_schema_version(self, force_refresh: bool = False) -> Tuple[SchemaVersion, Dict]:
         """
         Detect current database schema version and capabilities.
@@ -113,6 +125,8 @@ class DatabaseManager:
                 else:
                     not_null_checks[table] = False
             
+            conn.close()
+            
             # Determine schema version with more precise logic
             if not has_portfolios_table and not any(portfolio_id_checks.values()):
                 # Original single-portfolio schema
@@ -205,7 +219,7 @@ class DatabaseManager:
         try:
             version, capabilities = self.detect_schema_version()
             
-            with self.get_connection() as conn:
+            with self.connection() as conn:
                 if capabilities['multi_portfolio']:
                     # Multi-portfolio schema
                     query = """
@@ -250,7 +264,7 @@ class DatabaseManager:
         try:
             version, capabilities = self.detect_schema_version()
             
-            with self.get_connection() as conn:
+            with self.connection() as conn:
                 if capabilities['multi_portfolio']:
                     # Multi-portfolio schema
                     query = """
@@ -307,7 +321,7 @@ class DatabaseManager:
         try:
             version, capabilities = self.detect_schema_version()
             
-            with self.get_connection() as conn:
+            with self.connection() as conn:
                 with conn.cursor() as cur:
                     if capabilities['multi_portfolio']:
                         # Multi-portfolio schema
@@ -367,7 +381,7 @@ class DatabaseManager:
                     'updated_at': None
                 }])
             
-            with self.get_connection() as conn:
+            with self.connection() as conn:
                 query = """
                 SELECT portfolio_id, name, description, created_at, updated_at
                 FROM portfolios
@@ -398,7 +412,7 @@ class DatabaseManager:
                 logger.warning("Cannot create portfolio in single-portfolio schema")
                 return False
             
-            with self.get_connection() as conn:
+            with self.connection() as conn:
                 with conn.cursor() as cur:
                     query = """
                     INSERT INTO portfolios (portfolio_id, name, description)
@@ -464,14 +478,20 @@ class DatabaseManager:
         
         # Test database connection
         try:
-            conn = self.get_connection()
-            with conn.cursor() as cur:
-                cur.execute("SELECT version();")
-                version = cur.fetchone()[0]
+            with self.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT version();")
+                    version = cur.fetchone()[0]
             health['database'] = {'status': 'healthy', 'details': f'Connected to {version}'}
         except Exception as e:
             health['database'] = {'status': 'error', 'details': str(e)}
         
+        # Connection pool usage
+        try:
+            health['pool'] = {'status': 'healthy', 'details': self.get_pool_metrics()}
+        except Exception as e:
+            health['pool'] = {'status': 'error', 'details': str(e)}
+        
         # Test Redis connection
         if self.redis_client:
             try:
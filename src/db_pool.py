@@ -0,0 +1,399 @@
+"""
+Shared PostgreSQL Connection Pool
+
+Provides a process-wide, thread-safe connection pool used by every database
+manager (DatabaseManager, StrategicDatabaseManager, PortfolioAnalysisManager,
+PortfolioManager and the dashboard helpers) instead of opening a new
+psycopg2 connection per method call.
+
+Features:
+- One pool per DSN per process, sized from ConfigManager.get_database_config
+- Blocking borrow with timeout when the pool is exhausted
+- Health checks on borrow (closed / idle connections are validated)
+- Pool metrics (borrows, waits, exhaustion events, peak usage)
+"""
+
+import os
+import time
+import logging
+import threading
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIN_CONNECTIONS = 1
+DEFAULT_MAX_CONNECTIONS = 10
+DEFAULT_CONNECTION_TIMEOUT = 30
+DEFAULT_HEALTH_CHECK_INTERVAL = 30
+
+
+class PooledConnection:
+    """
+    Proxy around a pooled psycopg2 connection.
+
+    Behaves like a regular connection (cursor, commit, rollback, ...), but
+    close() returns the underlying connection to the pool instead of closing
+    the socket. Connections that are dropped without close() are returned
+    when the proxy is garbage collected.
+    """
+
+    def __init__(self, pool: 'ConnectionPool', conn):
+        self._pool = pool
+        self._conn = conn
+        self._finalizer = weakref.finalize(self, pool._release_leaked, conn)
+
+    def __getattr__(self, name):
+        conn = self.__dict__.get('_conn')
+        if conn is None:
+            raise psycopg2.InterfaceError("connection already returned to pool")
+        return getattr(conn, name)
+
+    @property
+    def closed(self):
+        return 1 if self._conn is None else self._conn.closed
+
+    def close(self):
+        """Return the connection to the pool"""
+        if self._conn is not None:
+            self._finalizer.detach()
+            conn, self._conn = self._conn, None
+            self._pool.putconn(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Same transaction semantics as psycopg2: commit on success, rollback on error
+        if self._conn is not None and not self._conn.closed:
+            if exc_type is None:
+                self._conn.commit()
+            else:
+                self._conn.rollback()
+        return False
+
+
+class ConnectionPool:
+    """Thread-safe PostgreSQL connection pool with health checks and metrics"""
+
+    def __init__(self, dsn: str, min_connections: int = DEFAULT_MIN_CONNECTIONS,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 connection_timeout: float = DEFAULT_CONNECTION_TIMEOUT,
+                 health_check_interval: float = DEFAULT_HEALTH_CHECK_INTERVAL):
+        """
+        Initialize the pool.
+
+        Args:
+            dsn: PostgreSQL connection string
+            min_connections: Connections opened eagerly and kept idle
+            max_connections: Hard limit of open connections
+            connection_timeout: Seconds to wait for a free connection when exhausted
+            health_check_interval: Idle seconds after which a connection is validated on borrow
+        """
+        self.dsn = dsn
+        self.min_connections = max(0, int(min_connections))
+        self.max_connections = max(1, int(max_connections), self.min_connections)
+        self.connection_timeout = float(connection_timeout)
+        self.health_check_interval = float(health_check_interval)
+
+        # Re-entrant so a proxy finalizer firing inside a locked section cannot deadlock
+        self._lock = threading.Condition(threading.RLock())
+        self._idle = deque()  # (connection, last_used_monotonic)
+        self._in_use = 0
+        self._opened = 0
+        self._closed = False
+        self._pid = os.getpid()
+
+        self._metrics = {
+            'borrows': 0,
+            'returns': 0,
+            'connections_created': 0,
+            'connections_discarded': 0,
+            'health_check_failures': 0,
+            'leaked_returns': 0,
+            'exhaustion_events': 0,
+            'wait_timeouts': 0,
+            'total_wait_seconds': 0.0,
+            'peak_in_use': 0,
+        }
+
+        for _ in range(self.min_connections):
+            try:
+                self._idle.append((self._connect(), time.monotonic()))
+                self._opened += 1
+                self._metrics['connections_created'] += 1
+            except Exception as e:
+                logger.warning(f"Could not pre-open pooled connection: {e}")
+                break
+
+    def _connect(self):
+        return psycopg2.connect(self.dsn)
+
+    def _discard(self, conn):
+        """Close a connection and free its slot (caller holds the lock)"""
+        try:
+            if not conn.closed:
+                conn.close()
+        except Exception:
+            pass
+        self._opened -= 1
+        self._metrics['connections_discarded'] += 1
+
+    def _is_healthy(self, conn, last_used: float) -> bool:
+        """Validate a connection before handing it out"""
+        if conn.closed:
+            return False
+        status = conn.info.transaction_status
+        if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            self._metrics['health_check_failures'] += 1
+            return False
+
+    def _check_fork(self):
+        """Drop connections inherited from a parent process (caller holds the lock)"""
+        if self._pid != os.getpid():
+            self._idle.clear()
+            self._in_use = 0
+            self._opened = 0
+            self._pid = os.getpid()
+
+    def getconn(self):
+        """
+        Borrow a raw psycopg2 connection, blocking up to connection_timeout.
+
+        Raises:
+            PoolError: If the pool is closed or no connection became free in time
+        """
+        deadline = None
+        waited_since = None
+
+        with self._lock:
+            self._check_fork()
+            while True:
+                if self._closed:
+                    raise PoolError("connection pool is closed")
+
+                while self._idle:
+                    conn, last_used = self._idle.pop()
+                    if self._is_healthy(conn, last_used):
+                        return self._checkout(conn, waited_since)
+                    self._discard(conn)
+
+                if self._opened < self.max_connections:
+                    self._opened += 1
+                    break
+
+                # Pool exhausted: wait for a connection to be returned
+                if waited_since is None:
+                    waited_since = time.monotonic()
+                    deadline = waited_since + self.connection_timeout
+                    self._metrics['exhaustion_events'] += 1
+                    logger.warning(f"Connection pool exhausted ({self._in_use}/{self.max_connections} in use), waiting")
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._metrics['wait_timeouts'] += 1
+                    self._metrics['total_wait_seconds'] += time.monotonic() - waited_since
+                    raise PoolError(f"connection pool exhausted: no connection available within {self.connection_timeout}s")
+                self._lock.wait(remaining)
+
+        # Open a new connection outside the lock; the slot is already reserved
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+                self._lock.notify()
+            raise
+
+        with self._lock:
+            self._metrics['connections_created'] += 1
+            return self._checkout(conn, waited_since)
+
+    def _checkout(self, conn, waited_since: Optional[float]):
+        """Record a borrow (caller holds the lock)"""
+        self._in_use += 1
+        self._metrics['borrows'] += 1
+        self._metrics['peak_in_use'] = max(self._metrics['peak_in_use'], self._in_use)
+        if waited_since is not None:
+            self._metrics['total_wait_seconds'] += time.monotonic() - waited_since
+        return conn
+
+    def putconn(self, conn, discard: bool = False):
+        """Return a raw connection to the pool, resetting any open transaction"""
+        if not discard and not conn.closed:
+            try:
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if conn.autocommit:
+                    conn.autocommit = False
+            except Exception:
+                discard = True
+
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            self._in_use = max(0, self._in_use - 1)
+            self._metrics['returns'] += 1
+            if discard or conn.closed or self._closed:
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._lock.notify()
+
+    def _release_leaked(self, conn):
+        """Finalizer for proxies dropped without close()"""
+        with self._lock:
+            self._metrics['leaked_returns'] += 1
+        try:
+            self.putconn(conn)
+        except Exception as e:
+            logger.debug(f"Failed to return leaked connection: {e}")
+
+    def get_connection(self) -> PooledConnection:
+        """Borrow a connection wrapped in a PooledConnection proxy"""
+        return PooledConnection(self, self.getconn())
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection for the duration of a with-block.
+
+        Commits on success, rolls back on error and always returns the
+        connection to the pool.
+        """
+        conn = self.getconn()
+        try:
+            yield conn
+            if not conn.closed:
+                conn.commit()
+        except Exception:
+            if not conn.closed:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+            raise
+        finally:
+            self.putconn(conn)
+
+    def health_check(self) -> Dict[str, Any]:
+        """Run a round-trip query on a pooled connection and report pool state"""
+        result = {'healthy': False, 'latency_ms': None, 'error': None}
+        try:
+            start = time.perf_counter()
+            with self.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                    cur.fetchone()
+            result['healthy'] = True
+            result['latency_ms'] = (time.perf_counter() - start) * 1000
+        except Exception as e:
+            result['error'] = str(e)
+        result['metrics'] = self.get_metrics()
+        return result
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Snapshot of pool usage counters"""
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics.update({
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'open': self._opened,
+                'min_connections': self.min_connections,
+                'max_connections': self.max_connections,
+            })
+        return metrics
+
+    def close_all(self):
+        """Close every idle connection and refuse further borrows"""
+        with self._lock:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._discard(conn)
+            self._lock.notify_all()
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool_settings() -> Dict[str, Any]:
+    """Pool sizing from ConfigManager, falling back to defaults when unconfigured"""
+    settings = {
+        'min_connections': DEFAULT_MIN_CONNECTIONS,
+        'max_connections': DEFAULT_MAX_CONNECTIONS,
+        'connection_timeout': DEFAULT_CONNECTION_TIMEOUT,
+        'health_check_interval': DEFAULT_HEALTH_CHECK_INTERVAL,
+    }
+    try:
+        try:
+            from .config_manager import get_config
+        except ImportError:
+            from config_manager import get_config
+        db_config = get_config().get_database_config()
+        for key in settings:
+            if db_config.get(key) is not None:
+                settings[key] = db_config[key]
+    except Exception as e:
+        logger.debug(f"Using default connection pool settings: {e}")
+    return settings
+
+
+def get_connection_pool(dsn: str, **overrides) -> ConnectionPool:
+    """
+    Get (or create) the process-wide pool for a DSN.
+
+    Args:
+        dsn: PostgreSQL connection string
+        **overrides: Optional min_connections/max_connections/connection_timeout/health_check_interval
+
+    Returns:
+        Shared ConnectionPool instance
+    """
+    pool = _pools.get(dsn)
+    if pool is not None and pool._pid == os.getpid() and not pool._closed:
+        return pool
+
+    with _pools_lock:
+        pool = _pools.get(dsn)
+        if pool is None or pool._pid != os.getpid() or pool._closed:
+            settings = _pool_settings()
+            settings.update(overrides)
+            pool = ConnectionPool(dsn, **settings)
+            _pools[dsn] = pool
+            logger.info(f"Created connection pool (min={pool.min_connections}, max={pool.max_connections})")
+        return pool
+
+
+def get_all_pool_metrics() -> Dict[str, Dict[str, Any]]:
+    """Metrics for every pool in this process, keyed by host/database (no credentials)"""
+    metrics = {}
+    for dsn, pool in list(_pools.items()):
+        label = dsn.split('@')[-1] if '@' in dsn else dsn
+        metrics[label] = pool.get_metrics()
+    return metrics
+
+
+def close_all_pools():
+    """Close every pool in this process"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close_all()
+        _pools.clear()
@@ -0,0 +1,234 @@
+"""
+Gap-Aware Price Fetch Planner
+
+Works out exactly which HKEX trading days are missing from
+daily_equity_technicals for each symbol and turns them into the smallest
+set of ranged fetches:
+- Expected days come from the HKEX trading calendar (weekends and holidays excluded)
+- Consecutive missing trading days collapse into one range, so gaps that
+  only look separated by a weekend or holiday are fetched together
+- Only completed sessions (through the last HKEX close) are requested, so an
+  intraday chart open does not keep refetching today's partial bar
+- The plan records what was skipped because it is already stored
+- Trading days a fetch came back without a bar for (suspensions, days
+  before listing) are remembered for a short while and not planned again
+"""
+
+import os
+import time
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional
+
+try:
+    from .hkex_calendar import get_hkex_trading_days, hkex_calendar
+except ImportError:
+    from hkex_calendar import get_hkex_trading_days, hkex_calendar
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FetchRange:
+    """One ranged fetch covering consecutive missing trading days"""
+    symbol: str
+    start_date: date
+    end_date: date
+    trading_days: int
+
+    def contains(self, check_date: date) -> bool:
+        return self.start_date <= check_date <= self.end_date
+
+
+@dataclass
+class FetchPlan:
+    """Ranges to fetch plus a report of what the database already covers"""
+    start_date: date
+    end_date: date
+    expected_days: int
+    ranges: List[FetchRange] = field(default_factory=list)
+    covered_days: Dict[str, int] = field(default_factory=dict)
+    missing_days: Dict[str, int] = field(default_factory=dict)
+    empty_days: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def is_complete(self) -> bool:
+        return not self.ranges
+
+    @property
+    def symbols_to_fetch(self) -> List[str]:
+        return sorted({r.symbol for r in self.ranges})
+
+    @property
+    def skipped_symbols(self) -> List[str]:
+        """Symbols fully covered by the database (no fetch needed)"""
+        return sorted(s for s, missing in self.missing_days.items() if missing == 0)
+
+    def ranges_for(self, symbol: str) -> List[FetchRange]:
+        return [r for r in self.ranges if r.symbol == symbol]
+
+    def summary(self) -> str:
+        """One-line description of what will be fetched and what was skipped"""
+        skipped_days = sum(self.covered_days.values())
+        fetch_days = sum(self.missing_days.values())
+        return (f"{len(self.ranges)} fetch range(s) for {len(self.symbols_to_fetch)} symbol(s) "
+                f"covering {fetch_days} missing trading day(s); skipped {skipped_days} stored day(s), "
+                f"{sum(self.empty_days.values())} recently empty day(s), "
+                f"{len(self.skipped_symbols)} symbol(s) already complete")
+
+
+class EmptyRangeCache:
+    """Trading days a fetch returned no bar for, per symbol, until they expire"""
+
+    def __init__(self, ttl_seconds: float = 1800):
+        """
+        Args:
+            ttl_seconds: How long an empty day is skipped before it is fetched again
+        """
+        self.ttl_seconds = ttl_seconds
+        self._expiry: Dict[str, Dict[date, float]] = {}
+        self._lock = threading.Lock()
+
+    def mark(self, symbol: str, days: Iterable[date]):
+        """Remember days that came back without a bar"""
+        expires = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            entries = self._expiry.setdefault(symbol, {})
+            for day in days:
+                entries[day] = expires
+
+    def days(self, symbol: str) -> set:
+        """Unexpired empty days of a symbol"""
+        now = time.monotonic()
+        with self._lock:
+            entries = self._expiry.get(symbol)
+            if not entries:
+                return set()
+            for day in [d for d, expires in entries.items() if expires <= now]:
+                del entries[day]
+            return set(entries)
+
+    def clear(self):
+        with self._lock:
+            self._expiry.clear()
+
+
+empty_ranges = EmptyRangeCache(float(os.getenv('FETCH_EMPTY_RANGE_TTL', '1800')))
+
+
+def record_empty_ranges(ranges: Iterable[FetchRange], fetched_dates: Dict[str, Iterable[date]],
+                        cache: Optional[EmptyRangeCache] = None, failed_symbols: Iterable[str] = ()):
+    """
+    Remember the planned trading days a successful fetch returned no bar for.
+
+    Only call this after the provider answered; a failed request says nothing
+    about which days exist. Symbols the provider reported as failed are left
+    alone, and nothing is recorded when the response holds no bars at all
+    (providers that swallow errors cannot be told apart from empty answers).
+
+    Args:
+        ranges: Planned ranges that were requested
+        fetched_dates: Dates returned per symbol
+        cache: Cache to update (defaults to the process-wide empty_ranges)
+        failed_symbols: Symbols whose fetch failed (HistoryResult.failed)
+    """
+    cache = cache or empty_ranges
+    if not any(True for dates in fetched_dates.values() for _ in dates):
+        return
+    failed = set(failed_symbols)
+    returned: Dict[str, set] = {}
+    for fetch_range in ranges:
+        if fetch_range.symbol in failed:
+            continue
+        if fetch_range.symbol not in returned:
+            returned[fetch_range.symbol] = set(fetched_dates.get(fetch_range.symbol, ()))
+        days = get_hkex_trading_days(fetch_range.start_date, fetch_range.end_date)
+        empty = [d for d in days if d not in returned[fetch_range.symbol]]
+        if empty:
+            cache.mark(fetch_range.symbol, empty)
+            logger.info(f"No bars for {fetch_range.symbol} on {len(empty)} trading day(s) "
+                        f"{fetch_range.start_date} to {fetch_range.end_date}; skipping them for now")
+
+
+def plan_missing_ranges(existing_dates: Dict[str, Iterable[date]], symbols: List[str],
+                        start_date: date, end_date: date, max_bridge_days: int = 0,
+                        today: Optional[date] = None,
+                        empty_cache: Optional[EmptyRangeCache] = None) -> FetchPlan:
+    """
+    Build a fetch plan from the trade dates already stored per symbol.
+
+    Args:
+        existing_dates: Stored trade dates per symbol
+        symbols: Symbols that should be covered
+        start_date: First date of the requested period
+        end_date: Last date of the requested period
+        max_bridge_days: Merge two gaps when at most this many stored trading
+                         days lie between them (0 = only truly adjacent gaps)
+        today: Sessions on or after this date are not expected (defaults to expecting
+               sessions through the last completed HKEX session, as the populator does)
+        empty_cache: Recently empty days to leave out (defaults to empty_ranges)
+
+    Returns:
+        FetchPlan with the merged missing ranges per symbol
+    """
+    empty_cache = empty_cache or empty_ranges
+    if today is None:
+        last_day = min(end_date, hkex_calendar.get_last_completed_trading_day())
+    else:
+        last_day = min(end_date, today - timedelta(days=1))
+    trading_days = get_hkex_trading_days(start_date, last_day) if start_date <= last_day else []
+
+    plan = FetchPlan(start_date=start_date, end_date=end_date, expected_days=len(trading_days))
+
+    for symbol in symbols:
+        stored = set(existing_dates.get(symbol, ()))
+        empty = empty_cache.days(symbol) - stored
+        missing_positions = [i for i, d in enumerate(trading_days) if d not in stored and d not in empty]
+
+        plan.missing_days[symbol] = len(missing_positions)
+        plan.empty_days[symbol] = len([d for d in trading_days if d in empty])
+        plan.covered_days[symbol] = len(trading_days) - len(missing_positions) - plan.empty_days[symbol]
+
+        # Group missing positions whose distance in the trading-day sequence is small enough
+        run_start = run_end = None
+        run_count = 0
+        for position in missing_positions:
+            if run_start is not None and position - run_end - 1 <= max_bridge_days:
+                run_end = position
+                run_count += 1
+                continue
+            if run_start is not None:
+                plan.ranges.append(FetchRange(symbol, trading_days[run_start], trading_days[run_end], run_count))
+            run_start = run_end = position
+            run_count = 1
+        if run_start is not None:
+            plan.ranges.append(FetchRange(symbol, trading_days[run_start], trading_days[run_end], run_count))
+
+    return plan
+
+
+def load_existing_dates(cur, symbols: List[str], start_date: date, end_date: date) -> Dict[str, List[date]]:
+    """Stored trade dates per symbol from daily_equity_technicals in one query"""
+    cur.execute("""
+        SELECT symbol, trade_date
+        FROM daily_equity_technicals
+        WHERE symbol = ANY(%s)
+          AND trade_date BETWEEN %s AND %s
+    """, (list(symbols), start_date, end_date))
+
+    existing: Dict[str, List[date]] = {}
+    for row in cur.fetchall():
+        symbol, trade_date = (row['symbol'], row['trade_date']) if isinstance(row, dict) else (row[0], row[1])
+        existing.setdefault(symbol, []).append(trade_date)
+    return existing
+
+
+def plan_from_database(cur, symbols: List[str], start_date: date, end_date: date,
+                       max_bridge_days: int = 0) -> FetchPlan:
+    """Load stored trade dates and plan the missing ranges"""
+    existing = load_existing_dates(cur, symbols, start_date, end_date)
+    plan = plan_missing_ranges(existing, symbols, start_date, end_date, max_bridge_days)
+    logger.info(f"Fetch plan {start_date} to {end_date}: {plan.summary()}")
+    return plan
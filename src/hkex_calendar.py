@@ -6,12 +6,16 @@ for portfolio analysis period selection.
 """
 
 import pandas as pd
-from datetime import datetime, date, timedelta
+from datetime import datetime, date, time, timedelta
 from typing import List, Tuple, Optional
+from dateutil import tz
 import logging
 
 logger = logging.getLogger(__name__)
 
+HK_TZ = tz.gettz("Asia/Hong_Kong")
+HKEX_SESSION_CLOSE = time(16, 10)  # End of the closing auction session
+
 # HKEX Public Holidays (2024-2026) - Update annually
 HKEX_HOLIDAYS = {
     # 2024
@@ -125,6 +129,24 @@ class HKEXTradingCalendar:
             current -= timedelta(days=1)
         return current
     
+    def get_last_completed_trading_day(self, now: Optional[datetime] = None) -> date:
+        """
+        Get the latest trading day whose session has closed.
+        
+        Args:
+            now: Current time (defaults to now in Hong Kong; naive values are taken as HK time)
+            
+        Returns:
+            Today once the closing auction is over on a trading day, otherwise the previous trading day
+        """
+        now = now or datetime.now(HK_TZ)
+        if now.tzinfo is not None:
+            now = now.astimezone(HK_TZ)
+        today = now.date()
+        if self.is_trading_day(today) and now.time() >= HKEX_SESSION_CLOSE:
+            return today
+        return self.get_previous_trading_day(today - timedelta(days=1))
+    
     def get_trading_days_between(self, start_date: date, end_date: date) -> List[date]:
         """
         Get all trading days between start_date and end_date (inclusive).
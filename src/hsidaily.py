@@ -36,6 +36,11 @@ from dateutil import tz
 from tabulate import tabulate
 import yfinance as yf
 
+try:
+    from market_data import get_market_data_provider
+except ImportError:
+    from src.market_data import get_market_data_provider
+
 HK_TZ = tz.gettz("Asia/Hong_Kong")
 
 # -----------------------------
@@ -182,19 +187,14 @@ def yf_history(ticker: str, days: int = LOOKBACK_DAYS) -> pd.DataFrame:
     """Fetch historical OHLCV data from Yahoo Finance with timezone handling
     Falls back to 6-month period if initial request returns insufficient data
     """
-    tk = yf.Ticker(ticker)
-    df = tk.history(period=f"{days}d", interval="1d", auto_adjust=False, actions=False)
+    provider = get_market_data_provider()
+    today = datetime.now(HK_TZ).date()
+    df = provider.history([ticker], today - timedelta(days=days), today)
     if df.empty or len(df) < 50:
         # Fallback: need minimum ~50 bars for meaningful technical analysis
-        df = tk.history(period="6mo", interval="1d", auto_adjust=False, actions=False)
-    df = df.rename_axis("Date").reset_index()
-    # Ensure timezone-aware datetimes in HK timezone for proper market hours
-    if df["Date"].dt.tz is None:
-        # Timezone-naive: assume UTC and convert to HK
-        df["Date"] = pd.to_datetime(df["Date"]).dt.tz_localize("UTC").dt.tz_convert(HK_TZ)
-    elif str(df["Date"].dt.tz) != str(HK_TZ):
-        # Already timezone-aware but not HK timezone
-        df["Date"] = df["Date"].dt.tz_convert(HK_TZ)
+        df = provider.history([ticker], today - timedelta(days=183), today)
+    df = df.drop(columns="symbol")
+    df["Date"] = pd.to_datetime(df["Date"]).dt.tz_localize(HK_TZ)  # daily bars are HK session dates
     return df
 
 def yf_live_quote(ticker: str) -> Tuple[Optional[float], Optional[int], Optional[datetime]]:
@@ -0,0 +1,226 @@
+"""
+Incremental Technical Indicator Computation
+
+Keeps per-symbol indicator state so end-of-day updates only compute and
+upsert the newly appended bars instead of re-downloading a 365-day buffer
+and recomputing every window:
+- EMA 12/26/50 and the MACD signal carry their exponentially weighted state
+- Rolling windows (SMA, Bollinger, RSI, ATR, volume, 52-week, ROC,
+  support/resistance) are recomputed over a tail of the last 252 raw bars
+
+Results match a full recompute of PriceDataPopulator.calculate_technical_indicators
+over the same history.
+"""
+
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Longest look-back of any indicator (52-week high/low)
+TAIL_BARS = 252
+
+RAW_COLUMNS = ['Date', 'Open', 'High', 'Low', 'Close', 'Volume']
+
+# Exponentially weighted series carried between runs: name -> span
+EWM_SPANS = {'ema_12': 12, 'ema_26': 26, 'ema_50': 50, 'macd_signal': 9}
+
+INDICATOR_STATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS equity_indicator_state (
+        symbol VARCHAR(10) PRIMARY KEY,
+        last_trade_date DATE NOT NULL,
+        state JSONB NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+def ewm_mean_continue(values: np.ndarray, span: int,
+                      state: Optional[Tuple[float, float]] = None) -> Tuple[np.ndarray, Tuple[float, float]]:
+    """
+    Continue pandas' Series.ewm(span=span).mean() (adjust=True) over new values.
+
+    Uses the same recurrence as pandas so a run split into several calls gives
+    the same output as one call over the whole series.
+
+    Args:
+        values: New observations (NaN allowed)
+        span: EWM span
+        state: (weighted_mean, old_weight) after the previous call, None to start fresh
+
+    Returns:
+        Tuple of (means for each value, state after the last value)
+    """
+    alpha = 2.0 / (span + 1.0)
+    old_wt_factor = 1.0 - alpha
+    weighted, old_wt = state if state is not None else (np.nan, 1.0)
+
+    output = np.empty(len(values))
+    for i, cur in enumerate(values):
+        is_observation = cur == cur
+        if weighted == weighted:
+            old_wt *= old_wt_factor
+            if is_observation:
+                if weighted != cur:
+                    weighted = (old_wt * weighted + cur) / (old_wt + 1.0)
+                old_wt += 1.0
+        elif is_observation:
+            weighted = cur
+        output[i] = weighted
+
+    return output, (float(weighted), float(old_wt))
+
+
+@dataclass
+class IndicatorState:
+    """Per-symbol state needed to extend the indicator series by new bars"""
+    symbol: str
+    last_trade_date: date
+    ewm: Dict[str, Tuple[float, float]] = field(default_factory=dict)
+    tail: pd.DataFrame = field(default_factory=lambda: pd.DataFrame(columns=RAW_COLUMNS))
+
+    def to_json(self) -> str:
+        tail = {
+            'Date': [d.isoformat() for d in self.tail['Date']],
+            **{column: [float(v) for v in self.tail[column]] for column in RAW_COLUMNS[1:]},
+        }
+        return json.dumps({
+            'symbol': self.symbol,
+            'last_trade_date': self.last_trade_date.isoformat(),
+            'ewm': {name: list(value) for name, value in self.ewm.items()},
+            'tail': tail,
+        })
+
+    @classmethod
+    def from_json(cls, payload) -> 'IndicatorState':
+        data = json.loads(payload) if isinstance(payload, str) else payload
+        tail = pd.DataFrame(data['tail'], columns=RAW_COLUMNS)
+        tail['Date'] = pd.to_datetime(tail['Date']).dt.date
+        return cls(
+            symbol=data['symbol'],
+            last_trade_date=date.fromisoformat(data['last_trade_date']),
+            ewm={name: (float(value[0]), float(value[1])) for name, value in data['ewm'].items()},
+            tail=tail,
+        )
+
+
+class IncrementalIndicatorCalculator:
+    """Builds and advances IndicatorState using the populator's indicator definitions"""
+
+    def __init__(self, populator):
+        """
+        Args:
+            populator: PriceDataPopulator providing calculate_technical_indicators
+        """
+        self.populator = populator
+
+    def _apply_ewm(self, data: pd.DataFrame, ewm_state: Dict[str, Tuple[float, float]]) -> Dict[str, Tuple[float, float]]:
+        """Overwrite the EWM-based columns of data from carried state; returns the new state"""
+        new_state = {}
+        for name in ('ema_12', 'ema_26', 'ema_50'):
+            data[name], new_state[name] = ewm_mean_continue(
+                data['Close'].to_numpy(dtype=float), EWM_SPANS[name], ewm_state.get(name))
+
+        data['macd'] = data['ema_12'] - data['ema_26']
+        data['macd_signal'], new_state['macd_signal'] = ewm_mean_continue(
+            data['macd'].to_numpy(dtype=float), EWM_SPANS['macd_signal'], ewm_state.get('macd_signal'))
+        data['macd_histogram'] = data['macd'] - data['macd_signal']
+        return new_state
+
+    def _make_state(self, symbol: str, bars: pd.DataFrame, ewm_state) -> IndicatorState:
+        tail = bars[RAW_COLUMNS].tail(TAIL_BARS).reset_index(drop=True)
+        return IndicatorState(symbol, tail['Date'].iloc[-1], ewm_state, tail)
+
+    def initialize(self, symbol: str, bars: pd.DataFrame) -> Tuple[pd.DataFrame, IndicatorState]:
+        """
+        Full computation over the complete history.
+
+        Args:
+            symbol: Stock symbol
+            bars: Raw OHLCV bars sorted by Date
+
+        Returns:
+            Tuple of (indicator frame for every bar, state after the last bar)
+        """
+        data = self.populator.calculate_technical_indicators(bars[RAW_COLUMNS].reset_index(drop=True).copy())
+        ewm_state = self._apply_ewm(data, {})
+        return data, self._make_state(symbol, data, ewm_state)
+
+    def update(self, state: IndicatorState, new_bars: pd.DataFrame) -> Tuple[pd.DataFrame, IndicatorState]:
+        """
+        Compute indicators for bars appended after state.last_trade_date.
+
+        Args:
+            state: State after the last processed bar
+            new_bars: Raw OHLCV bars; rows on or before last_trade_date are ignored
+
+        Returns:
+            Tuple of (indicator frame for the new bars only, advanced state)
+        """
+        new_bars = new_bars[new_bars['Date'] > state.last_trade_date].sort_values('Date')
+        if new_bars.empty:
+            return new_bars.iloc[0:0].copy(), state
+
+        combined = pd.concat([state.tail, new_bars[RAW_COLUMNS]], ignore_index=True)
+        combined = self.populator.calculate_technical_indicators(combined)
+        data = combined.iloc[len(state.tail):].reset_index(drop=True)
+
+        ewm_state = self._apply_ewm(data, state.ewm)
+        return data, self._make_state(state.symbol, combined, ewm_state)
+
+
+class IndicatorStateStore:
+    """Persists IndicatorState per symbol in the equity_indicator_state table"""
+
+    def __init__(self, db):
+        """
+        Args:
+            db: DatabaseManager providing connection()
+        """
+        self.db = db
+        self._table_ready = False
+
+    def _ensure_table(self, cur):
+        if not self._table_ready:
+            cur.execute(INDICATOR_STATE_TABLE_SQL)
+            self._table_ready = True
+
+    def load(self, symbols: List[str]) -> Dict[str, IndicatorState]:
+        """Load saved state for the given symbols (symbols without state are omitted)"""
+        try:
+            with self.db.connection() as conn:
+                with conn.cursor() as cur:
+                    self._ensure_table(cur)
+                    cur.execute("""
+                        SELECT symbol, state FROM equity_indicator_state
+                        WHERE symbol = ANY(%s)
+                    """, (list(symbols),))
+                    return {symbol: IndicatorState.from_json(state) for symbol, state in cur.fetchall()}
+        except Exception as e:
+            logger.error(f"Error loading indicator state: {e}")
+            return {}
+
+    def save(self, state: IndicatorState) -> bool:
+        """Insert or replace the saved state of one symbol"""
+        try:
+            with self.db.connection() as conn:
+                with conn.cursor() as cur:
+                    self._ensure_table(cur)
+                    cur.execute("""
+                        INSERT INTO equity_indicator_state (symbol, last_trade_date, state, updated_at)
+                        VALUES (%s, %s, %s::jsonb, CURRENT_TIMESTAMP)
+                        ON CONFLICT (symbol) DO UPDATE SET
+                            last_trade_date = EXCLUDED.last_trade_date,
+                            state = EXCLUDED.state,
+                            updated_at = CURRENT_TIMESTAMP
+                    """, (state.symbol, state.last_trade_date, state.to_json()))
+            return True
+        except Exception as e:
+            logger.error(f"Error saving indicator state for {state.symbol}: {e}")
+            return False
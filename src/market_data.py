@@ -0,0 +1,599 @@
+"""
+Market Data Providers
+
+One interface for daily bars and latest quotes, replacing direct yf.Ticker /
+yf.download calls scattered across the calculators, strategy scripts,
+populator and dashboard:
+- YahooMarketDataProvider: batched yf.download with per-symbol fallback
+- DatabaseMarketDataProvider: daily_equity_technicals (through the local price cache)
+- ReplayMarketDataProvider: recorded CSV bars with configurable latency, for
+  deterministic offline benchmarks and load tests
+- FallbackMarketDataProvider: asks providers in order for missing symbols
+- CoalescingMarketDataProvider: single-flight wrapper so concurrent sessions
+  asking for the same symbol/range share one upstream fetch
+
+history_result() also reports the symbols whose fetch failed, so callers
+only treat missing bars as "no trading" for symbols the source answered.
+
+The process-wide provider is chosen with MARKET_DATA_PROVIDER
+(yahoo | database | replay); replay reads MARKET_DATA_REPLAY_DIR and
+MARKET_DATA_REPLAY_LATENCY. It is wrapped in CoalescingMarketDataProvider
+unless MARKET_DATA_COALESCE=false (TTLs: MARKET_DATA_CACHE_TTL,
+MARKET_DATA_QUOTE_TTL).
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+import pandas as pd
+
+try:
+    from .single_flight import SingleFlight, connect_shared_redis
+except ImportError:
+    from single_flight import SingleFlight, connect_shared_redis
+
+logger = logging.getLogger(__name__)
+
+# Long-format history frame returned by every provider
+HISTORY_COLUMNS = ['symbol', 'Date', 'Open', 'High', 'Low', 'Close', 'Volume']
+_BAR_COLUMNS = HISTORY_COLUMNS[1:]
+
+
+@dataclass
+class Quote:
+    """Latest known price for a symbol"""
+    symbol: str
+    price: Optional[float]
+    volume: Optional[int] = None
+    timestamp: Optional[datetime] = None
+
+
+@dataclass
+class HistoryResult:
+    """Bars from one history request plus the symbols whose fetch failed"""
+    bars: pd.DataFrame
+    failed: Set[str] = field(default_factory=set)  # every other requested symbol was answered
+
+    def answered(self, symbols: List[str]) -> List[str]:
+        """Requested symbols the provider gave a definite answer for (bars or no bars)"""
+        return [symbol for symbol in symbols if symbol not in self.failed]
+
+
+def empty_history() -> pd.DataFrame:
+    return pd.DataFrame(columns=HISTORY_COLUMNS)
+
+
+def split_history(frame: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """Split a long history frame into per-symbol frames (Date, Open, High, Low, Close, Volume)"""
+    if frame.empty:
+        return {}
+    return {
+        symbol: group[_BAR_COLUMNS].sort_values('Date').reset_index(drop=True)
+        for symbol, group in frame.groupby('symbol', sort=False)
+    }
+
+
+def _normalize_bars(symbol: str, bars: pd.DataFrame) -> pd.DataFrame:
+    """yfinance-style bars (DatetimeIndex or Date column) -> long history rows for one symbol"""
+    bars = bars.reset_index() if 'Date' not in bars.columns else bars.copy()
+    if 'Date' not in bars.columns:
+        bars = bars.rename(columns={bars.columns[0]: 'Date'})
+    bars = bars.dropna(subset=['Close'])
+    if bars.empty:
+        return empty_history()
+
+    bars['Date'] = pd.to_datetime(bars['Date']).dt.date
+    bars['symbol'] = symbol
+    for column in _BAR_COLUMNS[1:]:
+        if column not in bars.columns:
+            bars[column] = float('nan')
+    return bars[HISTORY_COLUMNS]
+
+
+class MarketDataProvider(ABC):
+    """Base class for daily bar and quote sources"""
+
+    name = 'base'
+
+    @abstractmethod
+    def history(self, symbols: List[str], start_date: date, end_date: date,
+                adjusted: bool = False) -> pd.DataFrame:
+        """
+        Daily bars for several symbols.
+
+        Args:
+            symbols: Stock symbols
+            start_date: First date (inclusive)
+            end_date: Last date (inclusive)
+            adjusted: Dividend/split adjusted prices where the source supports it
+
+        Returns:
+            DataFrame with HISTORY_COLUMNS, Date as datetime.date
+        """
+
+    @abstractmethod
+    def quotes(self, symbols: List[str]) -> Dict[str, Quote]:
+        """Latest price per symbol (symbols without a price are omitted)"""
+
+    def history_result(self, symbols: List[str], start_date: date, end_date: date,
+                       adjusted: bool = False) -> HistoryResult:
+        """
+        history() plus the symbols that failed, so callers can tell "no bars" from "no answer".
+
+        Providers that swallow per-symbol errors override this; by default a
+        request either answers every symbol or raises.
+        """
+        return HistoryResult(self.history(symbols, start_date, end_date, adjusted=adjusted))
+
+    def history_by_symbol(self, symbols: List[str], start_date: date, end_date: date,
+                          adjusted: bool = False) -> Dict[str, pd.DataFrame]:
+        """history() split into one frame per symbol"""
+        return split_history(self.history(symbols, start_date, end_date, adjusted=adjusted))
+
+
+# yfinance 0.2.28 logs a window without bars as "No price data found, symbol may be delisted (...)";
+# a Yahoo chart error of that kind reads "No data found, symbol may be delisted"
+_EMPTY_WINDOW_MESSAGES = ('no price data found', 'no data found')
+
+# yf.download keeps its per-ticker frames and errors in module globals (yf.shared) and resets
+# them on every call: concurrent downloads in one process would read each other's results
+_download_lock = threading.Lock()
+
+
+class YahooMarketDataProvider(MarketDataProvider):
+    """Yahoo Finance via one batched yf.download per call"""
+
+    name = 'yahoo'
+
+    def history(self, symbols: List[str], start_date: date, end_date: date,
+                adjusted: bool = False) -> pd.DataFrame:
+        return self.history_result(symbols, start_date, end_date, adjusted=adjusted).bars
+
+    def history_result(self, symbols: List[str], start_date: date, end_date: date,
+                       adjusted: bool = False) -> HistoryResult:
+        import yfinance as yf
+
+        symbols = list(dict.fromkeys(symbols))
+        if not symbols:
+            return HistoryResult(empty_history())
+
+        try:
+            with _download_lock:
+                raw = yf.download(
+                    symbols,
+                    start=start_date,
+                    end=end_date + timedelta(days=1),
+                    auto_adjust=adjusted,
+                    actions=False,
+                    group_by='ticker',
+                    progress=False,
+                    threads=True
+                )
+                errors = dict(getattr(getattr(yf, 'shared', None), '_ERRORS', None) or {})
+        except Exception as e:
+            logger.warning(f"Yahoo Finance batch download failed, fetching individually: {e}")
+            return self._history_individually(symbols, start_date, end_date, adjusted)
+
+        frames = []
+        if raw is not None and not raw.empty:
+            if isinstance(raw.columns, pd.MultiIndex):
+                available = set(raw.columns.get_level_values(0))
+                for symbol in symbols:
+                    if symbol in available:
+                        frames.append(_normalize_bars(symbol, raw[symbol]))
+            else:
+                frames.append(_normalize_bars(symbols[0], raw))
+
+        frames = [frame for frame in frames if not frame.empty]
+        frame = pd.concat(frames, ignore_index=True) if frames else empty_history()
+
+        answered = set(frame['symbol'])
+        failed = self._download_errors(errors, [s for s in symbols if s not in answered])
+        if failed:
+            logger.warning(f"Yahoo Finance download failed for {sorted(failed)}")
+
+        frame = frame[(frame['Date'] >= start_date) & (frame['Date'] <= end_date)].reset_index(drop=True)
+        return HistoryResult(frame, failed)
+
+    @staticmethod
+    def _download_errors(errors: Dict[str, str], symbols: List[str]) -> Set[str]:
+        """
+        Symbols without bars that yf.download did not report as an empty window.
+
+        Args:
+            errors: Snapshot of yf.shared._ERRORS (ticker -> message) taken after the download
+            symbols: Requested symbols absent from, or all-NaN in, the downloaded frame
+
+        Returns:
+            Failed symbols: any other message, the empty-window message with a Yahoo
+            status code, or no message at all (asked again rather than remembered as empty)
+        """
+        messages = {ticker.upper(): str(message).lower() for ticker, message in errors.items()}
+        failed = set()
+        for symbol in symbols:
+            message = messages.get(symbol.upper(), '')
+            if 'status_code' in message or not any(text in message for text in _EMPTY_WINDOW_MESSAGES):
+                failed.add(symbol)
+        return failed
+
+    def _history_individually(self, symbols: List[str], start_date: date, end_date: date,
+                              adjusted: bool) -> HistoryResult:
+        import yfinance as yf
+
+        frames = []
+        failed = set()
+        for symbol in symbols:
+            try:
+                hist = yf.Ticker(symbol).history(start=start_date, end=end_date + timedelta(days=1),
+                                                 auto_adjust=adjusted, actions=False)
+                if not hist.empty:
+                    frames.append(_normalize_bars(symbol, hist))
+            except Exception as e:
+                logger.warning(f"Failed to fetch Yahoo Finance history for {symbol}: {e}")
+                failed.add(symbol)
+        frames = [frame for frame in frames if not frame.empty]
+        return HistoryResult(pd.concat(frames, ignore_index=True) if frames else empty_history(), failed)
+
+    def quotes(self, symbols: List[str]) -> Dict[str, Quote]:
+        import yfinance as yf
+
+        quotes = {}
+        for symbol in dict.fromkeys(symbols):
+            try:
+                info = yf.Ticker(symbol).fast_info
+                price = info.get('last_price') or info.get('regularMarketPrice')
+                if price:
+                    volume = info.get('last_volume') or info.get('regularMarketVolume')
+                    quotes[symbol] = Quote(symbol, float(price), int(volume) if volume else None)
+            except Exception as e:
+                logger.warning(f"Failed to fetch Yahoo Finance quote for {symbol}: {e}")
+        return quotes
+
+
+class DatabaseMarketDataProvider(MarketDataProvider):
+    """Bars stored in daily_equity_technicals (as populated, i.e. adjusted prices)"""
+
+    name = 'database'
+
+    def __init__(self, db=None):
+        """
+        Args:
+            db: Database manager (defaults to a new DatabaseManager)
+        """
+        if db is None:
+            try:
+                from .database import DatabaseManager
+            except ImportError:
+                from database import DatabaseManager
+            db = DatabaseManager()
+        self.db = db
+
+    def history(self, symbols: List[str], start_date: date, end_date: date,
+                adjusted: bool = False) -> pd.DataFrame:
+        try:
+            from .price_cache import get_price_cache
+        except ImportError:
+            from price_cache import get_price_cache
+
+        symbols = list(dict.fromkeys(symbols))
+        if not symbols:
+            return empty_history()
+
+        frame = get_price_cache(self.db).read(
+            symbols, start_date, end_date,
+            columns=['open_price', 'high_price', 'low_price', 'close_price', 'volume']
+        )
+        frame = frame.rename(columns={
+            'trade_date': 'Date', 'open_price': 'Open', 'high_price': 'High',
+            'low_price': 'Low', 'close_price': 'Close', 'volume': 'Volume'
+        })
+        frame['Date'] = pd.to_datetime(frame['Date']).dt.date
+        return frame[HISTORY_COLUMNS].reset_index(drop=True)
+
+    def quotes(self, symbols: List[str]) -> Dict[str, Quote]:
+        with self.db.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT DISTINCT ON (symbol) symbol, close_price, volume, trade_date
+                    FROM daily_equity_technicals
+                    WHERE symbol = ANY(%s)
+                    ORDER BY symbol, trade_date DESC
+                """, (list(symbols),))
+                rows = cur.fetchall()
+
+        return {
+            symbol: Quote(symbol, float(close), int(volume) if volume is not None else None,
+                          datetime.combine(trade_date, datetime.min.time()))
+            for symbol, close, volume, trade_date in rows if close is not None
+        }
+
+
+class ReplayMarketDataProvider(MarketDataProvider):
+    """
+    Serves bars recorded to CSV files ({directory}/{symbol}.csv).
+
+    Every call sleeps latency_seconds (plus per_symbol_latency_seconds per
+    requested symbol) to simulate a network round-trip. Quotes are the last
+    recorded close on or before as_of (default: the latest bar).
+    """
+
+    name = 'replay'
+
+    def __init__(self, directory: str, latency_seconds: float = 0.0,
+                 per_symbol_latency_seconds: float = 0.0, as_of: Optional[date] = None):
+        self.directory = directory
+        self.latency_seconds = latency_seconds
+        self.per_symbol_latency_seconds = per_symbol_latency_seconds
+        self.as_of = as_of
+        self._bars: Dict[str, pd.DataFrame] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, symbol: str) -> str:
+        return os.path.join(self.directory, f"{symbol}.csv")
+
+    def _simulate_latency(self, symbol_count: int):
+        delay = self.latency_seconds + self.per_symbol_latency_seconds * symbol_count
+        if delay > 0:
+            time.sleep(delay)
+
+    def _load(self, symbol: str) -> Optional[pd.DataFrame]:
+        with self._lock:
+            if symbol not in self._bars:
+                path = self._path(symbol)
+                if not os.path.exists(path):
+                    self._bars[symbol] = None
+                else:
+                    bars = pd.read_csv(path)
+                    bars['Date'] = pd.to_datetime(bars['Date']).dt.date
+                    self._bars[symbol] = bars.sort_values('Date').reset_index(drop=True)
+            return self._bars[symbol]
+
+    def history(self, symbols: List[str], start_date: date, end_date: date,
+                adjusted: bool = False) -> pd.DataFrame:
+        symbols = list(dict.fromkeys(symbols))
+        self._simulate_latency(len(symbols))
+
+        frames = []
+        for symbol in symbols:
+            bars = self._load(symbol)
+            if bars is None:
+                continue
+            bars = bars[(bars['Date'] >= start_date) & (bars['Date'] <= end_date)]
+            if not bars.empty:
+                frames.append(_normalize_bars(symbol, bars))
+        return pd.concat(frames, ignore_index=True) if frames else empty_history()
+
+    def quotes(self, symbols: List[str]) -> Dict[str, Quote]:
+        symbols = list(dict.fromkeys(symbols))
+        self._simulate_latency(len(symbols))
+
+        quotes = {}
+        for symbol in symbols:
+            bars = self._load(symbol)
+            if bars is None:
+                continue
+            if self.as_of is not None:
+                bars = bars[bars['Date'] <= self.as_of]
+            if not bars.empty:
+                last = bars.iloc[-1]
+                quotes[symbol] = Quote(symbol, float(last['Close']), int(last['Volume']),
+                                       datetime.combine(last['Date'], datetime.min.time()))
+        return quotes
+
+    def record(self, source: MarketDataProvider, symbols: List[str], start_date: date, end_date: date,
+               adjusted: bool = False) -> int:
+        """Record bars from another provider (e.g. Yahoo) for later replay; returns symbols recorded"""
+        os.makedirs(self.directory, exist_ok=True)
+        recorded = 0
+        for symbol, bars in source.history_by_symbol(symbols, start_date, end_date, adjusted=adjusted).items():
+            bars.to_csv(self._path(symbol), index=False)
+            with self._lock:
+                self._bars.pop(symbol, None)
+            recorded += 1
+        return recorded
+
+
+class FallbackMarketDataProvider(MarketDataProvider):
+    """Asks each provider in turn for the symbols the previous ones could not serve"""
+
+    name = 'fallback'
+
+    def __init__(self, providers: List[MarketDataProvider]):
+        self.providers = list(providers)
+
+    def history(self, symbols: List[str], start_date: date, end_date: date,
+                adjusted: bool = False) -> pd.DataFrame:
+        return self.history_result(symbols, start_date, end_date, adjusted=adjusted).bars
+
+    def history_result(self, symbols: List[str], start_date: date, end_date: date,
+                       adjusted: bool = False) -> HistoryResult:
+        remaining = list(dict.fromkeys(symbols))
+        answered = set()
+        frames = []
+        for provider in self.providers:
+            if not remaining:
+                break
+            try:
+                result = provider.history_result(remaining, start_date, end_date, adjusted=adjusted)
+            except Exception as e:
+                logger.warning(f"{provider.name} history failed: {e}")
+                continue
+            answered.update(result.answered(remaining))
+            if not result.bars.empty:
+                frames.append(result.bars)
+                served = set(result.bars['symbol'])
+                remaining = [symbol for symbol in remaining if symbol not in served]
+        bars = pd.concat(frames, ignore_index=True) if frames else empty_history()
+        return HistoryResult(bars, {symbol for symbol in remaining if symbol not in answered})
+
+    def quotes(self, symbols: List[str]) -> Dict[str, Quote]:
+        remaining = list(dict.fromkeys(symbols))
+        quotes = {}
+        for provider in self.providers:
+            if not remaining:
+                break
+            try:
+                quotes.update(provider.quotes(remaining))
+            except Exception as e:
+                logger.warning(f"{provider.name} quotes failed: {e}")
+            remaining = [symbol for symbol in remaining if symbol not in quotes]
+        return quotes
+
+
+def _encode_bars(bars: pd.DataFrame) -> str:
+    payload = {column: bars[column].tolist() for column in _BAR_COLUMNS[1:]}
+    payload['Date'] = [d.isoformat() for d in bars['Date']]
+    return json.dumps(payload)
+
+
+def _decode_bars(payload) -> pd.DataFrame:
+    data = json.loads(payload)
+    bars = pd.DataFrame({column: data[column] for column in _BAR_COLUMNS})
+    bars['Date'] = [date.fromisoformat(d) for d in bars['Date']]
+    return bars
+
+
+def _encode_quote(quote: Quote) -> str:
+    return json.dumps({
+        'symbol': quote.symbol, 'price': quote.price, 'volume': quote.volume,
+        'timestamp': quote.timestamp.isoformat() if quote.timestamp else None,
+    })
+
+
+def _decode_quote(payload) -> Quote:
+    data = json.loads(payload)
+    timestamp = datetime.fromisoformat(data['timestamp']) if data['timestamp'] else None
+    return Quote(data['symbol'], data['price'], data['volume'], timestamp)
+
+
+class CoalescingMarketDataProvider(MarketDataProvider):
+    """
+    Single-flight wrapper around another provider.
+
+    History is keyed by (symbol, start, end, interval, adjusted) and quotes by
+    symbol; concurrent identical requests share one fetch and results are
+    cached for a short TTL (and shared through Redis when available).
+    """
+
+    def __init__(self, provider: MarketDataProvider, ttl_seconds: float = 60.0,
+                 quote_ttl_seconds: float = 15.0, redis_client=None):
+        """
+        Args:
+            provider: Provider doing the actual fetches
+            ttl_seconds: Cache lifetime of history results
+            quote_ttl_seconds: Cache lifetime of quotes
+            redis_client: Optional redis client for cross-process coalescing
+        """
+        self.provider = provider
+        self.name = provider.name
+        self.history_flight = SingleFlight('history', ttl_seconds, redis_client,
+                                           encode=_encode_bars, decode=_decode_bars)
+        self.quote_flight = SingleFlight('quote', quote_ttl_seconds, redis_client,
+                                         encode=_encode_quote, decode=_decode_quote)
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Hit / join / miss counters for history and quote requests"""
+        return {'history': dict(self.history_flight.stats), 'quotes': dict(self.quote_flight.stats)}
+
+    def history(self, symbols: List[str], start_date: date, end_date: date,
+                adjusted: bool = False) -> pd.DataFrame:
+        return self.history_result(symbols, start_date, end_date, adjusted=adjusted).bars
+
+    def history_result(self, symbols: List[str], start_date: date, end_date: date,
+                       adjusted: bool = False) -> HistoryResult:
+        """
+        Coalesced history; symbols without bars count as answered only when this
+        caller fetched them (a joined fetch does not say whether it failed).
+        """
+        keys = {
+            f"{symbol}|{start_date}|{end_date}|1d|{'adj' if adjusted else 'raw'}": symbol
+            for symbol in dict.fromkeys(symbols)
+        }
+        answered = set()
+
+        def fetch(missing: List[str]) -> Dict[str, pd.DataFrame]:
+            requested = [keys[key] for key in missing]
+            result = self.provider.history_result(requested, start_date, end_date, adjusted=adjusted)
+            answered.update(result.answered(requested))
+            bars = split_history(result.bars)
+            return {key: bars[keys[key]] for key in missing if keys[key] in bars}
+
+        results = self.history_flight.do_many(list(keys), fetch)
+
+        frames = []
+        for key, symbol in keys.items():
+            if key in results:
+                bars = results[key].copy()
+                bars.insert(0, 'symbol', symbol)
+                frames.append(bars)
+        failed = {symbol for key, symbol in keys.items() if key not in results and symbol not in answered}
+        return HistoryResult(pd.concat(frames, ignore_index=True) if frames else empty_history(), failed)
+
+    def quotes(self, symbols: List[str]) -> Dict[str, Quote]:
+        return self.quote_flight.do_many(list(dict.fromkeys(symbols)), self.provider.quotes)
+
+    def clear(self):
+        """Drop cached history and quotes"""
+        self.history_flight.clear()
+        self.quote_flight.clear()
+
+
+def create_market_data_provider(kind: Optional[str] = None, db=None) -> MarketDataProvider:
+    """
+    Build a provider by name.
+
+    Args:
+        kind: 'yahoo', 'database' or 'replay' (defaults to MARKET_DATA_PROVIDER, then 'yahoo')
+        db: Database manager for the database provider
+
+    Returns:
+        MarketDataProvider instance
+    """
+    kind = (kind or os.getenv('MARKET_DATA_PROVIDER', 'yahoo')).lower()
+    if kind == 'yahoo':
+        return YahooMarketDataProvider()
+    if kind == 'database':
+        return DatabaseMarketDataProvider(db)
+    if kind == 'replay':
+        return ReplayMarketDataProvider(
+            os.getenv('MARKET_DATA_REPLAY_DIR', 'market_data_replay'),
+            latency_seconds=float(os.getenv('MARKET_DATA_REPLAY_LATENCY', '0'))
+        )
+    raise ValueError(f"Unknown market data provider: {kind}")
+
+
+_provider: Optional[MarketDataProvider] = None
+_provider_lock = threading.Lock()
+
+
+def get_market_data_provider() -> MarketDataProvider:
+    """Process-wide provider (created from MARKET_DATA_PROVIDER on first use, coalesced by default)"""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = create_market_data_provider()
+                if os.getenv('MARKET_DATA_COALESCE', 'true').lower() not in ('0', 'false', 'no'):
+                    _provider = CoalescingMarketDataProvider(
+                        _provider,
+                        ttl_seconds=float(os.getenv('MARKET_DATA_CACHE_TTL', '60')),
+                        quote_ttl_seconds=float(os.getenv('MARKET_DATA_QUOTE_TTL', '15')),
+                        redis_client=connect_shared_redis()
+                    )
+                logger.info(f"Using {_provider.name} market data provider")
+    return _provider
+
+
+def set_market_data_provider(provider: Optional[MarketDataProvider]):
+    """Replace the process-wide provider (None resets to the environment default)"""
+    global _provider
+    with _provider_lock:
+        _provider = provider
@@ -0,0 +1,188 @@
+"""
+Contiguous Per-Symbol OHLCV Bars
+
+One long (symbol, trade_date) frame from daily_equity_technicals is sorted
+once and kept as flat numpy arrays with per-symbol offsets:
+- each symbol's bars are a contiguous slice (no per-symbol DataFrame filtering)
+- locate() finds many (symbol, date) bars with one np.searchsorted
+- atr() and forward windows respect symbol boundaries
+"""
+
+import logging
+from datetime import date
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .price_index import to_ordinals
+except ImportError:
+    from price_index import to_ordinals
+
+logger = logging.getLogger(__name__)
+
+OHLCV_COLUMNS = ['open_price', 'high_price', 'low_price', 'close_price', 'volume']
+
+# Column order of the daily_equity_technicals OHLCV query
+BAR_COLUMNS = ['symbol', 'trade_date'] + OHLCV_COLUMNS
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+class OHLCVBars:
+    """Flat OHLCV arrays sorted by (symbol, date) with per-symbol offsets"""
+
+    def __init__(self, symbols: List[str], offsets: np.ndarray, ordinals: np.ndarray,
+                 arrays: Dict[str, np.ndarray]):
+        """
+        Args:
+            symbols: Sorted symbols
+            offsets: len(symbols) + 1 start offsets; symbol i owns rows offsets[i]:offsets[i + 1]
+            ordinals: Date ordinal of every row, ascending within each symbol
+            arrays: OHLCV_COLUMNS name -> float array aligned with ordinals
+        """
+        self.symbols = list(symbols)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.ordinals = np.asarray(ordinals, dtype=np.int64)
+        self.arrays = arrays
+        self._position = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self._keys = None
+        self._atr = {}
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, date_column: str = 'trade_date') -> 'OHLCVBars':
+        """
+        Build from a long frame (symbol, date_column, OHLCV_COLUMNS); duplicates keep the last row.
+        """
+        if frame is None or frame.empty:
+            return cls([], np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int64),
+                       {column: np.zeros(0) for column in OHLCV_COLUMNS})
+
+        symbols = frame['symbol'].to_numpy(dtype=object).astype(str)
+        ordinals = to_ordinals(frame[date_column])
+        order = np.lexsort((ordinals, symbols))
+        symbols, ordinals = symbols[order], ordinals[order]
+
+        # Last row of each (symbol, date) run wins
+        keep = np.ones(len(order), dtype=bool)
+        keep[:-1] = (symbols[1:] != symbols[:-1]) | (ordinals[1:] != ordinals[:-1])
+        order, symbols, ordinals = order[keep], symbols[keep], ordinals[keep]
+
+        unique, starts = np.unique(symbols, return_index=True)
+        offsets = np.append(starts, len(symbols))
+        arrays = {column: frame[column].to_numpy(dtype=float)[order] for column in OHLCV_COLUMNS}
+        return cls(unique.tolist(), offsets, ordinals, arrays)
+
+    @classmethod
+    def from_matrix(cls, symbols: List[str], ordinals: np.ndarray, arrays: Dict[str, np.ndarray]) -> 'OHLCVBars':
+        """
+        Build from symbols x bars arrays (see stack_price_frames); bars without a close are dropped.
+
+        Args:
+            symbols: Symbol per row
+            ordinals: Symbols x bars date ordinals, ascending along each row
+            arrays: OHLCV_COLUMNS name -> symbols x bars array
+        """
+        present = ~np.isnan(arrays['close_price'])
+        offsets = np.concatenate([[0], np.cumsum(present.sum(axis=1))])
+        return cls(list(symbols), offsets, ordinals[present],
+                   {column: arrays[column][present] for column in OHLCV_COLUMNS})
+
+    def to_matrix(self) -> Dict[str, np.ndarray]:
+        """
+        Right-aligned symbols x bars arrays (as stack_price_frames), scattered straight from the blocks.
+
+        Returns:
+            Dict with opens/highs/lows/closes/volumes (NaN padding) and bar_dates (None padding),
+            one row per entry of self.symbols
+        """
+        lengths = np.diff(self.offsets)
+        n_bars = int(lengths.max()) if len(lengths) else 0
+        rows = np.repeat(np.arange(len(self.symbols)), lengths)
+        columns = np.arange(len(self)) - np.repeat(self.offsets[:-1] - (n_bars - lengths), lengths)
+
+        matrix = {}
+        for name, column in zip(('opens', 'highs', 'lows', 'closes', 'volumes'), OHLCV_COLUMNS):
+            matrix[name] = np.full((len(self.symbols), n_bars), np.nan)
+            matrix[name][rows, columns] = self.arrays[column]
+        matrix['bar_dates'] = np.full((len(self.symbols), n_bars), None, dtype=object)
+        matrix['bar_dates'][rows, columns] = (self.ordinals - _EPOCH_ORDINAL).astype('datetime64[D]').astype(object)
+        return matrix
+
+    def __len__(self) -> int:
+        return len(self.ordinals)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._position
+
+    def rows(self, symbol: str) -> slice:
+        """Row slice of one symbol (empty slice if unknown)"""
+        i = self._position.get(symbol)
+        if i is None:
+            return slice(0, 0)
+        return slice(int(self.offsets[i]), int(self.offsets[i + 1]))
+
+    def symbol_frame(self, symbol: str) -> pd.DataFrame:
+        """Engine-shaped frame (symbol, bar_date, OHLCV_COLUMNS) of one symbol, oldest first"""
+        rows = self.rows(symbol)
+        frame = pd.DataFrame({column: self.arrays[column][rows] for column in OHLCV_COLUMNS})
+        frame.insert(0, 'bar_date', [date.fromordinal(int(o)) for o in self.ordinals[rows]])
+        frame.insert(0, 'symbol', symbol)
+        return frame
+
+    def price_frames(self, symbols: Optional[Sequence[str]] = None) -> Dict[str, pd.DataFrame]:
+        """symbol_frame for each symbol with bars"""
+        return {symbol: self.symbol_frame(symbol) for symbol in (symbols or self.symbols) if symbol in self}
+
+    def block_ends(self) -> np.ndarray:
+        """Exclusive end row of the symbol block each row belongs to"""
+        return np.repeat(self.offsets[1:], np.diff(self.offsets))
+
+    def locate(self, symbols: Sequence[str], dates) -> np.ndarray:
+        """
+        Row of each (symbol, date) pair.
+
+        Args:
+            symbols: Symbol per lookup
+            dates: Date per lookup
+
+        Returns:
+            Row positions, -1 where the symbol has no bar on that date
+        """
+        if len(symbols) == 0 or len(self) == 0:
+            return np.full(len(symbols), -1, dtype=np.int64)
+        if self._keys is None:
+            codes = np.repeat(np.arange(len(self.symbols), dtype=np.int64), np.diff(self.offsets))
+            self._keys = (codes << 32) | self.ordinals
+
+        codes = pd.Index(self.symbols).get_indexer(pd.Index(symbols))
+        keys = (codes.astype(np.int64) << 32) | to_ordinals(dates)
+        positions = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+        found = (codes >= 0) & (self._keys[positions] == keys)
+        return np.where(found, positions, -1)
+
+    def atr(self, period: int = 14) -> np.ndarray:
+        """
+        Simple-mean Average True Range per row (as TechnicalIndicatorCalculator.calculate_atr).
+
+        NaN until a symbol has `period` true ranges.
+        """
+        if period not in self._atr:
+            highs, lows, closes = (self.arrays[c] for c in ('high_price', 'low_price', 'close_price'))
+            prev_close = np.empty(len(closes))
+            prev_close[1:] = closes[:-1]
+            prev_close[self.offsets[:-1][np.diff(self.offsets) > 0]] = np.nan  # no previous bar across symbols
+            with np.errstate(invalid='ignore'):
+                true_range = np.maximum.reduce([highs - lows, np.abs(highs - prev_close), np.abs(lows - prev_close)])
+            sums = np.concatenate([[0.0], np.cumsum(np.nan_to_num(true_range))])
+            gaps = np.concatenate([[0], np.cumsum(np.isnan(true_range))])
+            row = np.arange(len(closes))
+            start = row - period + 1
+            block_start = np.repeat(self.offsets[:-1], np.diff(self.offsets))
+            atr = np.full(len(closes), np.nan)
+            complete = start > block_start  # window excludes the block's first bar (no true range)
+            complete[complete] = gaps[row[complete] + 1] == gaps[start[complete]]
+            atr[complete] = (sums[row[complete] + 1] - sums[start[complete]]) / period
+            self._atr[period] = atr
+        return self._atr[period]
@@ -0,0 +1,438 @@
+"""
+Parameter Sweep Runner
+
+Searches StrategicSignalEngine parameters (breakout_epsilon, volume_threshold)
+over a universe:
+- parameter sets come from a grid (parameter_grid) or random samples
+  (random_parameter_sets)
+- price arrays and indicator series are computed once and placed in
+  shared memory; the swept parameters only change strategy thresholds, so
+  every worker reuses the same series
+- each set is evaluated in a process pool (signal masks over every bar plus
+  the signal_backtest forward-return analytics)
+- sets that vary parameters no strategy reads (SWEEP_PARAMETERS lists the
+  read ones) are logged as a warning, since they repeat another set's run
+- each finished set is written as its own parameter_set / signal_run with
+  its signals, and its backtest score is recorded in parameter_sweep_result
+
+A sweep is identified by its name: rerunning it skips the parameter sets
+already recorded, so an interrupted sweep resumes where it stopped.
+"""
+
+import json
+import time
+import hashlib
+import logging
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .strategic_signal_engine import (
+        StrategicSignalEngine, StrategicSignal, TechnicalIndicatorCalculator, IndicatorSeries,
+        INDICATOR_FIELDS, stack_price_frames
+    )
+    from .ohlcv_bars import OHLCVBars, OHLCV_COLUMNS
+    from .signal_backtest import signal_outcomes, summarize_outcomes, FORWARD_HORIZONS
+except ImportError:
+    from strategic_signal_engine import (
+        StrategicSignalEngine, StrategicSignal, TechnicalIndicatorCalculator, IndicatorSeries,
+        INDICATOR_FIELDS, stack_price_frames
+    )
+    from ohlcv_bars import OHLCVBars, OHLCV_COLUMNS
+    from signal_backtest import signal_outcomes, summarize_outcomes, FORWARD_HORIZONS
+
+logger = logging.getLogger(__name__)
+
+# Engine parameters read by strategy_masks and the _evaluate_* methods; the others
+# (rsi_oversold, atr_multiplier, ...) do not change any signal
+SWEEP_PARAMETERS = ('breakout_epsilon', 'volume_threshold')
+DEFAULT_OBJECTIVE = f'payoff_atr_{FORWARD_HORIZONS[-1]}d'
+
+SWEEP_RESULT_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS parameter_sweep_result (
+        sweep_name VARCHAR(100) NOT NULL,
+        params_hash VARCHAR(32) NOT NULL,
+        param_set_id VARCHAR(64),
+        run_id VARCHAR(64),
+        params_json JSONB NOT NULL,
+        score_json JSONB NOT NULL,
+        objective DOUBLE PRECISION,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (sweep_name, params_hash)
+    )
+"""
+
+# Column order of the OHLCV block handed to OHLCVBars.from_matrix
+_COLUMN_ARRAYS = dict(zip(OHLCV_COLUMNS, ('opens', 'highs', 'lows', 'closes', 'volumes')))
+
+
+def parameter_grid(space: Dict[str, Sequence]) -> List[Dict]:
+    """Every combination of the given parameter values"""
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+
+
+def random_parameter_sets(space: Dict[str, Union[Tuple[float, float], Sequence]], samples: int,
+                          seed: int = 0) -> List[Dict]:
+    """
+    Random parameter sets.
+
+    Args:
+        space: Parameter -> (low, high) tuple for a uniform draw, or a list of choices
+        samples: Number of sets
+        seed: Random seed
+
+    Returns:
+        Distinct parameter sets (fewer than samples if the space is small)
+    """
+    rng = np.random.default_rng(seed)
+    sets, seen = [], set()
+    for _ in range(samples * 10):
+        params = {}
+        for name, values in space.items():
+            if isinstance(values, tuple) and len(values) == 2:
+                params[name] = round(float(rng.uniform(*values)), 6)
+            else:
+                params[name] = values[int(rng.integers(len(values)))]
+        key = params_hash(params)
+        if key not in seen:
+            seen.add(key)
+            sets.append(params)
+        if len(sets) == samples:
+            break
+    return sets
+
+
+def unread_parameters(parameter_sets: Sequence[Dict]) -> List[str]:
+    """Parameters varied across the sets that no strategy reads (outside SWEEP_PARAMETERS)"""
+    names = {name for params in parameter_sets for name in params} - set(SWEEP_PARAMETERS)
+    return sorted(
+        name for name in names
+        if len({json.dumps(params.get(name), sort_keys=True, default=str) for params in parameter_sets}) > 1
+    )
+
+
+def params_hash(params: Dict) -> str:
+    """Hash of a parameter set, as stored by StrategicDatabaseManager.create_parameter_set"""
+    return hashlib.md5(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+
+def score_outcomes(outcomes: pd.DataFrame) -> Dict[str, Any]:
+    """Headline backtest figures of one parameter set, plus its per-strategy summary"""
+    score: Dict[str, Any] = {'signals': int(len(outcomes))}
+    if outcomes.empty:
+        score['evaluated'] = 0
+        return score
+    score['evaluated'] = int(outcomes[f'return_{FORWARD_HORIZONS[0]}d'].notna().sum())
+    for h in FORWARD_HORIZONS:
+        returns = outcomes[f'return_{h}d'].dropna()
+        score[f'hit_rate_{h}d'] = float((returns > 0).mean()) if len(returns) else None
+        score[f'avg_return_{h}d'] = float(returns.mean()) if len(returns) else None
+        payoff = outcomes[f'payoff_atr_{h}d'].dropna()
+        score[f'payoff_atr_{h}d'] = float(payoff.mean()) if len(payoff) else None
+    score['avg_mae'] = float(outcomes['mae'].mean()) if outcomes['mae'].notna().any() else None
+    score['avg_mfe'] = float(outcomes['mfe'].mean()) if outcomes['mfe'].notna().any() else None
+
+    summary = summarize_outcomes(outcomes)
+    score['by_strategy'] = json.loads(summary.to_json(orient='records'))
+    return score
+
+
+class SharedArrays:
+    """Named numpy arrays copied into multiprocessing shared memory"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self._blocks = []
+        self.spec = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self._blocks.append(block)
+            self.spec[name] = (block.name, array.shape, array.dtype.str)
+
+    @staticmethod
+    def attach(spec: Dict[str, Tuple]) -> Tuple[Dict[str, np.ndarray], List]:
+        """Read-only views of shared arrays (keep the returned blocks referenced while in use)"""
+        arrays, blocks = {}, []
+        for name, (block_name, shape, dtype) in spec.items():
+            # Child processes share the parent's resource tracker; the parent unlinks in release()
+            block = shared_memory.SharedMemory(name=block_name)
+            view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+            view.flags.writeable = False
+            arrays[name] = view
+            blocks.append(block)
+        return arrays, blocks
+
+    def release(self):
+        """Close and unlink every block"""
+        for block in self._blocks:
+            try:
+                block.close()
+                block.unlink()
+            except FileNotFoundError:
+                pass
+        self._blocks = []
+
+
+class SweepContext:
+    """Indicator series and price store shared by every parameter set of a sweep"""
+
+    def __init__(self, symbols: List[str], arrays: Dict[str, np.ndarray],
+                 start_date: Optional[date], end_date: Optional[date]):
+        """
+        Args:
+            symbols: Symbol per row
+            arrays: 'ordinals', the stacked OHLCV arrays and 'ind:<field>' indicator series
+            start_date: First bar date to emit signals for
+            end_date: Last bar date to emit signals for
+        """
+        self.start_date, self.end_date = start_date, end_date
+        ordinals = arrays['ordinals']
+        bar_dates = np.full(ordinals.shape, None, dtype=object)
+        known = ordinals > 0
+        bar_dates[known] = [date.fromordinal(int(o)) for o in ordinals[known]]
+
+        self.series = IndicatorSeries(
+            symbols=list(symbols), bar_dates=bar_dates,
+            opens=arrays['opens'], highs=arrays['highs'], lows=arrays['lows'],
+            closes=arrays['closes'], volumes=arrays['volumes'],
+            values={name: arrays[f'ind:{name}'] for name in INDICATOR_FIELDS}
+        )
+        self.bars = OHLCVBars.from_matrix(
+            symbols, ordinals, {column: arrays[key] for column, key in _COLUMN_ARRAYS.items()})
+
+    @staticmethod
+    def build_arrays(price_data: Dict[str, pd.DataFrame]) -> Tuple[List[str], Dict[str, np.ndarray]]:
+        """Stack the price frames and compute the (parameter independent) indicator series once"""
+        symbols, stacked = stack_price_frames(price_data)
+        series = TechnicalIndicatorCalculator.calculate_series(
+            stacked['closes'], stacked['highs'], stacked['lows'], stacked['volumes'], opens=stacked['opens'])
+        ordinals = np.zeros(stacked['closes'].shape, dtype=np.int64)
+        known = pd.notna(stacked['bar_dates'])
+        ordinals[known] = [pd.Timestamp(d).toordinal() for d in stacked['bar_dates'][known]]
+
+        arrays = {'ordinals': ordinals}
+        arrays.update({key: stacked[key] for key in _COLUMN_ARRAYS.values()})
+        arrays.update({f'ind:{name}': series[name] for name in INDICATOR_FIELDS})
+        return symbols, arrays
+
+    def evaluate(self, params: Dict) -> Tuple[Dict, List[StrategicSignal], Dict, float]:
+        """Signals and backtest score of one parameter set"""
+        started = time.perf_counter()
+        engine = StrategicSignalEngine(params)
+        signals = engine.evaluate_series(self.series, self.start_date, self.end_date)
+        frame = pd.DataFrame(
+            [(s.symbol, s.bar_date, s.strategy_key, s.action, s.strength, s.close_at_signal) for s in signals],
+            columns=['symbol', 'bar_date', 'strategy_key', 'action', 'strength', 'close_at_signal'])
+        score = score_outcomes(signal_outcomes(frame, self.bars))
+        return params, signals, score, time.perf_counter() - started
+
+
+_worker_context: Optional[SweepContext] = None
+_worker_blocks: List = []
+
+
+def _init_worker(spec: Dict, symbols: List[str], start_date: Optional[date], end_date: Optional[date]):
+    global _worker_context, _worker_blocks
+    arrays, _worker_blocks = SharedArrays.attach(spec)
+    _worker_context = SweepContext(symbols, arrays, start_date, end_date)
+
+
+def _evaluate_in_worker(params: Dict):
+    return _worker_context.evaluate(params)
+
+
+class SweepStore:
+    """Backtest scores per sweep and parameter set in parameter_sweep_result"""
+
+    def __init__(self, db):
+        """
+        Args:
+            db: DatabaseManager providing connection()
+        """
+        self.db = db
+        self._table_ready = False
+
+    def _ensure_table(self, cur):
+        if not self._table_ready:
+            cur.execute(SWEEP_RESULT_TABLE_SQL)
+            self._table_ready = True
+
+    def completed(self, sweep_name: str) -> set:
+        """Hashes of the parameter sets already recorded for a sweep"""
+        try:
+            with self.db.connection() as conn:
+                with conn.cursor() as cur:
+                    self._ensure_table(cur)
+                    cur.execute("""
+                        SELECT params_hash FROM parameter_sweep_result WHERE sweep_name = %s
+                    """, (sweep_name,))
+                    return {row[0] for row in cur.fetchall()}
+        except Exception as e:
+            logger.error(f"Error loading sweep progress for {sweep_name}: {e}")
+            return set()
+
+    def save(self, sweep_name: str, params: Dict, param_set_id: str, run_id: str,
+             score: Dict, objective: Optional[float]) -> bool:
+        """Record one finished parameter set"""
+        try:
+            with self.db.connection() as conn:
+                with conn.cursor() as cur:
+                    self._ensure_table(cur)
+                    cur.execute("""
+                        INSERT INTO parameter_sweep_result
+                        (sweep_name, params_hash, param_set_id, run_id, params_json, score_json, objective)
+                        VALUES (%s, %s, %s, %s, %s::jsonb, %s::jsonb, %s)
+                        ON CONFLICT (sweep_name, params_hash) DO UPDATE SET
+                            param_set_id = EXCLUDED.param_set_id,
+                            run_id = EXCLUDED.run_id,
+                            score_json = EXCLUDED.score_json,
+                            objective = EXCLUDED.objective,
+                            created_at = CURRENT_TIMESTAMP
+                    """, (sweep_name, params_hash(params), param_set_id, run_id,
+                          json.dumps(params, sort_keys=True), json.dumps(score), objective))
+            return True
+        except Exception as e:
+            logger.error(f"Error saving sweep result for {sweep_name}: {e}")
+            return False
+
+    def results(self, sweep_name: str) -> pd.DataFrame:
+        """All recorded parameter sets of a sweep, best objective first"""
+        try:
+            with self.db.connection() as conn:
+                with conn.cursor() as cur:
+                    self._ensure_table(cur)
+                    cur.execute("""
+                        SELECT params_hash, param_set_id, run_id, params_json, score_json, objective
+                        FROM parameter_sweep_result
+                        WHERE sweep_name = %s
+                        ORDER BY objective DESC NULLS LAST
+                    """, (sweep_name,))
+                    rows = cur.fetchall()
+            return pd.DataFrame([tuple(row) for row in rows],
+                                columns=['params_hash', 'param_set_id', 'run_id', 'params', 'score', 'objective'])
+        except Exception as e:
+            logger.error(f"Error loading sweep results for {sweep_name}: {e}")
+            return pd.DataFrame()
+
+
+class ParameterSweepRunner:
+    """Evaluates many StrategicSignalEngine parameter sets over one universe"""
+
+    def __init__(self, db=None, workers: int = 1):
+        """
+        Args:
+            db: StrategicDatabaseManager for parameter_set/signal_run/signal_event writes
+                and sweep progress (None: evaluate only, nothing stored or resumed)
+            workers: Worker processes (1 evaluates in this process)
+        """
+        self.db = db
+        self.workers = max(1, int(workers))
+        self.store = SweepStore(db) if db is not None else None
+
+    def run(self, sweep_name: str, parameter_sets: Sequence[Dict], price_data: Dict[str, pd.DataFrame],
+            date_range: Tuple[Optional[date], Optional[date]] = (None, None),
+            universe_name: str = 'watchlist', objective: str = DEFAULT_OBJECTIVE) -> pd.DataFrame:
+        """
+        Evaluate the parameter sets that the sweep has not recorded yet.
+
+        Args:
+            sweep_name: Sweep identifier (resume key)
+            parameter_sets: Engine parameter overrides, merged over the engine defaults
+            price_data: Symbol -> OHLCV frame with bar_date, oldest first, including warm-up bars
+            date_range: (start, end) bar dates to emit signals for; a None bound means no
+                limit (the signal runs then record the first or last stacked bar date)
+            universe_name: Universe label of the signal runs
+            objective: Score key ranking the sets (higher is better)
+
+        Returns:
+            One row per evaluated parameter set of this call (params, run_id, objective, score
+            columns), best objective first
+        """
+        started = time.perf_counter()
+        defaults = StrategicSignalEngine().parameter_set
+        pending, seen = [], set()
+        done = self.store.completed(sweep_name) if self.store else set()
+        for overrides in parameter_sets:
+            params = {**defaults, **overrides}
+            key = params_hash(params)
+            if key not in done and key not in seen:
+                seen.add(key)
+                pending.append(params)
+        skipped = len(parameter_sets) - len(pending)
+        if skipped:
+            logger.info(f"Sweep {sweep_name}: skipping {skipped} parameter sets already recorded or repeated")
+        if not pending:
+            return pd.DataFrame()
+        unread = unread_parameters(pending)
+        if unread:
+            distinct = len({params_hash({name: params.get(name) for name in SWEEP_PARAMETERS})
+                            for params in pending})
+            logger.warning(f"Sweep {sweep_name}: {', '.join(unread)} not read by any strategy; "
+                           f"{len(pending)} parameter sets give {distinct} distinct runs")
+
+        symbols, arrays = SweepContext.build_arrays(price_data)
+        run_range = date_range
+        if None in date_range:
+            # signal_run start_date/end_date are NOT NULL: open bounds become the stacked bar dates
+            known = arrays['ordinals'][arrays['ordinals'] > 0]
+            if len(known):
+                run_range = (date_range[0] or date.fromordinal(int(known.min())),
+                             date_range[1] or date.fromordinal(int(known.max())))
+        logger.info(f"Sweep {sweep_name}: {len(pending)} parameter sets x {len(symbols)} symbols "
+                    f"x {arrays['closes'].shape[1]} bars on {self.workers} worker(s)")
+
+        rows = []
+        if self.workers == 1 or len(pending) == 1:
+            context = SweepContext(symbols, arrays, *date_range)
+            for params in pending:
+                rows.append(self._record(sweep_name, universe_name, run_range, objective, *context.evaluate(params)))
+        else:
+            shared = SharedArrays(arrays)
+            try:
+                with ProcessPoolExecutor(max_workers=min(self.workers, len(pending)), initializer=_init_worker,
+                                         initargs=(shared.spec, symbols, *date_range)) as pool:
+                    futures = [pool.submit(_evaluate_in_worker, params) for params in pending]
+                    for future in as_completed(futures):
+                        rows.append(self._record(sweep_name, universe_name, run_range, objective, *future.result()))
+            finally:
+                shared.release()
+
+        logger.info(f"Sweep {sweep_name}: {len(rows)} parameter sets in {time.perf_counter() - started:.1f}s")
+        results = pd.DataFrame(rows)
+        return results.sort_values('objective', ascending=False, na_position='last').reset_index(drop=True)
+
+    def _record(self, sweep_name: str, universe_name: str, date_range: Tuple, objective: str,
+                params: Dict, signals: List[StrategicSignal], score: Dict, seconds: float) -> Dict:
+        """
+        Store one finished parameter set (run, signals, score) and return its result row.
+
+        The run is completed and the set recorded as done only when every signal was stored,
+        so a failed insert is evaluated again when the sweep is resumed.
+        """
+        run_id = param_set_id = None
+        value = score.get(objective)
+        if self.db is not None:
+            key = params_hash(params)
+            param_set_id = self.db.create_parameter_set(f"{sweep_name} {key[:8]}", params)
+            run_id = self.db.create_signal_run(
+                param_set_id, universe_name, date_range[0], date_range[1],
+                notes=json.dumps({'sweep': sweep_name, objective: value, 'signals': score['signals']}))
+            saved = self.db.save_signal_events(signals, run_id=run_id, param_set_id=param_set_id)
+            if saved == len(signals):
+                self.db.complete_signal_run(run_id)
+                self.store.save(sweep_name, params, param_set_id, run_id, score, value)
+            else:
+                logger.error(f"Sweep {sweep_name}: stored {saved} of {len(signals)} signals for {key[:8]}; "
+                             f"signal run {run_id} left incomplete")
+
+        headline = {k: v for k, v in score.items() if k != 'by_strategy'}
+        return {**params, 'param_set_id': param_set_id, 'run_id': run_id, 'objective': value,
+                **headline, 'seconds': round(seconds, 3)}
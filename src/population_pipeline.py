@@ -0,0 +1,266 @@
+"""
+Pipelined Multi-Symbol Price Population
+
+Runs PriceDataPopulator work as three overlapping stages instead of one
+symbol at a time:
+- Fetch: bounded thread pool, token-bucket rate limited, retry with backoff
+- Compute: technical indicator calculation
+- Write: batched COPY-based upserts into daily_equity_technicals
+
+Each stage has its own concurrency knob and every symbol gets a timing report.
+"""
+
+import time
+import random
+import queue
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from datetime import date
+from typing import Dict, List, Optional, Any
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Thread-safe token bucket rate limiter"""
+
+    def __init__(self, rate_per_second: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate_per_second: Sustained refill rate (requests per second)
+            capacity: Maximum burst size (defaults to max(1, rate_per_second))
+        """
+        self.rate = float(rate_per_second)
+        self.capacity = float(capacity if capacity is not None else max(1.0, self.rate))
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until tokens are available; returns the seconds spent waiting"""
+        if self.rate <= 0:
+            return 0.0
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+@dataclass
+class PipelineConfig:
+    """Concurrency and batching knobs for each pipeline stage"""
+    fetch_workers: int = 4
+    compute_workers: int = 2
+    writer_workers: int = 1
+    requests_per_second: float = 2.0
+    burst: int = 4
+    max_retries: int = 3
+    backoff_seconds: float = 1.0
+    write_batch_rows: int = 5000
+    write_flush_seconds: float = 0.5
+
+
+@dataclass
+class SymbolPopulationResult:
+    """Outcome and per-stage timings for one symbol"""
+    symbol: str
+    success: bool = False
+    status: str = 'pending'
+    attempts: int = 0
+    rows_fetched: int = 0
+    rows_inserted: int = 0
+    rows_updated: int = 0
+    rows_failed: int = 0
+    rate_limit_wait_seconds: float = 0.0
+    fetch_seconds: float = 0.0
+    compute_seconds: float = 0.0
+    write_seconds: float = 0.0
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+_WRITER_STOP = object()
+
+
+class PopulationPipeline:
+    """Fetch -> compute -> write pipeline driving a PriceDataPopulator"""
+
+    def __init__(self, populator, config: Optional[PipelineConfig] = None):
+        self.populator = populator
+        self.config = config or PipelineConfig()
+        self.rate_limiter = TokenBucket(self.config.requests_per_second, self.config.burst)
+
+    def run(self, symbols: List[str], start_date: date, end_date: date) -> Dict[str, SymbolPopulationResult]:
+        """
+        Populate symbols with overlapping fetch, compute and write stages.
+
+        Returns:
+            Dict mapping symbol to SymbolPopulationResult (input order preserved)
+        """
+        config = self.config
+        results = {symbol: SymbolPopulationResult(symbol) for symbol in symbols}
+        write_queue: "queue.Queue" = queue.Queue()
+        started = time.perf_counter()
+
+        writers = [
+            threading.Thread(target=self._writer_loop, args=(write_queue, results), daemon=True,
+                             name=f"population-writer-{i}")
+            for i in range(max(1, config.writer_workers))
+        ]
+        for writer in writers:
+            writer.start()
+
+        with ThreadPoolExecutor(max_workers=max(1, config.compute_workers),
+                                thread_name_prefix="population-compute") as compute_pool:
+            compute_futures = []
+            compute_lock = threading.Lock()
+
+            def submit_compute(symbol, hist):
+                future = compute_pool.submit(self._compute, symbol, hist, start_date, results[symbol], write_queue)
+                with compute_lock:
+                    compute_futures.append(future)
+
+            with ThreadPoolExecutor(max_workers=max(1, config.fetch_workers),
+                                    thread_name_prefix="population-fetch") as fetch_pool:
+                for symbol in symbols:
+                    fetch_pool.submit(self._fetch, symbol, start_date, end_date, results[symbol], submit_compute)
+
+            # Fetch pool has drained, so every compute task is already submitted
+            for future in list(compute_futures):
+                future.result()
+
+        for _ in writers:
+            write_queue.put(_WRITER_STOP)
+        for writer in writers:
+            writer.join()
+
+        elapsed = time.perf_counter() - started
+        successful = sum(1 for result in results.values() if result.success)
+        logger.info(f"Pipelined population completed: {successful}/{len(symbols)} symbols successful in {elapsed:.2f}s")
+        return results
+
+    def _fetch(self, symbol: str, start_date: date, end_date: date,
+               result: SymbolPopulationResult, submit_compute) -> None:
+        """Fetch stage: rate-limited download with exponential backoff"""
+        config = self.config
+        stage_start = time.perf_counter()
+
+        for attempt in range(config.max_retries + 1):
+            result.attempts = attempt + 1
+            result.rate_limit_wait_seconds += self.rate_limiter.acquire()
+            try:
+                hist = self.populator.fetch_raw_history(symbol, start_date, end_date)
+                result.fetch_seconds = time.perf_counter() - stage_start
+
+                if hist is None or hist.empty:
+                    result.status = 'no_data'
+                    logger.warning(f"No data returned for {symbol}")
+                    return
+
+                result.rows_fetched = len(hist)
+                submit_compute(symbol, hist)
+                return
+            except Exception as e:
+                result.error = str(e)
+                if attempt >= config.max_retries:
+                    break
+                delay = config.backoff_seconds * (2 ** attempt) * (1 + random.random() * 0.25)
+                logger.warning(f"Fetch failed for {symbol} (attempt {attempt + 1}): {e}; retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+        result.fetch_seconds = time.perf_counter() - stage_start
+        result.status = 'fetch_failed'
+        logger.error(f"❌ {symbol}: fetch failed after {result.attempts} attempts - {result.error}")
+
+    def _compute(self, symbol: str, hist: pd.DataFrame, start_date: date,
+                 result: SymbolPopulationResult, write_queue: "queue.Queue") -> None:
+        """Compute stage: indicators and mapping to daily_equity_technicals columns"""
+        stage_start = time.perf_counter()
+        try:
+            data = self.populator.prepare_indicator_data(hist, start_date)
+            frame = self.populator._build_technicals_frame(symbol, data)
+            result.compute_seconds = time.perf_counter() - stage_start
+
+            if frame.empty:
+                result.status = 'no_data'
+                return
+            write_queue.put(frame)
+        except Exception as e:
+            result.compute_seconds = time.perf_counter() - stage_start
+            result.status = 'compute_failed'
+            result.error = str(e)
+            logger.error(f"❌ {symbol}: indicator calculation failed - {e}")
+
+    def _writer_loop(self, write_queue: "queue.Queue", results: Dict[str, SymbolPopulationResult]) -> None:
+        """Write stage: accumulate frames and flush them as one bulk upsert"""
+        config = self.config
+        pending: List[pd.DataFrame] = []
+        pending_rows = 0
+        stopping = False
+
+        while not stopping:
+            try:
+                item = write_queue.get(timeout=config.write_flush_seconds)
+            except queue.Empty:
+                item = None
+
+            if item is _WRITER_STOP:
+                stopping = True
+            elif item is not None:
+                pending.append(item)
+                pending_rows += len(item)
+                if pending_rows < config.write_batch_rows:
+                    continue
+
+            if pending:
+                try:
+                    self._flush(pending, results)
+                except Exception as e:
+                    logger.error(f"Batch write failed: {e}")
+                    for frame in pending:
+                        result = results[frame['symbol'].iloc[0]]
+                        result.status = 'write_failed'
+                        result.error = str(e)
+                pending = []
+                pending_rows = 0
+
+    def _flush(self, frames: List[pd.DataFrame], results: Dict[str, SymbolPopulationResult]) -> None:
+        """Write one batch of symbol frames and attribute counts back to each symbol"""
+        batch = pd.concat(frames, ignore_index=True)
+        symbols = batch['symbol'].unique().tolist()
+
+        stage_start = time.perf_counter()
+        stats = self.populator.store_price_data_bulk(batch, batch_size=max(len(batch), 1))
+        elapsed = time.perf_counter() - stage_start
+
+        for symbol in symbols:
+            result = results[symbol]
+            counts = stats['by_symbol'].get(symbol, {})
+            result.write_seconds += elapsed
+            result.rows_inserted += counts.get('inserted', 0)
+            result.rows_updated += counts.get('updated', 0)
+            result.rows_failed += counts.get('failed', 0)
+            result.success = (result.rows_inserted + result.rows_updated) > 0
+            result.status = 'stored' if result.success else 'write_failed'
+
+        logger.info(f"Wrote batch of {len(batch)} rows for {len(symbols)} symbols in {elapsed:.2f}s")
+
+
+def summarize_results(results: Dict[str, SymbolPopulationResult]) -> pd.DataFrame:
+    """Per-symbol report as a DataFrame (one row per symbol)"""
+    return pd.DataFrame([result.to_dict() for result in results.values()])
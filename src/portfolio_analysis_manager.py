@@ -10,14 +10,14 @@ Handles all portfolio analysis operations including:
 Uses the simplified single-table approach for maximum flexibility.
 """
 
+import time
 import logging
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import date, datetime, timedelta
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 import pandas as pd
 from decimal import Decimal
-import yfinance as yf
 
 # Import HKEX calendar functions
 try:
@@ -25,6 +25,57 @@ try:
 except ImportError:
     from hkex_calendar import get_hkex_trading_days, is_hkex_trading_day
 
+try:
+    from .timeline_engine import PriceMatrix, AnalysisSpec, evaluate_analyses, group_transactions
+except ImportError:
+    from timeline_engine import PriceMatrix, AnalysisSpec, evaluate_analyses, group_transactions
+
+try:
+    from .fetch_planner import FetchPlan, FetchRange, plan_missing_ranges, record_empty_ranges
+except ImportError:
+    from fetch_planner import FetchPlan, FetchRange, plan_missing_ranges, record_empty_ranges
+
+try:
+    from .price_cache import get_price_cache
+except ImportError:
+    from price_cache import get_price_cache
+
+try:
+    from .market_data import get_market_data_provider
+except ImportError:
+    from market_data import get_market_data_provider
+
+try:
+    from .price_index import PriceIndex, FILL_FORWARD
+except ImportError:
+    from price_index import PriceIndex, FILL_FORWARD
+
+try:
+    from .position_snapshots import get_position_snapshot_store
+except ImportError:
+    from position_snapshots import get_position_snapshot_store
+
+try:
+    from .timeline_store import TimelineStore
+except ImportError:
+    from timeline_store import TimelineStore
+
+try:
+    from .rolling_metrics import BENCHMARK_SYMBOL, ROLLING_COLUMNS, rolling_metrics_frame
+except ImportError:
+    from rolling_metrics import BENCHMARK_SYMBOL, ROLLING_COLUMNS, rolling_metrics_frame
+
+try:
+    from .scenario_engine import (
+        HypotheticalChange, ScenarioBase, ScenarioResult, SUMMARY_COLUMNS,
+        compare_scenarios, transaction_cash_change
+    )
+except ImportError:
+    from scenario_engine import (
+        HypotheticalChange, ScenarioBase, ScenarioResult, SUMMARY_COLUMNS,
+        compare_scenarios, transaction_cash_change
+    )
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -34,11 +85,21 @@ class PortfolioAnalysisManager:
     def __init__(self, database_manager):
         """Initialize with database connection"""
         self.db_manager = database_manager
+        self.price_cache = get_price_cache(database_manager)
+        self.market_data = get_market_data_provider()
+        self.snapshots = get_position_snapshot_store()
+        self.timelines = TimelineStore(database_manager, self.fetch_bulk_historical_prices)
+        self.timeline_timings = None
+        self._scenario_bases: Dict[int, Tuple[tuple, ScenarioBase]] = {}
         
     def get_connection(self):
         """Get database connection"""
         return self.db_manager.get_connection()
     
+    def connection(self):
+        """Borrow a pooled connection for a with-block (commit on success, rollback on error)"""
+        return self.db_manager.connection()
+    
     def create_analysis(self, portfolio_id: str, analysis_name: str, 
                        start_date: date, end_date: date, start_cash: float) -> Tuple[bool, str, int]:
         """
@@ -55,9 +116,7 @@ class PortfolioAnalysisManager:
             Tuple of (success, message, analysis_id)
         """
         try:
-            conn = self.get_connection()
-            
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            with self.connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
                 # First, validate that the portfolio exists and has positions
                 cur.execute("""
                     SELECT COUNT(*) as position_count
@@ -151,9 +210,7 @@ class PortfolioAnalysisManager:
             Tuple of (success, message)
         """
         try:
-            conn = self.get_connection()
-            
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            with self.connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
                 # Calculate cash change based on transaction type
                 cash_change = self._calculate_cash_change(
                     transaction_type, quantity_change, price_per_share
@@ -165,16 +222,26 @@ class PortfolioAnalysisManager:
                     (analysis_id, symbol, transaction_type, quantity_change,
                      price_per_share, cash_change, transaction_date, notes)
                     VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                    RETURNING id
                 """, (
                     analysis_id, symbol, transaction_type, quantity_change,
                     price_per_share, cash_change, transaction_date, notes
                 ))
+                transaction_id = cur.fetchone()['id']
                 
                 # Update calculated fields
                 self._update_analysis_calculations(cur, analysis_id)
                 
+                # Only the materialized timeline days from the transaction date on are stale
+                self.timelines.invalidate_from(cur, analysis_id, transaction_date, transaction_id)
+                
                 conn.commit()
                 
+                # Keep the as-of position snapshots current without a rebuild
+                self.snapshots.record_transaction(
+                    analysis_id, transaction_id, transaction_date, symbol, quantity_change, cash_change
+                )
+                
                 action = "bought" if quantity_change > 0 else "sold" if quantity_change < 0 else "processed"
                 logger.info(f"Transaction recorded: {action} {abs(quantity_change)} shares of {symbol}")
                 
@@ -287,57 +354,26 @@ class PortfolioAnalysisManager:
             target_date: Target date to calculate positions for
             
         Returns:
-            DataFrame with symbol, quantity, avg_cost, company_name, market_value (if prices available)
+            DataFrame with symbol, current_quantity, avg_cost, company_name
         """
         try:
-            conn = self.get_connection()
-            
-            # First, validate the target date is within the analysis period
-            with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT start_date, end_date, analysis_name 
-                    FROM portfolio_analyses 
-                    WHERE id = %s
-                """, (analysis_id,))
-                
-                result = cur.fetchone()
-                if not result:
+            with self.connection() as conn, conn.cursor() as cur:
+                snapshots = self.snapshots.get(cur, analysis_id)
+                if snapshots is None:
                     logger.warning(f"Analysis {analysis_id} not found")
                     return pd.DataFrame()
                 
-                start_date, end_date, analysis_name = result
-                
-                if target_date < start_date or target_date > end_date:
-                    logger.warning(f"Target date {target_date} is outside analysis period {start_date} to {end_date}")
+                if target_date < snapshots.start_date or target_date > snapshots.end_date:
+                    logger.warning(f"Target date {target_date} is outside analysis period "
+                                   f"{snapshots.start_date} to {snapshots.end_date}")
                     return pd.DataFrame()
+                
+                positions = snapshots.positions_at(target_date)
+                names = self._get_company_names(cur, [p['symbol'] for p in positions])
             
-            # Get positions as of the target date using cumulative transactions
-            query = """
-                SELECT 
-                    sc.symbol,
-                    SUM(sc.quantity_change) as current_quantity,
-                    -- Calculate weighted average cost for purchases up to target date
-                    CASE 
-                        WHEN SUM(CASE WHEN sc.quantity_change > 0 AND sc.transaction_date <= %s 
-                                     THEN sc.quantity_change ELSE 0 END) > 0 THEN
-                            ABS(SUM(CASE WHEN sc.quantity_change > 0 AND sc.transaction_date <= %s 
-                                        THEN sc.cash_change ELSE 0 END) / 
-                                SUM(CASE WHEN sc.quantity_change > 0 AND sc.transaction_date <= %s 
-                                        THEN sc.quantity_change ELSE 0 END))
-                        ELSE 0 
-                    END as avg_cost,
-                    -- Get company name from portfolio_holdings
-                    MAX(ph.company_name) as company_name
-                FROM portfolio_analysis_state_changes sc
-                LEFT JOIN portfolio_holdings ph ON sc.symbol = ph.symbol
-                WHERE sc.analysis_id = %s 
-                  AND sc.transaction_date <= %s
-                GROUP BY sc.symbol
-                HAVING SUM(sc.quantity_change) > 0
-                ORDER BY sc.symbol
-            """
-            
-            return pd.read_sql(query, conn, params=[target_date, target_date, target_date, analysis_id, target_date])
+            for position in positions:
+                position['company_name'] = names.get(position['symbol'])
+            return pd.DataFrame(positions, columns=['symbol', 'current_quantity', 'avg_cost', 'company_name'])
             
         except Exception as e:
             logger.error(f"Error getting positions at date {target_date}: {e}")
@@ -355,27 +391,71 @@ class PortfolioAnalysisManager:
             Cash amount as of target date
         """
         try:
-            conn = self.get_connection()
-            
-            with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT 
-                        pa.start_cash + COALESCE(SUM(sc.cash_change), 0) as cash_position
-                    FROM portfolio_analyses pa
-                    LEFT JOIN portfolio_analysis_state_changes sc 
-                        ON pa.id = sc.analysis_id 
-                        AND sc.transaction_date <= %s
-                    WHERE pa.id = %s
-                    GROUP BY pa.start_cash
-                """, (target_date, analysis_id))
-                
-                result = cur.fetchone()
-                return float(result[0]) if result else 0.0
+            with self.connection() as conn, conn.cursor() as cur:
+                snapshots = self.snapshots.get(cur, analysis_id)
+                return snapshots.cash_at(target_date) if snapshots else 0.0
                 
         except Exception as e:
             logger.error(f"Error getting cash position at date {target_date}: {e}")
             return 0.0
     
+    def _get_company_names(self, cur, symbols: List[str]) -> Dict[str, Optional[str]]:
+        """Company names from portfolio_holdings for a set of symbols"""
+        if not symbols:
+            return {}
+        cur.execute("""
+            SELECT symbol, MAX(company_name)
+            FROM portfolio_holdings
+            WHERE symbol = ANY(%s)
+            GROUP BY symbol
+        """, (list(symbols),))
+        return {symbol: name for symbol, name in cur.fetchall()}
+    
+    def _get_nearest_prices(self, cur, symbols: List[str], target_date: date,
+                            max_days: int = 7) -> Dict[str, Dict[str, Any]]:
+        """
+        Nearest stored close within max_days of target_date for every symbol, in one query
+        
+        Ties between an earlier and a later day resolve to the earlier one.
+        
+        Returns:
+            Dictionary of symbol -> {'close_price', 'trade_date', 'company_name'}
+            (symbols without a price within the window have close_price None)
+        """
+        if not symbols:
+            return {}
+        cur.execute("""
+            WITH wanted AS (
+                SELECT DISTINCT unnest(%s::text[]) AS symbol
+            ),
+            nearest AS (
+                SELECT DISTINCT ON (t.symbol) t.symbol, t.close_price, t.trade_date
+                FROM daily_equity_technicals t
+                JOIN wanted w ON w.symbol = t.symbol
+                WHERE t.trade_date BETWEEN %s::date - %s AND %s::date + %s
+                ORDER BY t.symbol, ABS(t.trade_date - %s::date), t.trade_date
+            ),
+            names AS (
+                SELECT ph.symbol, MAX(ph.company_name) AS company_name
+                FROM portfolio_holdings ph
+                JOIN wanted w ON w.symbol = ph.symbol
+                GROUP BY ph.symbol
+            )
+            SELECT w.symbol, n.close_price, n.trade_date, nm.company_name
+            FROM wanted w
+            LEFT JOIN nearest n ON n.symbol = w.symbol
+            LEFT JOIN names nm ON nm.symbol = w.symbol
+        """, (list(symbols), target_date, max_days, target_date, max_days, target_date))
+        
+        return {
+            symbol: {
+                'close_price': float(close_price) if close_price is not None else None,
+                'trade_date': trade_date,
+                'company_name': company_name
+            }
+            for symbol, close_price, trade_date, company_name in cur.fetchall()
+        }
+    
     def get_effective_trading_date(self, target_date: date, analysis_id: int = None) -> Tuple[date, str]:
         """
         Get the effective trading date for analysis, with fallback to previous trading day
@@ -395,8 +475,7 @@ class PortfolioAnalysisManager:
             
             # If analysis_id provided, validate within analysis period first
             if analysis_id:
-                conn = self.get_connection()
-                with conn.cursor() as cur:
+                with self.connection() as conn, conn.cursor() as cur:
                     cur.execute("""
                         SELECT start_date, end_date 
                         FROM portfolio_analyses 
@@ -443,54 +522,46 @@ class PortfolioAnalysisManager:
             # Get effective trading date
             effective_date, date_reason = self.get_effective_trading_date(target_date, analysis_id)
             
-            # Get positions and cash at effective date
-            positions_df = self.get_positions_at_date(analysis_id, effective_date)
-            cash_position = self.get_cash_position_at_date(analysis_id, effective_date)
-            
-            # Calculate market values using prices from database
+            # Positions and cash from the checkpointed snapshots, prices for every position in one query
             total_market_value = 0
             positions_with_values = []
-            
-            if not positions_df.empty:
-                conn = self.get_connection()
-                
-                for _, position in positions_df.iterrows():
-                    symbol = position['symbol']
-                    quantity = position['current_quantity']
-                    avg_cost = position['avg_cost']
-                    
-                    # Get price for effective date
-                    with conn.cursor() as cur:
-                        cur.execute("""
-                            SELECT close_price, trade_date
-                            FROM daily_equity_technicals 
-                            WHERE symbol = %s 
-                            AND ABS(trade_date - %s::date) <= 7
-                            ORDER BY ABS(trade_date - %s::date)
-                            LIMIT 1
-                        """, (symbol, effective_date, effective_date))
-                        
-                        price_result = cur.fetchone()
-                        if price_result:
-                            current_price = float(price_result[0])
-                            price_date = price_result[1]
-                        else:
-                            current_price = float(avg_cost) # Fallback to cost
-                            price_date = effective_date
-                    
-                    market_value = current_price * quantity
-                    total_market_value += market_value
-                    
-                    positions_with_values.append({
-                        'symbol': symbol,
-                        'company_name': position['company_name'],
-                        'quantity': quantity,
-                        'avg_cost': float(avg_cost),
-                        'current_price': current_price,
-                        'market_value': market_value,
-                        'unrealized_pnl': market_value - (float(avg_cost) * quantity),
-                        'price_date': price_date
-                    })
+            cash_position = 0.0
+            
+            with self.connection() as conn, conn.cursor() as cur:
+                snapshots = self.snapshots.get(cur, analysis_id)
+                positions = []
+                if snapshots is not None:
+                    cash_position = snapshots.cash_at(effective_date)
+                    if snapshots.start_date <= effective_date <= snapshots.end_date:
+                        positions = snapshots.positions_at(effective_date)
+                prices = self._get_nearest_prices(cur, [p['symbol'] for p in positions], effective_date)
+            
+            for position in positions:
+                symbol = position['symbol']
+                quantity = position['current_quantity']
+                avg_cost = position['avg_cost']
+                price_info = prices.get(symbol, {})
+                
+                if price_info.get('close_price') is not None:
+                    current_price = price_info['close_price']
+                    price_date = price_info['trade_date']
+                else:
+                    current_price = float(avg_cost)  # Fallback to cost
+                    price_date = effective_date
+                
+                market_value = current_price * quantity
+                total_market_value += market_value
+                
+                positions_with_values.append({
+                    'symbol': symbol,
+                    'company_name': price_info.get('company_name'),
+                    'quantity': quantity,
+                    'avg_cost': float(avg_cost),
+                    'current_price': current_price,
+                    'market_value': market_value,
+                    'unrealized_pnl': market_value - (float(avg_cost) * quantity),
+                    'price_date': price_date
+                })
             
             return {
                 'analysis_id': analysis_id,
@@ -522,9 +593,7 @@ class PortfolioAnalysisManager:
     def delete_analysis(self, analysis_id: int) -> Tuple[bool, str]:
         """Delete an analysis and all its transactions"""
         try:
-            conn = self.get_connection()
-            
-            with conn.cursor() as cur:
+            with self.connection() as conn, conn.cursor() as cur:
                 # Get analysis name for logging
                 cur.execute("SELECT analysis_name FROM portfolio_analyses WHERE id = %s", (analysis_id,))
                 result = cur.fetchone()
@@ -540,6 +609,8 @@ class PortfolioAnalysisManager:
                     return False, "Analysis not found"
                 
                 conn.commit()
+                self.snapshots.invalidate(analysis_id)
+                self._scenario_bases.pop(analysis_id, None)
                 
                 logger.info(f"Deleted analysis '{analysis_name}' (ID: {analysis_id})")
                 return True, f"Analysis '{analysis_name}' deleted successfully"
@@ -551,204 +622,161 @@ class PortfolioAnalysisManager:
     def _calculate_cash_change(self, transaction_type: str, quantity_change: int, 
                               price_per_share: float) -> float:
         """Calculate cash change for a transaction"""
-        if transaction_type == 'BUY':
-            return -abs(quantity_change) * price_per_share  # Cash decreases
-        elif transaction_type == 'SELL':
-            return abs(quantity_change) * price_per_share   # Cash increases
-        elif transaction_type == 'DIVIDEND':
-            return abs(quantity_change) * price_per_share   # Cash increases, quantity_change should be 0
-        elif transaction_type == 'SPLIT':
-            return 0  # No cash change for splits
-        elif transaction_type == 'CASH_ADJUSTMENT':
-            return quantity_change  # Direct cash adjustment
-        else:
-            return 0
+        return transaction_cash_change(transaction_type, quantity_change, price_per_share)
     
     def _update_analysis_calculations(self, cur, analysis_id: int):
         """Update calculated fields for an analysis"""
-        try:
-            # Calculate start equity value (sum of initial investments)
-            cur.execute("""
-                SELECT COALESCE(SUM(ABS(cash_change)), 0) as start_equity_value
-                FROM portfolio_analysis_state_changes
-                WHERE analysis_id = %s AND transaction_type = 'INITIAL'
-            """, (analysis_id,))
-            
-            result = cur.fetchone()
-            start_equity_value = float(result['start_equity_value'] if isinstance(result, dict) else result[0])
-            
-            # Get start cash
-            cur.execute("SELECT start_cash FROM portfolio_analyses WHERE id = %s", (analysis_id,))
-            result = cur.fetchone()
-            start_cash = float(result['start_cash'] if isinstance(result, dict) else result[0])
-            
-            # Calculate current cash (start cash + actual trading cash changes, excluding INITIAL)
-            # INITIAL transactions represent existing positions, not cash outflows during analysis period
-            cur.execute("""
-                SELECT COALESCE(SUM(cash_change), 0) as total_cash_changes
-                FROM portfolio_analysis_state_changes
-                WHERE analysis_id = %s 
-                  AND transaction_type != 'INITIAL'
-            """, (analysis_id,))
-            
-            result = cur.fetchone()
-            total_cash_changes = float(result['total_cash_changes'] if isinstance(result, dict) else result[0])
-            end_cash = start_cash + total_cash_changes
-            
-            # Calculate current market value using real market prices
-            end_equity_value = self._get_current_market_value(analysis_id)
-            
-            # Calculate totals
-            start_total_value = start_cash + start_equity_value
-            end_total_value = end_cash + end_equity_value
-            
-            # Update the analysis record
-            cur.execute("""
-                UPDATE portfolio_analyses SET
-                    start_equity_value = %s,
-                    end_equity_value = %s,
-                    end_cash = %s,
-                    start_total_value = %s,
-                    end_total_value = %s,
-                    total_equity_gain_loss = %s,
-                    total_value_gain_loss = %s,
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE id = %s
-            """, (
-                start_equity_value, end_equity_value, end_cash,
-                start_total_value, end_total_value,
-                end_equity_value - start_equity_value,
-                end_total_value - start_total_value,
-                analysis_id
-            ))
-            
-            logger.debug(f"Updated calculations for analysis {analysis_id}: start_equity={start_equity_value}, end_cash={end_cash}")
-            
-        except Exception as e:
-            logger.error(f"Error updating calculations: {e}")
-            raise
+        self._update_analyses_calculations(cur, [analysis_id])
     
-    def _get_current_market_value(self, analysis_id: int) -> float:
+    def _update_analyses_calculations(self, cur, analysis_ids: List[int]) -> Dict[str, Any]:
         """
-        Calculate current market value for an analysis using latest market prices
+        Update calculated fields of many analyses with set-based queries
+        
+        One aggregate query gives start equity (INITIAL cost) and cash changes,
+        one query gives the open positions, closes are fetched once per distinct
+        price window (analyses sharing end dates share a fetch) and every row is
+        written with a single UPDATE ... FROM (VALUES ...).
         
         Args:
-            analysis_id: Analysis ID to calculate market value for
+            cur: Cursor of the caller's transaction
+            analysis_ids: Analyses to update
             
         Returns:
-            Current market value of equity positions (float)
+            Dictionary with updated count, price fetches and timing
         """
+        started = time.perf_counter()
+        
+        def values(row):
+            # Callers may pass a RealDictCursor: every column is aliased so no two keys collide
+            return list(row.values()) if isinstance(row, dict) else list(row)
+        
         try:
-            conn = self.get_connection()
+            cur.execute("""
+                SELECT pa.id, pa.end_date, pa.start_cash,
+                       COALESCE(SUM(ABS(sc.cash_change)) FILTER (WHERE sc.transaction_type = 'INITIAL'), 0)
+                           AS start_equity_value,
+                       COALESCE(SUM(sc.cash_change) FILTER (WHERE sc.transaction_type != 'INITIAL'), 0)
+                           AS cash_changes
+                FROM portfolio_analyses pa
+                LEFT JOIN portfolio_analysis_state_changes sc ON sc.analysis_id = pa.id
+                WHERE pa.id = ANY(%s)
+                GROUP BY pa.id, pa.end_date, pa.start_cash
+            """, (list(analysis_ids),))
+            figures = {row[0]: row for row in map(values, cur.fetchall())}
             
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                # Get analysis end date and all positions
-                cur.execute("""
-                    SELECT 
-                        pa.end_date,
-                        sc.symbol,
-                        SUM(sc.quantity_change) as quantity
-                    FROM portfolio_analyses pa
-                    LEFT JOIN portfolio_analysis_state_changes sc ON pa.id = sc.analysis_id
-                    WHERE pa.id = %s 
-                      AND sc.symbol IS NOT NULL
-                      AND sc.transaction_type IN ('INITIAL', 'BUY', 'SELL')
-                    GROUP BY pa.end_date, sc.symbol
-                    HAVING SUM(sc.quantity_change) > 0
-                """, (analysis_id,))
-                
-                position_data = cur.fetchall()
-                
-                if not position_data:
-                    logger.info(f"No equity positions found for analysis {analysis_id}")
-                    return 0.0
-                
-                # Extract symbols and get end date
-                symbols = [row['symbol'] for row in position_data]
-                end_date = position_data[0]['end_date']
-                
-                logger.info(f"Calculating market value for analysis {analysis_id}: {len(symbols)} symbols as of {end_date}")
-                
-                # Fetch market prices for the end date (or latest available)
-                # Use a small date range around the end date to get the closest price
-                price_start = end_date - timedelta(days=7)  # Look back up to 7 days
-                price_end = min(end_date + timedelta(days=2), date.today())  # Don't go beyond today
-                
-                price_df = self.fetch_bulk_historical_prices(symbols, price_start, price_end)
-                
-                if price_df.empty:
-                    logger.warning(f"No price data available for analysis {analysis_id}, using cost basis fallback")
-                    return self._get_cost_basis_value(analysis_id)
-                
-                # Calculate market value
-                total_market_value = 0.0
-                price_date_used = None
-                
-                for row in position_data:
-                    symbol = row['symbol']
-                    quantity = float(row['quantity'])
-                    
-                    # Get the latest available price for this symbol (closest to end_date)
-                    symbol_prices = price_df[price_df['symbol'] == symbol].copy()
-                    if not symbol_prices.empty:
-                        # Sort by date and get the latest price
-                        symbol_prices = symbol_prices.sort_values('date', ascending=False)
-                        latest_price = float(symbol_prices.iloc[0]['close_price'])
-                        price_date = symbol_prices.iloc[0]['date'].date()
-                        
-                        market_value = quantity * latest_price
-                        total_market_value += market_value
-                        
-                        if price_date_used is None:
-                            price_date_used = price_date
-                        
-                        logger.info(f"  {symbol}: {quantity} × ${latest_price:.2f} = ${market_value:,.2f}")
+            # Open equity positions (INITIAL/BUY/SELL quantities still held)
+            cur.execute("""
+                SELECT analysis_id, symbol, SUM(quantity_change) AS quantity
+                FROM portfolio_analysis_state_changes
+                WHERE analysis_id = ANY(%s)
+                  AND symbol IS NOT NULL
+                  AND transaction_type IN ('INITIAL', 'BUY', 'SELL')
+                GROUP BY analysis_id, symbol
+                HAVING SUM(quantity_change) > 0
+            """, (list(analysis_ids),))
+            positions: Dict[int, List[Tuple[str, float]]] = {}
+            for analysis_id, symbol, quantity in map(values, cur.fetchall()):
+                positions.setdefault(analysis_id, []).append((symbol, float(quantity)))
+            
+            # Price window per analysis: up to 7 days before its end date, never beyond today
+            windows = {
+                analysis_id: (row[1] - timedelta(days=7), min(row[1] + timedelta(days=2), date.today()))
+                for analysis_id, row in figures.items() if analysis_id in positions
+            }
+            fetch_started = time.perf_counter()
+            price_index, fetches = self._fetch_price_windows(positions, windows)
+            fetch_seconds = time.perf_counter() - fetch_started
+            
+            rows = []
+            for analysis_id, (_, _, start_cash, start_equity_value, cash_changes) in figures.items():
+                start_cash = float(start_cash or 0)
+                start_equity_value = float(start_equity_value)
+                end_cash = start_cash + float(cash_changes)
+                
+                end_equity_value = 0.0
+                if analysis_id in positions:
+                    price_end = windows[analysis_id][1]
+                    priced = [(quantity, price_index.asof(symbol, price_end, fill=FILL_FORWARD))
+                              for symbol, quantity in positions[analysis_id]]
+                    priced = [(quantity, price) for quantity, price in priced if price is not None]
+                    if priced:
+                        end_equity_value = sum(quantity * price for quantity, price in priced)
                     else:
-                        logger.warning(f"  {symbol}: No price data available, excluding from market value")
-                
-                logger.info(f"Total market value for analysis {analysis_id}: ${total_market_value:,.2f} (as of {price_date_used})")
-                return total_market_value
-                
+                        logger.warning(f"No price data available for analysis {analysis_id}, using cost basis fallback")
+                        end_equity_value = start_equity_value
+                
+                start_total_value = start_cash + start_equity_value
+                end_total_value = end_cash + end_equity_value
+                rows.append((
+                    analysis_id, start_equity_value, end_equity_value, end_cash,
+                    start_total_value, end_total_value,
+                    end_equity_value - start_equity_value, end_total_value - start_total_value
+                ))
+            
+            if rows:
+                execute_values(cur, """
+                    UPDATE portfolio_analyses AS pa SET
+                        start_equity_value = v.start_equity_value,
+                        end_equity_value = v.end_equity_value,
+                        end_cash = v.end_cash,
+                        start_total_value = v.start_total_value,
+                        end_total_value = v.end_total_value,
+                        total_equity_gain_loss = v.total_equity_gain_loss,
+                        total_value_gain_loss = v.total_value_gain_loss,
+                        updated_at = CURRENT_TIMESTAMP
+                    FROM (VALUES %s) AS v(id, start_equity_value, end_equity_value, end_cash,
+                                          start_total_value, end_total_value,
+                                          total_equity_gain_loss, total_value_gain_loss)
+                    WHERE pa.id = v.id
+                """, rows, template="(%s::int, %s::numeric, %s::numeric, %s::numeric, "
+                                    "%s::numeric, %s::numeric, %s::numeric, %s::numeric)")
+            
+            result = {
+                'updated': len(rows),
+                'analyses_with_positions': len(positions),
+                'price_fetches': fetches,
+                'fetch_seconds': fetch_seconds,
+                'seconds': time.perf_counter() - started,
+            }
+            logger.debug(f"Updated calculations for {len(rows)} analyses: {result}")
+            return result
+            
         except Exception as e:
-            logger.error(f"Error calculating current market value for analysis {analysis_id}: {e}")
-            logger.info("Falling back to cost basis calculation")
-            return self._get_cost_basis_value(analysis_id)
-        finally:
-            if 'conn' in locals():
-                conn.close()
+            logger.error(f"Error updating calculations: {e}")
+            raise
     
-    def _get_cost_basis_value(self, analysis_id: int) -> float:
+    def _fetch_price_windows(self, positions: Dict[int, List[Tuple[str, float]]],
+                             windows: Dict[int, Tuple[date, date]]) -> Tuple[PriceIndex, int]:
         """
-        Fallback method to calculate equity value using cost basis
+        Fetch closes for every (symbol, price window) need with one fetch per merged window
         
         Args:
-            analysis_id: Analysis ID to calculate cost basis for
+            positions: analysis_id -> [(symbol, quantity)]
+            windows: analysis_id -> (price_start, price_end)
             
         Returns:
-            Cost basis value of equity positions (float)
+            Tuple of (PriceIndex over all fetched closes, number of fetches)
         """
-        try:
-            conn = self.get_connection()
-            
-            with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT COALESCE(SUM(ABS(cash_change)), 0) as cost_basis_value
-                    FROM portfolio_analysis_state_changes
-                    WHERE analysis_id = %s AND transaction_type = 'INITIAL'
-                """, (analysis_id,))
-                
-                result = cur.fetchone()
-                cost_basis = float(result[0] if result else 0)
-                
-                logger.info(f"Cost basis value for analysis {analysis_id}: ${cost_basis:,.2f}")
-                return cost_basis
-                
-        except Exception as e:
-            logger.error(f"Error calculating cost basis for analysis {analysis_id}: {e}")
-            return 0.0
-        finally:
-            if 'conn' in locals():
-                conn.close()
+        # Merge overlapping windows; each merged window fetches the union of its symbols
+        merged: List[List] = []
+        for analysis_id in sorted(windows, key=lambda a: windows[a]):
+            window_start, window_end = windows[analysis_id]
+            symbols = {symbol for symbol, _ in positions[analysis_id]}
+            if merged and window_start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], window_end)
+                merged[-1][2] |= symbols
+            else:
+                merged.append([window_start, window_end, symbols])
+        
+        frames = []
+        for window_start, window_end, symbols in merged:
+            price_df = self.fetch_bulk_historical_prices(sorted(symbols), window_start, window_end)
+            if not price_df.empty:
+                frames.append(price_df)
+        
+        if not frames:
+            return PriceIndex({}), len(merged)
+        return PriceIndex.from_frame(pd.concat(frames, ignore_index=True)), len(merged)
     
     def validate_analysis_name(self, portfolio_id: str, analysis_name: str, 
                               exclude_id: int = None) -> bool:
@@ -830,20 +858,24 @@ class PortfolioAnalysisManager:
                 if not analysis_ids:
                     return True, "No analyses found to update", 0
                 
-                # Update each analysis with current market prices
-                updated_count = 0
-                for analysis_id in analysis_ids:
-                    try:
-                        self._update_analysis_calculations(cur, analysis_id)
-                        updated_count += 1
-                    except Exception as e:
-                        logger.warning(f"Failed to update analysis {analysis_id}: {e}")
-                        continue
+                # Update every analysis with one set-based pass
+                result = self._update_analyses_calculations(cur, analysis_ids)
+                updated_count = result['updated']
                 
                 conn.commit()
                 
-                logger.info(f"Successfully refreshed {updated_count}/{len(analysis_ids)} analyses for portfolio {portfolio_id}")
-                return True, f"Updated {updated_count} analyses with current market prices", updated_count
+                # Append the new trading day(s) to each materialized timeline
+                self.timelines.refresh(analysis_ids)
+                
+                # The per-analysis path fetched prices once for every analysis holding equities
+                fetches_saved = result['analyses_with_positions'] - result['price_fetches']
+                seconds_saved = (result['fetch_seconds'] / result['price_fetches'] * fetches_saved
+                                 if result['price_fetches'] else 0.0)
+                logger.info(f"Successfully refreshed {updated_count}/{len(analysis_ids)} analyses for portfolio {portfolio_id} "
+                            f"in {result['seconds']:.2f}s ({result['price_fetches']} price fetch(es) instead of "
+                            f"{result['analyses_with_positions']}, ~{seconds_saved:.2f}s saved)")
+                return True, (f"Updated {updated_count} analyses with current market prices in {result['seconds']:.2f}s "
+                              f"(~{seconds_saved:.2f}s saved by {result['price_fetches']} shared price fetch(es))"), updated_count
                 
         except Exception as e:
             logger.error(f"Error refreshing analyses for portfolio {portfolio_id}: {e}")
@@ -864,11 +896,16 @@ class PortfolioAnalysisManager:
                                    cash_position, equity_value, transaction_details
         """
         try:
-            conn = self.get_connection()
-            
             if not analysis_ids:
                 return pd.DataFrame()
             
+            # Stored daily values, recomputed only from the earliest affected day
+            materialized = self.timelines.timeline(analysis_ids)
+            if not materialized.empty:
+                return materialized
+            
+            conn = self.get_connection()
+            
             # First, get the analysis date ranges and symbols
             placeholders = ','.join(['%s'] * len(analysis_ids))
             
@@ -939,6 +976,138 @@ class PortfolioAnalysisManager:
             if 'conn' in locals():
                 conn.close()
     
+    def get_analysis_rolling_metrics(self, analysis_ids: List[int],
+                                     timeline_df: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        Rolling 20/60/252-day volatility, Sharpe, Sortino, drawdown and beta vs HSI
+        
+        Args:
+            analysis_ids: List of analysis IDs
+            timeline_df: Output of get_analysis_timeline_data when already loaded
+            
+        Returns:
+            DataFrame with columns: analysis_id, date, window, volatility, sharpe_ratio,
+                                   sortino_ratio, max_drawdown_pct, drawdown_days, beta
+        """
+        try:
+            if not analysis_ids:
+                return pd.DataFrame(columns=ROLLING_COLUMNS)
+            
+            # Cached with the materialized timelines
+            metrics = self.timelines.rolling_metrics(analysis_ids, timeline_df)
+            if not metrics.empty:
+                return metrics
+            
+            # Timelines not materialized: compute from the live timeline
+            if timeline_df is None:
+                timeline_df = self.get_analysis_timeline_data(analysis_ids)
+            if timeline_df.empty:
+                return pd.DataFrame(columns=ROLLING_COLUMNS)
+            start = pd.Timestamp(timeline_df['date'].min()).date() - timedelta(days=14)
+            end = pd.Timestamp(timeline_df['date'].max()).date()
+            benchmark_df = self.fetch_bulk_historical_prices([BENCHMARK_SYMBOL], start, end)
+            return rolling_metrics_frame(timeline_df, benchmark_df)
+            
+        except Exception as e:
+            logger.error(f"Error computing rolling metrics: {e}")
+            return pd.DataFrame(columns=ROLLING_COLUMNS)
+    
+    def get_scenario_base(self, analysis_id: int) -> Optional[ScenarioBase]:
+        """
+        Base state for what-if scenarios of an analysis
+        
+        The close matrix and base positions are kept in memory and rebuilt only
+        when the analysis parameters, its state changes or the last trading day move.
+        
+        Args:
+            analysis_id: Base analysis ID
+            
+        Returns:
+            ScenarioBase, or None when the analysis cannot be loaded
+        """
+        try:
+            with self.connection() as conn, conn.cursor() as cur:
+                cur.execute("""
+                    SELECT analysis_name, start_date, end_date, start_cash
+                    FROM portfolio_analyses
+                    WHERE id = %s
+                """, (analysis_id,))
+                analysis = cur.fetchone()
+                if not analysis:
+                    return None
+                
+                cur.execute("""
+                    SELECT id, transaction_date, symbol, transaction_type, quantity_change, cash_change
+                    FROM portfolio_analysis_state_changes
+                    WHERE analysis_id = %s
+                    ORDER BY transaction_date, id
+                """, (analysis_id,))
+                rows = cur.fetchall()
+            
+            analysis_name, start_date, end_date, start_cash = analysis
+            through = min(end_date, date.today())
+            key = (start_date, end_date, float(start_cash or 0), through,
+                   len(rows), max((row[0] for row in rows), default=0))
+            cached = self._scenario_bases.get(analysis_id)
+            if cached and cached[0] == key:
+                return cached[1]
+            
+            transactions = [{
+                'transaction_date': row[1], 'symbol': row[2], 'transaction_type': row[3],
+                'quantity_change': row[4], 'cash_change': row[5],
+            } for row in rows]
+            trading_days = get_hkex_trading_days(start_date, through)
+            symbols = sorted({row[2] for row in rows if row[2]})
+            price_df = self.fetch_bulk_historical_prices(symbols, start_date - timedelta(days=14), through)
+            
+            base = ScenarioBase(
+                analysis_id, analysis_name, trading_days, transactions, float(start_cash or 0),
+                PriceMatrix.from_price_frame(price_df, trading_days, symbols)
+            )
+            self._scenario_bases[analysis_id] = (key, base)
+            logger.info(f"Scenario base for analysis {analysis_id}: {len(trading_days)} days, {len(symbols)} symbols")
+            return base
+            
+        except Exception as e:
+            logger.error(f"Error building scenario base for analysis {analysis_id}: {e}")
+            return None
+    
+    def evaluate_scenarios(self, analysis_id: int,
+                           scenarios: Dict[str, List[Any]]) -> Tuple[pd.DataFrame, Dict[str, ScenarioResult]]:
+        """
+        Evaluate hypothetical state changes against an analysis without writing them
+        
+        Args:
+            analysis_id: Base analysis ID
+            scenarios: Scenario name -> list of changes (HypotheticalChange or dicts with
+                       symbol, transaction_type, quantity_change, price_per_share, transaction_date)
+            
+        Returns:
+            Tuple of (summary DataFrame with one row per scenario, scenario name -> ScenarioResult)
+        """
+        try:
+            base = self.get_scenario_base(analysis_id)
+            if base is None:
+                return pd.DataFrame(columns=SUMMARY_COLUMNS), {}
+            
+            scenarios = {
+                name: [c if isinstance(c, HypotheticalChange) else HypotheticalChange.from_dict(c) for c in changes]
+                for name, changes in scenarios.items()
+            }
+            
+            # Closes for symbols the base does not hold, fetched once for all scenarios
+            missing = base.missing_symbols([c for changes in scenarios.values() for c in changes])
+            if missing and base.trading_days:
+                price_df = self.fetch_bulk_historical_prices(
+                    missing, base.trading_days[0] - timedelta(days=14), base.trading_days[-1])
+                base.add_prices(price_df, missing)
+            
+            return compare_scenarios(base, scenarios)
+            
+        except Exception as e:
+            logger.error(f"Error evaluating scenarios for analysis {analysis_id}: {e}")
+            return pd.DataFrame(columns=SUMMARY_COLUMNS), {}
+    
     def _get_trading_days_for_analyses(self, cur, analysis_ids: List[int]) -> Dict[int, List[date]]:
         """Get trading days for each analysis using HKEX calendar"""
         try:
@@ -1020,12 +1189,16 @@ class PortfolioAnalysisManager:
             
             transaction_data = cur.fetchall()
             
-            # Process each analysis separately with trading days only
-            all_results = []
+            # Build the shared days x symbols close matrix once for every analysis
+            all_trading_days = sorted(set(d for days in trading_days_map.values() for d in days))
+            price_matrix = PriceMatrix.from_price_frame(price_df, all_trading_days)
+            
+            # Group transactions once and evaluate every analysis against the shared matrix
+            transactions_by_analysis = group_transactions(transaction_data)
+            specs = []
             
             for metadata in metadata_results:
                 analysis_id = metadata['analysis_id']
-                analysis_name = metadata['analysis_name']
                 
                 # Get trading days for this analysis
                 trading_days = trading_days_map.get(analysis_id, [])
@@ -1033,28 +1206,23 @@ class PortfolioAnalysisManager:
                     logger.warning(f"No trading days for analysis {analysis_id}")
                     continue
                 
-                logger.info(f"Processing analysis {analysis_id} with {len(trading_days)} trading days")
-                
-                # Get transactions for this analysis
-                if isinstance(transaction_data[0], dict) if transaction_data else False:
-                    analysis_transactions = [t for t in transaction_data if t['analysis_id'] == analysis_id]
-                    start_cash = analysis_transactions[0]['start_cash'] if analysis_transactions else 0
+                analysis_rows = transactions_by_analysis.get(analysis_id, [])
+                if analysis_rows and isinstance(analysis_rows[0], dict):
+                    start_cash = analysis_rows[0]['start_cash']
                 else:
-                    analysis_transactions = [t for t in transaction_data if t[0] == analysis_id]
-                    start_cash = analysis_transactions[0][4] if analysis_transactions else 0
-                logger.info(f"Found {len(analysis_transactions)} transactions for analysis {analysis_id}, start_cash: {start_cash}")
-                
-                # Calculate daily values using trading days only
-                daily_results = self._calculate_daily_values_trading_days(
-                    analysis_id, analysis_name, trading_days, 
-                    analysis_transactions, start_cash, price_df
-                )
+                    start_cash = analysis_rows[0][4] if analysis_rows else 0
+                logger.info(f"Analysis {analysis_id}: {len(trading_days)} trading days, "
+                            f"{len(analysis_rows)} transactions, start_cash: {start_cash}")
                 
-                all_results.extend(daily_results)
+                specs.append(AnalysisSpec(
+                    analysis_id, metadata['analysis_name'], trading_days, analysis_rows, start_cash
+                ))
+            
+            all_results, self.timeline_timings = evaluate_analyses(specs, price_matrix)
             
-            # Convert to DataFrame
+            # Combine per-analysis frames
             if all_results:
-                result_df = pd.DataFrame(all_results)
+                result_df = pd.concat(all_results, ignore_index=True)
                 logger.info(f"Generated timeline with {len(result_df)} trading day data points")
                 return result_df
             else:
@@ -1066,124 +1234,6 @@ class PortfolioAnalysisManager:
             logger.error(f"Traceback: {traceback.format_exc()}")
             return pd.DataFrame()
     
-    def _calculate_daily_values_trading_days(self, analysis_id: int, analysis_name: str, 
-                                          trading_days: List[date], transactions: List,
-                                          start_cash: float, price_df: pd.DataFrame) -> List[Dict]:
-        """Calculate daily portfolio values for trading days only"""
-        daily_results = []
-        
-        # Initialize positions and cash
-        positions = {}  # symbol -> quantity
-        current_cash = start_cash
-        processed_transactions = set()  # Track processed transactions to avoid double-processing
-        
-        for trading_day in trading_days:
-            # Apply any transactions that occurred exactly on this trading day (FIXED: was <= causing double processing)
-            for i, transaction in enumerate(transactions):
-                # Create unique transaction identifier
-                trans_id = f"{analysis_id}_{i}"
-                
-                # Skip if already processed
-                if trans_id in processed_transactions:
-                    continue
-                
-                # Handle both dict and tuple transaction data
-                if isinstance(transaction, dict):
-                    trans_date = transaction['transaction_date']
-                    symbol = transaction['symbol']
-                    trans_type = transaction['transaction_type']
-                    qty_change = transaction['quantity_change'] or 0
-                    cash_change = transaction['cash_change'] or 0
-                else:
-                    trans_date = transaction[5]  # transaction_date
-                    symbol = transaction[6]
-                    trans_type = transaction[7]
-                    qty_change = transaction[8] or 0
-                    cash_change = transaction[9] or 0
-                
-                # FIXED: Only process transactions that occur exactly on this trading day
-                if trans_date and trans_date == trading_day:
-                    if symbol and trans_type:
-                        # Update positions
-                        if symbol not in positions:
-                            positions[symbol] = 0
-                        positions[symbol] += qty_change
-                        
-                        # Update cash (handle Decimal type from database)
-                        current_cash = float(current_cash) + float(cash_change or 0)
-                        
-                        # Mark transaction as processed
-                        processed_transactions.add(trans_id)
-            
-            # Calculate equity value using market prices
-            equity_value = 0.0
-            transaction_details = []
-            
-            # Get market prices for this trading day
-            day_prices = price_df[price_df['date'].dt.date == trading_day] if not price_df.empty else pd.DataFrame()
-            
-            for symbol, quantity in positions.items():
-                if quantity == 0:
-                    continue
-                
-                # Get price for this symbol on this date
-                symbol_prices = day_prices[day_prices['symbol'] == symbol]
-                if not symbol_prices.empty:
-                    price = float(symbol_prices.iloc[0]['close_price'])
-                    equity_value += quantity * price
-                else:
-                    # FIXED: Use intelligent fallback - get best available price
-                    all_symbol_prices = price_df[price_df['symbol'] == symbol]
-                    if not all_symbol_prices.empty:
-                        # First try: Get latest price before or on this date (backward fill)
-                        before_date = all_symbol_prices[all_symbol_prices['date'].dt.date <= trading_day]
-                        if not before_date.empty:
-                            price = float(before_date.iloc[-1]['close_price'])
-                            equity_value += quantity * price
-                        else:
-                            # Second try: Get earliest price after this date (forward fill)
-                            # This handles cases where we only have current/future price data
-                            after_date = all_symbol_prices[all_symbol_prices['date'].dt.date >= trading_day]
-                            if not after_date.empty:
-                                price = float(after_date.iloc[0]['close_price'])
-                                equity_value += quantity * price
-            
-            # Check for transactions on this exact date for hover details
-            day_transactions = []
-            for t in transactions:
-                if isinstance(t, dict):
-                    if t['transaction_date'] == trading_day:
-                        day_transactions.append(t)
-                else:
-                    if t[5] == trading_day:  # transaction_date
-                        day_transactions.append(t)
-            
-            if day_transactions:
-                trans_details = []
-                for t in day_transactions:
-                    if isinstance(t, dict):
-                        if t['symbol'] and t['transaction_type']:
-                            trans_details.append(f"{t['transaction_type']} {t['symbol']} ({t['quantity_change']})")
-                    else:
-                        if t[6] and t[7]:  # symbol and transaction_type exist
-                            trans_details.append(f"{t[7]} {t[6]} ({t[8]})")
-                if trans_details:
-                    transaction_details = '; '.join(trans_details)
-            
-            # Add daily result (ensure all values are float for consistency)
-            total_value = float(current_cash) + equity_value
-            daily_results.append({
-                'analysis_id': analysis_id,
-                'analysis_name': analysis_name,
-                'date': trading_day,
-                'total_value': total_value,
-                'cash_position': float(current_cash),
-                'equity_value': equity_value,
-                'transaction_details': '; '.join(transaction_details) if transaction_details else None
-            })
-        
-        return daily_results
-    
     def _calculate_timeline_with_market_prices_old(self, cur, analysis_ids: List[int], 
                                                  price_df: pd.DataFrame, metadata_results) -> pd.DataFrame:
         """OLD VERSION - Calculate timeline data using real market prices (INCLUDES WEEKENDS - PROBLEMATIC)"""
@@ -1737,94 +1787,90 @@ class PortfolioAnalysisManager:
             # First try: Get data from local database
             db_results = self._get_database_price_data(formatted_symbols, start_date, end_date)
             
+            # Plan the exact missing trading-day ranges per symbol
+            existing_dates = {}
             if not db_results.empty:
-                # Check if we have complete data for all symbols
-                missing_symbols = []
-                for symbol in formatted_symbols:
-                    symbol_data = db_results[db_results['symbol'] == symbol]
-                    if symbol_data.empty:
-                        missing_symbols.append(symbol)
-                        logger.info(f"No database data found for {symbol}")
-                
-                if not missing_symbols:
-                    logger.info(f"Successfully retrieved complete data from database for all {len(formatted_symbols)} symbols")
-                    return db_results
-                else:
-                    logger.info(f"Database has partial data, missing {len(missing_symbols)} symbols: {missing_symbols}")
-                    # Continue to Yahoo Finance for missing symbols
-                    formatted_symbols = missing_symbols
-            else:
-                logger.info("No data found in database, falling back to Yahoo Finance")
+                for symbol, group in db_results.groupby('symbol'):
+                    existing_dates[symbol] = set(pd.to_datetime(group['date']).dt.date)
             
-            # Second try: Fetch missing data using yfinance bulk download (more efficient)
-            try:
-                # Add buffer dates to ensure we have data for weekends/holidays
-                buffer_start = start_date - timedelta(days=5)
-                buffer_end = end_date + timedelta(days=2)
-                
-                price_data = yf.download(
-                    formatted_symbols,
-                    start=buffer_start,
-                    end=buffer_end,
-                    progress=False,
-                    threads=True
-                )
-                
-                if price_data.empty:
-                    logger.warning("No price data returned from Yahoo Finance")
-                    return self._get_fallback_price_data(symbols, start_date, end_date)
-                
-                # Process the multi-level columns from yfinance
-                results = []
-                
-                if len(formatted_symbols) == 1:
-                    # Single symbol - simpler structure
-                    symbol = formatted_symbols[0]
-                    if 'Close' in price_data.columns:
-                        close_prices = price_data['Close'].dropna()
-                        for date_idx, price in close_prices.items():
-                            results.append({
-                                'symbol': symbol,
-                                'date': date_idx.date(),
-                                'close_price': float(price)
-                            })
-                else:
-                    # Multiple symbols - multi-level columns
-                    if 'Close' in price_data.columns:
-                        close_data = price_data['Close']
-                        for symbol in formatted_symbols:
-                            if symbol in close_data.columns:
-                                symbol_prices = close_data[symbol].dropna()
-                                for date_idx, price in symbol_prices.items():
-                                    results.append({
-                                        'symbol': symbol,
-                                        'date': date_idx.date(),
-                                        'close_price': float(price)
-                                    })
-                
-                if not results:
-                    logger.warning("No valid price data extracted")
-                    return self._get_fallback_price_data(symbols, start_date, end_date)
-                
-                # Create DataFrame and filter to requested date range
-                df = pd.DataFrame(results)
-                df['date'] = pd.to_datetime(df['date'])
-                df = df[(df['date'].dt.date >= start_date) & (df['date'].dt.date <= end_date)]
-                
-                # Fill missing dates using forward fill for each symbol
-                df = self._fill_missing_price_dates(df, start_date, end_date)
-                
-                logger.info(f"Successfully fetched price data: {len(df)} records for {len(df['symbol'].unique())} symbols")
-                return df
-                
-            except Exception as yf_error:
-                logger.warning(f"Yahoo Finance bulk download failed: {yf_error}")
-                return self._fetch_prices_individually(formatted_symbols, start_date, end_date)
+            plan = plan_missing_ranges(existing_dates, formatted_symbols, start_date, end_date)
+            logger.info(f"Price fetch plan: {plan.summary()}")
+            
+            if plan.is_complete:
+                logger.info(f"Successfully retrieved complete data from database for all {len(formatted_symbols)} symbols")
+                return db_results
+            
+            # Second try: Fetch only the missing ranges from the market data provider
+            fetched = self._fetch_planned_ranges(plan)
+            
+            frames = [frame for frame in (db_results, fetched) if not frame.empty]
+            if not frames:
+                logger.warning("No price data available from database or market data provider")
+                return self._get_fallback_price_data(symbols, start_date, end_date)
+            
+            df = pd.concat(frames, ignore_index=True)
+            df['date'] = pd.to_datetime(df['date'])
+            df = df.drop_duplicates(subset=['symbol', 'date'], keep='first')
+            df = df[(df['date'].dt.date >= start_date) & (df['date'].dt.date <= end_date)]
+            
+            # Fill missing dates using forward fill for each symbol
+            df = self._fill_missing_price_dates(df, start_date, end_date)
+            
+            logger.info(f"Successfully fetched price data: {len(df)} records for {len(df['symbol'].unique())} symbols")
+            return df
                 
         except Exception as e:
             logger.error(f"Error fetching bulk historical prices: {e}")
             return self._get_fallback_price_data(symbols, start_date, end_date)
     
+    def _fetch_planned_ranges(self, plan: FetchPlan) -> pd.DataFrame:
+        """
+        Fetch the missing ranges of a FetchPlan from the market data provider
+        
+        Symbols sharing the same missing range (typically symbols with no stored
+        data at all) are requested together in one batched history call.
+        
+        Args:
+            plan: FetchPlan from plan_missing_ranges
+            
+        Returns:
+            DataFrame with columns: symbol, date, close_price (missing days only)
+        """
+        groups: Dict[Tuple[date, date], List[FetchRange]] = {}
+        for fetch_range in plan.ranges:
+            groups.setdefault((fetch_range.start_date, fetch_range.end_date), []).append(fetch_range)
+        
+        frames = []
+        for (range_start, range_end), group_ranges in groups.items():
+            group_symbols = [fetch_range.symbol for fetch_range in group_ranges]
+            try:
+                result = self.market_data.history_result(group_symbols, range_start, range_end)
+                history = result.bars
+                fetched_dates = {symbol: list(group['Date']) for symbol, group in history.groupby('symbol')}
+                record_empty_ranges(group_ranges, fetched_dates, failed_symbols=result.failed)
+                if result.failed:
+                    logger.warning(f"Price fetch failed for {sorted(result.failed)} ({range_start} to {range_end})")
+                
+                if history.empty:
+                    logger.warning(f"No price data returned for {group_symbols} ({range_start} to {range_end})")
+                    continue
+                
+                frames.append(pd.DataFrame({
+                    'symbol': history['symbol'],
+                    'date': history['Date'],
+                    'close_price': history['Close'].astype(float)
+                }))
+                    
+            except Exception as e:
+                logger.warning(f"Batched price fetch failed: {e}")
+                individual = self._fetch_prices_individually(group_symbols, range_start, range_end)
+                if not individual.empty:
+                    frames.append(individual)
+        
+        if not frames:
+            return pd.DataFrame(columns=['symbol', 'date', 'close_price'])
+        return pd.concat(frames, ignore_index=True)
+    
     def _fetch_prices_individually(self, symbols: List[str], start_date: date, end_date: date) -> pd.DataFrame:
         """Fallback method to fetch prices one symbol at a time"""
         results = []
@@ -1832,18 +1878,15 @@ class PortfolioAnalysisManager:
         for symbol in symbols:
             try:
                 logger.info(f"Fetching individual price data for {symbol}")
-                stock = yf.Ticker(symbol)
-                hist = stock.history(start=start_date - timedelta(days=5), end=end_date + timedelta(days=2))
-                
-                if not hist.empty:
-                    close_prices = hist['Close'].dropna()
-                    for date_idx, price in close_prices.items():
-                        if start_date <= date_idx.date() <= end_date:
-                            results.append({
-                                'symbol': symbol,
-                                'date': date_idx.date(),
-                                'close_price': float(price)
-                            })
+                hist = self.market_data.history([symbol], start_date - timedelta(days=5), end_date + timedelta(days=2))
+                
+                for price_date, price in zip(hist['Date'], hist['Close']):
+                    if start_date <= price_date <= end_date and pd.notna(price):
+                        results.append({
+                            'symbol': symbol,
+                            'date': price_date,
+                            'close_price': float(price)
+                        })
                 
             except Exception as e:
                 logger.warning(f"Failed to fetch individual data for {symbol}: {e}")
@@ -1857,71 +1900,33 @@ class PortfolioAnalysisManager:
         return df
     
     def _fill_missing_price_dates(self, df: pd.DataFrame, start_date: date, end_date: date) -> pd.DataFrame:
-        """Fill missing dates for each symbol using forward fill"""
+        """Forward fill each symbol onto every HKEX trading day in the range (no backward fill)"""
         if df.empty:
             return df
         
-        filled_results = []
-        
-        for symbol in df['symbol'].unique():
-            symbol_data = df[df['symbol'] == symbol].copy()
-            symbol_data = symbol_data.sort_values('date')
-            
-            # Create complete date range
-            date_range = pd.date_range(start=start_date, end=end_date, freq='D')
-            
-            # Reindex to include all dates
-            symbol_data.set_index('date', inplace=True)
-            symbol_data = symbol_data.reindex(date_range, method='ffill')  # Forward fill
-            
-            # Reset index and add back to results
-            symbol_data.reset_index(inplace=True)
-            symbol_data['date'] = symbol_data['index']
-            symbol_data['symbol'] = symbol
-            symbol_data = symbol_data[['symbol', 'date', 'close_price']].dropna()
-            
-            filled_results.append(symbol_data)
-        
-        if filled_results:
-            result_df = pd.concat(filled_results, ignore_index=True)
-            result_df['date'] = pd.to_datetime(result_df['date'])
-            return result_df
+        trading_days = get_hkex_trading_days(start_date, end_date)
+        if not trading_days:
+            return pd.DataFrame(columns=['symbol', 'date', 'close_price'])
         
-        return pd.DataFrame(columns=['symbol', 'date', 'close_price'])
+        price_index = PriceIndex.from_frame(df, keep='first')
+        return price_index.to_frame(trading_days, fill=FILL_FORWARD, symbols=list(df['symbol'].unique()))
     
     def _get_database_price_data(self, symbols: List[str], start_date: date, end_date: date) -> pd.DataFrame:
-        """Get price data from local database"""
+        """Get price data from local database (through the local columnar price cache)"""
         try:
-            conn = self.get_connection()
+            frame = self.price_cache.read(symbols, start_date, end_date, columns=['close_price'])
             
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                # Query the database for price data
-                cur.execute("""
-                    SELECT symbol, trade_date as date, close_price
-                    FROM daily_equity_technicals 
-                    WHERE symbol = ANY(%s) 
-                    AND trade_date BETWEEN %s AND %s
-                    ORDER BY symbol, trade_date
-                """, (symbols, start_date, end_date))
-                
-                results = cur.fetchall()
-                
-                if results:
-                    # Convert to DataFrame
-                    df = pd.DataFrame(results)
-                    df['date'] = pd.to_datetime(df['date'])
-                    logger.info(f"Retrieved {len(results)} records from database for {len(set(r['symbol'] for r in results))} symbols")
-                    return df
-                else:
-                    logger.info("No price data found in database")
-                    return pd.DataFrame(columns=['symbol', 'date', 'close_price'])
+            if not frame.empty:
+                df = frame.rename(columns={'trade_date': 'date'})
+                logger.info(f"Retrieved {len(df)} records from database for {df['symbol'].nunique()} symbols")
+                return df
+            else:
+                logger.info("No price data found in database")
+                return pd.DataFrame(columns=['symbol', 'date', 'close_price'])
                     
         except Exception as e:
             logger.warning(f"Error querying database for price data: {e}")
             return pd.DataFrame(columns=['symbol', 'date', 'close_price'])
-        finally:
-            if 'conn' in locals():
-                conn.close()
 
     def _get_fallback_price_data(self, symbols: List[str], start_date: date, end_date: date) -> pd.DataFrame:
         """Generate fallback price data, first trying database with expanded date range"""
@@ -7,18 +7,40 @@ and attribution analysis for HKEX portfolio tracking.
 
 import pandas as pd
 import numpy as np
-import yfinance as yf
 from datetime import datetime, date, timedelta
 from typing import Dict, List, Tuple, Optional, Any
 import logging
 import json
 from dataclasses import dataclass
+from psycopg2.extras import execute_values
 
 try:
     from .hkex_calendar import hkex_calendar, get_hkex_trading_days
 except ImportError:
     from hkex_calendar import hkex_calendar, get_hkex_trading_days
 
+try:
+    from .market_data import get_market_data_provider, empty_history
+except ImportError:
+    from market_data import get_market_data_provider, empty_history
+
+try:
+    from .price_index import PriceIndex, FILL_FORWARD
+except ImportError:
+    from price_index import PriceIndex, FILL_FORWARD
+
+try:
+    from .fetch_planner import FetchPlan, plan_missing_ranges, record_empty_ranges
+    from .price_cache import get_price_cache
+except ImportError:
+    from fetch_planner import FetchPlan, plan_missing_ranges, record_empty_ranges
+    from price_cache import get_price_cache
+
+try:
+    from .incremental_indicators import INDICATOR_STATE_TABLE_SQL
+except ImportError:
+    from incremental_indicators import INDICATOR_STATE_TABLE_SQL
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -46,6 +68,103 @@ class DailyContribution:
     price_change_pct: float  # Price change percentage
     position_value: float  # Total position value
 
+TOP_CONTRIBUTORS = 3
+
+CONTRIBUTOR_COLUMNS = [
+    'trade_date', 'rank', 'symbol', 'contribution', 'contribution_pct',
+    'price_change', 'price_change_pct', 'position_value'
+]
+
+# Fields of each top_contributors entry (JSON stored in portfolio_value_history)
+_CONTRIBUTOR_FIELDS = CONTRIBUTOR_COLUMNS[2:]
+
+
+def calculate_daily_contributions(trading_days: List[date], symbols: List[str], prices: np.ndarray,
+                                  quantities: np.ndarray, daily_change: np.ndarray,
+                                  top_k: int = TOP_CONTRIBUTORS) -> pd.DataFrame:
+    """
+    Top contributors to each day's portfolio change, computed for all days at once.
+    
+    Position values are quantity x price; their day-over-day diff is each
+    symbol's contribution (symbols without a close on both days are skipped).
+    The top_k by absolute contribution are picked per day with argpartition.
+    
+    Args:
+        trading_days: Days forming the matrix rows
+        symbols: Symbols forming the matrix columns
+        prices: Days x symbols close matrix (NaN where unresolved)
+        quantities: Quantity per symbol
+        daily_change: Day-over-day change of total portfolio value per day
+        top_k: Contributors kept per day
+    
+    Returns:
+        Long DataFrame with CONTRIBUTOR_COLUMNS, ordered by trade_date and rank
+    """
+    n_days, n_symbols = prices.shape if prices.ndim == 2 else (len(trading_days), 0)
+    if n_days < 2 or n_symbols == 0 or top_k <= 0:
+        return pd.DataFrame(columns=CONTRIBUTOR_COLUMNS)
+    
+    values = prices * quantities
+    previous_prices = prices[:-1]
+    contribution = values[1:] - values[:-1]
+    price_change = prices[1:] - previous_prices
+    total_change = np.asarray(daily_change, dtype=float)[1:, None]
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        contribution_pct = np.where(total_change != 0, contribution / total_change * 100, 0.0)
+        price_change_pct = np.where(previous_prices != 0, price_change / previous_prices * 100, 0.0)
+    
+    # Top k columns per day by |contribution|, ties kept in symbol order
+    magnitude = np.where(np.isnan(contribution), -np.inf, np.abs(contribution))
+    k = min(top_k, n_symbols)
+    if k < n_symbols:
+        top = np.argpartition(-magnitude, k - 1, axis=1)[:, :k]
+    else:
+        top = np.broadcast_to(np.arange(n_symbols), (n_days - 1, n_symbols))
+    order = np.lexsort((top, -np.take_along_axis(magnitude, top, axis=1)))
+    top = np.take_along_axis(top, order, axis=1)
+    
+    rows = np.repeat(np.arange(n_days - 1), k)
+    cols = top.ravel()
+    valid = np.isfinite(magnitude[rows, cols])
+    rows, cols = rows[valid], cols[valid]
+    
+    return pd.DataFrame({
+        'trade_date': np.array(trading_days, dtype=object)[rows + 1],
+        'rank': np.tile(np.arange(1, k + 1), n_days - 1)[valid],
+        'symbol': np.array(symbols, dtype=object)[cols],
+        'contribution': contribution[rows, cols],
+        'contribution_pct': contribution_pct[rows, cols],
+        'price_change': price_change[rows, cols],
+        'price_change_pct': price_change_pct[rows, cols],
+        'position_value': values[1:][rows, cols],
+    }, columns=CONTRIBUTOR_COLUMNS)
+
+
+def contributors_by_day(contributors: pd.DataFrame, trading_days: List[date]) -> List[List[Dict]]:
+    """
+    Per-day lists of contributor dicts (the top_contributors format) from the long frame.
+    
+    Args:
+        contributors: Output of calculate_daily_contributions
+        trading_days: Days to emit a list for (days without contributors get [])
+    
+    Returns:
+        List aligned with trading_days
+    """
+    by_day: Dict[date, List[Dict]] = {day: [] for day in trading_days}
+    if contributors.empty:
+        return list(by_day.values())
+    
+    columns = [contributors[field].tolist() for field in _CONTRIBUTOR_FIELDS]
+    for day, *fields in zip(contributors['trade_date'], *columns):
+        entry = dict(zip(_CONTRIBUTOR_FIELDS, fields))
+        for field in _CONTRIBUTOR_FIELDS[1:]:
+            entry[field] = float(entry[field])
+        by_day[day].append(entry)
+    return list(by_day.values())
+
+
 class PortfolioCalculator:
     """
     Portfolio Value Calculator with historical analysis capabilities.
@@ -54,12 +173,23 @@ class PortfolioCalculator:
     analysis for HKEX portfolio tracking over specified time periods.
     """
     
-    def __init__(self):
+    def __init__(self, market_data=None, db=None):
+        """
+        Args:
+            market_data: MarketDataProvider for historical prices (defaults to the process-wide provider)
+            db: DatabaseManager for DB-first price lookups and write-back (network only when omitted)
+        """
         self.risk_free_rate = 0.025  # 2.5% risk-free rate for Sharpe ratio
+        self.market_data = market_data or get_market_data_provider()
+        self.db = db
     
-    def fetch_historical_prices(self, symbols: List[str], start_date: date, end_date: date) -> Dict[str, pd.DataFrame]:
+    def fetch_historical_prices(self, symbols: List[str], start_date: date, end_date: date) -> PriceIndex:
         """
-        Fetch historical price data for multiple symbols.
+        Fetch historical closes for multiple symbols, database first.
+        
+        Stored closes are read from daily_equity_technicals; only the missing
+        trading-day ranges are downloaded, in one batched request for all
+        symbols with gaps, and written back so the next analysis is local.
         
         Args:
             symbols: List of stock symbols
@@ -67,46 +197,107 @@ class PortfolioCalculator:
             end_date: Data end date
             
         Returns:
-            Dictionary mapping symbol to price DataFrame
+            PriceIndex over the closes of every symbol with data
         """
-        price_data = {}
+        symbols = list(dict.fromkeys(symbols))
+        stored = pd.DataFrame(columns=['symbol', 'date', 'close_price'])
+        plan = plan_missing_ranges({}, symbols, start_date, end_date, today=end_date + timedelta(days=1))
         
-        for symbol in symbols:
+        if self.db is not None:
             try:
-                ticker = yf.Ticker(symbol)
-                
-                # Convert dates to pandas datetime for yfinance
-                start_str = start_date.strftime('%Y-%m-%d')
-                end_str = (end_date + timedelta(days=1)).strftime('%Y-%m-%d')  # Include end date
-                
-                # Fetch data with some buffer
-                hist = ticker.history(start=start_str, end=end_str, auto_adjust=False, actions=False)
-                
-                if hist.empty:
-                    logger.warning(f"No historical data found for {symbol}")
-                    continue
-                
-                # Reset index to get Date as column
-                hist = hist.reset_index()
-                hist['Date'] = pd.to_datetime(hist['Date']).dt.date
-                
-                # Sort by date
-                hist = hist.sort_values('Date')
-                
-                price_data[symbol] = hist
-                
-                logger.info(f"Fetched {len(hist)} days of data for {symbol}")
-                
+                stored = get_price_cache(self.db).read(symbols, start_date, end_date, columns=['close_price'])
+                stored['date'] = stored['trade_date'].dt.date
+                existing = {symbol: group['date'].tolist() for symbol, group in stored.groupby('symbol')}
+                plan = plan_missing_ranges(existing, symbols, start_date, end_date)
+                logger.info(f"Historical price plan: {plan.summary()}")
             except Exception as e:
-                logger.error(f"Error fetching data for {symbol}: {e}")
-                continue
+                logger.warning(f"Database price lookup failed, downloading everything: {e}")
+        
+        fetched = self._download_missing(plan)
+        if self.db is not None and not fetched.empty:
+            self._store_downloaded_bars(fetched, plan)
+        
+        frames = [
+            frame for frame in (
+                stored[['symbol', 'date', 'close_price']],
+                fetched.rename(columns={'Date': 'date', 'Close': 'close_price'})[['symbol', 'date', 'close_price']],
+            )
+            if not frame.empty
+        ]
+        closes = pd.concat(frames, ignore_index=True) if frames else stored[['symbol', 'date', 'close_price']]
+        price_index = PriceIndex.from_frame(closes, keep='first')
+        
+        for symbol in symbols:
+            if symbol in price_index:
+                logger.info(f"Using {len(price_index.dates(symbol))} days of data for {symbol}")
+            else:
+                logger.warning(f"No historical data found for {symbol}")
+        
+        return price_index
+    
+    def _download_missing(self, plan: FetchPlan) -> pd.DataFrame:
+        """One batched download spanning every planned range, for the symbols with gaps"""
+        if plan.is_complete:
+            return empty_history()
+        
+        window_start = min(r.start_date for r in plan.ranges)
+        window_end = max(r.end_date for r in plan.ranges)
+        try:
+            result = self.market_data.history_result(plan.symbols_to_fetch, window_start, window_end, adjusted=True)
+            if result.failed:
+                logger.warning(f"Historical download failed for {sorted(result.failed)}")
+            record_empty_ranges(plan.ranges, {symbol: list(group['Date']) for symbol, group in result.bars.groupby('symbol')},
+                                failed_symbols=result.failed)
+            return result.bars
+        except Exception as e:
+            logger.error(f"Error fetching historical data for {plan.symbols_to_fetch}: {e}")
+            return empty_history()
+    
+    def _store_downloaded_bars(self, bars: pd.DataFrame, plan: FetchPlan):
+        """
+        Insert downloaded OHLCV bars that fall in the planned gaps (existing rows are left alone).
         
-        return price_data
+        The new rows carry no indicators, so the saved indicator state of every symbol that
+        gained rows is dropped: the next incremental populator run bootstraps those symbols
+        with a full recompute, which upserts indicators over the stored bars.
+        """
+        wanted = [
+            any(r.contains(d) for r in plan.ranges_for(symbol))
+            for symbol, d in zip(bars['symbol'], bars['Date'])
+        ]
+        bars = bars[wanted].dropna(subset=['Open', 'High', 'Low', 'Close'])
+        if bars.empty:
+            return
+        rows = [
+            (symbol, trade_date, float(o), float(c), float(h), float(l),
+             int(v) if pd.notna(v) else 0, float(h), float(l))
+            for symbol, trade_date, o, h, l, c, v in zip(
+                bars['symbol'], bars['Date'], bars['Open'], bars['High'], bars['Low'], bars['Close'], bars['Volume'])
+        ]
+        try:
+            with self.db.connection() as conn:
+                with conn.cursor() as cur:
+                    inserted = execute_values(cur, """
+                        INSERT INTO daily_equity_technicals
+                        (symbol, trade_date, open_price, close_price, high_price, low_price,
+                         volume, day_high, day_low)
+                        VALUES %s
+                        ON CONFLICT (symbol, trade_date) DO NOTHING
+                        RETURNING symbol
+                    """, rows, fetch=True)
+                    stale = sorted({row[0] for row in inserted})
+                    if stale:
+                        cur.execute(INDICATOR_STATE_TABLE_SQL)
+                        cur.execute("DELETE FROM equity_indicator_state WHERE symbol = ANY(%s)", (stale,))
+            logger.info(f"Stored {len(inserted)} downloaded bars for {len(stale)} symbols "
+                        f"(indicator state reset for recompute)")
+        except Exception as e:
+            logger.warning(f"Could not store downloaded bars: {e}")
     
     def calculate_daily_portfolio_values(
         self, 
         positions: Dict[str, int],  # symbol -> quantity
-        price_data: Dict[str, pd.DataFrame],
+        price_data,
         start_date: date,
         end_date: date,
         cash_amount: float = 0.0
@@ -116,13 +307,15 @@ class PortfolioCalculator:
         
         Args:
             positions: Dictionary mapping symbol to quantity
-            price_data: Historical price data for all symbols
+            price_data: PriceIndex (or per-symbol frames with Date/Close columns)
             start_date: Analysis start date
             end_date: Analysis end date
             cash_amount: Cash component of portfolio
             
         Returns:
-            DataFrame with daily portfolio values and metrics
+            DataFrame with daily portfolio values and metrics; top_contributors holds
+            the top 3 contributors per day as dicts and attrs['contributors'] the same
+            rows as a long frame (see calculate_daily_contributions)
         """
         # Get all trading days in the analysis period
         trading_days = get_hkex_trading_days(start_date, end_date)
@@ -130,123 +323,40 @@ class PortfolioCalculator:
         if not trading_days:
             return pd.DataFrame()
         
-        # Initialize results list
-        daily_values = []
-        
-        for trade_date in trading_days:
-            portfolio_value = 0.0
-            position_values = {}
-            
-            # Calculate portfolio value for this date
-            for symbol, quantity in positions.items():
-                if quantity == 0:
-                    continue
-                    
-                if symbol not in price_data:
-                    logger.warning(f"No price data for {symbol} on {trade_date}")
-                    continue
-                
-                # Get price for this date (use closest available price)
-                symbol_data = price_data[symbol]
-                price = self._get_price_for_date(symbol_data, trade_date)
-                
-                if price is not None:
-                    position_value = quantity * price
-                    portfolio_value += position_value
-                    position_values[symbol] = {
-                        'price': price,
-                        'quantity': quantity,
-                        'value': position_value
-                    }
-            
-            total_value = portfolio_value + cash_amount
-            
-            daily_values.append({
-                'trade_date': trade_date,
-                'portfolio_value': portfolio_value,
-                'cash_value': cash_amount,
-                'total_value': total_value,
-                'position_values': position_values
-            })
-        
-        # Convert to DataFrame
-        df = pd.DataFrame(daily_values)
-        
-        if df.empty:
-            return df
+        # Resolve every held symbol's close on every trading day (latest close on or before it)
+        price_index = price_data if isinstance(price_data, PriceIndex) else PriceIndex.from_symbol_frames(price_data)
+        held = {symbol: quantity for symbol, quantity in positions.items() if quantity != 0}
+        for symbol in held:
+            if symbol not in price_index:
+                logger.warning(f"No price data for {symbol} between {start_date} and {end_date}")
+        symbols = [symbol for symbol in held if symbol in price_index]
+        
+        # Days x symbols price and value matrices (NaN before a symbol's first close)
+        prices = price_index.matrix(symbols, trading_days, fill=FILL_FORWARD)
+        quantities = np.array([held[symbol] for symbol in symbols], dtype=float)
+        values = prices * quantities
+        portfolio_value = np.nansum(values, axis=1) if symbols else np.zeros(len(trading_days))
+        
+        df = pd.DataFrame({
+            'trade_date': trading_days,
+            'portfolio_value': portfolio_value,
+            'cash_value': float(cash_amount),
+            'total_value': portfolio_value + cash_amount,
+        })
         
         # Calculate daily changes and returns
         df['daily_change'] = df['total_value'].diff()
         df['daily_return'] = df['total_value'].pct_change()
         
-        # Calculate attribution for each day
-        df['top_contributors'] = df.apply(
-            lambda row: self._calculate_daily_attribution(row, df, price_data), 
-            axis=1
+        # Attribution for all days at once; the long frame backs the per-day top_contributors lists
+        contributors = calculate_daily_contributions(
+            trading_days, symbols, prices, quantities, df['daily_change'].to_numpy()
         )
+        df['top_contributors'] = contributors_by_day(contributors, trading_days)
+        df.attrs['contributors'] = contributors
         
         return df
     
-    def _get_price_for_date(self, symbol_data: pd.DataFrame, target_date: date) -> Optional[float]:
-        """
-        Get the price for a symbol on a specific date.
-        Uses the closest available price if exact date not found.
-        """
-        # Filter data up to target date
-        available_data = symbol_data[symbol_data['Date'] <= target_date]
-        
-        if available_data.empty:
-            return None
-        
-        # Use the most recent available price
-        latest_row = available_data.iloc[-1]
-        return float(latest_row['Close'])
-    
-    def _calculate_daily_attribution(self, row: pd.Series, df: pd.DataFrame, price_data: Dict[str, pd.DataFrame]) -> List[Dict]:
-        """
-        Calculate top contributors to daily portfolio change.
-        
-        Returns:
-            List of top 3 contributors with detailed attribution
-        """
-        if row.name == 0:  # First day, no previous day for comparison
-            return []
-        
-        current_positions = row['position_values']
-        prev_row = df.iloc[row.name - 1]
-        prev_positions = prev_row['position_values']
-        
-        contributions = []
-        
-        for symbol in current_positions.keys():
-            if symbol not in prev_positions:
-                continue
-            
-            current = current_positions[symbol]
-            previous = prev_positions[symbol]
-            
-            # Calculate contribution to daily change
-            value_change = current['value'] - previous['value']
-            price_change = current['price'] - previous['price']
-            price_change_pct = (price_change / previous['price']) * 100 if previous['price'] != 0 else 0
-            
-            # Calculate contribution percentage (relative to total daily change)
-            total_change = row['daily_change']
-            contribution_pct = (value_change / total_change * 100) if total_change != 0 else 0
-            
-            contributions.append({
-                'symbol': symbol,
-                'contribution': float(value_change),
-                'contribution_pct': float(contribution_pct),
-                'price_change': float(price_change),
-                'price_change_pct': float(price_change_pct),
-                'position_value': float(current['value'])
-            })
-        
-        # Sort by absolute contribution and return top 3
-        contributions.sort(key=lambda x: abs(x['contribution']), reverse=True)
-        return contributions[:3]
-    
     def calculate_performance_metrics(self, daily_values_df: pd.DataFrame) -> PortfolioMetrics:
         """
         Calculate comprehensive performance metrics from daily values.
@@ -268,14 +378,14 @@ class PortfolioCalculator:
         total_return = end_value - start_value
         total_return_pct = (total_return / start_value * 100) if start_value != 0 else 0
         
-        # Calculate running maximum for drawdown
-        daily_values_df['cummax'] = daily_values_df['total_value'].cummax()
-        daily_values_df['drawdown'] = daily_values_df['total_value'] - daily_values_df['cummax']
-        daily_values_df['drawdown_pct'] = (daily_values_df['drawdown'] / daily_values_df['cummax'] * 100)
+        # Drawdown from the running maximum (without adding columns to the caller's frame)
+        total_values = daily_values_df['total_value']
+        running_max = total_values.cummax()
+        drawdown = total_values - running_max
         
         # Maximum drawdown
-        max_drawdown = float(daily_values_df['drawdown'].min())
-        max_drawdown_pct = float(daily_values_df['drawdown_pct'].min())
+        max_drawdown = float(drawdown.min())
+        max_drawdown_pct = float((drawdown / running_max * 100).min())
         
         # Volatility (annualized standard deviation of daily returns)
         daily_returns = daily_values_df['daily_return'].dropna()
@@ -352,10 +462,10 @@ class PortfolioCalculator:
         
         logger.info(f"Analyzing {len(symbols)} positions: {symbols}")
         
-        # Fetch historical price data
+        # Fetch historical closes (database first)
         price_data = self.fetch_historical_prices(symbols, data_start_date, end_date)
         
-        if not price_data:
+        if not len(price_data):
             raise ValueError("No price data available for analysis")
         
         # Calculate daily portfolio values
@@ -0,0 +1,235 @@
+"""
+Checkpointed Position Snapshots
+
+Cumulative positions and cash of a portfolio analysis at each transaction
+date, so as-of queries (date-slider scrubbing on the PV Analysis page) are a
+binary search instead of re-aggregating portfolio_analysis_state_changes:
+- Per symbol: cumulative quantity, bought quantity and bought cash at each
+  transaction date (the inputs of the weighted average cost)
+- Per analysis: cumulative cash change at each transaction date
+
+Snapshots live in a process-wide store. add_transaction appends to the
+cached snapshot directly; every read checks a (row count, max id) watermark
+of the analysis so changes made by other processes trigger a rebuild.
+"""
+
+import logging
+import threading
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _SymbolCheckpoints:
+    """Cumulative totals of one symbol after each of its transaction dates"""
+    dates: List[date] = field(default_factory=list)
+    quantity: List[float] = field(default_factory=list)
+    bought_quantity: List[float] = field(default_factory=list)
+    bought_cash: List[float] = field(default_factory=list)
+
+
+class AnalysisSnapshots:
+    """Cumulative position and cash checkpoints of one analysis"""
+
+    def __init__(self, analysis_id: int, analysis_name: str, start_date: date, end_date: date,
+                 start_cash: float, transactions: List[Tuple], watermark: Tuple[int, int]):
+        """
+        Args:
+            analysis_id: Analysis ID
+            analysis_name: Analysis name
+            start_date: Analysis start date
+            end_date: Analysis end date
+            start_cash: Starting cash
+            transactions: (id, transaction_date, symbol, quantity_change, cash_change) rows
+            watermark: (row count, max id) of the analysis' state changes
+        """
+        self.analysis_id = analysis_id
+        self.analysis_name = analysis_name
+        self.start_date = start_date
+        self.end_date = end_date
+        self.start_cash = float(start_cash or 0)
+        self.watermark = watermark
+        self._transactions = sorted(transactions, key=lambda t: (t[1], t[0]))
+        self._build()
+
+    def _build(self):
+        self._cash_dates: List[date] = []
+        self._cash: List[float] = []
+        self._symbols: Dict[str, _SymbolCheckpoints] = {}
+        for transaction in self._transactions:
+            self._checkpoint(*transaction[1:])
+
+    def _checkpoint(self, transaction_date: date, symbol: str, quantity_change, cash_change):
+        quantity_change = float(quantity_change or 0)
+        cash_change = float(cash_change or 0)
+
+        previous_cash = self._cash[-1] if self._cash else 0.0
+        if self._cash_dates and self._cash_dates[-1] == transaction_date:
+            self._cash[-1] = previous_cash + cash_change
+        else:
+            self._cash_dates.append(transaction_date)
+            self._cash.append(previous_cash + cash_change)
+
+        if not symbol:
+            return
+        points = self._symbols.setdefault(symbol, _SymbolCheckpoints())
+        quantity = points.quantity[-1] if points.dates else 0.0
+        bought_quantity = points.bought_quantity[-1] if points.dates else 0.0
+        bought_cash = points.bought_cash[-1] if points.dates else 0.0
+        if quantity_change > 0:
+            bought_quantity += quantity_change
+            bought_cash += cash_change
+
+        if points.dates and points.dates[-1] == transaction_date:
+            points.quantity[-1] = quantity + quantity_change
+            points.bought_quantity[-1] = bought_quantity
+            points.bought_cash[-1] = bought_cash
+        else:
+            points.dates.append(transaction_date)
+            points.quantity.append(quantity + quantity_change)
+            points.bought_quantity.append(bought_quantity)
+            points.bought_cash.append(bought_cash)
+
+    def append(self, transaction: Tuple):
+        """Add a newly inserted (id, transaction_date, symbol, quantity_change, cash_change) row"""
+        count, max_id = self.watermark
+        self.watermark = (count + 1, max(max_id, transaction[0]))
+        if self._transactions and transaction[1] < self._transactions[-1][1]:
+            # Back-dated transaction: later checkpoints shift, rebuild from the ordered rows
+            self._transactions.append(transaction)
+            self._transactions.sort(key=lambda t: (t[1], t[0]))
+            self._build()
+        else:
+            self._transactions.append(transaction)
+            self._checkpoint(*transaction[1:])
+
+    def cash_at(self, target_date: date) -> float:
+        """Start cash plus every cash change on or before target_date"""
+        position = bisect_right(self._cash_dates, target_date)
+        return self.start_cash + (self._cash[position - 1] if position else 0.0)
+
+    def positions_at(self, target_date: date) -> List[Dict]:
+        """
+        Open positions on target_date.
+
+        Returns:
+            List of dicts with symbol, current_quantity and avg_cost (weighted
+            average cost of purchases so far), sorted by symbol
+        """
+        positions = []
+        for symbol in sorted(self._symbols):
+            points = self._symbols[symbol]
+            position = bisect_right(points.dates, target_date)
+            if not position:
+                continue
+            quantity = points.quantity[position - 1]
+            if quantity <= 0:
+                continue
+            bought_quantity = points.bought_quantity[position - 1]
+            avg_cost = abs(points.bought_cash[position - 1] / bought_quantity) if bought_quantity > 0 else 0.0
+            positions.append({
+                'symbol': symbol,
+                'current_quantity': int(quantity) if float(quantity).is_integer() else quantity,
+                'avg_cost': avg_cost,
+            })
+        return positions
+
+
+class PositionSnapshotStore:
+    """Process-wide cache of AnalysisSnapshots validated by a row watermark"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshots: Dict[int, AnalysisSnapshots] = {}
+        self.stats = {'hits': 0, 'rebuilds': 0, 'appends': 0}
+
+    def get(self, cur, analysis_id: int) -> Optional[AnalysisSnapshots]:
+        """
+        Snapshots of an analysis, rebuilt only when its state changes moved on.
+
+        Args:
+            cur: Open (tuple) cursor
+            analysis_id: Analysis ID
+
+        Returns:
+            AnalysisSnapshots, or None when the analysis does not exist
+        """
+        cur.execute("""
+            SELECT pa.analysis_name, pa.start_date, pa.end_date, pa.start_cash,
+                   COUNT(sc.id), COALESCE(MAX(sc.id), 0)
+            FROM portfolio_analyses pa
+            LEFT JOIN portfolio_analysis_state_changes sc ON sc.analysis_id = pa.id
+            WHERE pa.id = %s
+            GROUP BY pa.id
+        """, (analysis_id,))
+        row = cur.fetchone()
+        if not row:
+            return None
+        analysis_name, start_date, end_date, start_cash, count, max_id = self._values(row)
+        watermark = (int(count), int(max_id))
+
+        with self._lock:
+            cached = self._snapshots.get(analysis_id)
+            if (cached is not None and cached.watermark == watermark
+                    and cached.start_cash == float(start_cash or 0)
+                    and (cached.start_date, cached.end_date) == (start_date, end_date)):
+                self.stats['hits'] += 1
+                return cached
+
+        cur.execute("""
+            SELECT id, transaction_date, symbol, quantity_change, cash_change
+            FROM portfolio_analysis_state_changes
+            WHERE analysis_id = %s
+            ORDER BY transaction_date, id
+        """, (analysis_id,))
+        transactions = [tuple(self._values(t)) for t in cur.fetchall()]
+
+        snapshots = AnalysisSnapshots(analysis_id, analysis_name, start_date, end_date,
+                                      start_cash, transactions, watermark)
+        with self._lock:
+            self._snapshots[analysis_id] = snapshots
+            self.stats['rebuilds'] += 1
+        return snapshots
+
+    def record_transaction(self, analysis_id: int, transaction_id: int, transaction_date: date,
+                           symbol: str, quantity_change, cash_change):
+        """Append a transaction just inserted by this process to the cached snapshots"""
+        with self._lock:
+            cached = self._snapshots.get(analysis_id)
+            if cached is None:
+                return
+            if transaction_id <= cached.watermark[1]:
+                # Out of order with what we cached: let the next read rebuild
+                self._snapshots.pop(analysis_id, None)
+                return
+            cached.append((transaction_id, transaction_date, symbol, quantity_change, cash_change))
+            self.stats['appends'] += 1
+
+    def invalidate(self, analysis_id: Optional[int] = None):
+        """Drop cached snapshots of one analysis (or all)"""
+        with self._lock:
+            if analysis_id is None:
+                self._snapshots.clear()
+            else:
+                self._snapshots.pop(analysis_id, None)
+
+    @staticmethod
+    def _values(row):
+        return list(row.values()) if isinstance(row, dict) else list(row)
+
+
+_store: Optional[PositionSnapshotStore] = None
+_store_lock = threading.Lock()
+
+
+def get_position_snapshot_store() -> PositionSnapshotStore:
+    """Process-wide PositionSnapshotStore"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PositionSnapshotStore()
+        return _store
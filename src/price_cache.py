@@ -0,0 +1,391 @@
+"""
+Local Columnar Price Cache
+
+Read-through cache in front of daily_equity_technicals:
+- One Arrow IPC file per symbol per month ({cache_dir}/{database}/{symbol}/{YYYY-MM}.arrow)
+- Files are memory-mapped and sliced by date range without copying
+- Months are invalidated by a (MAX(updated_at), COUNT(*)) watermark checked
+  with a single aggregate query, so only changed months are reloaded
+- updated_at is the writer's transaction start, not its commit, so a month is
+  only trusted once it was loaded PRICE_WATERMARK_SAFETY_SECONDS after its
+  watermark (the longest expected writer transaction); until then every read
+  reloads it, which picks up long writes that commit behind a later one
+
+pyarrow is optional; without it (or with PRICE_CACHE_ENABLED=false) reads go
+straight to the database and return the same frame.
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    PYARROW_AVAILABLE = True
+except ImportError:
+    pa = None
+    ipc = None
+    PYARROW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Numeric columns of daily_equity_technicals held in the cache (stored as float64)
+CACHE_COLUMNS = [
+    'open_price', 'close_price', 'high_price', 'low_price', 'volume',
+    'day_high', 'day_low', 'week_52_high', 'week_52_low',
+    'rsi_14', 'rsi_9', 'ema_12', 'ema_26', 'ema_50', 'sma_20', 'sma_50', 'sma_200',
+    'bollinger_upper', 'bollinger_middle', 'bollinger_lower',
+    'macd', 'macd_signal', 'macd_histogram', 'atr_14', 'volume_sma_20', 'volume_ratio',
+    'price_vs_52w_high', 'price_vs_52w_low', 'roc_1d', 'roc_5d', 'roc_20d',
+    'support_level', 'resistance_level',
+]
+
+# Longest expected daily_equity_technicals write transaction
+WATERMARK_SAFETY_WINDOW = timedelta(seconds=float(os.getenv('PRICE_WATERMARK_SAFETY_SECONDS', '900')))
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.price_cache')
+
+
+def _month_start(d: date) -> date:
+    return d.replace(day=1)
+
+
+def _month_end(d: date) -> date:
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return pd.Timestamp(value).date()
+
+
+class PriceCache:
+    """Memory-mapped Arrow cache of daily_equity_technicals rows"""
+
+    def __init__(self, db, cache_dir: Optional[str] = None, enabled: Optional[bool] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            db: Database manager providing connection()
+            cache_dir: Cache directory (defaults to PRICE_CACHE_DIR or ./.price_cache)
+            enabled: Force the cache on/off (defaults to PRICE_CACHE_ENABLED, on when pyarrow is installed)
+        """
+        self.db = db
+        self.cache_dir = cache_dir or os.getenv('PRICE_CACHE_DIR', DEFAULT_CACHE_DIR)
+        if enabled is None:
+            enabled = os.getenv('PRICE_CACHE_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+        self.enabled = bool(enabled) and PYARROW_AVAILABLE
+
+        self._lock = threading.RLock()
+        self._manifests: Dict[str, Dict[str, list]] = {}
+        self._tables: Dict[str, Tuple[int, object, np.ndarray]] = {}  # path -> (mtime_ns, table, day numbers)
+        self.stats = {
+            'reads': 0, 'months_hit': 0, 'months_refreshed': 0,
+            'db_rows_loaded': 0, 'database_reads': 0,
+        }
+
+        if enabled and not PYARROW_AVAILABLE:
+            logger.info("pyarrow not installed, price cache disabled")
+
+    # ------------------------------------------------------------------ public
+
+    def read(self, symbols: List[str], start_date: date, end_date: date,
+             columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Read rows for symbols between start_date and end_date (inclusive).
+
+        Args:
+            symbols: Stock symbols
+            start_date: First trade date
+            end_date: Last trade date
+            columns: Cached columns to return (defaults to close_price)
+
+        Returns:
+            DataFrame with symbol, trade_date (datetime64) and the requested
+            columns as float64, sorted by symbol and trade_date
+        """
+        columns = self._validate_columns(columns)
+        start_date, end_date = _as_date(start_date), _as_date(end_date)
+        symbols = list(dict.fromkeys(symbols))
+
+        if not symbols or start_date > end_date:
+            return self._empty_frame(columns)
+
+        if not self.enabled:
+            return self._read_database(symbols, start_date, end_date, columns)
+
+        try:
+            with self._lock:
+                self.stats['reads'] += 1
+                watermarks = self._load_watermarks(symbols, start_date, end_date)
+                stale = [key for key, mark in watermarks.items() if not self._is_fresh(key, mark)]
+                if stale:
+                    self._refresh(stale, watermarks)
+                self.stats['months_hit'] += len(watermarks) - len(stale)
+
+                return self._assemble(sorted(watermarks), start_date, end_date, columns)
+        except Exception as e:
+            logger.warning(f"Price cache read failed, querying database directly: {e}")
+            return self._read_database(symbols, start_date, end_date, columns)
+
+    def invalidate(self, symbol: Optional[str] = None):
+        """Drop cached months for one symbol (or everything)"""
+        with self._lock:
+            symbols = [symbol] if symbol else set(self._manifests) | set(self._cached_symbols())
+            for sym in symbols:
+                self._manifests.pop(sym, None)
+                manifest_path = self._manifest_path(sym)
+                if os.path.exists(manifest_path):
+                    os.remove(manifest_path)
+            self._tables.clear()
+
+    # ------------------------------------------------------------------ paths
+
+    def _symbol_dir(self, symbol: str) -> str:
+        return os.path.join(self.cache_dir, symbol.replace('/', '_'))
+
+    def _month_path(self, symbol: str, month: date) -> str:
+        return os.path.join(self._symbol_dir(symbol), f"{month:%Y-%m}.arrow")
+
+    def _manifest_path(self, symbol: str) -> str:
+        return os.path.join(self._symbol_dir(symbol), 'manifest.json')
+
+    def _cached_symbols(self) -> List[str]:
+        if not os.path.isdir(self.cache_dir):
+            return []
+        return [name for name in os.listdir(self.cache_dir) if os.path.isdir(os.path.join(self.cache_dir, name))]
+
+    # ------------------------------------------------------------ watermarks
+
+    def _manifest(self, symbol: str) -> Dict[str, list]:
+        manifest = self._manifests.get(symbol)
+        if manifest is None:
+            manifest = {}
+            path = self._manifest_path(symbol)
+            if os.path.exists(path):
+                try:
+                    with open(path) as f:
+                        manifest = json.load(f)
+                except (OSError, ValueError):
+                    manifest = {}
+            self._manifests[symbol] = manifest
+        return manifest
+
+    def _save_manifest(self, symbol: str):
+        path = self._manifest_path(symbol)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._manifests[symbol], f)
+        os.replace(tmp_path, path)
+
+    def _load_watermarks(self, symbols: List[str], start_date: date, end_date: date) -> Dict[Tuple[str, date], list]:
+        """
+        (symbol, month) -> [max updated_at, row count, settled] for every month touching the range.
+
+        settled means the check ran at least WATERMARK_SAFETY_WINDOW after the
+        watermark, so every write stamped at or before it has committed.
+        """
+        with self.db.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT symbol, date_trunc('month', trade_date)::date AS month,
+                           MAX(updated_at), COUNT(*), LOCALTIMESTAMP
+                    FROM daily_equity_technicals
+                    WHERE symbol = ANY(%s)
+                      AND trade_date BETWEEN %s AND %s
+                    GROUP BY 1, 2
+                """, (symbols, _month_start(start_date), _month_end(end_date)))
+                rows = cur.fetchall()
+
+        return {
+            (symbol, _as_date(month)): [
+                updated_at.isoformat() if updated_at else None, int(count),
+                updated_at is None or checked_at - updated_at >= WATERMARK_SAFETY_WINDOW,
+            ]
+            for symbol, month, updated_at, count, checked_at in rows
+        }
+
+    def _is_fresh(self, key: Tuple[str, date], mark: list) -> bool:
+        """Cached month matches the watermark and was loaded after its writes settled"""
+        symbol, month = key
+        cached = self._manifest(symbol).get(f"{month:%Y-%m}")
+        return (cached is not None and len(cached) == 3 and cached[2]
+                and cached[:2] == mark[:2]
+                and os.path.exists(self._month_path(symbol, month)))
+
+    # --------------------------------------------------------------- refresh
+
+    def _refresh(self, stale: List[Tuple[str, date]], watermarks: Dict[Tuple[str, date], list]):
+        """Reload stale months from the database with one query and rewrite their files"""
+        stale_set = set(stale)
+        symbols = sorted({symbol for symbol, _ in stale})
+        first = min(month for _, month in stale)
+        last = _month_end(max(month for _, month in stale))
+
+        column_sql = ', '.join(CACHE_COLUMNS)
+        with self.db.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    SELECT symbol, trade_date, {column_sql}
+                    FROM daily_equity_technicals
+                    WHERE symbol = ANY(%s)
+                      AND trade_date BETWEEN %s AND %s
+                    ORDER BY symbol, trade_date
+                """, (symbols, first, last))
+                rows = cur.fetchall()
+
+        self.stats['db_rows_loaded'] += len(rows)
+        frame = pd.DataFrame.from_records(rows, columns=['symbol', 'trade_date'] + CACHE_COLUMNS)
+        frame['trade_date'] = pd.to_datetime(frame['trade_date'])
+        for column in CACHE_COLUMNS:
+            frame[column] = pd.to_numeric(frame[column], errors='coerce').astype('float64')
+        frame['month'] = frame['trade_date'].dt.to_period('M').dt.start_time.dt.date
+
+        touched = set()
+        for (symbol, month), group in frame.groupby(['symbol', 'month'], sort=False):
+            if (symbol, month) not in stale_set:
+                continue
+            self._write_month(symbol, month, group.drop(columns=['symbol', 'month']))
+            self._manifest(symbol)[f"{month:%Y-%m}"] = watermarks[(symbol, month)]
+            touched.add(symbol)
+            self.stats['months_refreshed'] += 1
+
+        for symbol in touched:
+            self._save_manifest(symbol)
+
+    def _write_month(self, symbol: str, month: date, frame: pd.DataFrame):
+        os.makedirs(self._symbol_dir(symbol), exist_ok=True)
+        table = pa.Table.from_pandas(frame.reset_index(drop=True), preserve_index=False)
+        table = table.set_column(0, 'trade_date', table.column('trade_date').cast(pa.date32()))
+
+        path = self._month_path(symbol, month)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+        self._tables.pop(path, None)
+
+    # ------------------------------------------------------------------ read
+
+    def _open_month(self, path: str):
+        """Memory-map a month file (kept open while unchanged on disk)"""
+        mtime = os.stat(path).st_mtime_ns
+        cached = self._tables.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1], cached[2]
+
+        table = ipc.open_file(pa.memory_map(path, 'r')).read_all()
+        days = table.column('trade_date').cast(pa.int32()).to_numpy()
+        self._tables[path] = (mtime, table, days)
+        return table, days
+
+    def _assemble(self, keys: List[Tuple[str, date]], start_date: date, end_date: date,
+                  columns: List[str]) -> pd.DataFrame:
+        epoch = date(1970, 1, 1)
+        lo_day, hi_day = (start_date - epoch).days, (end_date - epoch).days
+
+        slices, slice_symbols, lengths = [], [], []
+        for symbol, month in keys:
+            table, days = self._open_month(self._month_path(symbol, month))
+            lo = int(np.searchsorted(days, lo_day, side='left'))
+            hi = int(np.searchsorted(days, hi_day, side='right'))
+            if hi > lo:
+                slices.append(table.slice(lo, hi - lo).select(['trade_date'] + columns))
+                slice_symbols.append(symbol)
+                lengths.append(hi - lo)
+
+        if not slices:
+            return self._empty_frame(columns)
+
+        frame = pa.concat_tables(slices).to_pandas(date_as_object=False)
+        frame.insert(0, 'symbol', np.repeat(np.array(slice_symbols, dtype=object), lengths))
+        frame['trade_date'] = pd.to_datetime(frame['trade_date'])
+        return frame
+
+    def _read_database(self, symbols: List[str], start_date: date, end_date: date,
+                       columns: List[str]) -> pd.DataFrame:
+        """Uncached read with the same output shape as read()"""
+        self.stats['database_reads'] += 1
+        with self.db.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    SELECT symbol, trade_date, {', '.join(columns)}
+                    FROM daily_equity_technicals
+                    WHERE symbol = ANY(%s)
+                      AND trade_date BETWEEN %s AND %s
+                    ORDER BY symbol, trade_date
+                """, (symbols, start_date, end_date))
+                rows = cur.fetchall()
+
+        if not rows:
+            return self._empty_frame(columns)
+        frame = pd.DataFrame.from_records(rows, columns=['symbol', 'trade_date'] + columns)
+        frame['trade_date'] = pd.to_datetime(frame['trade_date'])
+        for column in columns:
+            frame[column] = pd.to_numeric(frame[column], errors='coerce').astype('float64')
+        return frame
+
+    @staticmethod
+    def _validate_columns(columns: Optional[List[str]]) -> List[str]:
+        columns = list(columns) if columns else ['close_price']
+        unknown = [column for column in columns if column not in CACHE_COLUMNS]
+        if unknown:
+            raise ValueError(f"Columns not available in price cache: {unknown}")
+        return columns
+
+    @staticmethod
+    def _empty_frame(columns: List[str]) -> pd.DataFrame:
+        frame = pd.DataFrame({'symbol': pd.Series(dtype=object),
+                              'trade_date': pd.Series(dtype='datetime64[ns]')})
+        for column in columns:
+            frame[column] = pd.Series(dtype='float64')
+        return frame
+
+
+_caches: Dict[Tuple[str, str], PriceCache] = {}
+_caches_lock = threading.Lock()
+
+
+def _database_key(db) -> str:
+    """Identity of a database manager: its URL, or the object itself when it has none"""
+    return getattr(db, 'db_url', None) or f"object-{id(db):x}"
+
+
+def get_price_cache(db, cache_dir: Optional[str] = None) -> PriceCache:
+    """
+    Get (or create) the process-wide cache for a database and cache directory.
+
+    Each database gets its own subdirectory, so caches of different
+    databases never serve each other's rows.
+
+    Args:
+        db: Database manager used for watermark checks and refreshes
+        cache_dir: Optional cache directory override
+
+    Returns:
+        Shared PriceCache instance bound to db
+    """
+    base_dir = cache_dir or os.getenv('PRICE_CACHE_DIR', DEFAULT_CACHE_DIR)
+    db_key = _database_key(db)
+    key = (base_dir, db_key)
+    with _caches_lock:
+        cache = _caches.get(key)
+        # Object ids are reused once a manager is collected; never hand out a cache bound to another object
+        if cache is None or (getattr(db, 'db_url', None) is None and cache.db is not db):
+            directory = os.path.join(base_dir, hashlib.md5(db_key.encode()).hexdigest()[:12])
+            cache = PriceCache(db, directory)
+            _caches[key] = cache
+        return cache
@@ -5,31 +5,83 @@ Fetches historical price data and technical indicators for Hong Kong stocks
 and populates the daily_equity_technicals table.
 """
 
-import yfinance as yf
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta, date
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+import io
 import logging
 import sys
 import os
+import psycopg2
 from dotenv import load_dotenv
 
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from src.database import DatabaseManager
+from src.population_pipeline import PopulationPipeline, PipelineConfig, SymbolPopulationResult
+from src.market_data import get_market_data_provider
+from src.incremental_indicators import IncrementalIndicatorCalculator, IndicatorState, IndicatorStateStore
+from src.hkex_calendar import hkex_calendar
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# daily_equity_technicals column -> indicator frame column
+TECHNICALS_COLUMNS = [
+    ('symbol', 'symbol'), ('trade_date', 'Date'),
+    ('open_price', 'Open'), ('close_price', 'Close'), ('high_price', 'High'), ('low_price', 'Low'),
+    ('volume', 'Volume'), ('day_high', 'High'), ('day_low', 'Low'),
+    ('week_52_high', 'week_52_high'), ('week_52_low', 'week_52_low'),
+    ('rsi_14', 'rsi_14'), ('rsi_9', 'rsi_9'),
+    ('ema_12', 'ema_12'), ('ema_26', 'ema_26'), ('ema_50', 'ema_50'),
+    ('sma_20', 'sma_20'), ('sma_50', 'sma_50'), ('sma_200', 'sma_200'),
+    ('bollinger_upper', 'bollinger_upper'), ('bollinger_middle', 'bollinger_middle'), ('bollinger_lower', 'bollinger_lower'),
+    ('macd', 'macd'), ('macd_signal', 'macd_signal'), ('macd_histogram', 'macd_histogram'),
+    ('atr_14', 'atr_14'), ('volume_sma_20', 'volume_sma_20'), ('volume_ratio', 'volume_ratio'),
+    ('price_vs_52w_high', 'price_vs_52w_high'), ('price_vs_52w_low', 'price_vs_52w_low'),
+    ('roc_1d', 'roc_1d'), ('roc_5d', 'roc_5d'), ('roc_20d', 'roc_20d'),
+    ('support_level', 'support_level'), ('resistance_level', 'resistance_level'),
+]
+TECHNICALS_INTEGER_COLUMNS = {'volume', 'volume_sma_20'}
+
+_TECHNICALS_VALUE_COLUMNS = [column for column, _ in TECHNICALS_COLUMNS if column not in ('symbol', 'trade_date')]
+
+# Set-based merge of the staging table; (xmax = 0) is true only for freshly inserted rows
+TECHNICALS_MERGE_SQL = f"""
+    WITH merged AS (
+        INSERT INTO daily_equity_technicals ({', '.join(column for column, _ in TECHNICALS_COLUMNS)})
+        SELECT {', '.join(column for column, _ in TECHNICALS_COLUMNS)}
+        FROM staging_equity_technicals
+        ON CONFLICT (symbol, trade_date) DO UPDATE SET
+            {', '.join(f'{column} = EXCLUDED.{column}' for column in _TECHNICALS_VALUE_COLUMNS)},
+            updated_at = CURRENT_TIMESTAMP
+        RETURNING symbol, (xmax = 0) AS inserted
+    )
+    SELECT symbol, COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted)
+    FROM merged
+    GROUP BY symbol
+"""
+
+INDICATOR_BUFFER_DAYS = 365  # History fetched before start_date so long windows are warm
+
+
 class PriceDataPopulator:
     """Handles fetching and storing price data from Yahoo Finance"""
     
-    def __init__(self):
-        """Initialize the populator with database connection"""
+    def __init__(self, data_source=None):
+        """
+        Initialize the populator with database connection
+        
+        Args:
+            data_source: MarketDataProvider for OHLCV bars (defaults to the
+                         process-wide provider, Yahoo Finance unless configured)
+        """
         load_dotenv()
         self.db = DatabaseManager()
+        self.data_source = data_source or get_market_data_provider()
+        self.state_store = IndicatorStateStore(self.db)
         
     def calculate_technical_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
         """Calculate technical indicators for price data"""
@@ -131,24 +183,13 @@ class PriceDataPopulator:
         try:
             logger.info(f"Fetching Yahoo Finance data for {symbol} from {start_date} to {end_date}")
             
-            # Create ticker object
-            ticker = yf.Ticker(symbol)
+            hist = self.fetch_raw_history(symbol, start_date, end_date)
             
-            # Fetch historical data with buffer for technical indicators
-            buffer_start = start_date - timedelta(days=365)  # 1 year buffer for indicators
-            hist = ticker.history(start=buffer_start, end=end_date + timedelta(days=1), auto_adjust=True, prepost=True)
-            
-            if hist.empty:
+            if hist is None or hist.empty:
                 logger.warning(f"No data returned for {symbol}")
                 return None
-                
-            # Reset index to make Date a column
-            hist = hist.reset_index()
-            hist['Date'] = hist['Date'].dt.date
             
-            # Filter to actual requested date range after calculating indicators
-            hist_with_indicators = self.calculate_technical_indicators(hist)
-            filtered_data = hist_with_indicators[hist_with_indicators['Date'] >= start_date]
+            filtered_data = self.prepare_indicator_data(hist, start_date)
             
             logger.info(f"Successfully fetched {len(filtered_data)} records for {symbol}")
             return filtered_data
@@ -157,125 +198,198 @@ class PriceDataPopulator:
             logger.error(f"Error fetching Yahoo Finance data for {symbol}: {e}")
             return None
     
+    def fetch_raw_history(self, symbol: str, start_date: date, end_date: date) -> Optional[pd.DataFrame]:
+        """Fetch raw adjusted OHLCV bars (with a 1 year indicator buffer) from the market data provider"""
+        buffer_start = start_date - timedelta(days=INDICATOR_BUFFER_DAYS)
+        return self._fetch_bars(symbol, buffer_start, end_date)
+    
+    def _fetch_bars(self, symbol: str, start_date: date, end_date: date) -> Optional[pd.DataFrame]:
+        """Bars with Date, Open, High, Low, Close, Volume columns, or None when there is no data"""
+        bars = self.data_source.history_by_symbol([symbol], start_date, end_date, adjusted=True).get(symbol)
+        return bars if bars is not None and not bars.empty else None
+    
+    def prepare_indicator_data(self, hist: pd.DataFrame, start_date: date) -> pd.DataFrame:
+        """Calculate indicators over the buffered history, then keep rows from start_date"""
+        hist_with_indicators = self.calculate_technical_indicators(hist.copy())
+        return hist_with_indicators[hist_with_indicators['Date'] >= start_date]
+    
     def store_price_data(self, symbol: str, data: pd.DataFrame) -> int:
         """Store price data in the daily_equity_technicals table"""
+        stats = self.store_price_data_bulk(self._build_technicals_frame(symbol, data))
+        logger.info(f"Successfully stored {stats['stored']} records for {symbol} "
+                    f"({stats['inserted']} inserted, {stats['updated']} updated, {stats['failed']} failed)")
+        return stats['stored']
+    
+    def _build_technicals_frame(self, symbol: str, data: pd.DataFrame) -> pd.DataFrame:
+        """Map an indicator frame to daily_equity_technicals columns with column-wise type conversion"""
+        frame = pd.DataFrame(index=data.index)
+        frame['symbol'] = symbol
+        for column, source in TECHNICALS_COLUMNS:
+            if column == 'symbol':
+                continue
+            values = data[source] if source in data.columns else pd.Series(np.nan, index=data.index)
+            if column == 'trade_date':
+                frame[column] = pd.to_datetime(values).dt.date
+            elif column in TECHNICALS_INTEGER_COLUMNS:
+                numeric = pd.to_numeric(values, errors='coerce').replace([np.inf, -np.inf], np.nan)
+                frame[column] = np.trunc(numeric).astype('Int64')
+            else:
+                numeric = pd.to_numeric(values, errors='coerce').astype(float)
+                frame[column] = numeric.replace([np.inf, -np.inf], np.nan)
+        return frame.reset_index(drop=True)
+    
+    def store_price_data_bulk(self, frame: pd.DataFrame, batch_size: int = 5000) -> Dict[str, int]:
+        """
+        Bulk upsert a technicals frame (one or many symbols) into daily_equity_technicals.
+        
+        Each batch is streamed into a temporary staging table with COPY FROM STDIN
+        and merged with one set-based INSERT ... ON CONFLICT DO UPDATE. If COPY or
+        the merge rejects a batch, that batch falls back to per-row upserts so a
+        single bad row does not lose the rest.
+        
+        Args:
+            frame: DataFrame with TECHNICALS_COLUMNS (see _build_technicals_frame)
+            batch_size: Rows per COPY/merge round-trip
+            
+        Returns:
+            Dict with inserted, updated, stored, failed and fallback_rows counts,
+            plus the same counts per symbol under 'by_symbol'
+        """
+        stats = {'inserted': 0, 'updated': 0, 'stored': 0, 'failed': 0, 'fallback_rows': 0, 'by_symbol': {}}
+        
+        def tally(symbol, key, count):
+            counts = stats['by_symbol'].setdefault(symbol, {'inserted': 0, 'updated': 0, 'failed': 0})
+            counts[key] += count
+            stats[key] += count
+        
+        if frame is None or frame.empty:
+            return stats
+        
+        columns = [column for column, _ in TECHNICALS_COLUMNS]
+        frame = frame[columns].drop_duplicates(subset=['symbol', 'trade_date'], keep='last')
+        
+        # Rows missing required OHLC values can never be stored
+        required = frame[['open_price', 'close_price', 'high_price', 'low_price']].notna().all(axis=1)
+        for symbol, count in frame.loc[~required, 'symbol'].value_counts().items():
+            tally(symbol, 'failed', int(count))
+        frame = frame[required]
+        
         try:
-            conn = self.db.get_connection()
-            cur = conn.cursor()
-            
-            records_inserted = 0
-            
-            for _, row in data.iterrows():
-                try:
-                    # Prepare the data for insertion
-                    record = {
-                        'symbol': symbol,
-                        'trade_date': row['Date'],
-                        'open_price': float(row['Open']) if pd.notna(row['Open']) else None,
-                        'close_price': float(row['Close']) if pd.notna(row['Close']) else None,
-                        'high_price': float(row['High']) if pd.notna(row['High']) else None,
-                        'low_price': float(row['Low']) if pd.notna(row['Low']) else None,
-                        'volume': int(row['Volume']) if pd.notna(row['Volume']) else None,
-                        'day_high': float(row['High']) if pd.notna(row['High']) else None,
-                        'day_low': float(row['Low']) if pd.notna(row['Low']) else None,
-                        'week_52_high': float(row['week_52_high']) if pd.notna(row['week_52_high']) else None,
-                        'week_52_low': float(row['week_52_low']) if pd.notna(row['week_52_low']) else None,
-                        'rsi_14': float(row['rsi_14']) if pd.notna(row['rsi_14']) else None,
-                        'rsi_9': float(row['rsi_9']) if pd.notna(row['rsi_9']) else None,
-                        'ema_12': float(row['ema_12']) if pd.notna(row['ema_12']) else None,
-                        'ema_26': float(row['ema_26']) if pd.notna(row['ema_26']) else None,
-                        'ema_50': float(row['ema_50']) if pd.notna(row['ema_50']) else None,
-                        'sma_20': float(row['sma_20']) if pd.notna(row['sma_20']) else None,
-                        'sma_50': float(row['sma_50']) if pd.notna(row['sma_50']) else None,
-                        'sma_200': float(row['sma_200']) if pd.notna(row['sma_200']) else None,
-                        'bollinger_upper': float(row['bollinger_upper']) if pd.notna(row['bollinger_upper']) else None,
-                        'bollinger_middle': float(row['bollinger_middle']) if pd.notna(row['bollinger_middle']) else None,
-                        'bollinger_lower': float(row['bollinger_lower']) if pd.notna(row['bollinger_lower']) else None,
-                        'macd': float(row['macd']) if pd.notna(row['macd']) else None,
-                        'macd_signal': float(row['macd_signal']) if pd.notna(row['macd_signal']) else None,
-                        'macd_histogram': float(row['macd_histogram']) if pd.notna(row['macd_histogram']) else None,
-                        'atr_14': float(row['atr_14']) if pd.notna(row['atr_14']) else None,
-                        'volume_sma_20': int(row['volume_sma_20']) if pd.notna(row['volume_sma_20']) else None,
-                        'volume_ratio': float(row['volume_ratio']) if pd.notna(row['volume_ratio']) else None,
-                        'price_vs_52w_high': float(row['price_vs_52w_high']) if pd.notna(row['price_vs_52w_high']) else None,
-                        'price_vs_52w_low': float(row['price_vs_52w_low']) if pd.notna(row['price_vs_52w_low']) else None,
-                        'roc_1d': float(row['roc_1d']) if pd.notna(row['roc_1d']) else None,
-                        'roc_5d': float(row['roc_5d']) if pd.notna(row['roc_5d']) else None,
-                        'roc_20d': float(row['roc_20d']) if pd.notna(row['roc_20d']) else None,
-                        'support_level': float(row['support_level']) if pd.notna(row['support_level']) else None,
-                        'resistance_level': float(row['resistance_level']) if pd.notna(row['resistance_level']) else None,
-                    }
-                    
-                    # Insert using ON CONFLICT to handle duplicates
-                    cur.execute("""
-                        INSERT INTO daily_equity_technicals (
-                            symbol, trade_date, open_price, close_price, high_price, low_price, volume,
-                            day_high, day_low, week_52_high, week_52_low, rsi_14, rsi_9,
-                            ema_12, ema_26, ema_50, sma_20, sma_50, sma_200,
-                            bollinger_upper, bollinger_middle, bollinger_lower,
-                            macd, macd_signal, macd_histogram, atr_14,
-                            volume_sma_20, volume_ratio, price_vs_52w_high, price_vs_52w_low,
-                            roc_1d, roc_5d, roc_20d, support_level, resistance_level
-                        ) VALUES (
-                            %(symbol)s, %(trade_date)s, %(open_price)s, %(close_price)s, %(high_price)s, %(low_price)s, %(volume)s,
-                            %(day_high)s, %(day_low)s, %(week_52_high)s, %(week_52_low)s, %(rsi_14)s, %(rsi_9)s,
-                            %(ema_12)s, %(ema_26)s, %(ema_50)s, %(sma_20)s, %(sma_50)s, %(sma_200)s,
-                            %(bollinger_upper)s, %(bollinger_middle)s, %(bollinger_lower)s,
-                            %(macd)s, %(macd_signal)s, %(macd_histogram)s, %(atr_14)s,
-                            %(volume_sma_20)s, %(volume_ratio)s, %(price_vs_52w_high)s, %(price_vs_52w_low)s,
-                            %(roc_1d)s, %(roc_5d)s, %(roc_20d)s, %(support_level)s, %(resistance_level)s
-                        ) ON CONFLICT (symbol, trade_date) DO UPDATE SET
-                            open_price = EXCLUDED.open_price,
-                            close_price = EXCLUDED.close_price,
-                            high_price = EXCLUDED.high_price,
-                            low_price = EXCLUDED.low_price,
-                            volume = EXCLUDED.volume,
-                            day_high = EXCLUDED.day_high,
-                            day_low = EXCLUDED.day_low,
-                            week_52_high = EXCLUDED.week_52_high,
-                            week_52_low = EXCLUDED.week_52_low,
-                            rsi_14 = EXCLUDED.rsi_14,
-                            rsi_9 = EXCLUDED.rsi_9,
-                            ema_12 = EXCLUDED.ema_12,
-                            ema_26 = EXCLUDED.ema_26,
-                            ema_50 = EXCLUDED.ema_50,
-                            sma_20 = EXCLUDED.sma_20,
-                            sma_50 = EXCLUDED.sma_50,
-                            sma_200 = EXCLUDED.sma_200,
-                            bollinger_upper = EXCLUDED.bollinger_upper,
-                            bollinger_middle = EXCLUDED.bollinger_middle,
-                            bollinger_lower = EXCLUDED.bollinger_lower,
-                            macd = EXCLUDED.macd,
-                            macd_signal = EXCLUDED.macd_signal,
-                            macd_histogram = EXCLUDED.macd_histogram,
-                            atr_14 = EXCLUDED.atr_14,
-                            volume_sma_20 = EXCLUDED.volume_sma_20,
-                            volume_ratio = EXCLUDED.volume_ratio,
-                            price_vs_52w_high = EXCLUDED.price_vs_52w_high,
-                            price_vs_52w_low = EXCLUDED.price_vs_52w_low,
-                            roc_1d = EXCLUDED.roc_1d,
-                            roc_5d = EXCLUDED.roc_5d,
-                            roc_20d = EXCLUDED.roc_20d,
-                            support_level = EXCLUDED.support_level,
-                            resistance_level = EXCLUDED.resistance_level,
-                            updated_at = CURRENT_TIMESTAMP
-                    """, record)
+            with self.db.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(f"""
+                        CREATE TEMP TABLE IF NOT EXISTS staging_equity_technicals AS
+                        SELECT {', '.join(columns)} FROM daily_equity_technicals WITH NO DATA
+                    """)
                     
-                    records_inserted += 1
+                    for offset in range(0, len(frame), batch_size):
+                        batch = frame.iloc[offset:offset + batch_size]
+                        buffer = io.StringIO()
+                        batch.to_csv(buffer, index=False, header=False, na_rep='')
+                        buffer.seek(0)
+                        
+                        cur.execute("SAVEPOINT technicals_batch")
+                        try:
+                            cur.execute("TRUNCATE staging_equity_technicals")
+                            cur.copy_expert(
+                                f"COPY staging_equity_technicals ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                                buffer
+                            )
+                            cur.execute(TECHNICALS_MERGE_SQL)
+                            merged = cur.fetchall()
+                            cur.execute("RELEASE SAVEPOINT technicals_batch")
+                            for symbol, inserted, updated in merged:
+                                tally(symbol, 'inserted', inserted)
+                                tally(symbol, 'updated', updated)
+                        except psycopg2.Error as batch_error:
+                            cur.execute("ROLLBACK TO SAVEPOINT technicals_batch")
+                            logger.warning(f"Bulk batch of {len(batch)} rows rejected ({batch_error}), falling back to per-row upserts")
+                            stats['fallback_rows'] += len(batch)
+                            for (symbol, key), count in self._store_rows_individually(cur, batch).items():
+                                tally(symbol, key, count)
                     
-                except Exception as row_error:
-                    logger.warning(f"Error inserting record for {symbol} on {row['Date']}: {row_error}")
-                    continue
-            
-            conn.commit()
-            conn.close()
-            
-            logger.info(f"Successfully stored {records_inserted} records for {symbol}")
-            return records_inserted
-            
+                    cur.execute("DROP TABLE IF EXISTS staging_equity_technicals")
         except Exception as e:
-            logger.error(f"Error storing price data for {symbol}: {e}")
-            return 0
+            logger.error(f"Error bulk storing price data: {e}")
+            by_symbol = {symbol: {'inserted': 0, 'updated': 0, 'failed': int(count)}
+                         for symbol, count in frame['symbol'].value_counts().items()}
+            return {'inserted': 0, 'updated': 0, 'stored': 0, 'failed': len(frame) + stats['failed'],
+                    'fallback_rows': 0, 'by_symbol': by_symbol}
+        
+        stats['stored'] = stats['inserted'] + stats['updated']
+        return stats
+    
+    def _store_rows_individually(self, cur, frame: pd.DataFrame) -> Dict[Tuple[str, str], int]:
+        """Per-row upsert fallback; each row runs in its own savepoint. Returns {(symbol, outcome): count}"""
+        counts: Dict[Tuple[str, str], int] = {}
+        
+        for record in frame.astype(object).where(frame.notna(), None).to_dict('records'):
+            cur.execute("SAVEPOINT technicals_row")
+            try:
+                cur.execute("""
+                    INSERT INTO daily_equity_technicals (
+                        symbol, trade_date, open_price, close_price, high_price, low_price, volume,
+                        day_high, day_low, week_52_high, week_52_low, rsi_14, rsi_9,
+                        ema_12, ema_26, ema_50, sma_20, sma_50, sma_200,
+                        bollinger_upper, bollinger_middle, bollinger_lower,
+                        macd, macd_signal, macd_histogram, atr_14,
+                        volume_sma_20, volume_ratio, price_vs_52w_high, price_vs_52w_low,
+                        roc_1d, roc_5d, roc_20d, support_level, resistance_level
+                    ) VALUES (
+                        %(symbol)s, %(trade_date)s, %(open_price)s, %(close_price)s, %(high_price)s, %(low_price)s, %(volume)s,
+                        %(day_high)s, %(day_low)s, %(week_52_high)s, %(week_52_low)s, %(rsi_14)s, %(rsi_9)s,
+                        %(ema_12)s, %(ema_26)s, %(ema_50)s, %(sma_20)s, %(sma_50)s, %(sma_200)s,
+                        %(bollinger_upper)s, %(bollinger_middle)s, %(bollinger_lower)s,
+                        %(macd)s, %(macd_signal)s, %(macd_histogram)s, %(atr_14)s,
+                        %(volume_sma_20)s, %(volume_ratio)s, %(price_vs_52w_high)s, %(price_vs_52w_low)s,
+                        %(roc_1d)s, %(roc_5d)s, %(roc_20d)s, %(support_level)s, %(resistance_level)s
+                    ) ON CONFLICT (symbol, trade_date) DO UPDATE SET
+                        open_price = EXCLUDED.open_price,
+                        close_price = EXCLUDED.close_price,
+                        high_price = EXCLUDED.high_price,
+                        low_price = EXCLUDED.low_price,
+                        volume = EXCLUDED.volume,
+                        day_high = EXCLUDED.day_high,
+                        day_low = EXCLUDED.day_low,
+                        week_52_high = EXCLUDED.week_52_high,
+                        week_52_low = EXCLUDED.week_52_low,
+                        rsi_14 = EXCLUDED.rsi_14,
+                        rsi_9 = EXCLUDED.rsi_9,
+                        ema_12 = EXCLUDED.ema_12,
+                        ema_26 = EXCLUDED.ema_26,
+                        ema_50 = EXCLUDED.ema_50,
+                        sma_20 = EXCLUDED.sma_20,
+                        sma_50 = EXCLUDED.sma_50,
+                        sma_200 = EXCLUDED.sma_200,
+                        bollinger_upper = EXCLUDED.bollinger_upper,
+                        bollinger_middle = EXCLUDED.bollinger_middle,
+                        bollinger_lower = EXCLUDED.bollinger_lower,
+                        macd = EXCLUDED.macd,
+                        macd_signal = EXCLUDED.macd_signal,
+                        macd_histogram = EXCLUDED.macd_histogram,
+                        atr_14 = EXCLUDED.atr_14,
+                        volume_sma_20 = EXCLUDED.volume_sma_20,
+                        volume_ratio = EXCLUDED.volume_ratio,
+                        price_vs_52w_high = EXCLUDED.price_vs_52w_high,
+                        price_vs_52w_low = EXCLUDED.price_vs_52w_low,
+                        roc_1d = EXCLUDED.roc_1d,
+                        roc_5d = EXCLUDED.roc_5d,
+                        roc_20d = EXCLUDED.roc_20d,
+                        support_level = EXCLUDED.support_level,
+                        resistance_level = EXCLUDED.resistance_level,
+                        updated_at = CURRENT_TIMESTAMP
+                    RETURNING (xmax = 0) AS inserted
+                """, record)
+                outcome = 'inserted' if cur.fetchone()[0] else 'updated'
+                cur.execute("RELEASE SAVEPOINT technicals_row")
+            except Exception as row_error:
+                cur.execute("ROLLBACK TO SAVEPOINT technicals_row")
+                logger.warning(f"Error inserting record for {record['symbol']} on {record['trade_date']}: {row_error}")
+                outcome = 'failed'
+            key = (record['symbol'], outcome)
+            counts[key] = counts.get(key, 0) + 1
+        
+        return counts
     
     def populate_symbol_data(self, symbol: str, start_date: date, end_date: date) -> bool:
         """Populate data for a single symbol"""
@@ -303,8 +417,22 @@ class PriceDataPopulator:
             logger.error(f"Error populating data for {symbol}: {e}")
             return False
     
-    def populate_multiple_symbols(self, symbols: List[str], start_date: date, end_date: date) -> Dict[str, bool]:
-        """Populate data for multiple symbols"""
+    def populate_multiple_symbols(self, symbols: List[str], start_date: date, end_date: date,
+                                  pipelined: bool = False, **pipeline_options) -> Dict[str, bool]:
+        """
+        Populate data for multiple symbols
+        
+        Args:
+            symbols: Symbols to populate
+            start_date: First date to store
+            end_date: Last date to store
+            pipelined: Overlap fetch/compute/write stages (see populate_multiple_symbols_pipelined)
+            **pipeline_options: PipelineConfig fields used when pipelined is True
+        """
+        if pipelined:
+            report = self.populate_multiple_symbols_pipelined(symbols, start_date, end_date, **pipeline_options)
+            return {symbol: result.success for symbol, result in report.items()}
+        
         results = {}
         
         logger.info(f"Starting bulk population for {len(symbols)} symbols")
@@ -330,12 +458,130 @@ class PriceDataPopulator:
         logger.info(f"Bulk population completed: {successful}/{total} symbols successful")
         
         return results
+    
+    def populate_multiple_symbols_pipelined(self, symbols: List[str], start_date: date, end_date: date,
+                                            **pipeline_options) -> Dict[str, SymbolPopulationResult]:
+        """
+        Populate symbols with a fetch -> compute -> write pipeline
+        
+        Fetches run in a rate-limited thread pool with retry/backoff, indicator
+        calculation runs in its own pool and a writer stage batches COPY upserts.
+        
+        Args:
+            symbols: Symbols to populate
+            start_date: First date to store
+            end_date: Last date to store
+            **pipeline_options: PipelineConfig fields (fetch_workers, compute_workers,
+                                writer_workers, requests_per_second, burst, max_retries,
+                                backoff_seconds, write_batch_rows, write_flush_seconds)
+            
+        Returns:
+            Dict mapping symbol to SymbolPopulationResult with per-stage timings
+        """
+        logger.info(f"Starting pipelined population for {len(symbols)} symbols")
+        pipeline = PopulationPipeline(self, PipelineConfig(**pipeline_options))
+        return pipeline.run(symbols, start_date, end_date)
+
+    def populate_symbol_incremental(self, symbol: str, end_date: Optional[date] = None,
+                                    bootstrap_start: Optional[date] = None,
+                                    state: Optional[IndicatorState] = None) -> Dict[str, object]:
+        """
+        Append new bars for a symbol using its saved indicator state
+        
+        Only bars after the saved last_trade_date are fetched, computed and
+        upserted. Symbols without saved state are bootstrapped with a full
+        computation from bootstrap_start (plus the usual indicator buffer).
+        
+        Args:
+            symbol: Stock symbol
+            end_date: Last date to fetch (defaults to, and is capped at, the last completed
+                      HKEX session so an intraday partial bar never enters the saved state)
+            bootstrap_start: First stored date when no state exists (defaults to 2 years back)
+            state: Already loaded state (loaded from equity_indicator_state when omitted)
+            
+        Returns:
+            Dict with mode ('full', 'incremental' or 'up_to_date'), rows stored and success flag
+        """
+        last_session = hkex_calendar.get_last_completed_trading_day()
+        end_date = min(end_date or last_session, last_session)
+        calculator = IncrementalIndicatorCalculator(self)
+        result = {'symbol': symbol, 'mode': 'incremental', 'rows': 0, 'success': False}
+        
+        try:
+            if state is None:
+                state = self.state_store.load([symbol]).get(symbol)
+            
+            if state is None:
+                result['mode'] = 'full'
+                start_date = bootstrap_start or end_date - timedelta(days=2*365)
+                hist = self.fetch_raw_history(symbol, start_date, end_date)
+                if hist is None or hist.empty:
+                    logger.warning(f"No data available for {symbol}")
+                    return result
+                data, new_state = calculator.initialize(symbol, hist)
+                data = data[data['Date'] >= start_date]
+            else:
+                if state.last_trade_date >= end_date:
+                    result.update(mode='up_to_date', success=True)
+                    return result
+                hist = self._fetch_bars(symbol, state.last_trade_date + timedelta(days=1), end_date)
+                if hist is None or hist.empty:
+                    result.update(mode='up_to_date', success=True)
+                    return result
+                data, new_state = calculator.update(state, hist)
+                if data.empty:
+                    result.update(mode='up_to_date', success=True)
+                    return result
+            
+            stats = self.store_price_data_bulk(self._build_technicals_frame(symbol, data))
+            result['rows'] = stats['stored']
+            
+            # Only advance the state once the rows it describes are stored
+            if stats['failed'] == 0 and self.state_store.save(new_state):
+                result['success'] = True
+            
+            logger.info(f"{symbol}: {result['mode']} update stored {stats['stored']} rows")
+            return result
+            
+        except Exception as e:
+            logger.error(f"Error updating {symbol} incrementally: {e}")
+            return result
+    
+    def populate_multiple_symbols_incremental(self, symbols: List[str],
+                                              end_date: Optional[date] = None) -> Dict[str, Dict[str, object]]:
+        """End-of-day update for many symbols using saved indicator state"""
+        states = self.state_store.load(symbols)
+        results = {
+            symbol: self.populate_symbol_incremental(symbol, end_date, state=states.get(symbol))
+            for symbol in symbols
+        }
+        
+        successful = sum(1 for result in results.values() if result['success'])
+        rows = sum(result['rows'] for result in results.values())
+        logger.info(f"Incremental update completed: {successful}/{len(symbols)} symbols, {rows} rows")
+        return results
+
 
 def main():
     """Main function for command-line usage"""
     # Get symbols that need data
     load_dotenv()
     db = DatabaseManager()
+    
+    if '--incremental' in sys.argv:
+        # Nightly end-of-day update: append new bars for every stored symbol
+        with db.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT DISTINCT symbol FROM daily_equity_technicals ORDER BY symbol")
+                symbols = [row[0] for row in cur.fetchall()]
+        
+        populator = PriceDataPopulator()
+        results = populator.populate_multiple_symbols_incremental(symbols)
+        for symbol, result in results.items():
+            status = "✅" if result['success'] else "❌"
+            print(f"{status} {symbol}: {result['mode']} ({result['rows']} rows)")
+        return
+    
     conn = db.get_connection()
     cur = conn.cursor()
     
@@ -366,7 +612,7 @@ def main():
     
     # Populate data
     populator = PriceDataPopulator()
-    results = populator.populate_multiple_symbols(missing_symbols, start_date, end_date)
+    results = populator.populate_multiple_symbols(missing_symbols, start_date, end_date, pipelined=True)
     
     # Print final summary
     print("\n" + "="*60)
@@ -0,0 +1,253 @@
+"""
+Sorted Per-Symbol Price Index
+
+Contiguous numpy arrays of ordinal dates and closes per symbol with
+binary-search (np.searchsorted) as-of lookups, replacing repeated
+`frame[frame['Date'] <= d].iloc[-1]` scans:
+- asof(): O(log n) lookup of one date
+- asof_many() / matrix(): vectorized lookup of a whole date vector
+- to_frame(): long symbol/date/close_price frame on a given set of days
+
+Fill policies decide what a date without its own close resolves to:
+- 'none': exact date only
+- 'ffill': latest close on or before the date
+- 'bfill': earliest close on or after the date
+- 'ffill_bfill': forward fill, falling back to the earliest later close
+"""
+
+import logging
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FILL_NONE = 'none'
+FILL_FORWARD = 'ffill'
+FILL_BACKWARD = 'bfill'
+FILL_FORWARD_BACKWARD = 'ffill_bfill'
+FILL_POLICIES = (FILL_NONE, FILL_FORWARD, FILL_BACKWARD, FILL_FORWARD_BACKWARD)
+
+# date(1970, 1, 1).toordinal(): converts datetime64[D] day numbers to proleptic ordinals
+_EPOCH_ORDINAL = 719163
+
+
+def to_ordinals(dates) -> np.ndarray:
+    """Proleptic Gregorian ordinals (date.toordinal()) for a sequence of dates/timestamps"""
+    if isinstance(dates, np.ndarray) and dates.dtype.kind == 'i':
+        return dates.astype(np.int64, copy=False)
+    if not isinstance(dates, (pd.Series, pd.Index)):
+        dates = pd.Series(list(dates), dtype=object)
+    values = pd.DatetimeIndex(pd.to_datetime(dates))
+    if values.tz is not None:
+        values = values.tz_localize(None)
+    return values.values.astype('datetime64[D]').astype(np.int64) + _EPOCH_ORDINAL
+
+
+def _ordinal(value) -> int:
+    if isinstance(value, datetime):
+        return value.date().toordinal()
+    if isinstance(value, date):
+        return value.toordinal()
+    return pd.Timestamp(value).date().toordinal()
+
+
+class PriceIndex:
+    """Per-symbol sorted (ordinal date, close) arrays with as-of lookups"""
+
+    def __init__(self, series: Dict[str, Tuple[np.ndarray, np.ndarray]]):
+        """
+        Args:
+            series: symbol -> (strictly increasing int64 ordinals, float64 closes)
+        """
+        self._series = series
+
+    # ------------------------------------------------------------ construction
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, symbol_column: str = 'symbol', date_column: str = 'date',
+                   price_column: str = 'close_price', keep: str = 'first') -> 'PriceIndex':
+        """
+        Build from a long-format price frame.
+
+        Args:
+            frame: DataFrame with symbol, date and price columns
+            symbol_column: Symbol column name
+            date_column: Date column name (date, datetime or Timestamp values)
+            price_column: Close price column name
+            keep: Which row wins when a symbol has several rows on one date ('first' or 'last')
+
+        Returns:
+            PriceIndex instance (rows with missing prices are ignored)
+        """
+        if frame is None or frame.empty:
+            return cls({})
+
+        ordinals = to_ordinals(frame[date_column])
+        closes = pd.to_numeric(frame[price_column], errors='coerce').to_numpy(dtype=float)
+        symbols = frame[symbol_column].to_numpy()
+
+        valid = ~np.isnan(closes)
+        ordinals, closes, symbols = ordinals[valid], closes[valid], symbols[valid]
+
+        series = {}
+        codes, uniques = pd.factorize(symbols)
+        order = np.lexsort((np.arange(len(codes)), ordinals, codes))
+        codes, ordinals, closes = codes[order], ordinals[order], closes[order]
+        bounds = np.flatnonzero(np.diff(codes)) + 1
+        for code_rows in np.split(np.arange(len(codes)), bounds):
+            if len(code_rows) == 0:
+                continue
+            symbol_ordinals = ordinals[code_rows]
+            symbol_closes = closes[code_rows]
+            series[uniques[codes[code_rows[0]]]] = cls._dedupe(symbol_ordinals, symbol_closes, keep)
+        return cls(series)
+
+    @classmethod
+    def from_symbol_frames(cls, price_data: Dict[str, pd.DataFrame], date_column: str = 'Date',
+                           price_column: str = 'Close') -> 'PriceIndex':
+        """Build from per-symbol frames with Date and Close columns (market_data.split_history output)"""
+        series = {}
+        for symbol, bars in price_data.items():
+            if bars is None or bars.empty:
+                continue
+            ordinals = to_ordinals(bars[date_column])
+            closes = pd.to_numeric(bars[price_column], errors='coerce').to_numpy(dtype=float)
+            valid = ~np.isnan(closes)
+            ordinals, closes = ordinals[valid], closes[valid]
+            order = np.argsort(ordinals, kind='stable')
+            series[symbol] = cls._dedupe(ordinals[order], closes[order], 'last')
+        return cls(series)
+
+    @staticmethod
+    def _dedupe(ordinals: np.ndarray, closes: np.ndarray, keep: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Collapse repeated dates of a sorted array pair to one row each"""
+        if len(ordinals) < 2:
+            return np.ascontiguousarray(ordinals), np.ascontiguousarray(closes)
+        if keep == 'first':
+            mask = np.concatenate(([True], ordinals[1:] != ordinals[:-1]))
+        else:
+            mask = np.concatenate((ordinals[1:] != ordinals[:-1], [True]))
+        return np.ascontiguousarray(ordinals[mask]), np.ascontiguousarray(closes[mask])
+
+    # ------------------------------------------------------------------ access
+
+    @property
+    def symbols(self) -> List[str]:
+        return sorted(self._series)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._series
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    def dates(self, symbol: str) -> List[date]:
+        """Dates with a close for the symbol"""
+        ordinals = self._series.get(symbol, (np.empty(0, dtype=np.int64), None))[0]
+        return [date.fromordinal(int(o)) for o in ordinals]
+
+    def first_date(self, symbol: str) -> Optional[date]:
+        ordinals = self._series.get(symbol, (np.empty(0, dtype=np.int64), None))[0]
+        return date.fromordinal(int(ordinals[0])) if len(ordinals) else None
+
+    def last_date(self, symbol: str) -> Optional[date]:
+        ordinals = self._series.get(symbol, (np.empty(0, dtype=np.int64), None))[0]
+        return date.fromordinal(int(ordinals[-1])) if len(ordinals) else None
+
+    # ----------------------------------------------------------------- lookups
+
+    @staticmethod
+    def _positions(ordinals: np.ndarray, targets: np.ndarray, fill: str) -> np.ndarray:
+        """Row index per target under the fill policy (-1 when unresolved)"""
+        if fill not in FILL_POLICIES:
+            raise ValueError(f"Unknown fill policy: {fill}")
+        n = len(ordinals)
+        if n == 0:
+            return np.full(len(targets), -1, dtype=np.int64)
+
+        before = np.searchsorted(ordinals, targets, side='right') - 1
+        if fill == FILL_FORWARD:
+            return before
+        if fill == FILL_NONE:
+            exact = (before >= 0) & (ordinals[np.maximum(before, 0)] == targets)
+            return np.where(exact, before, -1)
+
+        after = np.searchsorted(ordinals, targets, side='left')
+        after = np.where(after < n, after, -1)
+        if fill == FILL_BACKWARD:
+            return after
+        return np.where(before >= 0, before, after)
+
+    def asof(self, symbol: str, target_date, fill: str = FILL_FORWARD) -> Optional[float]:
+        """
+        Close for one symbol on one date.
+
+        Args:
+            symbol: Stock symbol
+            target_date: Date to resolve
+            fill: Fill policy
+
+        Returns:
+            Close price, or None when the symbol has no close under the policy
+        """
+        entry = self._series.get(symbol)
+        if entry is None:
+            return None
+        ordinals, closes = entry
+        position = self._positions(ordinals, np.array([_ordinal(target_date)], dtype=np.int64), fill)[0]
+        return float(closes[position]) if position >= 0 else None
+
+    def asof_many(self, symbol: str, dates, fill: str = FILL_FORWARD) -> np.ndarray:
+        """
+        Closes for one symbol on every date of a vector.
+
+        Args:
+            symbol: Stock symbol
+            dates: Dates to resolve (any order)
+            fill: Fill policy
+
+        Returns:
+            float64 array aligned with dates, NaN where unresolved
+        """
+        targets = to_ordinals(dates)
+        entry = self._series.get(symbol)
+        if entry is None or len(entry[0]) == 0:
+            return np.full(len(targets), np.nan)
+        ordinals, closes = entry
+        positions = self._positions(ordinals, targets, fill)
+        return np.where(positions >= 0, closes[np.maximum(positions, 0)], np.nan)
+
+    def matrix(self, symbols: Sequence[str], dates, fill: str = FILL_FORWARD) -> np.ndarray:
+        """Dates x symbols close matrix (NaN where unresolved)"""
+        targets = to_ordinals(dates)
+        result = np.full((len(targets), len(symbols)), np.nan)
+        for column, symbol in enumerate(symbols):
+            result[:, column] = self.asof_many(symbol, targets, fill)
+        return result
+
+    def to_frame(self, dates, fill: str = FILL_FORWARD, symbols: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """
+        Long frame of resolved closes on the given dates.
+
+        Args:
+            dates: Dates to emit rows for
+            fill: Fill policy
+            symbols: Symbols to include (defaults to every indexed symbol)
+
+        Returns:
+            DataFrame with columns symbol, date (datetime64), close_price; unresolved rows dropped
+        """
+        symbols = list(symbols) if symbols is not None else self.symbols
+        targets = to_ordinals(dates)
+        values = self.matrix(symbols, targets, fill)
+
+        day_values = (targets - _EPOCH_ORDINAL).astype('datetime64[D]').astype('datetime64[ns]')
+        frame = pd.DataFrame({
+            'symbol': np.repeat(np.array(symbols, dtype=object), len(targets)),
+            'date': np.tile(day_values, len(symbols)),
+            'close_price': values.T.reshape(-1),
+        })
+        return frame.dropna(subset=['close_price']).reset_index(drop=True)
@@ -0,0 +1,198 @@
+"""
+Rolling Performance Metrics
+
+Windowed risk metrics for many analyses in one vectorized pass over an
+analyses x days value matrix:
+- Annualized volatility, Sharpe and Sortino ratios of daily returns
+- Maximum drawdown within the window and trading days since the window high
+- Beta of daily returns against a benchmark (the Hang Seng Index by default)
+
+Sums over each window come from cumulative sums, so every window length costs
+a few array operations regardless of the number of analyses. Drawdowns extend
+each window one day to the left per step (window - 1 steps of matrix ops).
+"""
+
+import os
+import logging
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ROLLING_WINDOWS = (20, 60, 252)
+TRADING_DAYS_PER_YEAR = 252
+RISK_FREE_RATE = 0.025
+BENCHMARK_SYMBOL = os.getenv('BENCHMARK_SYMBOL', '^HSI')
+
+ROLLING_COLUMNS = [
+    'analysis_id', 'date', 'window', 'volatility', 'sharpe_ratio', 'sortino_ratio',
+    'max_drawdown_pct', 'drawdown_days', 'beta'
+]
+METRIC_COLUMNS = ROLLING_COLUMNS[3:]
+
+
+def _daily_returns(values: np.ndarray) -> np.ndarray:
+    """Simple returns along the last axis, NaN on the first day and around missing values"""
+    returns = np.full(values.shape, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns[..., 1:] = values[..., 1:] / values[..., :-1] - 1.0
+    returns[~np.isfinite(returns)] = np.nan
+    return returns
+
+
+def _rolling_sum(x: np.ndarray, window: int) -> np.ndarray:
+    """Sum over the trailing window along the last axis (NaN counts as 0, first window - 1 days are NaN)"""
+    csum = np.cumsum(np.nan_to_num(x), axis=-1)
+    sums = np.full(x.shape, np.nan)
+    if window > x.shape[-1]:
+        return sums
+    sums[..., window - 1] = csum[..., window - 1]
+    sums[..., window:] = csum[..., window:] - csum[..., :-window]
+    return sums
+
+
+def _full_windows(mask: np.ndarray, window: int) -> np.ndarray:
+    """True where every day of the trailing window satisfies mask"""
+    return _rolling_sum(mask.astype(float), window) == window
+
+
+def _rolling_drawdown(values: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Maximum drawdown (fraction) and days since the high within each trailing window.
+
+    Grows every window one day to the left per step: the new earliest day
+    adds drawdowns to the lowest later value in the window, and becomes the
+    window high when it exceeds the current one.
+    """
+    days = values.shape[-1]
+    drawdown = np.zeros(values.shape)
+    lowest = values.copy()
+    peak = values.copy()
+    age = np.zeros(values.shape)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for k in range(1, min(window, days)):
+            lagged = np.full(values.shape, np.nan)
+            lagged[..., k:] = values[..., :-k]
+            drawdown = np.fmin(drawdown, lowest / lagged - 1.0)
+            lowest = np.fmin(lowest, lagged)
+            higher = lagged > peak
+            peak = np.where(higher, lagged, peak)
+            age = np.where(higher, k, age)
+    return drawdown, age
+
+
+def compute_rolling_metrics(values: np.ndarray, benchmark: Optional[np.ndarray] = None,
+                            windows: Sequence[int] = ROLLING_WINDOWS,
+                            risk_free_rate: float = RISK_FREE_RATE) -> Dict[int, Dict[str, np.ndarray]]:
+    """
+    Rolling metrics of every analysis for every window length.
+
+    Args:
+        values: analyses x days matrix of total values (NaN outside an analysis' period)
+        benchmark: Benchmark closes aligned to the same days (beta is NaN without it)
+        windows: Window lengths in trading days
+        risk_free_rate: Annual risk-free rate for Sharpe and Sortino
+
+    Returns:
+        {window: {metric: analyses x days array}} for METRIC_COLUMNS; a metric is
+        NaN until its window is full
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    returns = _daily_returns(values)
+    has_return = ~np.isnan(returns)
+    rf_daily = risk_free_rate / TRADING_DAYS_PER_YEAR
+    excess = returns - rf_daily
+    downside = np.minimum(excess, 0.0) ** 2
+
+    bench_returns = None
+    if benchmark is not None:
+        bench_returns = _daily_returns(np.asarray(benchmark, dtype=float))[np.newaxis, :]
+        joint = has_return & ~np.isnan(bench_returns)
+        joint_returns = np.where(joint, returns, np.nan)
+        joint_bench = np.where(joint, bench_returns, np.nan)
+
+    results = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for window in windows:
+            full = _full_windows(has_return, window)
+            sum_r = _rolling_sum(returns, window)
+            sum_r2 = _rolling_sum(returns ** 2, window)
+            mean = sum_r / window
+            variance = np.maximum((sum_r2 - sum_r * mean) / (window - 1), 0.0)
+            volatility = np.sqrt(variance * TRADING_DAYS_PER_YEAR)
+            annual_excess = (mean - rf_daily) * TRADING_DAYS_PER_YEAR
+            downside_dev = np.sqrt(_rolling_sum(downside, window) / window * TRADING_DAYS_PER_YEAR)
+
+            sharpe = np.where(volatility > 0, annual_excess / volatility, np.nan)
+            sortino = np.where(downside_dev > 0, annual_excess / downside_dev, np.nan)
+
+            beta = np.full(values.shape, np.nan)
+            if bench_returns is not None:
+                sum_b = _rolling_sum(joint_bench, window)
+                covariance = _rolling_sum(joint_returns * joint_bench, window) - _rolling_sum(joint_returns, window) * sum_b / window
+                bench_variance = _rolling_sum(joint_bench ** 2, window) - sum_b * sum_b / window
+                beta = np.where(_full_windows(joint, window) & (bench_variance > 0),
+                                covariance / bench_variance, np.nan)
+
+            drawdown, age = _rolling_drawdown(values, window)
+            full_values = _full_windows(~np.isnan(values), window)
+
+            results[window] = {
+                'volatility': np.where(full, volatility, np.nan),
+                'sharpe_ratio': np.where(full, sharpe, np.nan),
+                'sortino_ratio': np.where(full, sortino, np.nan),
+                'max_drawdown_pct': np.where(full_values, drawdown * 100, np.nan),
+                'drawdown_days': np.where(full_values, age, np.nan),
+                'beta': beta,
+            }
+    return results
+
+
+def rolling_metrics_frame(timeline_df: pd.DataFrame, benchmark_df: Optional[pd.DataFrame] = None,
+                          windows: Sequence[int] = ROLLING_WINDOWS,
+                          risk_free_rate: float = RISK_FREE_RATE) -> pd.DataFrame:
+    """
+    Rolling metrics for every analysis in a timeline frame.
+
+    Args:
+        timeline_df: Frame with analysis_id, date and total_value (TIMELINE_COLUMNS)
+        benchmark_df: Benchmark closes with date and close_price (forward filled onto timeline days)
+        windows: Window lengths in trading days
+        risk_free_rate: Annual risk-free rate for Sharpe and Sortino
+
+    Returns:
+        Long frame with ROLLING_COLUMNS, one row per analysis, day and window
+    """
+    if timeline_df is None or timeline_df.empty:
+        return pd.DataFrame(columns=ROLLING_COLUMNS)
+
+    values = timeline_df.pivot_table(index='analysis_id', columns='date', values='total_value', aggfunc='last')
+    analysis_ids = values.index.tolist()
+    days = values.columns.tolist()
+
+    benchmark = None
+    if benchmark_df is not None and not benchmark_df.empty:
+        closes = pd.Series(
+            pd.to_numeric(benchmark_df['close_price'], errors='coerce').to_numpy(),
+            index=pd.to_datetime(benchmark_df['date']),
+        ).sort_index()
+        closes = closes[~closes.index.duplicated(keep='last')]
+        benchmark = closes.reindex(pd.to_datetime(days), method='ffill').to_numpy()
+
+    metrics = compute_rolling_metrics(values.to_numpy(dtype=float), benchmark, windows, risk_free_rate)
+
+    present = values.notna().to_numpy()
+    rows, cols = np.nonzero(present)
+    frames = []
+    for window, arrays in metrics.items():
+        frame = pd.DataFrame({
+            'analysis_id': np.asarray(analysis_ids)[rows],
+            'date': np.asarray(days, dtype=object)[cols],
+            'window': window,
+        })
+        for metric in METRIC_COLUMNS:
+            frame[metric] = arrays[metric][rows, cols]
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)[ROLLING_COLUMNS]
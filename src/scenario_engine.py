@@ -0,0 +1,284 @@
+"""
+What-If Scenario Engine
+
+Evaluates hypothetical BUY/SELL/DIVIDEND/SPLIT state changes against a
+base analysis without writing to the database:
+- ScenarioBase holds the base timeline, its cumulative position matrix and
+  the close matrix, built once per base analysis
+- A scenario is applied as a delta from its earliest changed trading day:
+  only the changed symbols' quantities and the cash flows are accumulated
+  and valued against the cached closes, then added to the base values
+
+For changes dated on trading days the result matches what add_transaction
+followed by a timeline rebuild would produce, at a fraction of the cost,
+so many scenarios can be compared side by side interactively.
+"""
+
+import time
+import logging
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .timeline_engine import PriceMatrix, evaluate_analysis_timeline, _transaction_fields
+except ImportError:
+    from timeline_engine import PriceMatrix, evaluate_analysis_timeline, _transaction_fields
+
+logger = logging.getLogger(__name__)
+
+SCENARIO_TYPES = ('BUY', 'SELL', 'DIVIDEND', 'SPLIT')
+
+SCENARIO_COLUMNS = [
+    'date', 'total_value', 'cash_position', 'equity_value', 'base_total_value', 'delta_value'
+]
+SUMMARY_COLUMNS = [
+    'scenario', 'valid', 'message', 'changes', 'delta_from',
+    'end_total_value', 'end_delta_value', 'max_delta_value', 'min_delta_value', 'milliseconds'
+]
+
+
+def transaction_cash_change(transaction_type: str, quantity_change: float, price_per_share: float) -> float:
+    """Cash change of a state change (shared by add_transaction and scenarios)"""
+    if transaction_type == 'BUY':
+        return -abs(quantity_change) * price_per_share  # Cash decreases
+    elif transaction_type == 'SELL':
+        return abs(quantity_change) * price_per_share   # Cash increases
+    elif transaction_type == 'DIVIDEND':
+        return abs(quantity_change) * price_per_share   # Cash increases, quantity_change should be 0
+    elif transaction_type == 'SPLIT':
+        return 0  # No cash change for splits
+    elif transaction_type == 'CASH_ADJUSTMENT':
+        return quantity_change  # Direct cash adjustment
+    else:
+        return 0
+
+
+@dataclass
+class HypotheticalChange:
+    """A state change that is evaluated but never stored"""
+    symbol: str
+    transaction_type: str
+    quantity_change: float
+    price_per_share: float
+    transaction_date: date
+
+    def __post_init__(self):
+        # Stored state changes carry signed quantities: BUY adds shares, SELL removes them
+        if self.transaction_type == 'BUY':
+            self.quantity_change = abs(self.quantity_change)
+        elif self.transaction_type == 'SELL':
+            self.quantity_change = -abs(self.quantity_change)
+
+    @property
+    def cash_change(self) -> float:
+        return float(transaction_cash_change(self.transaction_type, self.quantity_change, self.price_per_share))
+
+    @classmethod
+    def from_dict(cls, change: Dict) -> 'HypotheticalChange':
+        return cls(
+            symbol=change['symbol'],
+            transaction_type=change['transaction_type'].upper(),
+            quantity_change=float(change.get('quantity_change') or 0),
+            price_per_share=float(change.get('price_per_share') or 0),
+            transaction_date=pd.Timestamp(change['transaction_date']).date(),
+        )
+
+
+@dataclass
+class ScenarioResult:
+    """Timeline and headline figures of one evaluated scenario"""
+    name: str
+    timeline: pd.DataFrame
+    valid: bool
+    message: str
+    changes: int
+    delta_from: Optional[date]
+    seconds: float
+
+    def summary(self) -> Dict:
+        delta = self.timeline['delta_value'] if not self.timeline.empty else pd.Series(dtype=float)
+        return {
+            'scenario': self.name,
+            'valid': self.valid,
+            'message': self.message,
+            'changes': self.changes,
+            'delta_from': self.delta_from,
+            'end_total_value': float(self.timeline['total_value'].iloc[-1]) if not self.timeline.empty else None,
+            'end_delta_value': float(delta.iloc[-1]) if not delta.empty else 0.0,
+            'max_delta_value': float(delta.max()) if not delta.empty else 0.0,
+            'min_delta_value': float(delta.min()) if not delta.empty else 0.0,
+            'milliseconds': round(self.seconds * 1000, 2),
+        }
+
+
+class ScenarioBase:
+    """Base analysis state shared by every scenario evaluated against it"""
+
+    def __init__(self, analysis_id: int, analysis_name: str, trading_days: List[date],
+                 transactions: List, start_cash: float, price_matrix: PriceMatrix):
+        """
+        Args:
+            analysis_id: Base analysis ID
+            analysis_name: Base analysis name
+            trading_days: Trading days of the base timeline
+            transactions: Stored state changes of the base analysis (dict or tuple rows)
+            start_cash: Base analysis start cash
+            price_matrix: Closes covering trading_days (extended with add_prices for new symbols)
+        """
+        self.analysis_id = analysis_id
+        self.analysis_name = analysis_name
+        self.trading_days = list(trading_days)
+        self.price_matrix = price_matrix
+        self._rows = price_matrix.day_positions(self.trading_days)
+
+        timeline = evaluate_analysis_timeline(
+            analysis_id, analysis_name, self.trading_days, transactions, start_cash, price_matrix)
+        self.base_total = timeline['total_value'].to_numpy(dtype=float)
+        self.base_cash = timeline['cash_position'].to_numpy(dtype=float)
+        self.base_equity = timeline['equity_value'].to_numpy(dtype=float)
+
+        # Cumulative base quantities (days x symbols), the same accumulation the engine values
+        day_lookup = {d: i for i, d in enumerate(self.trading_days)}
+        held = {}
+        for transaction in transactions:
+            trans_date, symbol, trans_type, qty_change, _ = _transaction_fields(transaction)
+            row = day_lookup.get(trans_date)
+            if row is not None and symbol and trans_type:
+                held.setdefault(symbol, []).append((row, float(qty_change or 0)))
+        self.base_symbols = sorted(held)
+        self._base_column = {s: i for i, s in enumerate(self.base_symbols)}
+        delta = np.zeros((len(self.trading_days), len(self.base_symbols)))
+        for symbol, changes in held.items():
+            for row, quantity in changes:
+                delta[row, self._base_column[symbol]] += quantity
+        self.base_positions = np.cumsum(delta, axis=0)
+
+    def missing_symbols(self, changes: Sequence[HypotheticalChange]) -> List[str]:
+        """Symbols of the changes without a column in the cached close matrix"""
+        symbols = sorted({c.symbol for c in changes})
+        return [s for s, col in zip(symbols, self.price_matrix.symbol_positions(symbols)) if col < 0]
+
+    def add_prices(self, price_df: pd.DataFrame, symbols: List[str]):
+        """Extend the cached close matrix with new symbols (long frame: symbol, date, close_price)"""
+        priced = set(price_df['symbol']) if price_df is not None and not price_df.empty else set()
+        symbols = [s for s in symbols if s in priced and s not in self.price_matrix.symbols]
+        if not symbols:
+            return
+        extra = PriceMatrix.from_price_frame(price_df, self.price_matrix.days, symbols)
+        self.price_matrix = PriceMatrix(
+            self.price_matrix.days, self.price_matrix.symbols + symbols,
+            np.hstack([self.price_matrix.closes, extra.closes])
+        )
+
+    def evaluate(self, changes: Sequence[HypotheticalChange], name: str = 'Scenario') -> ScenarioResult:
+        """
+        Base timeline with the hypothetical changes applied.
+
+        Args:
+            changes: Hypothetical state changes
+            name: Scenario label
+
+        Returns:
+            ScenarioResult with SCENARIO_COLUMNS, one row per base trading day
+        """
+        started = time.perf_counter()
+        n_days = len(self.trading_days)
+        total, cash, equity = self.base_total.copy(), self.base_cash.copy(), self.base_equity.copy()
+
+        problems = []
+        rows, symbols, quantities, cash_changes = [], [], [], []
+        for change in changes:
+            if change.transaction_type not in SCENARIO_TYPES:
+                problems.append(f"Unsupported transaction type {change.transaction_type}")
+                continue
+            row = bisect_left(self.trading_days, change.transaction_date)
+            if n_days == 0 or change.transaction_date < self.trading_days[0] or row >= n_days:
+                problems.append(f"{change.transaction_type} {change.symbol} on {change.transaction_date} "
+                                f"is outside the analysis period")
+                continue
+            if self.trading_days[row] != change.transaction_date:
+                # The base timeline ignores changes on non-trading days, so shifting them would diverge
+                problems.append(f"{change.transaction_type} {change.symbol} on {change.transaction_date} "
+                                f"is not a trading day")
+                continue
+            rows.append(row)
+            symbols.append(change.symbol)
+            quantities.append(float(change.quantity_change))
+            cash_changes.append(change.cash_change)
+
+        delta_from = None
+        if rows:
+            start = min(rows)
+            delta_from = self.trading_days[start]
+            offsets = np.asarray(rows) - start
+            span = n_days - start
+
+            cash_delta = np.zeros(span)
+            np.add.at(cash_delta, offsets, cash_changes)
+            cash_delta = np.cumsum(cash_delta)
+
+            changed = sorted(set(symbols))
+            column = {s: i for i, s in enumerate(changed)}
+            quantity_delta = np.zeros((span, len(changed)))
+            np.add.at(quantity_delta, (offsets, [column[s] for s in symbols]), quantities)
+            quantity_delta = np.cumsum(quantity_delta, axis=0)
+
+            held = quantity_delta.copy()
+            for symbol, i in column.items():
+                if symbol in self._base_column:
+                    held[:, i] += self.base_positions[start:, self._base_column[symbol]]
+            negative = [s for s, i in column.items() if (held[:, i] < -1e-9).any()]
+            if negative:
+                problems.append(f"Negative quantity for {', '.join(negative)}")
+
+            cols = self.price_matrix.symbol_positions(changed)
+            closes = np.zeros((span, len(changed)))
+            known = cols >= 0
+            if known.any():
+                closes[:, known] = self.price_matrix.closes[np.ix_(self._rows[start:], cols[known])]
+            unpriced = [s for s, k in zip(changed, known) if not k]
+            if unpriced:
+                problems.append(f"No prices for {', '.join(unpriced)}")
+
+            equity_delta = np.einsum('ij,ij->i', quantity_delta, closes)
+            cash[start:] += cash_delta
+            equity[start:] += equity_delta
+            total[start:] += cash_delta + equity_delta
+
+        timeline = pd.DataFrame({
+            'date': self.trading_days,
+            'total_value': total,
+            'cash_position': cash,
+            'equity_value': equity,
+            'base_total_value': self.base_total,
+            'delta_value': total - self.base_total,
+        }, columns=SCENARIO_COLUMNS)
+
+        return ScenarioResult(
+            name=name, timeline=timeline, valid=not problems,
+            message='; '.join(problems) if problems else 'OK',
+            changes=len(rows), delta_from=delta_from,
+            seconds=time.perf_counter() - started,
+        )
+
+
+def compare_scenarios(base: ScenarioBase,
+                      scenarios: Dict[str, Sequence[HypotheticalChange]]) -> Tuple[pd.DataFrame, Dict[str, ScenarioResult]]:
+    """
+    Evaluate several scenarios against one base.
+
+    Args:
+        base: Shared base state
+        scenarios: Scenario name -> hypothetical changes
+
+    Returns:
+        Tuple of (one summary row per scenario with SUMMARY_COLUMNS, name -> ScenarioResult)
+    """
+    results = {name: base.evaluate(changes, name) for name, changes in scenarios.items()}
+    summary = pd.DataFrame([result.summary() for result in results.values()], columns=SUMMARY_COLUMNS)
+    return summary, results
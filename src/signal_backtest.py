@@ -0,0 +1,307 @@
+"""
+Signal Backtester
+
+Scores stored signal_event rows against the daily_equity_technicals price
+store, fully vectorized over all signals of a run:
+- forward 1/5/20-bar returns from the signal bar close, signed by side
+  (a SELL signal pays when the price falls)
+- hit rate: share of evaluated signals with a positive signed return
+- MAE/MFE: worst/best signed excursion of the highs/lows over the next
+  EXCURSION_BARS bars
+- ATR-normalized payoff: signed forward move in units of the ATR14 at the signal
+
+Results are summarised per strategy_key and strength and cached per
+signal_run (refreshed when the run's signal count or completion changes, or
+when bars are added to the price window the run is scored against).
+"""
+
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .ohlcv_bars import OHLCVBars, BAR_COLUMNS
+except ImportError:
+    from ohlcv_bars import OHLCVBars, BAR_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+FORWARD_HORIZONS = (1, 5, 20)
+EXCURSION_BARS = 20
+ATR_PERIOD = 14
+
+SIGNAL_COLUMNS = ['symbol', 'bar_date', 'strategy_key', 'action', 'strength', 'close_at_signal']
+
+OUTCOME_COLUMNS = (
+    SIGNAL_COLUMNS + ['entry_price', 'atr14']
+    + [f'return_{h}d' for h in FORWARD_HORIZONS]
+    + [f'payoff_atr_{h}d' for h in FORWARD_HORIZONS]
+    + ['mae', 'mfe']
+)
+
+SUMMARY_COLUMNS = (
+    ['strategy_key', 'base_strategy', 'action', 'strength', 'signals', 'evaluated']
+    + [f'{metric}_{h}d' for h in FORWARD_HORIZONS for metric in ('hit_rate', 'avg_return', 'payoff_atr')]
+    + ['avg_mae', 'avg_mfe', 'worst_mae', 'best_mfe']
+)
+
+
+def signal_outcomes(signals: pd.DataFrame, bars: OHLCVBars,
+                    horizons: Sequence[int] = FORWARD_HORIZONS,
+                    excursion_bars: int = EXCURSION_BARS) -> pd.DataFrame:
+    """
+    Forward returns, excursions and ATR payoffs of every signal.
+
+    Args:
+        signals: Frame with SIGNAL_COLUMNS (action 'B' or 'S')
+        bars: Price store covering the signal bars and the bars after them
+        horizons: Forward horizons in bars
+        excursion_bars: Bars after the signal scanned for MAE/MFE
+
+    Returns:
+        One row per signal with OUTCOME_COLUMNS (NaN where the bars are not available yet)
+    """
+    outcomes = signals.reindex(columns=SIGNAL_COLUMNS).reset_index(drop=True)
+    if outcomes.empty or len(bars) == 0:
+        return outcomes.reindex(columns=OUTCOME_COLUMNS)
+
+    closes, highs, lows = (bars.arrays[c] for c in ('close_price', 'high_price', 'low_price'))
+    position = bars.locate(outcomes['symbol'].tolist(), outcomes['bar_date'])
+    found = position >= 0
+    row = np.where(found, position, 0)
+    end = np.where(found, bars.block_ends()[row], 0)
+    side = np.where(outcomes['action'].to_numpy() == 'S', -1.0, 1.0)
+
+    entry = np.where(found, closes[row], np.nan)
+    atr = np.where(found, bars.atr(ATR_PERIOD)[row], np.nan)
+    outcomes['entry_price'] = entry
+    outcomes['atr14'] = atr
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for h in horizons:
+            target = row + h
+            ok = found & (target < end)
+            move = np.where(ok, closes[np.minimum(target, len(closes) - 1)] - entry, np.nan) * side
+            outcomes[f'return_{h}d'] = move / entry
+            outcomes[f'payoff_atr_{h}d'] = np.where(atr > 0, move / atr, np.nan)
+
+        # Excursions over the next bars of the same symbol (partial windows for recent signals)
+        offsets = row[:, None] + np.arange(1, excursion_bars + 1)
+        inside = found[:, None] & (offsets < end[:, None])
+        clipped = np.minimum(offsets, len(closes) - 1)
+        highest = np.where(inside, highs[clipped], -np.inf).max(axis=1)
+        lowest = np.where(inside, lows[clipped], np.inf).min(axis=1)
+        any_bar = inside.any(axis=1)
+        best = np.where(side > 0, highest / entry - 1, 1 - lowest / entry)
+        worst = np.where(side > 0, lowest / entry - 1, 1 - highest / entry)
+        outcomes['mfe'] = np.where(any_bar, best, np.nan)
+        outcomes['mae'] = np.where(any_bar, worst, np.nan)
+
+    return outcomes.reindex(columns=OUTCOME_COLUMNS)
+
+
+def summarize_outcomes(outcomes: pd.DataFrame, horizons: Sequence[int] = FORWARD_HORIZONS) -> pd.DataFrame:
+    """
+    Aggregate signal outcomes per strategy_key and strength.
+
+    Returns:
+        One row per (strategy_key, action, strength) with SUMMARY_COLUMNS, strongest edge first
+    """
+    if outcomes.empty:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+
+    frame = outcomes.copy()
+    frame['base_strategy'] = frame['strategy_key'].str[:4]
+    frame['evaluated'] = frame[f'return_{horizons[0]}d'].notna()
+    aggregations = {
+        'signals': ('strategy_key', 'size'),
+        'evaluated': ('evaluated', 'sum'),
+        'avg_mae': ('mae', 'mean'),
+        'avg_mfe': ('mfe', 'mean'),
+        'worst_mae': ('mae', 'min'),
+        'best_mfe': ('mfe', 'max'),
+    }
+    for h in horizons:
+        returns = frame[f'return_{h}d']
+        frame[f'hit_{h}d'] = (returns > 0).astype(float).where(returns.notna())
+        aggregations[f'hit_rate_{h}d'] = (f'hit_{h}d', 'mean')
+        aggregations[f'avg_return_{h}d'] = (f'return_{h}d', 'mean')
+        aggregations[f'payoff_atr_{h}d'] = (f'payoff_atr_{h}d', 'mean')
+
+    summary = (frame.groupby(['strategy_key', 'base_strategy', 'action', 'strength'], dropna=False)
+               .agg(**aggregations).reset_index())
+    summary['evaluated'] = summary['evaluated'].astype(int)
+    summary = summary.sort_values(f'payoff_atr_{horizons[-1]}d', ascending=False, na_position='last')
+    return summary.reindex(columns=SUMMARY_COLUMNS).reset_index(drop=True)
+
+
+@dataclass
+class BacktestResult:
+    """Backtest of one signal run"""
+    run_id: str
+    outcomes: pd.DataFrame
+    summary: pd.DataFrame
+    seconds: float
+
+    def to_dict(self, include_signals: bool = False) -> Dict:
+        """JSON-friendly representation (NaN becomes None)"""
+        def records(frame):
+            frame = frame.astype(object).where(frame.notna(), None)
+            for column in ('bar_date',):
+                if column in frame:
+                    frame[column] = frame[column].map(lambda d: d.isoformat() if d is not None else None)
+            return frame.to_dict('records')
+
+        result = {
+            'run_id': self.run_id,
+            'signals': len(self.outcomes),
+            'evaluated': int(self.outcomes[f'return_{FORWARD_HORIZONS[0]}d'].notna().sum()) if not self.outcomes.empty else 0,
+            'horizons': list(FORWARD_HORIZONS),
+            'summary': records(self.summary),
+            'seconds': round(self.seconds, 3),
+        }
+        if include_signals:
+            result['outcomes'] = records(self.outcomes)
+        return result
+
+
+def _bar_window(first_signal, last_signal) -> Tuple[date, date]:
+    """Calendar dates covering ATR warm-up before the first signal and the forward bars after the last"""
+    forward_bars = max(max(FORWARD_HORIZONS), EXCURSION_BARS)
+    return (pd.Timestamp(first_signal).date() - timedelta(days=ATR_PERIOD * 2 + 10),
+            pd.Timestamp(last_signal).date() + timedelta(days=forward_bars * 2 + 10))
+
+
+class SignalBacktester:
+    """Backtests signal runs against the price store, caching results per run"""
+
+    def __init__(self, db):
+        """
+        Args:
+            db: Database manager with a connection() context manager
+        """
+        self.db = db
+        self._cache: Dict[str, Tuple[Tuple, BacktestResult]] = {}
+        self._lock = threading.Lock()
+
+    def backtest_run(self, run_id: str, refresh: bool = False) -> Optional[BacktestResult]:
+        """
+        Backtest every non-provisional signal of a signal run.
+
+        Args:
+            run_id: Signal run ID
+            refresh: Ignore the cached result
+
+        Returns:
+            BacktestResult, or None on error
+        """
+        try:
+            version = self._run_version(run_id)
+            with self._lock:
+                cached = self._cache.get(run_id)
+            if cached and cached[0] == version and not refresh:
+                return cached[1]
+
+            started = time.perf_counter()
+            signals = self._load_signals(run_id)
+            bars = self._load_bars(signals)
+            outcomes = signal_outcomes(signals, bars)
+            result = BacktestResult(run_id, outcomes, summarize_outcomes(outcomes),
+                                    time.perf_counter() - started)
+            with self._lock:
+                self._cache[run_id] = (version, result)
+
+            logger.info(f"Backtested run {run_id}: {len(signals)} signals, "
+                        f"{len(bars)} bars in {result.seconds * 1000:.1f}ms")
+            return result
+
+        except Exception as e:
+            logger.error(f"Error backtesting signal run {run_id}: {e}")
+            return None
+
+    def invalidate(self, run_id: Optional[str] = None):
+        """Drop one cached run (or all)"""
+        with self._lock:
+            if run_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(run_id, None)
+
+    def _run_version(self, run_id: str) -> Tuple:
+        """
+        Signal count, date range and completion of a run plus the bar count and latest
+        trade date of its price window; a change invalidates the cache, so signals whose
+        forward horizons were not available yet are re-scored once new bars are stored.
+        """
+        with self.db.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT COUNT(se.strategy_key), MIN(se.bar_date), MAX(se.bar_date), MAX(sr.completed_at)
+                    FROM signal_run sr
+                    LEFT JOIN signal_event se ON se.run_id = sr.run_id AND se.provisional = false
+                    WHERE sr.run_id = %s
+                """, (run_id,))
+                signals = tuple(cur.fetchone() or ())
+                if not signals or not signals[0]:
+                    return signals
+
+                start, end = _bar_window(signals[1], signals[2])
+                cur.execute("""
+                    SELECT COUNT(*), MAX(trade_date)
+                    FROM daily_equity_technicals
+                    WHERE symbol IN (
+                        SELECT symbol FROM signal_event WHERE run_id = %s AND provisional = false
+                    )
+                    AND trade_date BETWEEN %s AND %s
+                """, (run_id, start, end))
+                return signals + tuple(cur.fetchone() or ())
+
+    def _load_signals(self, run_id: str) -> pd.DataFrame:
+        with self.db.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT symbol, bar_date, strategy_key, action, strength, close_at_signal
+                    FROM signal_event
+                    WHERE run_id = %s AND provisional = false
+                    ORDER BY bar_date, symbol, strategy_key
+                """, (run_id,))
+                rows = cur.fetchall()
+        return pd.DataFrame([tuple(row) for row in rows], columns=SIGNAL_COLUMNS)
+
+    def _load_bars(self, signals: pd.DataFrame) -> OHLCVBars:
+        """One query for every signal symbol, from ATR warm-up to the last forward bar"""
+        if signals.empty:
+            return OHLCVBars.from_frame(None)
+        start, end = _bar_window(signals['bar_date'].min(), signals['bar_date'].max())
+
+        with self.db.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT symbol, trade_date, open_price, high_price, low_price, close_price, volume
+                    FROM daily_equity_technicals
+                    WHERE symbol = ANY(%s) AND trade_date BETWEEN %s AND %s
+                    ORDER BY symbol, trade_date
+                """, (sorted(signals['symbol'].unique().tolist()), start, end))
+                rows = cur.fetchall()
+        return OHLCVBars.from_frame(pd.DataFrame([tuple(row) for row in rows], columns=BAR_COLUMNS))
+
+
+_backtesters: Dict[str, SignalBacktester] = {}
+_backtesters_lock = threading.Lock()
+
+
+def get_signal_backtester(db) -> SignalBacktester:
+    """Process-wide backtester (and result cache) per database URL"""
+    key = getattr(db, 'db_url', None) or str(id(db))
+    with _backtesters_lock:
+        backtester = _backtesters.get(key)
+        if backtester is None:
+            backtester = SignalBacktester(db)
+            _backtesters[key] = backtester
+        return backtester
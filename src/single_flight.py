@@ -0,0 +1,274 @@
+"""
+Single-Flight Request Coalescing
+
+Concurrent identical lookups (same key) share one in-flight fetch instead of
+each calling the upstream source:
+- The first caller for a key becomes the leader and fetches; callers that
+  arrive while it is running join and receive the same result (or error)
+- Results are kept in a short-TTL in-process cache
+- With Redis available, results are also shared between processes and a
+  per-key Redis lock makes other processes wait for the fetching process
+  instead of issuing the same request
+
+Counters: hits (served from cache), joins (waited on an in-flight fetch),
+misses (fetched by this caller), plus the Redis-side equivalents.
+"""
+
+import os
+import math
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """One in-flight fetch that joiners wait on"""
+    __slots__ = ('event', 'found', 'value', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.found = False
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent fetches per key and caches their results briefly"""
+
+    def __init__(self, name: str, ttl_seconds: float = 30.0, redis_client=None,
+                 encode: Optional[Callable[[Any], str]] = None,
+                 decode: Optional[Callable[[str], Any]] = None,
+                 lock_timeout_seconds: float = 30.0, poll_interval_seconds: float = 0.05,
+                 max_entries: int = 2048):
+        """
+        Args:
+            name: Namespace for Redis keys and log messages
+            ttl_seconds: How long a fetched result is served from cache
+            redis_client: Optional redis client for cross-process locks and results
+            encode: Serializer for results shared through Redis
+            decode: Deserializer for results shared through Redis
+            lock_timeout_seconds: Expiry of the Redis fetch lock (and the longest wait on it)
+            poll_interval_seconds: Poll interval while another process holds the lock
+            max_entries: Expired entries are pruned once the cache grows past this
+        """
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.redis = redis_client if (encode and decode) else None
+        self.encode = encode
+        self.decode = decode
+        self.lock_timeout_seconds = lock_timeout_seconds
+        self.poll_interval_seconds = poll_interval_seconds
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._cache: Dict[Hashable, tuple] = {}  # key -> (expires_at, value)
+        self._inflight: Dict[Hashable, _Call] = {}
+        self._redis_retry_at = 0.0
+        self.stats = {
+            'hits': 0, 'joins': 0, 'misses': 0,
+            'redis_hits': 0, 'redis_waits': 0, 'errors': 0,
+        }
+
+    # ------------------------------------------------------------------ public
+
+    def do(self, key: Hashable, fetch: Callable[[], Any]) -> Any:
+        """
+        Fetch one key, sharing the result with concurrent callers.
+
+        Args:
+            key: Request identity
+            fetch: Callable producing the value
+
+        Returns:
+            The fetched or cached value
+        """
+        return self.do_many([key], lambda keys: {keys[0]: fetch()}).get(key)
+
+    def do_many(self, keys: List[Hashable],
+                fetch_many: Callable[[List[Hashable]], Dict[Hashable, Any]]) -> Dict[Hashable, Any]:
+        """
+        Fetch several keys with one upstream call for the ones nobody else is fetching.
+
+        Args:
+            keys: Request identities
+            fetch_many: Callable taking the keys to fetch and returning key -> value;
+                        keys it omits are reported as not found and not cached
+
+        Returns:
+            Dictionary of key -> value for every key that was found
+
+        Raises:
+            Whatever fetch_many raised, for the leader and every joiner of that fetch
+        """
+        results: Dict[Hashable, Any] = {}
+        joined: Dict[Hashable, _Call] = {}
+        owned: List[Hashable] = []
+
+        now = time.monotonic()
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                cached = self._cache.get(key)
+                if cached is not None and cached[0] > now:
+                    results[key] = cached[1]
+                    self.stats['hits'] += 1
+                elif key in self._inflight:
+                    joined[key] = self._inflight[key]
+                    self.stats['joins'] += 1
+                else:
+                    self._inflight[key] = _Call()
+                    owned.append(key)
+                    self.stats['misses'] += 1
+
+        if owned:
+            results.update(self._lead(owned, fetch_many))
+
+        for key, call in joined.items():
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            if call.found:
+                results[key] = call.value
+
+        return results
+
+    def clear(self):
+        """Drop every cached result (in-flight fetches are unaffected)"""
+        with self._lock:
+            self._cache.clear()
+
+    # ----------------------------------------------------------------- leader
+
+    def _lead(self, owned: List[Hashable], fetch_many) -> Dict[Hashable, Any]:
+        values: Dict[Hashable, Any] = {}
+        redis_locks = []
+        try:
+            to_fetch = owned
+            if self._redis_usable():
+                values, to_fetch, redis_locks = self._coordinate(owned)
+            if to_fetch:
+                fetched = fetch_many(list(to_fetch)) or {}
+                fetched = {key: value for key, value in fetched.items() if key in to_fetch}
+                values.update(fetched)
+                if fetched and self._redis_usable():
+                    self._publish(fetched)
+        except BaseException as e:
+            with self._lock:
+                self.stats['errors'] += 1
+                for key in owned:
+                    call = self._inflight.pop(key)
+                    call.error = e
+                    call.event.set()
+            raise
+        finally:
+            for lock in redis_locks:
+                self._release(lock)
+
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            if len(self._cache) >= self.max_entries:
+                self._prune()
+            for key in owned:
+                call = self._inflight.pop(key)
+                if key in values:
+                    call.found = True
+                    call.value = values[key]
+                    self._cache[key] = (expires_at, values[key])
+                call.event.set()
+        return values
+
+    def _prune(self):
+        now = time.monotonic()
+        for key in [key for key, (expires_at, _) in self._cache.items() if expires_at <= now]:
+            del self._cache[key]
+
+    # ------------------------------------------------------------------ redis
+
+    def _redis_key(self, kind: str, key: Hashable) -> str:
+        return f"singleflight:{self.name}:{kind}:{key}"
+
+    def _redis_usable(self) -> bool:
+        return self.redis is not None and time.monotonic() >= self._redis_retry_at
+
+    def _redis_failed(self, e: Exception):
+        logger.warning(f"Redis unavailable for {self.name} request coalescing, using process-local only: {e}")
+        self._redis_retry_at = time.monotonic() + 60.0
+
+    def _shared_values(self, keys: List[Hashable]) -> Dict[Hashable, Any]:
+        payloads = self.redis.mget([self._redis_key('value', key) for key in keys])
+        return {key: self.decode(payload) for key, payload in zip(keys, payloads) if payload is not None}
+
+    def _coordinate(self, owned: List[Hashable]):
+        """Resolve owned keys through Redis: shared results, our locks, or waiting on another process"""
+        try:
+            values = self._shared_values(owned)
+            with self._lock:
+                self.stats['redis_hits'] += len(values)
+
+            locks, to_fetch, held_elsewhere = [], [], []
+            for key in owned:
+                if key in values:
+                    continue
+                lock = self.redis.lock(self._redis_key('lock', key), timeout=self.lock_timeout_seconds,
+                                       blocking=False)
+                if lock.acquire():
+                    locks.append(lock)
+                    to_fetch.append(key)
+                else:
+                    held_elsewhere.append(key)
+
+            if held_elsewhere:
+                with self._lock:
+                    self.stats['redis_waits'] += len(held_elsewhere)
+                deadline = time.monotonic() + self.lock_timeout_seconds
+                while held_elsewhere and time.monotonic() < deadline:
+                    time.sleep(self.poll_interval_seconds)
+                    values.update(self._shared_values(held_elsewhere))
+                    held_elsewhere = [key for key in held_elsewhere
+                                      if key not in values and self.redis.exists(self._redis_key('lock', key))]
+                # The other process gave up or timed out: fetch the rest ourselves
+                to_fetch.extend(key for key in owned if key not in values and key not in to_fetch)
+
+            return values, to_fetch, locks
+        except Exception as e:
+            self._redis_failed(e)
+            return {}, owned, []
+
+    def _publish(self, values: Dict[Hashable, Any]):
+        try:
+            expiry = max(1, math.ceil(self.ttl_seconds))
+            with self.redis.pipeline(transaction=False) as pipe:
+                for key, value in values.items():
+                    pipe.set(self._redis_key('value', key), self.encode(value), ex=expiry)
+                pipe.execute()
+        except Exception as e:
+            self._redis_failed(e)
+
+    def _release(self, lock):
+        try:
+            lock.release()
+        except Exception as e:
+            logger.debug(f"Could not release {self.name} fetch lock: {e}")
+
+
+def connect_shared_redis(url: Optional[str] = None):
+    """
+    Redis client for cross-process coalescing, or None when Redis is unreachable.
+
+    Args:
+        url: Redis URL (defaults to REDIS_URL, then redis://localhost:6379)
+
+    Returns:
+        redis.Redis with short timeouts, or None
+    """
+    try:
+        import redis
+        client = redis.from_url(url or os.getenv('REDIS_URL', 'redis://localhost:6379'),
+                                socket_connect_timeout=1, socket_timeout=2)
+        client.ping()
+        return client
+    except Exception as e:
+        logger.info(f"Redis not available for request coalescing, using process-local only: {e}")
+        return None
@@ -5,7 +5,7 @@ Extends existing DatabaseManager with strategic signal capabilities
 
 import os
 import psycopg2
-from psycopg2.extras import RealDictCursor, Json
+from psycopg2.extras import RealDictCursor, Json, execute_values
 import pandas as pd
 from typing import List, Dict, Optional, Tuple, Any
 from datetime import date, datetime
@@ -39,7 +39,7 @@ class StrategicDatabaseManager(DatabaseManager):
             params_hash = hashlib.md5(params_json.encode()).hexdigest()
             param_set_id = str(uuid.uuid4())
             
-            with self.get_connection() as conn:
+            with self.connection() as conn:
                 with conn.cursor() as cur:
                     query = """
                     INSERT INTO parameter_set 
@@ -68,7 +68,7 @@ class StrategicDatabaseManager(DatabaseManager):
     def get_parameter_set(self, param_set_id: str) -> Optional[Dict]:
         """Get parameter set by ID"""
         try:
-            with self.get_connection() as conn:
+            with self.connection() as conn:
                 query = """
                 SELECT param_set_id, name, owner_user_id, params_json, 
                        params_hash, engine_version, created_at
@@ -97,7 +97,7 @@ class StrategicDatabaseManager(DatabaseManager):
     def list_parameter_sets(self, owner_user_id: Optional[str] = None) -> pd.DataFrame:
         """List parameter sets, optionally filtered by owner"""
         try:
-            with self.get_connection() as conn:
+            with self.connection() as conn:
                 query = """
                 SELECT param_set_id, name, owner_user_id, engine_version, created_at,
                        LENGTH(params_json) as params_size
@@ -128,7 +128,7 @@ class StrategicDatabaseManager(DatabaseManager):
         try:
             run_id = str(uuid.uuid4())
             
-            with self.get_connection() as conn:
+            with self.connection() as conn:
                 with conn.cursor() as cur:
                     query = """
                     INSERT INTO signal_run 
@@ -154,7 +154,7 @@ class StrategicDatabaseManager(DatabaseManager):
     def complete_signal_run(self, run_id: str) -> bool:
         """Mark a signal run as completed"""
         try:
-            with self.get_connection() as conn:
+            with self.connection() as conn:
                 with conn.cursor() as cur:
                     query = """
                     UPDATE signal_run 
@@ -173,7 +173,7 @@ class StrategicDatabaseManager(DatabaseManager):
     def get_signal_run(self, run_id: str) -> Optional[Dict]:
         """Get signal run details"""
         try:
-            with self.get_connection() as conn:
+            with self.connection() as conn:
                 query = """
                 SELECT sr.*, ps.name as parameter_set_name
                 FROM signal_run sr
@@ -190,6 +190,28 @@ class StrategicDatabaseManager(DatabaseManager):
             logger.error(f"Error fetching signal run {run_id}: {e}")
             return None
     
+    def list_signal_runs(self, limit: int = 50) -> pd.DataFrame:
+        """Most recent signal runs with their signal counts"""
+        try:
+            with self.connection() as conn:
+                query = """
+                SELECT sr.run_id, sr.universe_name, sr.start_date, sr.end_date,
+                       sr.completed_at, sr.notes, ps.name as parameter_set_name,
+                       COUNT(se.strategy_key) as signal_count
+                FROM signal_run sr
+                LEFT JOIN parameter_set ps ON sr.param_set_id = ps.param_set_id
+                LEFT JOIN signal_event se ON se.run_id = sr.run_id
+                GROUP BY sr.run_id, sr.universe_name, sr.start_date, sr.end_date,
+                         sr.completed_at, sr.notes, ps.name
+                ORDER BY sr.completed_at DESC NULLS FIRST
+                LIMIT %s
+                """
+                return pd.read_sql(query, conn, params=[limit])
+                
+        except Exception as e:
+            logger.error(f"Error listing signal runs: {e}")
+            return pd.DataFrame()
+    
     # ==============================================
     # Indicator Snapshot Management
     # ==============================================
@@ -197,7 +219,7 @@ class StrategicDatabaseManager(DatabaseManager):
     def save_indicator_snapshot(self, snapshot: IndicatorSnapshot) -> bool:
         """Save indicator snapshot to database"""
         try:
-            with self.get_connection() as conn:
+            with self.connection() as conn:
                 with conn.cursor() as cur:
                     query = """
                     INSERT INTO indicator_snapshot (
@@ -260,7 +282,7 @@ class StrategicDatabaseManager(DatabaseManager):
     def get_indicator_snapshot(self, symbol: str, bar_date: date) -> Optional[IndicatorSnapshot]:
         """Get indicator snapshot for specific symbol and date"""
         try:
-            with self.get_connection() as conn:
+            with self.connection() as conn:
                 query = """
                 SELECT * FROM indicator_snapshot 
                 WHERE symbol = %s AND bar_date = %s
@@ -296,7 +318,7 @@ class StrategicDatabaseManager(DatabaseManager):
     def get_latest_indicators(self, symbol: str, limit: int = 1) -> pd.DataFrame:
         """Get latest indicator snapshots for a symbol"""
         try:
-            with self.get_connection() as conn:
+            with self.connection() as conn:
                 query = """
                 SELECT * FROM indicator_snapshot 
                 WHERE symbol = %s 
@@ -317,7 +339,7 @@ class StrategicDatabaseManager(DatabaseManager):
                          param_set_id: Optional[str] = None) -> bool:
         """Save a strategic signal event"""
         try:
-            with self.get_connection() as conn:
+            with self.connection() as conn:
                 with conn.cursor() as cur:
                     query = """
                     INSERT INTO signal_event (
@@ -353,6 +375,58 @@ class StrategicDatabaseManager(DatabaseManager):
             logger.error(f"Error saving signal event: {e}")
             return False
     
+    def save_signal_events(self, signals: List[StrategicSignal], run_id: Optional[str] = None,
+                          param_set_id: Optional[str] = None, page_size: int = 1000) -> int:
+        """
+        Bulk-insert strategic signal events (same upsert as save_signal_event).
+        
+        Args:
+            signals: Signals to store
+            run_id: Signal run the signals belong to
+            param_set_id: Parameter set used to generate them
+            page_size: Rows per INSERT statement
+            
+        Returns:
+            Number of rows written (0 on error)
+        """
+        if not signals:
+            return 0
+        try:
+            rows = [(
+                run_id, param_set_id, signal.symbol, signal.bar_date,
+                signal.strategy_key, signal.action, signal.strength,
+                signal.close_at_signal, signal.volume_at_signal,
+                Json(signal.thresholds_json), Json(signal.reasons_json),
+                Json(signal.score_json), signal.provisional
+            ) for signal in signals]
+            
+            with self.connection() as conn:
+                with conn.cursor() as cur:
+                    execute_values(cur, """
+                    INSERT INTO signal_event (
+                        run_id, param_set_id, symbol, bar_date, strategy_key, action, strength,
+                        close_at_signal, volume_at_signal, thresholds_json, reasons_json, 
+                        score_json, provisional
+                    ) VALUES %s
+                    ON CONFLICT (run_id, symbol, bar_date, tf, strategy_key) DO UPDATE SET
+                        action = EXCLUDED.action,
+                        strength = EXCLUDED.strength,
+                        close_at_signal = EXCLUDED.close_at_signal,
+                        volume_at_signal = EXCLUDED.volume_at_signal,
+                        thresholds_json = EXCLUDED.thresholds_json,
+                        reasons_json = EXCLUDED.reasons_json,
+                        score_json = EXCLUDED.score_json,
+                        provisional = EXCLUDED.provisional
+                    """, rows, page_size=page_size)
+                    conn.commit()
+            
+            logger.info(f"Saved {len(rows)} signal events for run {run_id}")
+            return len(rows)
+                    
+        except Exception as e:
+            logger.error(f"Error saving signal events: {e}")
+            return 0
+    
     def get_signal_events(self, symbol: Optional[str] = None, 
                          strategy_key: Optional[str] = None,
                          date_range: Optional[Tuple[date, date]] = None,
@@ -360,7 +434,7 @@ class StrategicDatabaseManager(DatabaseManager):
                          limit: int = 100) -> pd.DataFrame:
         """Get signal events with filtering"""
         try:
-            with self.get_connection() as conn:
+            with self.connection() as conn:
                 query = """
                 SELECT se.*, s.name as strategy_name, s.category, s.description
                 FROM signal_event se
@@ -398,7 +472,7 @@ class StrategicDatabaseManager(DatabaseManager):
             if not portfolio_symbols:
                 return pd.DataFrame()
             
-            with self.get_connection() as conn:
+            with self.connection() as conn:
                 placeholders = ','.join(['%s'] * len(portfolio_symbols))
                 query = f"""
                 SELECT se.*, s.name as strategy_name, s.category
@@ -438,7 +512,7 @@ class StrategicDatabaseManager(DatabaseManager):
             if not valid_indicators:
                 return pd.DataFrame()
             
-            with self.get_connection() as conn:
+            with self.connection() as conn:
                 columns = ['symbol', 'bar_date', 'close_price'] + valid_indicators
                 column_str = ', '.join(columns)
                 
@@ -465,7 +539,7 @@ class StrategicDatabaseManager(DatabaseManager):
                             date_range: Optional[Tuple[date, date]] = None) -> pd.DataFrame:
         """Get signals for chart highlighting"""
         try:
-            with self.get_connection() as conn:
+            with self.connection() as conn:
                 query = """
                 SELECT se.bar_date, se.strategy_key, se.action, se.strength,
                        se.close_at_signal, se.reasons_json, s.name, s.category
@@ -496,7 +570,7 @@ class StrategicDatabaseManager(DatabaseManager):
         try:
             migrated_count = 0
             
-            with self.get_connection() as conn:
+            with self.connection() as conn:
                 # Get legacy signals
                 legacy_query = """
                 SELECT * FROM trading_signals 
@@ -568,7 +642,7 @@ class StrategicDatabaseManager(DatabaseManager):
     def cleanup_provisional_signals(self, days_old: int = 7) -> int:
         """Clean up old provisional signals"""
         try:
-            with self.get_connection() as conn:
+            with self.connection() as conn:
                 with conn.cursor() as cur:
                     query = """
                     DELETE FROM signal_event 
@@ -593,7 +667,7 @@ class StrategicDatabaseManager(DatabaseManager):
     def get_strategy_performance_summary(self) -> pd.DataFrame:
         """Get performance summary by strategy"""
         try:
-            with self.get_connection() as conn:
+            with self.connection() as conn:
                 query = """
                 SELECT 
                     s.base_strategy,
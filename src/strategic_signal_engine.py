@@ -6,14 +6,21 @@ Implements 12 strategic signal types with comprehensive technical analysis
 import numpy as np
 import pandas as pd
 from typing import Dict, List, Tuple, Optional, Any
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 import json
 import logging
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from enum import Enum
+from numpy.lib.stride_tricks import sliding_window_view
 import hashlib
+import time
 import uuid
 
+try:
+    from .ohlcv_bars import OHLCVBars, BAR_COLUMNS
+except ImportError:
+    from ohlcv_bars import OHLCVBars, BAR_COLUMNS
+
 logger = logging.getLogger(__name__)
 
 class StrategyCategory(Enum):
@@ -99,6 +106,243 @@ class IndicatorSnapshot:
     # Specialized (1)
     parabolic_sar: Optional[float] = None
 
+# Indicator fields of IndicatorSnapshot (everything after the OHLCV bar)
+INDICATOR_FIELDS = [f.name for f in fields(IndicatorSnapshot)][7:]
+
+# Bars (from a symbol's first valid bar) before each series is reported; NaN until then
+INDICATOR_WARMUP = {
+    'rsi6': 7, 'rsi12': 13, 'rsi14': 15, 'rsi24': 25,
+    'macd': 26, 'macd_sig': 34, 'macd_hist': 34,
+    'ppo': 26, 'ppo_sig': 34, 'ppo_hist': 34,
+    'ema5': 5, 'ema10': 10, 'ema20': 20, 'ema50': 50, 'sma20': 20, 'sma50': 50,
+    'bb_upper': 20, 'bb_middle': 20, 'bb_lower': 20, 'atr14': 15,
+    'vr24': 24, 'mfi14': 15, 'ad_line': 1,
+    'stoch_k': 14, 'stoch_d': 16, 'williams_r': 14, 'adx14': 28,
+    'parabolic_sar': 2,
+}
+
+
+@dataclass
+class IndicatorSeries:
+    """Full indicator series for a batch of symbols (symbols x bars arrays)"""
+    symbols: List[str]
+    bar_dates: Optional[np.ndarray]        # symbols x bars, None for padding
+    opens: np.ndarray
+    highs: np.ndarray
+    lows: np.ndarray
+    closes: np.ndarray
+    volumes: np.ndarray
+    values: Dict[str, np.ndarray]          # INDICATOR_FIELDS name -> symbols x bars
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.values[name]
+
+    def snapshot(self, row: int, bar: int = -1) -> IndicatorSnapshot:
+        """IndicatorSnapshot of one symbol at one bar (NaN indicators become None)"""
+        return self.snapshots_at([row], [bar])[0]
+
+    def snapshots_at(self, rows, bars) -> List[IndicatorSnapshot]:
+        """IndicatorSnapshot for each (row, bar) pair, gathered column by column"""
+        rows, bars = np.asarray(rows, dtype=int), np.asarray(bars, dtype=int)
+
+        def column(array):
+            values = array[rows, bars]
+            return np.where(np.isnan(values), None, values).tolist()
+
+        indicators = {name: column(self.values[name]) for name in INDICATOR_FIELDS}
+        bar_dates = self.bar_dates[rows, bars] if self.bar_dates is not None else [None] * len(rows)
+        opens, highs, lows, closes = (self.opens[rows, bars].tolist(), self.highs[rows, bars].tolist(),
+                                      self.lows[rows, bars].tolist(), self.closes[rows, bars].tolist())
+        volumes = np.nan_to_num(self.volumes[rows, bars]).astype(np.int64).tolist()
+
+        return [IndicatorSnapshot(
+            symbol=self.symbols[row],
+            bar_date=bar_date if bar_date is not None else date.today(),
+            open_price=opens[i], high_price=highs[i], low_price=lows[i], close_price=closes[i],
+            volume=volumes[i],
+            **{name: values[i] for name, values in indicators.items()}
+        ) for i, (row, bar_date) in enumerate(zip(rows.tolist(), bar_dates))]
+
+    def snapshots(self, bar: int = -1) -> List[IndicatorSnapshot]:
+        """IndicatorSnapshot of every symbol with a close at the given bar"""
+        rows = np.flatnonzero(~np.isnan(self.closes[:, bar]))
+        return self.snapshots_at(rows, np.full(len(rows), bar))
+
+
+def stack_price_frames(frames: Dict[str, pd.DataFrame]) -> Tuple[List[str], Dict[str, np.ndarray]]:
+    """
+    Right-align per-symbol OHLCV frames into symbols x bars arrays.
+
+    Each symbol keeps its own bar sequence (the last bar of every row is the
+    symbol's latest bar); shorter histories are left-padded with NaN.
+
+    Args:
+        frames: Symbol -> frame with bar_date, open/high/low/close_price and volume, oldest first
+
+    Returns:
+        Tuple of (symbols, dict with opens/highs/lows/closes/volumes/bar_dates arrays)
+    """
+    symbols = list(frames)
+    n_bars = max((len(frame) for frame in frames.values()), default=0)
+    arrays = {name: np.full((len(symbols), n_bars), np.nan)
+              for name in ('opens', 'highs', 'lows', 'closes', 'volumes')}
+    arrays['bar_dates'] = np.full((len(symbols), n_bars), None, dtype=object)
+
+    columns = {'opens': 'open_price', 'highs': 'high_price', 'lows': 'low_price',
+               'closes': 'close_price', 'volumes': 'volume'}
+    for row, symbol in enumerate(symbols):
+        frame = frames[symbol]
+        start = n_bars - len(frame)
+        for name, column in columns.items():
+            arrays[name][row, start:] = frame[column].to_numpy(dtype=float)
+        if 'bar_date' in frame:
+            arrays['bar_dates'][row, start:] = frame['bar_date'].to_numpy(dtype=object)
+    return symbols, arrays
+
+
+def _window(values: np.ndarray, period: int, reducer) -> np.ndarray:
+    """Trailing-window reduction along bars; NaN until the window is full or if it holds a NaN"""
+    output = np.full(values.shape, np.nan)
+    if values.shape[1] >= period:
+        output[:, period - 1:] = reducer(sliding_window_view(values, period, axis=1), axis=-1)
+    return output
+
+
+def _ewm(values: np.ndarray, alpha: float) -> np.ndarray:
+    """Recursive EMA along bars seeded with each row's first valid value (adjust=False)"""
+    if values.size == 0:
+        return values.copy()
+    return pd.DataFrame(values.T).ewm(alpha=alpha, adjust=False).mean().to_numpy().T
+
+
+def _lag(values: np.ndarray) -> np.ndarray:
+    lagged = np.full(values.shape, np.nan)
+    lagged[:, 1:] = values[:, :-1]
+    return lagged
+
+
+def _parabolic_sar(highs: np.ndarray, lows: np.ndarray, first: np.ndarray,
+                   step: float = 0.02, max_step: float = 0.2) -> np.ndarray:
+    """Wilder's parabolic SAR; one pass over bars, vectorized across symbols"""
+    n_symbols, n_bars = highs.shape
+    sar = np.full((n_symbols, n_bars), np.nan)
+    if n_bars < 2:
+        return sar
+
+    rows = np.arange(n_symbols)
+    start = np.minimum(first, n_bars - 1)
+    up = np.ones(n_symbols, dtype=bool)
+    current = lows[rows, start].copy()
+    extreme = highs[rows, start].copy()
+    af = np.full(n_symbols, step)
+
+    for i in range(1, n_bars):
+        active = i > first
+        if not active.any():
+            continue
+        high, low = highs[:, i], lows[:, i]
+        nxt = current + af * (extreme - current)
+        # SAR never moves inside the prior two bars' range
+        prior_low = np.fmin(lows[:, i - 1], lows[:, i - 2] if i >= 2 else np.nan)
+        prior_high = np.fmax(highs[:, i - 1], highs[:, i - 2] if i >= 2 else np.nan)
+        nxt = np.where(up, np.fmin(nxt, prior_low), np.fmax(nxt, prior_high))
+
+        reverse = np.where(up, low < nxt, high > nxt)
+        new_extreme = np.where(up, high > extreme, low < extreme)
+        reversed_sar = extreme
+        extreme = np.where(reverse, np.where(up, low, high),
+                           np.where(new_extreme, np.where(up, high, low), extreme))
+        af = np.where(reverse, step, np.where(new_extreme, np.minimum(af + step, max_step), af))
+        nxt = np.where(reverse, reversed_sar, nxt)
+        up = np.where(reverse, ~up, up)
+
+        current = np.where(active, nxt, current)
+        extreme = np.where(active, extreme, highs[rows, start])
+        af = np.where(active, af, step)
+        up = np.where(active, up, True)
+        sar[:, i] = np.where(active, current, np.nan)
+    return sar
+
+
+def _indicator_series(opens: np.ndarray, highs: np.ndarray, lows: np.ndarray,
+                      closes: np.ndarray, volumes: np.ndarray) -> Dict[str, np.ndarray]:
+    """Every INDICATOR_FIELDS series for symbols x bars OHLCV arrays"""
+    valid = ~np.isnan(closes)
+    bars_seen = np.cumsum(valid, axis=1)
+    first = np.where(valid.any(axis=1), valid.argmax(axis=1), closes.shape[1])
+    out = {}
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # RSI family: simple averages of gains/losses over the last `period` changes
+        deltas = closes - _lag(closes)
+        gains, losses = np.clip(deltas, 0, None), np.clip(-deltas, 0, None)
+        for period in (6, 12, 14, 24):
+            avg_gain = _window(gains, period, np.mean)
+            avg_loss = _window(losses, period, np.mean)
+            out[f'rsi{period}'] = np.where(avg_loss == 0, 100.0, 100 - 100 / (1 + avg_gain / avg_loss))
+
+        # Moving averages; EMAs are seeded with the first bar like calculate_ema
+        ema = {period: _ewm(closes, 2 / (period + 1)) for period in (5, 10, 12, 20, 26, 50)}
+        for period in (5, 10, 20, 50):
+            out[f'ema{period}'] = ema[period]
+        out['sma20'] = _window(closes, 20, np.mean)
+        out['sma50'] = _window(closes, 50, np.mean)
+
+        # MACD & PPO with EMA9 signal lines over their own history
+        macd = np.where(bars_seen >= 26, ema[12] - ema[26], np.nan)
+        ppo = np.where(bars_seen >= 26, (ema[12] - ema[26]) / ema[26] * 100, np.nan)
+        out['macd'], out['macd_sig'] = macd, _ewm(macd, 2 / 10)
+        out['macd_hist'] = macd - out['macd_sig']
+        out['ppo'], out['ppo_sig'] = ppo, _ewm(ppo, 2 / 10)
+        out['ppo_hist'] = ppo - out['ppo_sig']
+
+        # Bollinger (population std) & ATR (simple mean of true ranges)
+        std20 = _window(closes, 20, np.std)
+        out['bb_middle'] = out['sma20']
+        out['bb_upper'] = out['sma20'] + 2.0 * std20
+        out['bb_lower'] = out['sma20'] - 2.0 * std20
+        prev_close = _lag(closes)
+        true_range = np.maximum.reduce([highs - lows, np.abs(highs - prev_close), np.abs(lows - prev_close)])
+        out['atr14'] = _window(true_range, 14, np.mean)
+
+        # Volume & flow
+        out['vr24'] = volumes / _window(volumes, 24, np.mean)
+        typical = (highs + lows + closes) / 3
+        flow = typical * volumes
+        typical_change = typical - _lag(typical)
+        positive = np.where(np.isnan(typical_change), np.nan, np.where(typical_change > 0, flow, 0.0))
+        negative = np.where(np.isnan(typical_change), np.nan, np.where(typical_change < 0, flow, 0.0))
+        positive, negative = _window(positive, 14, np.sum), _window(negative, 14, np.sum)
+        out['mfi14'] = np.where(negative == 0, 100.0, 100 - 100 / (1 + positive / negative))
+        ranges = highs - lows
+        clv = np.where(ranges > 0, ((closes - lows) - (highs - closes)) / ranges, 0.0)
+        out['ad_line'] = np.where(valid, np.cumsum(np.where(valid, clv * np.nan_to_num(volumes), 0.0), axis=1), np.nan)
+
+        # Stochastic & Williams %R over 14 bars
+        highest, lowest = _window(highs, 14, np.max), _window(lows, 14, np.min)
+        out['stoch_k'] = np.where(highest == lowest, 50.0, (closes - lowest) / (highest - lowest) * 100)
+        out['stoch_d'] = _window(out['stoch_k'], 3, np.mean)
+        out['williams_r'] = (highest - closes) / (highest - lowest + 0.001) * -100
+
+        # Wilder ADX
+        up_move, down_move = highs - _lag(highs), _lag(lows) - lows
+        plus_dm = np.where((up_move > down_move) & (up_move > 0), up_move, 0.0)
+        minus_dm = np.where((down_move > up_move) & (down_move > 0), down_move, 0.0)
+        missing = np.isnan(up_move) | np.isnan(down_move)
+        plus_dm[missing] = minus_dm[missing] = np.nan
+        smoothed_tr = _ewm(true_range, 1 / 14)
+        plus_di = 100 * _ewm(plus_dm, 1 / 14) / smoothed_tr
+        minus_di = 100 * _ewm(minus_dm, 1 / 14) / smoothed_tr
+        di_sum = plus_di + minus_di
+        dx = np.where(di_sum == 0, 0.0, 100 * np.abs(plus_di - minus_di) / di_sum)
+        out['adx14'] = _ewm(np.where(bars_seen >= 15, dx, np.nan), 1 / 14)
+
+        out['parabolic_sar'] = _parabolic_sar(highs, lows, first)
+
+    for name, required in INDICATOR_WARMUP.items():
+        out[name] = np.where((bars_seen >= required) & valid, out[name], np.nan)
+    return {name: out[name] for name in INDICATOR_FIELDS}
+
 class TechnicalIndicatorCalculator:
     """Comprehensive technical indicator calculation engine"""
     
@@ -205,17 +449,74 @@ class TechnicalIndicatorCalculator:
         if len(close_prices) < 2:
             return abs(high_prices[-1] - low_prices[-1]) if len(high_prices) > 0 else 0.0
         
-        true_ranges = []
-        for i in range(1, len(close_prices)):
-            tr1 = high_prices[i] - low_prices[i]
-            tr2 = abs(high_prices[i] - close_prices[i-1])
-            tr3 = abs(low_prices[i] - close_prices[i-1])
-            true_ranges.append(max(tr1, tr2, tr3))
+        prev_close = close_prices[:-1]
+        true_ranges = np.maximum.reduce([
+            high_prices[1:] - low_prices[1:],
+            np.abs(high_prices[1:] - prev_close),
+            np.abs(low_prices[1:] - prev_close)
+        ])
         
         if len(true_ranges) < period:
             return np.mean(true_ranges)
         return np.mean(true_ranges[-period:])
     
+    @staticmethod
+    def calculate_series(closes: np.ndarray, highs: np.ndarray, lows: np.ndarray, volumes: np.ndarray,
+                         opens: Optional[np.ndarray] = None, symbols: Optional[List[str]] = None,
+                         bar_dates: Optional[np.ndarray] = None) -> IndicatorSeries:
+        """
+        Calculate full series of every indicator for many symbols in one vectorized pass.
+
+        Rows are symbols, columns are bars (oldest first). Shorter histories are
+        left-padded with NaN and each indicator is NaN until INDICATOR_WARMUP bars
+        of the symbol have been seen. After warm-up, the series used by the
+        strategies (RSI, EMA/SMA, Bollinger, ATR, VR24, stochastic %K, Williams %R,
+        MACD line) equal calculate_all_indicators on the bars up to that point;
+        signal lines, %D, MFI, A/D, ADX and SAR use their full-history definitions.
+
+        Args:
+            closes: Symbols x bars close prices
+            highs: Symbols x bars high prices
+            lows: Symbols x bars low prices
+            volumes: Symbols x bars volumes
+            opens: Symbols x bars open prices (defaults to closes)
+            symbols: Symbol per row
+            bar_dates: Symbols x bars bar dates, for snapshots
+
+        Returns:
+            IndicatorSeries with one symbols x bars array per INDICATOR_FIELDS name
+        """
+        closes = np.atleast_2d(np.asarray(closes, dtype=float))
+        highs = np.atleast_2d(np.asarray(highs, dtype=float))
+        lows = np.atleast_2d(np.asarray(lows, dtype=float))
+        volumes = np.atleast_2d(np.asarray(volumes, dtype=float))
+        opens = closes if opens is None else np.atleast_2d(np.asarray(opens, dtype=float))
+        symbols = list(symbols) if symbols is not None else [''] * closes.shape[0]
+
+        return IndicatorSeries(
+            symbols=symbols, bar_dates=bar_dates,
+            opens=opens, highs=highs, lows=lows, closes=closes, volumes=volumes,
+            values=_indicator_series(opens, highs, lows, closes, volumes)
+        )
+    
+    @staticmethod
+    def calculate_series_for_frames(frames: Dict[str, pd.DataFrame]) -> IndicatorSeries:
+        """Calculate indicator series for per-symbol price frames (see stack_price_frames)"""
+        symbols, arrays = stack_price_frames(frames)
+        return TechnicalIndicatorCalculator.calculate_series(
+            arrays['closes'], arrays['highs'], arrays['lows'], arrays['volumes'],
+            opens=arrays['opens'], symbols=symbols, bar_dates=arrays['bar_dates']
+        )
+
+    @staticmethod
+    def calculate_series_for_bars(bars: OHLCVBars) -> IndicatorSeries:
+        """Calculate indicator series for a price store (no per-symbol frames)"""
+        arrays = bars.to_matrix()
+        return TechnicalIndicatorCalculator.calculate_series(
+            arrays['closes'], arrays['highs'], arrays['lows'], arrays['volumes'],
+            opens=arrays['opens'], symbols=bars.symbols, bar_dates=arrays['bar_dates']
+        )
+
     @staticmethod
     def calculate_all_indicators(price_data: pd.DataFrame) -> IndicatorSnapshot:
         """Calculate all 21 indicators for the latest price data"""
@@ -288,9 +589,25 @@ class TechnicalIndicatorCalculator:
             adx14=adx14, parabolic_sar=parabolic_sar
         )
 
+# Bars of history a symbol needs before any strategy is evaluated
+MIN_HISTORY_BARS = 50
+
+# Bars loaded before the first signal bar: the longest indicator warm-up
+LOOKBACK_BARS = max(max(INDICATOR_WARMUP.values()), MIN_HISTORY_BARS)
+
+
+def lookback_days(bars: int) -> int:
+    """Calendar days spanning `bars` trading days (weekends plus a holiday margin)"""
+    return int(np.ceil(bars * 7 / 5)) + 14
+
 class StrategicSignalEngine:
     """Professional strategic signal generation engine"""
     
+    STRATEGIES = [
+        'BBRK', 'BOSR', 'BMAC', 'BBOL', 'BDIV', 'BSUP',  # Buy strategies
+        'SBDN', 'SOBR', 'SMAC', 'SBND', 'SDIV', 'SRES'   # Sell strategies
+    ]
+    
     def __init__(self, parameter_set: Optional[Dict] = None):
         self.parameter_set = parameter_set or self._get_default_parameters()
         self.engine_version = "1.0.0"
@@ -311,7 +628,7 @@ class StrategicSignalEngine:
     def generate_signals(self, symbol: str, price_data: pd.DataFrame, 
                         provisional: bool = False) -> List[StrategicSignal]:
         """Generate all strategic signals for a symbol"""
-        if len(price_data) < 50:  # Need sufficient history
+        if len(price_data) < MIN_HISTORY_BARS:  # Need sufficient history
             logger.warning(f"Insufficient price data for {symbol}: {len(price_data)} rows")
             return []
         
@@ -319,21 +636,114 @@ class StrategicSignalEngine:
         indicators = self.calculator.calculate_all_indicators(price_data)
         
         signals = []
-        latest_date = price_data.iloc[-1].get('bar_date', date.today())
         
         # Generate signals for each strategy
-        strategies = [
-            'BBRK', 'BOSR', 'BMAC', 'BBOL', 'BDIV', 'BSUP',  # Buy strategies
-            'SBDN', 'SOBR', 'SMAC', 'SBND', 'SDIV', 'SRES'   # Sell strategies
-        ]
-        
-        for base_strategy in strategies:
+        for base_strategy in self.STRATEGIES:
             signal = self._evaluate_strategy(base_strategy, indicators, provisional)
             if signal:
                 signals.append(signal)
         
         return signals
     
+    def generate_signal_history(self, price_data: Dict[str, pd.DataFrame],
+                                start_date: Optional[date] = None, end_date: Optional[date] = None,
+                                provisional: bool = False) -> List[StrategicSignal]:
+        """
+        Backfill mode: signals of every strategy on every bar of the history.
+        
+        Indicator series are computed once for all symbols and the strategies are
+        evaluated as boolean masks over every bar; StrategicSignal rows are only
+        built for the bars where a strategy fires. The result is the same as calling
+        generate_signals with the history up to each bar, without the O(n²) cost.
+        
+        Args:
+            price_data: Symbol -> OHLCV frame with bar_date, oldest first (include warm-up bars before start_date)
+            start_date: First bar date to emit signals for (None for all)
+            end_date: Last bar date to emit signals for (None for all)
+            provisional: Mark the signals as provisional
+            
+        Returns:
+            Signals ordered by bar date, then symbol, then strategy
+        """
+        frames = {symbol: frame for symbol, frame in price_data.items() if len(frame) >= MIN_HISTORY_BARS}
+        for symbol in set(price_data) - set(frames):
+            logger.warning(f"Insufficient price data for {symbol}: {len(price_data[symbol])} rows")
+        if not frames:
+            return []
+        
+        series = self.calculator.calculate_series_for_frames(frames)
+        return self.evaluate_series(series, start_date, end_date, provisional)
+    
+    def evaluate_series(self, series: IndicatorSeries, start_date: Optional[date] = None,
+                        end_date: Optional[date] = None, provisional: bool = False) -> List[StrategicSignal]:
+        """Signals for every bar of precomputed indicator series (see generate_signal_history)"""
+        eligible = np.cumsum(~np.isnan(series.closes), axis=1) >= MIN_HISTORY_BARS
+        if series.bar_dates is not None and (start_date or end_date):
+            bar_dates = pd.to_datetime(pd.Series(series.bar_dates.ravel())).to_numpy().reshape(series.bar_dates.shape)
+            if start_date:
+                eligible &= bar_dates >= np.datetime64(start_date)
+            if end_date:
+                eligible &= bar_dates <= np.datetime64(end_date)
+        
+        masks = {base: mask & eligible for base, mask in self.strategy_masks(series).items()}
+        fired = np.logical_or.reduce(list(masks.values()))
+        
+        signals = []
+        rows, bars = np.nonzero(fired)
+        for row, bar, indicators in zip(rows, bars, series.snapshots_at(rows, bars)):
+            for base_strategy in self.STRATEGIES:
+                if masks[base_strategy][row, bar]:
+                    signal = self._evaluate_strategy(base_strategy, indicators, provisional)
+                    if signal:
+                        signals.append(signal)
+        signals.sort(key=lambda signal: signal.bar_date)  # stable: symbol and strategy order kept
+        
+        logger.info(f"Backfilled {len(signals)} signals over {int(eligible.sum())} bars "
+                    f"for {len(series.symbols)} symbols")
+        return signals
+
+    def evaluate_latest(self, series: IndicatorSeries, provisional: bool = False) -> Dict[str, List[StrategicSignal]]:
+        """
+        Batch generate_signals: every strategy on each symbol's latest bar of precomputed series.
+
+        Returns:
+            Symbol -> signals (empty for symbols with insufficient history)
+        """
+        history = np.sum(~np.isnan(series.closes), axis=1) if series.closes.size else np.zeros(len(series.symbols))
+        results = {symbol: [] for symbol in series.symbols}
+        rows = np.flatnonzero(history >= MIN_HISTORY_BARS)
+        for row in np.flatnonzero(history < MIN_HISTORY_BARS):
+            logger.warning(f"Insufficient price data for {series.symbols[row]}: {int(history[row])} rows")
+
+        for row, indicators in zip(rows, series.snapshots_at(rows, np.full(len(rows), -1))):
+            for base_strategy in self.STRATEGIES:
+                signal = self._evaluate_strategy(base_strategy, indicators, provisional)
+                if signal:
+                    results[series.symbols[row]].append(signal)
+        return results
+
+    def strategy_masks(self, series: IndicatorSeries) -> Dict[str, np.ndarray]:
+        """
+        Trigger condition of every strategy as a symbols x bars boolean mask.
+        
+        Mirrors the entry conditions of the _evaluate_* methods; placeholder
+        strategies never trigger.
+        """
+        params = self.parameter_set
+        close = series.closes
+        with np.errstate(invalid='ignore'):
+            breakout_level = np.maximum(series['bb_upper'], series['ema20'] * 1.02)
+            breakout = close > breakout_level + breakout_level * params["breakout_epsilon"]
+            rsi14 = series['rsi14']
+            oversold_reclaim = ((rsi14 > 35) & (rsi14 < 65) & (series['williams_r'] > -70)
+                                & (close > series['ema20']))
+            ma_crossover = (series['ema20'] > series['ema50']) & (series['macd'] > 0)
+        
+        never = np.zeros(close.shape, dtype=bool)
+        masks = {base_strategy: never for base_strategy in self.STRATEGIES}
+        masks.update({'BBRK': breakout, 'BOSR': oversold_reclaim, 'BMAC': ma_crossover})
+        return masks
+    
     def _evaluate_strategy(self, base_strategy: str, indicators: IndicatorSnapshot, 
                           provisional: bool) -> Optional[StrategicSignal]:
         """Evaluate a specific strategy and return signal if triggered"""
@@ -577,43 +987,132 @@ class StrategicSignalEngine:
 class StrategicSignalManager:
     """High-level manager for strategic signal operations"""
     
-    def __init__(self, database_manager=None):
+    def __init__(self, database_manager=None, lookback_bars: int = LOOKBACK_BARS):
+        """
+        Args:
+            database_manager: StrategicDatabaseManager (price store and signal persistence)
+            lookback_bars: Bars loaded before the first signal bar (indicator warm-up)
+        """
         self.db = database_manager
         self.engine = StrategicSignalEngine()
+        self.lookback_bars = lookback_bars
         
     def generate_signals_for_portfolio(self, portfolio_symbols: List[str], 
                                      date_range: Tuple[date, date]) -> Dict[str, List[StrategicSignal]]:
-        """Generate signals for entire portfolio"""
-        results = {}
-        
-        for symbol in portfolio_symbols:
-            try:
-                # Get price data from database
-                price_data = self._get_price_data(symbol, date_range)
-                signals = self.engine.generate_signals(symbol, price_data)
-                results[symbol] = signals
-                
-                logger.info(f"Generated {len(signals)} signals for {symbol}")
-                
-            except Exception as e:
-                logger.error(f"Error generating signals for {symbol}: {e}")
-                results[symbol] = []
+        """Generate signals for entire portfolio (each symbol's latest bar up to date_range[1])"""
+        results = {symbol: [] for symbol in portfolio_symbols}
+        
+        try:
+            bars = self.load_price_bars(portfolio_symbols, date_range[1], date_range[1])
+            if len(bars) == 0:
+                logger.warning(f"No price data for {len(portfolio_symbols)} portfolio symbols")
+                return results
+            
+            series = self.engine.calculator.calculate_series_for_bars(bars)
+            results.update(self.engine.evaluate_latest(series))
+            logger.info(f"Generated {sum(len(s) for s in results.values())} signals "
+                        f"for {len(bars.symbols)} symbols")
+            
+        except Exception as e:
+            logger.error(f"Error generating portfolio signals: {e}")
         
         return results
     
-    def _get_price_data(self, symbol: str, date_range: Tuple[date, date]) -> pd.DataFrame:
-        """Get price data for a symbol (placeholder - integrate with your database)"""
-        # This would integrate with your actual price data source
-        # For now, return mock data structure
-        return pd.DataFrame({
-            'symbol': [symbol] * 50,
-            'bar_date': pd.date_range(end=date_range[1], periods=50),
-            'open_price': np.random.normal(100, 5, 50),
-            'high_price': np.random.normal(102, 5, 50), 
-            'low_price': np.random.normal(98, 5, 50),
-            'close_price': np.random.normal(100, 5, 50),
-            'volume': np.random.randint(100000, 2000000, 50)
-        })
+    def backfill_signals(self, symbols: List[str], date_range: Tuple[date, date],
+                         universe_name: str = "watchlist",
+                         price_data: Optional[Dict[str, pd.DataFrame]] = None,
+                         notes: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Backfill signal history for a universe under one signal_run.
+        
+        Args:
+            symbols: Symbols to backfill
+            date_range: (start, end) bar dates to emit signals for
+            universe_name: Universe label of the signal run
+            price_data: Symbol -> OHLCV frames including warm-up bars (loaded when None)
+            notes: Signal run notes
+            
+        Returns:
+            Dict with run_id, param_set_id, signals (count), symbols, seconds and error
+            (None unless the signals could not be stored; the run is then left uncompleted)
+        """
+        started = time.perf_counter()
+        if price_data is None:
+            bars = self.load_price_bars(symbols, date_range[0], date_range[1])
+            signals = []
+            if len(bars):
+                series = self.engine.calculator.calculate_series_for_bars(bars)
+                signals = self.engine.evaluate_series(series, date_range[0], date_range[1])
+            symbol_count = len(bars.symbols)
+        else:
+            price_data = {symbol: price_data[symbol] for symbol in symbols if symbol in price_data}
+            signals = self.engine.generate_signal_history(price_data, date_range[0], date_range[1])
+            symbol_count = len(price_data)
+        
+        run_id = param_set_id = error = None
+        if self.db is not None:
+            param_set_id = self.db.create_parameter_set(
+                "Backfill", self.engine.parameter_set, engine_version=self.engine.engine_version)
+            run_id = self.db.create_signal_run(
+                param_set_id, universe_name, date_range[0], date_range[1],
+                notes or f"Backfill of {symbol_count} symbols")
+            saved = self.db.save_signal_events(signals, run_id=run_id, param_set_id=param_set_id)
+            if saved == len(signals):
+                self.db.complete_signal_run(run_id)
+            else:
+                error = f"Stored {saved} of {len(signals)} signals; signal run {run_id} left incomplete"
+                logger.error(f"Backfill failed: {error}")
+        
+        seconds = time.perf_counter() - started
+        logger.info(f"Backfilled {len(signals)} signals for {symbol_count} symbols in {seconds:.2f}s")
+        return {
+            'run_id': run_id,
+            'param_set_id': param_set_id,
+            'signals': len(signals),
+            'symbols': symbol_count,
+            'seconds': seconds,
+            'error': error,
+        }
+    
+    def load_price_bars(self, symbols: List[str], start_date: date, end_date: date) -> OHLCVBars:
+        """
+        OHLCV of all symbols from daily_equity_technicals in one query.
+        
+        Reads from lookback_bars trading days before start_date (indicator warm-up)
+        through end_date and keeps each symbol's bars as one contiguous block.
+        
+        Args:
+            symbols: Symbols to load
+            start_date: First bar date signals are needed for
+            end_date: Last bar date
+            
+        Returns:
+            OHLCVBars (empty when there is no database or on error)
+        """
+        if self.db is None or not symbols:
+            return OHLCVBars.from_frame(None)
+        
+        try:
+            first_date = pd.Timestamp(start_date).date() - timedelta(days=lookback_days(self.lookback_bars))
+            with self.db.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        SELECT symbol, trade_date, open_price, high_price, low_price, close_price, volume
+                        FROM daily_equity_technicals
+                        WHERE symbol = ANY(%s) AND trade_date BETWEEN %s AND %s
+                          AND close_price IS NOT NULL
+                        ORDER BY symbol, trade_date
+                    """, (sorted(set(symbols)), first_date, end_date))
+                    rows = cur.fetchall()
+            
+            bars = OHLCVBars.from_frame(pd.DataFrame([tuple(row) for row in rows], columns=BAR_COLUMNS))
+            logger.info(f"Loaded {len(bars)} bars for {len(bars.symbols)}/{len(set(symbols))} symbols "
+                        f"from {first_date} to {end_date}")
+            return bars
+            
+        except Exception as e:
+            logger.error(f"Error loading price data for {len(symbols)} symbols: {e}")
+            return OHLCVBars.from_frame(None)
 
 # Example usage and testing
 if __name__ == "__main__":
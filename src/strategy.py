@@ -13,6 +13,11 @@ import pandas as pd
 from dateutil import tz
 import yfinance as yf
 
+try:
+    from market_data import get_market_data_provider
+except ImportError:
+    from src.market_data import get_market_data_provider
+
 try:
     from database import DatabaseManager
 except ImportError:
@@ -63,19 +68,15 @@ class HKStrategy:
         """Get cached Yahoo Finance data from Redis"""
         cache_key = f"yf_data:{ticker}:{days}"
         cached = self.db.get_cache(cache_key)
-        if cached:
-            try:
-                return pd.read_json(cached)
-            except:
-                pass
+        if isinstance(cached, pd.DataFrame):
+            return cached
         return None
     
     def cache_data(self, ticker: str, df: pd.DataFrame, days: int = LOOKBACK_DAYS):
         """Cache Yahoo Finance data in Redis"""
         cache_key = f"yf_data:{ticker}:{days}"
         try:
-            json_data = df.to_json()
-            self.db.set_cache(cache_key, json_data, expiry=3600)  # 1 hour cache
+            self.db.set_cache(cache_key, df, expiry=3600)  # 1 hour cache, binary codec keeps dtypes and timezone
         except Exception:
             pass
     
@@ -86,17 +87,15 @@ class HKStrategy:
         if cached_df is not None and len(cached_df) >= 50:
             return cached_df
         
-        # Fetch from Yahoo Finance
-        tk = yf.Ticker(ticker)
-        df = tk.history(period=f"{days}d", interval="1d", auto_adjust=False, actions=False)
+        # Fetch from the market data provider (Yahoo Finance unless configured)
+        provider = get_market_data_provider()
+        today = datetime.now(HK_TZ).date()
+        df = provider.history([ticker], today - timedelta(days=days), today)
         if df.empty or len(df) < 50:
-            df = tk.history(period="6mo", interval="1d", auto_adjust=False, actions=False)
+            df = provider.history([ticker], today - timedelta(days=183), today)
         
-        df = df.rename_axis("Date").reset_index()
-        if df["Date"].dt.tz is None:
-            df["Date"] = pd.to_datetime(df["Date"]).dt.tz_localize("UTC").dt.tz_convert(HK_TZ)
-        elif str(df["Date"].dt.tz) != str(HK_TZ):
-            df["Date"] = df["Date"].dt.tz_convert(HK_TZ)
+        df = df.drop(columns="symbol")
+        df["Date"] = pd.to_datetime(df["Date"]).dt.tz_localize(HK_TZ)  # daily bars are HK session dates
         
         # Cache the result
         self.cache_data(ticker, df, days)
@@ -17,6 +17,7 @@ from src.signal_dictionary import SignalDictionary, SignalType, SignalPriority
 from src.indicator_dictionary import IndicatorDictionary, IndicatorCategory
 from src.signal_validation import SignalValidationEngine, ValidationResult
 from src.strategic_database_manager import StrategicDatabaseManager
+from src.signal_backtest import get_signal_backtester
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +34,7 @@ class StrategyManagerAPI:
         self.indicator_dict = IndicatorDictionary()
         self.validator = SignalValidationEngine()
         self.db_manager = StrategicDatabaseManager()
+        self.backtester = get_signal_backtester(self.db_manager)
         
         # Register routes
         self._register_routes()
@@ -68,6 +70,10 @@ class StrategyManagerAPI:
                              self.get_signal_types, methods=['GET'])
         self.app.add_url_rule('/api/signals/validate', 'validate_signal', 
                              self.validate_signal, methods=['POST'])
+        self.app.add_url_rule('/api/signals/runs', 'get_signal_runs', 
+                             self.get_signal_runs, methods=['GET'])
+        self.app.add_url_rule('/api/signals/backtest/<run_id>', 'get_signal_backtest', 
+                             self.get_signal_backtest, methods=['GET'])
         
         # Indicator Management Routes
         self.app.add_url_rule('/api/indicators', 'get_indicators', 
@@ -479,6 +485,36 @@ class StrategyManagerAPI:
             logger.error(f"Error getting signals: {e}")
             return jsonify({'error': 'Failed to retrieve signals'}), 500
     
+    def get_signal_runs(self):
+        """GET /api/signals/runs - List recent signal runs"""
+        try:
+            limit = int(request.args.get('limit', 50))
+            runs_df = self.db_manager.list_signal_runs(limit=limit)
+            runs = json.loads(runs_df.to_json(orient='records', date_format='iso')) if not runs_df.empty else []
+            return jsonify({'runs': runs, 'count': len(runs)})
+            
+        except Exception as e:
+            logger.error(f"Error getting signal runs: {e}")
+            return jsonify({'error': 'Failed to retrieve signal runs'}), 500
+    
+    def get_signal_backtest(self, run_id: str):
+        """GET /api/signals/backtest/<run_id> - Forward-return backtest of a signal run"""
+        try:
+            refresh = request.args.get('refresh', 'false').lower() == 'true'
+            include_signals = request.args.get('include_signals', 'false').lower() == 'true'
+            
+            result = self.backtester.backtest_run(run_id, refresh=refresh)
+            if result is None:
+                return jsonify({'error': 'Failed to backtest signal run'}), 500
+            if result.outcomes.empty:
+                return jsonify({'error': f'No signals found for run {run_id}'}), 404
+            
+            return jsonify(result.to_dict(include_signals=include_signals))
+            
+        except Exception as e:
+            logger.error(f"Error backtesting signal run {run_id}: {e}")
+            return jsonify({'error': 'Failed to backtest signal run'}), 500
+    
     def get_signal_types(self):
         """GET /api/signals/types - Get all signal type definitions"""
         try:
@@ -911,6 +947,8 @@ if __name__ == "__main__":
     print("  GET  /api/strategies - List all strategies")
     print("  POST /api/strategies - Create new strategy")
     print("  GET  /api/signals - List signal events")
+    print("  GET  /api/signals/runs - List signal runs")
+    print("  GET  /api/signals/backtest/<run_id> - Backtest a signal run")
     print("  GET  /api/indicators - List all indicators")
     print("  GET  /api/dashboard/config - Dashboard configuration")
     print("  GET  /api/system/health - Health check")
@@ -0,0 +1,374 @@
+"""
+Vectorized Portfolio Timeline Engine
+
+Computes daily portfolio values for analyses using matrix operations:
+- A days x symbols close-price matrix built once and forward-filled
+- A cumulative position matrix built from transactions with one cumsum
+- Equity, cash and total value from row-wise matrix products
+
+Replaces the per-day, per-symbol DataFrame scans previously used by
+PortfolioAnalysisManager for the PV Analysis timeline.
+
+evaluate_analyses() evaluates many analyses against one matrix; above
+TIMELINE_PARALLEL_MIN analyses it fans out to a process pool whose workers
+map the close matrix from shared memory instead of receiving a copy.
+"""
+
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .price_index import PriceIndex, FILL_FORWARD_BACKWARD
+except ImportError:
+    from price_index import PriceIndex, FILL_FORWARD_BACKWARD
+
+logger = logging.getLogger(__name__)
+
+TIMELINE_COLUMNS = [
+    'analysis_id', 'analysis_name', 'date', 'total_value',
+    'cash_position', 'equity_value', 'transaction_details'
+]
+
+
+class PriceMatrix:
+    """Dense days x symbols matrix of close prices aligned to trading days."""
+
+    def __init__(self, days: List[date], symbols: List[str], closes: np.ndarray):
+        self.days = list(days)
+        self.symbols = list(symbols)
+        self.closes = closes
+        self._day_index = {d: i for i, d in enumerate(self.days)}
+        self._symbol_index = {s: i for i, s in enumerate(self.symbols)}
+
+    @classmethod
+    def from_price_frame(cls, price_df: pd.DataFrame, days: List[date],
+                         symbols: Optional[Sequence[str]] = None) -> 'PriceMatrix':
+        """
+        Build the matrix from a long-format price frame.
+
+        Prices are resolved the same way as the original per-day lookup: the
+        exact close for the day, otherwise the latest close before it, otherwise
+        the earliest close after it. Symbols without any price stay at 0.0.
+
+        Args:
+            price_df: DataFrame with columns symbol, date, close_price
+            days: Sorted trading days forming the matrix rows
+            symbols: Optional column order (defaults to symbols in price_df)
+
+        Returns:
+            PriceMatrix instance
+        """
+        if symbols is None:
+            symbols = sorted(price_df['symbol'].unique()) if not price_df.empty else []
+        symbols = list(symbols)
+
+        if price_df.empty or not days or not symbols:
+            return cls(days, symbols, np.zeros((len(days), len(symbols))))
+
+        index = PriceIndex.from_frame(price_df, keep='first')
+        closes = index.matrix(symbols, days, fill=FILL_FORWARD_BACKWARD)
+        closes = np.nan_to_num(closes, nan=0.0)
+        return cls(days, symbols, closes)
+
+    def day_positions(self, days: List[date]) -> np.ndarray:
+        """Row indices for the given days (days must be present in the matrix)"""
+        return np.fromiter((self._day_index[d] for d in days), dtype=np.int64, count=len(days))
+
+    def symbol_positions(self, symbols: List[str]) -> np.ndarray:
+        """Column indices for the given symbols (-1 when a symbol has no column)"""
+        return np.fromiter((self._symbol_index.get(s, -1) for s in symbols), dtype=np.int64, count=len(symbols))
+
+
+def _transaction_fields(transaction) -> tuple:
+    """Normalize a dict or tuple transaction row to (date, symbol, type, qty, cash)"""
+    if isinstance(transaction, dict):
+        return (transaction['transaction_date'], transaction['symbol'],
+                transaction['transaction_type'], transaction['quantity_change'],
+                transaction['cash_change'])
+    return transaction[5], transaction[6], transaction[7], transaction[8], transaction[9]
+
+
+def opening_state(transactions: List, trading_days: List[date]) -> Tuple[float, Dict[str, float]]:
+    """
+    Cash change and quantities that evaluate_analysis_timeline applies on the given days.
+
+    Used to resume a timeline after its first days: pass the returned cash
+    (added to start cash) and positions as the opening state of the remaining days.
+
+    Args:
+        transactions: Transaction rows (dict or tuple) for one analysis
+        trading_days: Trading days already evaluated
+
+    Returns:
+        Tuple of (cumulative cash change, symbol -> cumulative quantity)
+    """
+    days = set(trading_days)
+    cash = 0.0
+    positions: Dict[str, float] = {}
+    for transaction in transactions:
+        trans_date, symbol, trans_type, qty_change, cash_change = _transaction_fields(transaction)
+        if not trans_date or not symbol or not trans_type or trans_date not in days:
+            continue
+        cash += float(cash_change or 0)
+        positions[symbol] = positions.get(symbol, 0.0) + float(qty_change or 0)
+    return cash, positions
+
+
+def evaluate_analysis_timeline(analysis_id: int, analysis_name: str,
+                               trading_days: List[date], transactions: List,
+                               start_cash: float, price_matrix: PriceMatrix,
+                               opening_positions: Optional[Dict[str, float]] = None) -> pd.DataFrame:
+    """
+    Evaluate the daily timeline of one analysis against a shared price matrix.
+
+    Transactions are applied on their exact trading day; the cumulative
+    position matrix is multiplied element-wise with the close matrix and
+    summed per day to produce equity value.
+
+    Args:
+        analysis_id: Analysis ID
+        analysis_name: Analysis name
+        trading_days: Sorted trading days of the analysis period
+        transactions: Transaction rows (dict or tuple) for this analysis
+        start_cash: Starting cash of the analysis (cash carried into the first day when resuming)
+        price_matrix: Shared PriceMatrix covering all trading days
+        opening_positions: Quantities held before the first day when resuming (see opening_state)
+
+    Returns:
+        DataFrame with TIMELINE_COLUMNS, one row per trading day
+    """
+    n_days = len(trading_days)
+    if n_days == 0:
+        return pd.DataFrame(columns=TIMELINE_COLUMNS)
+
+    day_lookup = {d: i for i, d in enumerate(trading_days)}
+
+    day_idx, symbols, quantities, cash_changes = [], [], [], []
+    details: Dict[int, List[str]] = {}
+
+    for transaction in transactions:
+        trans_date, symbol, trans_type, qty_change, cash_change = _transaction_fields(transaction)
+        if not trans_date or not symbol or not trans_type:
+            continue
+        row = day_lookup.get(trans_date)
+        if row is None:
+            continue
+
+        day_idx.append(row)
+        symbols.append(symbol)
+        quantities.append(float(qty_change or 0))
+        cash_changes.append(float(cash_change or 0))
+        details.setdefault(row, []).append(f"{trans_type} {symbol} ({qty_change})")
+
+    for symbol, quantity in (opening_positions or {}).items():
+        if quantity:
+            day_idx.append(0)
+            symbols.append(symbol)
+            quantities.append(float(quantity))
+            cash_changes.append(0.0)
+
+    # Cash: start cash plus cumulative cash flows per day
+    cash_delta = np.zeros(n_days)
+    if day_idx:
+        np.add.at(cash_delta, day_idx, cash_changes)
+    cash_position = float(start_cash or 0) + np.cumsum(cash_delta)
+
+    # Positions: scatter quantity changes into a days x symbols delta matrix, then cumsum
+    held_symbols = sorted(set(symbols))
+    equity_value = np.zeros(n_days)
+    if held_symbols:
+        col_lookup = {s: i for i, s in enumerate(held_symbols)}
+        delta = np.zeros((n_days, len(held_symbols)))
+        np.add.at(delta, (day_idx, [col_lookup[s] for s in symbols]), quantities)
+        positions = np.cumsum(delta, axis=0)
+
+        rows = price_matrix.day_positions(trading_days)
+        cols = price_matrix.symbol_positions(held_symbols)
+        closes = np.zeros((n_days, len(held_symbols)))
+        known = cols >= 0
+        if known.any():
+            closes[:, known] = price_matrix.closes[np.ix_(rows, cols[known])]
+
+        equity_value = np.einsum('ij,ij->i', positions, closes)
+
+    transaction_details = [
+        '; '.join(details[i]) if i in details else None for i in range(n_days)
+    ]
+
+    return pd.DataFrame({
+        'analysis_id': analysis_id,
+        'analysis_name': analysis_name,
+        'date': list(trading_days),
+        'total_value': cash_position + equity_value,
+        'cash_position': cash_position,
+        'equity_value': equity_value,
+        'transaction_details': pd.Series(transaction_details, dtype=object),
+    }, columns=TIMELINE_COLUMNS)
+
+
+# ---------------------------------------------------------------- batch evaluation
+
+@dataclass
+class AnalysisSpec:
+    """Inputs of one analysis for evaluate_analyses"""
+    analysis_id: int
+    analysis_name: Optional[str]
+    trading_days: List[date]
+    transactions: List
+    start_cash: float
+    opening_positions: Optional[Dict[str, float]] = None
+
+
+@dataclass
+class BatchTimings:
+    """Timing breakdown of an evaluate_analyses call"""
+    mode: str = 'serial'
+    workers: int = 1
+    total_seconds: float = 0.0
+    analyses: List[Dict[str, Any]] = field(default_factory=list)
+
+    def summary(self) -> str:
+        slowest = max(self.analyses, key=lambda t: t['seconds'], default=None)
+        text = (f"{len(self.analyses)} analyses in {self.total_seconds * 1000:.1f}ms "
+                f"({self.mode}, {self.workers} worker(s))")
+        if slowest:
+            text += f", slowest analysis {slowest['analysis_id']} {slowest['seconds'] * 1000:.1f}ms"
+        return text
+
+
+def group_transactions(rows: List, key: str = 'analysis_id') -> Dict[Any, List]:
+    """
+    Group transaction rows by analysis in one pass (order within a group is kept).
+
+    Args:
+        rows: Dict rows (grouped by key) or tuple rows (grouped by their first field)
+        key: Dict key holding the analysis ID
+
+    Returns:
+        Dictionary of analysis ID -> rows
+    """
+    grouped: Dict[Any, List] = {}
+    for row in rows:
+        grouped.setdefault(row[key] if isinstance(row, dict) else row[0], []).append(row)
+    return grouped
+
+
+def _normalized(transactions: List) -> List[Dict]:
+    """Transactions as plain dicts with the fields the engine reads (small to pickle)"""
+    result = []
+    for transaction in transactions:
+        trans_date, symbol, trans_type, qty_change, cash_change = _transaction_fields(transaction)
+        result.append({
+            'transaction_date': trans_date, 'symbol': symbol, 'transaction_type': trans_type,
+            'quantity_change': qty_change, 'cash_change': cash_change,
+        })
+    return result
+
+
+def _evaluate_spec(spec: AnalysisSpec, price_matrix: PriceMatrix) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    started = time.perf_counter()
+    frame = evaluate_analysis_timeline(
+        spec.analysis_id, spec.analysis_name, spec.trading_days, spec.transactions,
+        spec.start_cash, price_matrix, spec.opening_positions
+    )
+    timing = {
+        'analysis_id': spec.analysis_id,
+        'days': len(spec.trading_days),
+        'transactions': len(spec.transactions),
+        'seconds': time.perf_counter() - started,
+        'pid': os.getpid(),
+    }
+    return frame, timing
+
+
+# Worker process state: the shared close matrix, attached once per worker
+_worker_matrix: Optional[PriceMatrix] = None
+_worker_memory: Optional[shared_memory.SharedMemory] = None
+
+
+def _attach_worker(memory_name: str, shape: Tuple[int, int], days: List[date], symbols: List[str]):
+    global _worker_matrix, _worker_memory
+    _worker_memory = shared_memory.SharedMemory(name=memory_name)
+    closes = np.ndarray(shape, dtype=np.float64, buffer=_worker_memory.buf)
+    _worker_matrix = PriceMatrix(days, symbols, closes)
+
+
+def _evaluate_in_worker(spec: AnalysisSpec) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    return _evaluate_spec(spec, _worker_matrix)
+
+
+def _parallel_settings(workers: Optional[int]) -> Tuple[int, int]:
+    if workers is None:
+        workers = int(os.getenv('TIMELINE_WORKERS', '0')) or (os.cpu_count() or 1)
+    return max(1, workers), int(os.getenv('TIMELINE_PARALLEL_MIN', '8'))
+
+
+def evaluate_analyses(specs: List[AnalysisSpec], price_matrix: PriceMatrix,
+                      workers: Optional[int] = None,
+                      parallel_min: Optional[int] = None) -> Tuple[List[pd.DataFrame], BatchTimings]:
+    """
+    Evaluate many analyses against one shared price matrix.
+
+    With at least parallel_min analyses and more than one worker the specs
+    are evaluated by a process pool; the close matrix is placed in shared
+    memory once and mapped by every worker. Any pool failure falls back to
+    serial evaluation.
+
+    Args:
+        specs: Analyses to evaluate
+        price_matrix: PriceMatrix covering every trading day of every spec
+        workers: Process count (defaults to TIMELINE_WORKERS or the CPU count)
+        parallel_min: Minimum analyses for the pool (defaults to TIMELINE_PARALLEL_MIN, 8)
+
+    Returns:
+        Tuple of (frames in spec order, BatchTimings)
+    """
+    started = time.perf_counter()
+    workers, default_min = _parallel_settings(workers)
+    parallel_min = default_min if parallel_min is None else parallel_min
+    specs = [AnalysisSpec(s.analysis_id, s.analysis_name, list(s.trading_days), _normalized(s.transactions),
+                          float(s.start_cash or 0), s.opening_positions) for s in specs]
+
+    results = None
+    timings = BatchTimings()
+    if workers > 1 and len(specs) >= max(parallel_min, 2) and price_matrix.closes.size:
+        try:
+            results = _evaluate_parallel(specs, price_matrix, min(workers, len(specs)))
+            timings.mode, timings.workers = 'process_pool', min(workers, len(specs))
+        except Exception as e:
+            logger.warning(f"Parallel timeline evaluation failed, evaluating serially: {e}")
+
+    if results is None:
+        results = [_evaluate_spec(spec, price_matrix) for spec in specs]
+
+    timings.analyses = [timing for _, timing in results]
+    timings.total_seconds = time.perf_counter() - started
+    logger.info(f"Evaluated timelines: {timings.summary()}")
+    return [frame for frame, _ in results], timings
+
+
+def _evaluate_parallel(specs: List[AnalysisSpec], price_matrix: PriceMatrix,
+                       workers: int) -> List[Tuple[pd.DataFrame, Dict[str, Any]]]:
+    closes = np.ascontiguousarray(price_matrix.closes, dtype=np.float64)
+    memory = shared_memory.SharedMemory(create=True, size=closes.nbytes)
+    try:
+        np.ndarray(closes.shape, dtype=np.float64, buffer=memory.buf)[:] = closes
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_attach_worker,
+            initargs=(memory.name, closes.shape, price_matrix.days, price_matrix.symbols),
+        ) as executor:
+            # map() yields in submission order, so results are deterministic
+            return list(executor.map(_evaluate_in_worker, specs, chunksize=max(1, len(specs) // (workers * 4))))
+    finally:
+        memory.close()
+        memory.unlink()
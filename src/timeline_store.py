@@ -0,0 +1,554 @@
+"""
+Materialized Analysis Timelines
+
+Persists the daily values evaluate_analysis_timeline produces for every
+analysis in portfolio_analysis_daily_values, with a per-analysis watermark
+in portfolio_analysis_timeline_state:
+- computed_through: last trading day with a stored row
+- transaction_count / max_transaction_id: state change rows the values cover
+- price_watermark: MAX(updated_at) of the analysis' closes when computed
+- price_checked_at: database time the watermark was read
+- start_date / end_date / start_cash: analysis parameters the values cover
+
+refresh() only recomputes from the earliest affected trading day: the day
+after computed_through for new trading days, the earliest close updated past
+the price watermark for late price corrections (or within the price cache's
+safety window of the last check, since updated_at is stamped at transaction
+start and a long write can commit behind a later one), or the transaction date after
+invalidate_from(). Changed parameters, or state changes the watermark does
+not account for, rebuild the whole analysis.
+
+rolling_metrics() keeps each analysis' rolling risk metrics in memory keyed
+by its (computed_through, updated_at) state, so they are only recomputed
+after the stored timeline itself changed.
+"""
+
+import logging
+from bisect import bisect_left
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+from psycopg2.extras import execute_values
+
+try:
+    from .timeline_engine import PriceMatrix, AnalysisSpec, TIMELINE_COLUMNS, evaluate_analyses, opening_state
+    from .hkex_calendar import get_hkex_trading_days
+    from .rolling_metrics import BENCHMARK_SYMBOL, ROLLING_COLUMNS, rolling_metrics_frame
+    from .price_cache import WATERMARK_SAFETY_WINDOW
+except ImportError:
+    from timeline_engine import PriceMatrix, AnalysisSpec, TIMELINE_COLUMNS, evaluate_analyses, opening_state
+    from hkex_calendar import get_hkex_trading_days
+    from rolling_metrics import BENCHMARK_SYMBOL, ROLLING_COLUMNS, rolling_metrics_frame
+    from price_cache import WATERMARK_SAFETY_WINDOW
+
+logger = logging.getLogger(__name__)
+
+# Calendar days of closes fetched before the first recomputed day, so held
+# symbols forward fill from their previous close; symbols without a close in
+# that window (suspensions) carry in their last stored close instead
+PRICE_LOOKBACK_DAYS = 14
+
+TIMELINE_TABLES_SQL = """
+    CREATE TABLE IF NOT EXISTS portfolio_analysis_daily_values (
+        analysis_id INT NOT NULL REFERENCES portfolio_analyses(id) ON DELETE CASCADE,
+        trade_date DATE NOT NULL,
+        total_value DOUBLE PRECISION NOT NULL,
+        cash_position DOUBLE PRECISION NOT NULL,
+        equity_value DOUBLE PRECISION NOT NULL,
+        transaction_details TEXT,
+        PRIMARY KEY (analysis_id, trade_date)
+    );
+    CREATE TABLE IF NOT EXISTS portfolio_analysis_timeline_state (
+        analysis_id INT PRIMARY KEY REFERENCES portfolio_analyses(id) ON DELETE CASCADE,
+        computed_through DATE,
+        start_date DATE NOT NULL,
+        end_date DATE NOT NULL,
+        start_cash DECIMAL(15,2) NOT NULL,
+        transaction_count INT NOT NULL,
+        max_transaction_id INT NOT NULL,
+        price_watermark TIMESTAMP,
+        price_checked_at TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    ALTER TABLE portfolio_analysis_timeline_state ADD COLUMN IF NOT EXISTS price_checked_at TIMESTAMP
+"""
+
+
+def plan_resume(trading_days: List[date], computed_through: Optional[date],
+                correction_date: Optional[date] = None) -> int:
+    """
+    Index of the first trading day that needs (re)computing.
+
+    Args:
+        trading_days: Sorted trading days to materialize
+        computed_through: Last stored trading day (None when nothing is stored)
+        correction_date: Earliest stored day whose close changed since it was computed
+
+    Returns:
+        Index into trading_days (len(trading_days) when everything is current)
+    """
+    if computed_through is None:
+        return 0
+    resume = bisect_left(trading_days, computed_through + timedelta(days=1))
+    if correction_date is not None:
+        resume = min(resume, bisect_left(trading_days, correction_date))
+    return resume
+
+
+class TimelineStore:
+    """Incrementally maintained daily values of portfolio analyses"""
+
+    def __init__(self, db, fetch_prices: Callable[[List[str], date, date], pd.DataFrame]):
+        """
+        Args:
+            db: DatabaseManager providing connection()
+            fetch_prices: (symbols, start_date, end_date) -> DataFrame with
+                symbol, date, close_price (PortfolioAnalysisManager.fetch_bulk_historical_prices)
+        """
+        self.db = db
+        self.fetch_prices = fetch_prices
+        self._table_ready = False
+        self.stats = {'current': 0, 'appended': 0, 'suffix_recomputes': 0, 'rebuilds': 0, 'days_computed': 0,
+                      'rolling_hits': 0, 'rolling_computed': 0}
+        self.last_timings = None
+        self._rolling: Dict[int, tuple] = {}  # analysis_id -> (state key, metrics frame)
+
+    def _ensure_tables(self, cur):
+        if not self._table_ready:
+            cur.execute(TIMELINE_TABLES_SQL)
+            self._table_ready = True
+
+    def timeline(self, analysis_ids: List[int], through: Optional[date] = None) -> pd.DataFrame:
+        """
+        Bring the analyses up to date and return their stored daily values.
+
+        Args:
+            analysis_ids: Analyses to return
+            through: Last day to materialize (defaults to today)
+
+        Returns:
+            DataFrame with TIMELINE_COLUMNS, empty when the timelines could not be materialized
+        """
+        try:
+            if not self.refresh(analysis_ids, through):
+                return pd.DataFrame(columns=TIMELINE_COLUMNS)
+
+            with self.db.connection() as conn, conn.cursor() as cur:
+                cur.execute("""
+                    SELECT dv.analysis_id, pa.analysis_name, dv.trade_date, dv.total_value,
+                           dv.cash_position, dv.equity_value, dv.transaction_details
+                    FROM portfolio_analysis_daily_values dv
+                    JOIN portfolio_analyses pa ON pa.id = dv.analysis_id
+                    WHERE dv.analysis_id = ANY(%s)
+                    ORDER BY dv.analysis_id, dv.trade_date
+                """, (list(analysis_ids),))
+                rows = cur.fetchall()
+
+            return pd.DataFrame(rows, columns=TIMELINE_COLUMNS)
+
+        except Exception as e:
+            logger.error(f"Error reading materialized timelines: {e}")
+            return pd.DataFrame(columns=TIMELINE_COLUMNS)
+
+    def refresh(self, analysis_ids: List[int], through: Optional[date] = None) -> bool:
+        """
+        Recompute the affected suffix of each analysis' stored daily values.
+
+        Args:
+            analysis_ids: Analyses to bring up to date
+            through: Last day to materialize (defaults to today)
+
+        Returns:
+            True when every analysis is up to date
+        """
+        through = through or date.today()
+        try:
+            with self.db.connection() as conn, conn.cursor() as cur:
+                self._ensure_tables(cur)
+                plans = self._plan(cur, list(analysis_ids), through)
+                pending = [plan for plan in plans if plan['resume'] < len(plan['trading_days'])]
+                self.stats['current'] += len(plans) - len(pending)
+                if not pending:
+                    return True
+
+                price_df = self._fetch_window(cur, pending)
+                if price_df is None:
+                    return False
+
+                transactions = self._load_transactions(cur, [plan['analysis_id'] for plan in pending])
+                all_days = sorted({d for plan in pending for d in plan['trading_days'][plan['resume']:]})
+                price_matrix = PriceMatrix.from_price_frame(price_df, all_days)
+
+                specs = []
+                for plan in pending:
+                    analysis_transactions = transactions.get(plan['analysis_id'], [])
+                    opening_cash, opening_positions = opening_state(
+                        analysis_transactions, plan['trading_days'][:plan['resume']])
+                    specs.append(AnalysisSpec(
+                        plan['analysis_id'], None, plan['trading_days'][plan['resume']:], analysis_transactions,
+                        plan['start_cash'] + opening_cash, opening_positions
+                    ))
+                frames, self.last_timings = evaluate_analyses(specs, price_matrix)
+
+                for plan, daily_df in zip(pending, frames):
+                    self._store(cur, plan, daily_df)
+            return True
+
+        except Exception as e:
+            logger.error(f"Error refreshing materialized timelines: {e}")
+            return False
+
+    def rolling_metrics(self, analysis_ids: List[int], timeline_df: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        Rolling risk metrics of the analyses' stored timelines.
+
+        Analyses whose timeline state is unchanged since the last call are
+        served from memory; the rest are computed together in one pass.
+
+        Args:
+            analysis_ids: Analyses to return
+            timeline_df: Their timelines when already loaded (read via timeline() otherwise)
+
+        Returns:
+            DataFrame with ROLLING_COLUMNS, empty when the timelines are not materialized
+        """
+        try:
+            keys = self._state_keys(analysis_ids)
+            stale = [i for i in analysis_ids if i not in keys or self._rolling.get(i, (None,))[0] != keys[i]]
+            self.stats['rolling_hits'] += len(analysis_ids) - len(stale)
+
+            fresh = {}
+            if stale:
+                if timeline_df is None:
+                    timeline_df = self.timeline(stale)
+                    keys.update(self._state_keys(stale))
+                timeline_df = timeline_df[timeline_df['analysis_id'].isin(stale)]
+                benchmark_df = self._fetch_benchmark(timeline_df) if not timeline_df.empty else None
+                metrics = rolling_metrics_frame(timeline_df, benchmark_df)
+                self.stats['rolling_computed'] += len(stale)
+                for analysis_id, frame in metrics.groupby('analysis_id'):
+                    fresh[analysis_id] = frame
+                    if analysis_id in keys and benchmark_df is not None:
+                        self._rolling[analysis_id] = (keys[analysis_id], frame)
+
+            frames = [fresh.get(i) if i in stale else self._rolling[i][1] for i in analysis_ids]
+            frames = [frame for frame in frames if frame is not None]
+            if not frames:
+                return pd.DataFrame(columns=ROLLING_COLUMNS)
+            return pd.concat(frames, ignore_index=True)
+
+        except Exception as e:
+            logger.error(f"Error computing rolling metrics: {e}")
+            return pd.DataFrame(columns=ROLLING_COLUMNS)
+
+    def invalidate_from(self, cur, analysis_id: int, from_date: date, transaction_id: int):
+        """
+        Drop stored days from from_date on after a transaction was inserted on that date.
+
+        Runs inside the caller's transaction (under a savepoint, so a failure
+        here never aborts the insert). When the state changes moved by more
+        than this one row the watermark is left as is and the next refresh
+        rebuilds the analysis.
+
+        Args:
+            cur: Cursor of the transaction that inserted the row
+            analysis_id: Analysis ID
+            from_date: Transaction date
+            transaction_id: ID of the inserted state change
+        """
+        cur.execute("SAVEPOINT timeline_invalidate")
+        try:
+            self._ensure_tables(cur)
+            cur.execute("""
+                SELECT ts.transaction_count, ts.max_transaction_id, sc.count, sc.max_id
+                FROM portfolio_analysis_timeline_state ts
+                CROSS JOIN (
+                    SELECT COUNT(*) AS count, COALESCE(MAX(id), 0) AS max_id
+                    FROM portfolio_analysis_state_changes
+                    WHERE analysis_id = %s
+                ) sc
+                WHERE ts.analysis_id = %s
+                FOR UPDATE OF ts
+            """, (analysis_id, analysis_id))
+            row = cur.fetchone()
+            values = list(row.values()) if isinstance(row, dict) else row
+            if values and values[2] == values[0] + 1 and values[3] == transaction_id:
+                cur.execute("""
+                    DELETE FROM portfolio_analysis_daily_values
+                    WHERE analysis_id = %s AND trade_date >= %s
+                """, (analysis_id, from_date))
+                cur.execute("""
+                    UPDATE portfolio_analysis_timeline_state SET
+                        computed_through = (
+                            SELECT MAX(trade_date) FROM portfolio_analysis_daily_values WHERE analysis_id = %s
+                        ),
+                        transaction_count = %s,
+                        max_transaction_id = %s,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE analysis_id = %s
+                """, (analysis_id, values[2], values[3], analysis_id))
+            cur.execute("RELEASE SAVEPOINT timeline_invalidate")
+        except Exception as e:
+            cur.execute("ROLLBACK TO SAVEPOINT timeline_invalidate")
+            self._table_ready = False
+            logger.warning(f"Could not invalidate timeline of analysis {analysis_id} from {from_date}: {e}")
+
+    # ---------------------------------------------------------------- planning
+
+    def _plan(self, cur, analysis_ids: List[int], through: date) -> List[Dict]:
+        """Per analysis: trading days to cover, resume index and the watermark to store"""
+        cur.execute("""
+            SELECT pa.id, pa.start_date, pa.end_date, pa.start_cash,
+                   ts.computed_through, ts.start_date, ts.end_date, ts.start_cash,
+                   ts.transaction_count, ts.max_transaction_id, ts.price_watermark, ts.price_checked_at,
+                   COALESCE(sc.count, 0), COALESCE(sc.max_id, 0), COALESCE(sc.symbols, '{}')
+            FROM portfolio_analyses pa
+            LEFT JOIN portfolio_analysis_timeline_state ts ON ts.analysis_id = pa.id
+            LEFT JOIN (
+                SELECT analysis_id, COUNT(*) AS count, MAX(id) AS max_id,
+                       ARRAY_AGG(DISTINCT symbol) AS symbols
+                FROM portfolio_analysis_state_changes
+                WHERE analysis_id = ANY(%s)
+                GROUP BY analysis_id
+            ) sc ON sc.analysis_id = pa.id
+            WHERE pa.id = ANY(%s)
+        """, (analysis_ids, analysis_ids))
+
+        plans = []
+        for row in cur.fetchall():
+            (analysis_id, start_date, end_date, start_cash, computed_through, state_start, state_end,
+             state_cash, state_count, state_max_id, price_watermark, price_checked_at,
+             count, max_id, symbols) = (
+                list(row.values()) if isinstance(row, dict) else row)
+
+            matches = (state_count is not None
+                       and (state_start, state_end, float(state_cash)) == (start_date, end_date, float(start_cash))
+                       and (state_count, state_max_id) == (count, max_id))
+            plans.append({
+                'analysis_id': analysis_id,
+                'start_date': start_date,
+                'end_date': end_date,
+                'start_cash': float(start_cash or 0),
+                'trading_days': get_hkex_trading_days(start_date, min(end_date, through)),
+                'computed_through': computed_through if matches else None,
+                'price_watermark': price_watermark if matches else None,
+                'price_checked_at': price_checked_at if matches else None,
+                'rebuild': not matches,
+                'watermark': (int(count), int(max_id)),
+                'symbols': sorted(s for s in symbols if s),
+            })
+
+        self._apply_price_corrections(cur, plans)
+        for plan in plans:
+            plan['resume'] = plan_resume(plan['trading_days'], plan['computed_through'], plan['correction_date'])
+        return plans
+
+    def _apply_price_corrections(self, cur, plans: List[Dict]):
+        """
+        Latest close update and earliest corrected stored day per analysis, in one query.
+
+        Closes stamped after the stored watermark are corrections; so are closes
+        stamped within WATERMARK_SAFETY_WINDOW before the last check (or any, when
+        it was never checked), which may belong to writes still uncommitted then.
+        """
+        for plan in plans:
+            plan['correction_date'] = None
+            plan['new_price_watermark'] = plan['price_watermark']
+            plan['new_price_checked_at'] = plan['price_checked_at']
+
+        pairs = [(plan, symbol) for plan in plans if plan['trading_days'] for symbol in plan['symbols']]
+        if not pairs:
+            return
+
+        cur.execute("""
+            SELECT a.analysis_id, MAX(t.updated_at),
+                   MIN(t.trade_date) FILTER (
+                       WHERE t.updated_at > LEAST(a.watermark, COALESCE(a.checked_at, '-infinity') - %s)
+                         AND t.trade_date <= a.computed_through
+                   ),
+                   LOCALTIMESTAMP
+            FROM unnest(%s::int[], %s::text[], %s::date[], %s::date[], %s::date[], %s::timestamp[], %s::timestamp[])
+                 AS a(analysis_id, symbol, start_date, end_date, computed_through, watermark, checked_at)
+            JOIN daily_equity_technicals t
+              ON t.symbol = a.symbol AND t.trade_date BETWEEN a.start_date AND a.end_date
+            GROUP BY a.analysis_id
+        """, (
+            WATERMARK_SAFETY_WINDOW,
+            [plan['analysis_id'] for plan, _ in pairs],
+            [symbol for _, symbol in pairs],
+            [plan['trading_days'][0] for plan, _ in pairs],
+            [plan['trading_days'][-1] for plan, _ in pairs],
+            [plan['computed_through'] for plan, _ in pairs],
+            [plan['price_watermark'] for plan, _ in pairs],
+            [plan['price_checked_at'] for plan, _ in pairs],
+        ))
+
+        by_id = {plan['analysis_id']: plan for plan in plans}
+        for row in cur.fetchall():
+            analysis_id, latest_update, correction_date, checked_at = (
+                list(row.values()) if isinstance(row, dict) else row)
+            by_id[analysis_id]['new_price_watermark'] = latest_update
+            by_id[analysis_id]['new_price_checked_at'] = checked_at
+            by_id[analysis_id]['correction_date'] = correction_date
+
+    # ------------------------------------------------------------- computation
+
+    def _fetch_window(self, cur, pending: List[Dict]) -> Optional[pd.DataFrame]:
+        """
+        Closes of every pending symbol from the earliest look-back to the last day to compute.
+
+        Each symbol is seeded with its last stored close before the window (not
+        before the analysis start), so a symbol suspended through the look-back
+        forward fills exactly as in a full recompute.
+        """
+        symbols = sorted({s for plan in pending for s in plan['symbols']})
+        if not symbols:
+            return pd.DataFrame(columns=['symbol', 'date', 'close_price'])
+
+        window_start = min(
+            plan['start_date'] if plan['resume'] == 0
+            else max(plan['start_date'], plan['trading_days'][plan['resume']] - timedelta(days=PRICE_LOOKBACK_DAYS))
+            for plan in pending
+        )
+        window_end = max(plan['trading_days'][-1] for plan in pending)
+
+        first_dates: Dict[str, date] = {}
+        for plan in pending:
+            for symbol in plan['symbols']:
+                first_dates[symbol] = min(first_dates.get(symbol, plan['start_date']), plan['start_date'])
+        carry_in = self._carry_in_closes(cur, {s: d for s, d in first_dates.items() if d < window_start},
+                                         window_start)
+
+        price_df = self.fetch_prices(symbols, window_start, window_end)
+        frames = [frame for frame in (carry_in, price_df) if frame is not None and not frame.empty]
+        if not frames:
+            logger.warning(f"No price data for {len(symbols)} symbols, timelines not materialized")
+            return None
+        return pd.concat(frames, ignore_index=True)
+
+    def _carry_in_closes(self, cur, first_dates: Dict[str, date], before: date) -> pd.DataFrame:
+        """Last stored close of each symbol between its first date and the day before `before`, in one query"""
+        if not first_dates:
+            return pd.DataFrame(columns=['symbol', 'date', 'close_price'])
+        cur.execute("""
+            SELECT DISTINCT ON (t.symbol) t.symbol, t.trade_date, t.close_price
+            FROM daily_equity_technicals t
+            JOIN unnest(%s::text[], %s::date[]) AS w(symbol, first_date) ON w.symbol = t.symbol
+            WHERE t.trade_date >= w.first_date AND t.trade_date < %s
+              AND t.close_price IS NOT NULL
+            ORDER BY t.symbol, t.trade_date DESC
+        """, (list(first_dates), list(first_dates.values()), before))
+
+        rows = [list(row.values()) if isinstance(row, dict) else row for row in cur.fetchall()]
+        return pd.DataFrame({
+            'symbol': [row[0] for row in rows],
+            'date': pd.to_datetime([row[1] for row in rows]),
+            'close_price': [float(row[2]) for row in rows],
+        })
+
+    def _state_keys(self, analysis_ids: List[int]) -> Dict[int, tuple]:
+        """(computed_through, updated_at) of each materialized analysis"""
+        with self.db.connection() as conn, conn.cursor() as cur:
+            self._ensure_tables(cur)
+            cur.execute("""
+                SELECT analysis_id, computed_through, updated_at
+                FROM portfolio_analysis_timeline_state
+                WHERE analysis_id = ANY(%s)
+            """, (list(analysis_ids),))
+            return {values[0]: (values[1], values[2])
+                    for values in (list(row.values()) if isinstance(row, dict) else row for row in cur.fetchall())}
+
+    def _fetch_benchmark(self, timeline_df: pd.DataFrame) -> Optional[pd.DataFrame]:
+        """Benchmark closes over the timelines' span (None when unavailable, beta is then left empty)"""
+        start = pd.Timestamp(timeline_df['date'].min()).date() - timedelta(days=PRICE_LOOKBACK_DAYS)
+        end = pd.Timestamp(timeline_df['date'].max()).date()
+        try:
+            benchmark_df = self.fetch_prices([BENCHMARK_SYMBOL], start, end)
+        except Exception as e:
+            logger.warning(f"Could not load {BENCHMARK_SYMBOL} closes: {e}")
+            return None
+        if benchmark_df is None or benchmark_df.empty:
+            logger.warning(f"No {BENCHMARK_SYMBOL} closes between {start} and {end}, beta left empty")
+            return None
+        return benchmark_df
+
+    def _load_transactions(self, cur, analysis_ids: List[int]) -> Dict[int, List[Dict]]:
+        cur.execute("""
+            SELECT analysis_id, transaction_date, symbol, transaction_type, quantity_change, cash_change
+            FROM portfolio_analysis_state_changes
+            WHERE analysis_id = ANY(%s)
+            ORDER BY analysis_id, transaction_date, id
+        """, (analysis_ids,))
+
+        transactions: Dict[int, List[Dict]] = {}
+        for row in cur.fetchall():
+            values = list(row.values()) if isinstance(row, dict) else row
+            transactions.setdefault(values[0], []).append({
+                'transaction_date': values[1],
+                'symbol': values[2],
+                'transaction_type': values[3],
+                'quantity_change': values[4],
+                'cash_change': values[5],
+            })
+        return transactions
+
+    def _store(self, cur, plan: Dict, daily_df: pd.DataFrame):
+        """Replace the stored days of one analysis from its resume day on and advance its watermark"""
+        analysis_id = plan['analysis_id']
+        days = plan['trading_days'][plan['resume']:]
+
+        if plan['rebuild']:
+            cur.execute("DELETE FROM portfolio_analysis_daily_values WHERE analysis_id = %s", (analysis_id,))
+        else:
+            cur.execute("""
+                DELETE FROM portfolio_analysis_daily_values
+                WHERE analysis_id = %s AND trade_date >= %s
+            """, (analysis_id, days[0]))
+
+        execute_values(cur, """
+            INSERT INTO portfolio_analysis_daily_values
+            (analysis_id, trade_date, total_value, cash_position, equity_value, transaction_details)
+            VALUES %s
+            ON CONFLICT (analysis_id, trade_date) DO UPDATE SET
+                total_value = EXCLUDED.total_value,
+                cash_position = EXCLUDED.cash_position,
+                equity_value = EXCLUDED.equity_value,
+                transaction_details = EXCLUDED.transaction_details
+        """, list(zip(
+            [analysis_id] * len(daily_df), daily_df['date'],
+            daily_df['total_value'].astype(float).tolist(),
+            daily_df['cash_position'].astype(float).tolist(),
+            daily_df['equity_value'].astype(float).tolist(),
+            daily_df['transaction_details'].tolist(),
+        )))
+
+        cur.execute("""
+            INSERT INTO portfolio_analysis_timeline_state
+            (analysis_id, computed_through, start_date, end_date, start_cash,
+             transaction_count, max_transaction_id, price_watermark, price_checked_at, updated_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+            ON CONFLICT (analysis_id) DO UPDATE SET
+                computed_through = EXCLUDED.computed_through,
+                start_date = EXCLUDED.start_date,
+                end_date = EXCLUDED.end_date,
+                start_cash = EXCLUDED.start_cash,
+                transaction_count = EXCLUDED.transaction_count,
+                max_transaction_id = EXCLUDED.max_transaction_id,
+                price_watermark = EXCLUDED.price_watermark,
+                price_checked_at = EXCLUDED.price_checked_at,
+                updated_at = CURRENT_TIMESTAMP
+        """, (
+            analysis_id, days[-1], plan['start_date'], plan['end_date'], plan['start_cash'],
+            plan['watermark'][0], plan['watermark'][1], plan['new_price_watermark'],
+            plan['new_price_checked_at'],
+        ))
+
+        if plan['rebuild']:
+            self.stats['rebuilds'] += 1
+        elif plan['computed_through'] is not None and days[0] > plan['computed_through']:
+            self.stats['appended'] += 1
+        else:
+            self.stats['suffix_recomputes'] += 1
+        self.stats['days_computed'] += len(days)
+        logger.info(f"Materialized {len(days)} day(s) of analysis {analysis_id} from {days[0]}")
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Test the synthetic benchmark dataset and its in-memory database stand-in
+"""
+
+import sys
+sys.path.append('src')
+sys.path.append('benchmarks')
+from benchmarks.synthetic import SyntheticDataset, SyntheticDatabase, PRICES_UPDATED_AT
+from src.portfolio_analysis_manager import PortfolioAnalysisManager
+import numpy as np
+import pytest
+
+
+def test_dataset_is_deterministic():
+    """Same seed, same data; holdings never go negative"""
+    first = SyntheticDataset.generate(symbols=8, days=40, transactions=15, analyses=3, seed=5)
+    second = SyntheticDataset.generate(symbols=8, days=40, transactions=15, analyses=3, seed=5)
+    assert np.array_equal(first.closes, second.closes)
+    assert first.analyses == second.analyses
+    assert first.transactions == second.transactions
+
+    for analysis in first.analyses:
+        rows = first.transactions[analysis['id']]
+        assert len(rows) == 15
+        held = {}
+        for row in rows:
+            assert analysis['start_date'] <= row['transaction_date'] <= analysis['end_date']
+            held[row['symbol']] = held.get(row['symbol'], 0) + row['quantity_change']
+            assert held[row['symbol']] >= 0
+
+
+def test_stand_in_serves_timeline(monkeypatch, tmp_path):
+    """The live timeline path runs end to end on the stand-in, one row per trading day"""
+    monkeypatch.setenv('PRICE_CACHE_ENABLED', 'false')
+    monkeypatch.setenv('PRICE_CACHE_DIR', str(tmp_path))
+    dataset = SyntheticDataset.generate(symbols=6, days=30, transactions=10, analyses=2, seed=1)
+    manager = PortfolioAnalysisManager(SyntheticDatabase(dataset))
+    monkeypatch.setattr(manager.timelines, 'refresh', lambda *args: False)  # not materialized
+
+    timeline = manager.get_analysis_timeline_data(dataset.analysis_ids())
+    for analysis in dataset.analyses:
+        days = [d for d in dataset.trading_days if analysis['start_date'] <= d <= analysis['end_date']]
+        rows = timeline[timeline['analysis_id'] == analysis['id']]
+        assert list(rows['date']) == days
+    assert (timeline['total_value'] > 0).all()
+
+
+def test_stand_in_materializes_timeline(monkeypatch, tmp_path):
+    """TimelineStore materializes on the stand-in, serves stored values and re-checks unsettled prices"""
+    monkeypatch.setenv('PRICE_CACHE_ENABLED', 'false')
+    monkeypatch.setenv('PRICE_CACHE_DIR', str(tmp_path))
+    dataset = SyntheticDataset.generate(symbols=6, days=30, transactions=10, analyses=2, seed=1)
+    db = SyntheticDatabase(dataset)
+    manager = PortfolioAnalysisManager(db)
+    live = PortfolioAnalysisManager(SyntheticDatabase(dataset))
+    monkeypatch.setattr(live.timelines, 'refresh', lambda *args: False)
+    ids = dataset.analysis_ids()
+
+    stored = manager.get_analysis_timeline_data(ids)
+    assert manager.timelines.stats['rebuilds'] == 2
+    expected = live.get_analysis_timeline_data(ids)
+    assert list(stored['date']) == list(expected['date'])
+    assert np.allclose(stored['total_value'].astype(float), expected['total_value'].astype(float))
+
+    assert manager.get_analysis_timeline_data(ids).equals(stored)
+    assert manager.timelines.stats['current'] == 2
+
+    # Checked while the closes' writes could still be in flight: the stored days are recomputed once
+    db.timeline_state[1]['price_checked_at'] = PRICES_UPDATED_AT
+    assert manager.get_analysis_timeline_data(ids).equals(stored)
+    assert manager.timelines.stats['suffix_recomputes'] == 1
+    assert db.timeline_state[1]['price_checked_at'] > PRICES_UPDATED_AT
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test the binary Redis cache codec
+"""
+
+import sys
+import json
+sys.path.append('src')
+from src import cache_codec
+import numpy as np
+import pandas as pd
+from dateutil import tz
+
+
+def _frame(rows=300):
+    dates = pd.bdate_range('2025-01-02', periods=rows).tz_localize(tz.gettz('Asia/Hong_Kong'))
+    return pd.DataFrame({
+        'Date': dates,
+        'Close': np.linspace(100.0, 130.0, rows),
+        'Volume': np.arange(rows, dtype='int64') * 1000,
+        'Flag': np.arange(rows) % 2 == 0,
+        'Note': ['x'] * rows,
+    })
+
+
+def _assert_round_trip(original, decoded):
+    assert list(decoded.columns) == list(original.columns)
+    assert str(decoded['Date'].dt.tz) in ('Asia/Hong_Kong', str(original['Date'].dt.tz))
+    assert decoded['Date'].dt.tz_convert('UTC').equals(original['Date'].dt.tz_convert('UTC'))
+    for column in ('Close', 'Volume', 'Flag'):
+        assert decoded[column].dtype == original[column].dtype
+        assert decoded[column].equals(original[column])
+    assert list(decoded['Note']) == list(original['Note'])
+
+
+def test_frame_round_trip_all_formats():
+    """DataFrames keep dtypes, timezone and values in every format/compression"""
+    frame = _frame()
+    formats = [cache_codec.FORMAT_NUMPY]
+    if cache_codec.PYARROW_AVAILABLE:
+        formats.append(cache_codec.FORMAT_ARROW)
+
+    for fmt in formats:
+        for compression in (cache_codec.COMPRESSION_NONE, cache_codec.COMPRESSION_ZLIB):
+            payload = cache_codec.encode(frame, compression=compression, frame_format=fmt)
+            assert payload[:3] == cache_codec.MAGIC
+            assert payload[4] == fmt
+            assert payload[5] == compression
+            _assert_round_trip(frame, cache_codec.decode(payload))
+
+
+def test_indexed_frame_numpy():
+    """A named index survives the numpy format"""
+    frame = _frame(5).set_index('Date')
+    decoded = cache_codec.decode(cache_codec.encode(frame, frame_format=cache_codec.FORMAT_NUMPY))
+    assert decoded.index.name == 'Date'
+    assert decoded.index.tz_convert('UTC').equals(frame.index.tz_convert('UTC'))
+    assert decoded['Close'].tolist() == frame['Close'].tolist()
+
+
+def test_text_and_legacy_values():
+    """Strings round-trip, small payloads stay uncompressed and pre-codec values read as text"""
+    quote = json.dumps({'price': 599.0, 'volume': 100, 'timestamp': None})
+    payload = cache_codec.encode(quote)
+    assert payload[5] == cache_codec.COMPRESSION_NONE
+    assert cache_codec.decode(payload) == quote
+
+    long_text = 'a' * 5000
+    payload = cache_codec.encode(long_text, compression=cache_codec.COMPRESSION_ZLIB)
+    assert len(payload) < 200
+    assert cache_codec.decode(payload) == long_text
+
+    assert cache_codec.decode(quote.encode('utf-8')) == quote
+    assert cache_codec.decode(None) is None
+
+
+if __name__ == "__main__":
+    test_frame_round_trip_all_formats()
+    test_indexed_frame_numpy()
+    test_text_and_legacy_values()
+    print("✅ Cache codec tests passed")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test the shared connection pool (borrow/return, exhaustion, leak recovery)
+without a live database, using stand-in connection objects
+"""
+
+import sys
+import threading
+import time
+sys.path.append('src')
+from src.db_pool import ConnectionPool, PoolError
+from psycopg2 import extensions
+
+
+class _FakeInfo:
+    transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+
+class _FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.autocommit = False
+        self.info = _FakeInfo()
+        self.commits = 0
+        self.rollbacks = 0
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = 1
+
+
+def _make_pool(**kwargs):
+    pool = ConnectionPool('postgresql://test@localhost/test', min_connections=0, **kwargs)
+    pool._connect = _FakeConnection
+    return pool
+
+
+def test_connections_are_reused():
+    """Returned connections are handed out again instead of reconnecting"""
+    pool = _make_pool(max_connections=2)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert first is second
+    assert first.commits == 2
+    metrics = pool.get_metrics()
+    assert metrics['connections_created'] == 1
+    assert metrics['borrows'] == 2 and metrics['in_use'] == 0 and metrics['idle'] == 1
+
+
+def test_exhaustion_waits_then_times_out():
+    """Borrowing beyond max_connections blocks and raises after the timeout"""
+    pool = _make_pool(max_connections=1, connection_timeout=0.2)
+    held = pool.getconn()
+
+    start = time.monotonic()
+    try:
+        pool.getconn()
+        assert False, "expected PoolError"
+    except PoolError:
+        pass
+    assert time.monotonic() - start >= 0.2
+
+    # A waiter is released as soon as the connection is returned
+    threading.Timer(0.05, pool.putconn, args=(held,)).start()
+    pool.connection_timeout = 2
+    assert pool.getconn() is held
+
+    metrics = pool.get_metrics()
+    assert metrics['exhaustion_events'] == 2
+    assert metrics['wait_timeouts'] == 1
+
+
+def test_proxy_close_and_leak_recovery():
+    """close() and garbage collection of a proxy both return the connection"""
+    pool = _make_pool(max_connections=1, connection_timeout=0.1)
+
+    conn = pool.get_connection()
+    conn.close()
+    assert pool.get_metrics()['in_use'] == 0
+
+    def leak():
+        pool.get_connection()  # dropped without close()
+
+    leak()
+    metrics = pool.get_metrics()
+    assert metrics['in_use'] == 0
+    assert metrics['leaked_returns'] == 1
+
+
+def test_rollback_on_error():
+    """The context manager rolls back and still returns the connection on errors"""
+    pool = _make_pool(max_connections=1)
+    try:
+        with pool.connection() as conn:
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    assert conn.rollbacks == 1 and conn.commits == 0
+    assert pool.get_metrics()['idle'] == 1
+
+
+if __name__ == "__main__":
+    test_connections_are_reused()
+    test_exhaustion_waits_then_times_out()
+    test_proxy_close_and_leak_recovery()
+    test_rollback_on_error()
+    print("✅ Connection pool tests passed")
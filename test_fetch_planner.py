@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test the gap-aware fetch planner against the HKEX trading calendar
+"""
+
+import sys
+from datetime import date, datetime
+sys.path.append('src')
+from src.fetch_planner import plan_missing_ranges, record_empty_ranges, EmptyRangeCache
+from src.hkex_calendar import get_hkex_trading_days, hkex_calendar
+
+
+def test_complete_symbol_is_skipped():
+    days = get_hkex_trading_days(date(2025, 3, 3), date(2025, 3, 31))
+    plan = plan_missing_ranges({'0700.HK': days}, ['0700.HK'], date(2025, 3, 1), date(2025, 3, 31),
+                               today=date(2025, 6, 1))
+    assert plan.is_complete
+    assert plan.skipped_symbols == ['0700.HK']
+    assert plan.covered_days['0700.HK'] == len(days) == plan.expected_days
+
+
+def test_gaps_become_minimal_ranges():
+    """Gaps separated only by weekends/holidays are one range; stored days split ranges"""
+    days = get_hkex_trading_days(date(2025, 4, 1), date(2025, 4, 30))
+    missing = {date(2025, 4, 3), date(2025, 4, 7),            # Ching Ming (4 Apr) + weekend between
+               date(2025, 4, 17), date(2025, 4, 22),          # Easter holidays between
+               date(2025, 4, 29)}
+    stored = [d for d in days if d not in missing]
+
+    plan = plan_missing_ranges({'0005.HK': stored}, ['0005.HK', '0941.HK'],
+                               date(2025, 4, 1), date(2025, 4, 30), today=date(2025, 6, 1))
+
+    ranges = [(r.start_date, r.end_date, r.trading_days) for r in plan.ranges_for('0005.HK')]
+    assert ranges == [
+        (date(2025, 4, 3), date(2025, 4, 7), 2),
+        (date(2025, 4, 17), date(2025, 4, 22), 2),
+        (date(2025, 4, 29), date(2025, 4, 29), 1),
+    ]
+    # A symbol with nothing stored is a single range over the whole period
+    assert [(r.start_date, r.end_date) for r in plan.ranges_for('0941.HK')] == [(days[0], days[-1])]
+    assert plan.missing_days == {'0005.HK': 5, '0941.HK': len(days)}
+    assert plan.covered_days['0005.HK'] == len(days) - 5
+
+
+def test_bridge_and_today_cutoff():
+    days = get_hkex_trading_days(date(2025, 5, 5), date(2025, 5, 16))
+    stored = [d for d in days if d not in (date(2025, 5, 6), date(2025, 5, 8))]
+
+    merged = plan_missing_ranges({'2800.HK': stored}, ['2800.HK'], days[0], days[-1],
+                                 max_bridge_days=1, today=date(2025, 5, 14))
+    # 7 May is stored but bridged; sessions from 14 May onwards are not expected yet
+    assert [(r.start_date, r.end_date) for r in merged.ranges] == [(date(2025, 5, 6), date(2025, 5, 8))]
+    assert merged.expected_days == len([d for d in days if d < date(2025, 5, 14)])
+
+
+def test_empty_fetches_are_not_replanned():
+    """Days a fetch returned nothing for (suspension, before listing) are skipped until they expire"""
+    days = get_hkex_trading_days(date(2025, 3, 3), date(2025, 3, 31))
+    cache = EmptyRangeCache(ttl_seconds=60)
+    first = plan_missing_ranges({'6181.HK': days[10:]}, ['6181.HK'], days[0], days[-1],
+                                today=date(2025, 6, 1), empty_cache=cache)
+    assert [(r.start_date, r.end_date) for r in first.ranges] == [(days[0], days[9])]
+
+    # The provider only had bars from the listing day (days[8]) onwards
+    record_empty_ranges(first.ranges, {'6181.HK': days[8:10]}, cache=cache)
+    second = plan_missing_ranges({'6181.HK': days[10:]}, ['6181.HK'], days[0], days[-1],
+                                 today=date(2025, 6, 1), empty_cache=cache)
+    assert [(r.start_date, r.end_date) for r in second.ranges] == [(days[8], days[9])]
+    assert second.empty_days['6181.HK'] == 8 and second.missing_days['6181.HK'] == 2
+
+    # Once the days are stored they count as covered; expired entries are planned again
+    stored = plan_missing_ranges({'6181.HK': days[8:]}, ['6181.HK'], days[0], days[-1],
+                                 today=date(2025, 6, 1), empty_cache=cache)
+    assert stored.is_complete and stored.covered_days['6181.HK'] == len(days) - 8
+    cache.ttl_seconds = 0
+    record_empty_ranges(first.ranges, {'6181.HK': days[8:10]}, cache=cache)
+    again = plan_missing_ranges({'6181.HK': days[10:]}, ['6181.HK'], days[0], days[-1],
+                                today=date(2025, 6, 1), empty_cache=cache)
+    assert again.missing_days['6181.HK'] == 10
+
+
+def test_default_cutoff_is_last_completed_session():
+    """Without today the planner expects sessions through the last HKEX close, like the populator"""
+    days = get_hkex_trading_days(date(2025, 5, 2), date(2025, 5, 16))   # Friday 16 May is a session
+    original = hkex_calendar.get_last_completed_trading_day
+    try:
+        for now, last in [(datetime(2025, 5, 16, 16, 30), date(2025, 5, 16)),
+                          (datetime(2025, 5, 16, 11, 0), date(2025, 5, 15)),
+                          (datetime(2025, 5, 18, 9, 0), date(2025, 5, 16))]:
+            hkex_calendar.get_last_completed_trading_day = lambda now=now: original(now)
+            plan = plan_missing_ranges({}, ['0700.HK'], days[0], days[-1], empty_cache=EmptyRangeCache())
+            assert plan.expected_days == len([d for d in days if d <= last])
+            assert plan.ranges_for('0700.HK')[-1].end_date == last
+    finally:
+        hkex_calendar.get_last_completed_trading_day = original
+
+
+if __name__ == "__main__":
+    test_complete_symbol_is_skipped()
+    test_gaps_become_minimal_ranges()
+    test_bridge_and_today_cutoff()
+    test_empty_fetches_are_not_replanned()
+    test_default_cutoff_is_last_completed_session()
+    print("✅ Fetch planner tests passed")
@@ -99,23 +99,17 @@ def test_end_equity_calculation():
             print(f"End date: {end_date}")
             print(f"Current end_equity_value: {current_end_equity}")
             
-            # Test the _get_current_market_value method
+            # Refresh the portfolio's analyses with the set-based calculated-field update
             try:
-                market_value = analysis_manager._get_current_market_value(analysis_id)
-                print(f"Calculated market value: ${market_value:.2f}")
+                success, message, updated = analysis_manager.refresh_all_analyses_for_portfolio(portfolio_id)
+                print(f"Refresh: {message}")
                 
-                if market_value > 0:
+                cur.execute("SELECT end_equity_value FROM portfolio_analyses WHERE id = %s", (analysis_id,))
+                new_end_equity = cur.fetchone()[0] or 0
+                print(f"Updated end_equity_value: ${new_end_equity:.2f}")
+                
+                if success and new_end_equity > 0:
                     print("✅ End Equity calculation now returns non-zero value!")
-                    
-                    # Update the analysis calculations
-                    print("Updating analysis calculations...")
-                    analysis_manager.update_analysis_calculations(analysis_id)
-                    
-                    # Check the updated value
-                    cur.execute("SELECT end_equity_value FROM portfolio_analyses WHERE id = %s", (analysis_id,))
-                    new_end_equity = cur.fetchone()[0]
-                    print(f"Updated end_equity_value: ${new_end_equity:.2f}")
-                    
                     conn.close()
                     return True
                 else:
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Test the DB-first historical fetch: stored closes are used, only gaps are downloaded and written back
+"""
+
+import sys
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import date
+sys.path.append('src')
+from src.market_data import HISTORY_COLUMNS, HistoryResult, MarketDataProvider, empty_history
+from src.fetch_planner import empty_ranges
+from src.portfolio_calculator import PortfolioCalculator
+from src.price_index import PriceIndex
+from src.hkex_calendar import get_hkex_trading_days
+import pandas as pd
+
+
+class _Connection:
+    encoding = 'UTF8'
+
+
+class _Cursor:
+    """Serves stored closes, captures the VALUES rows of the write-back and indicator state resets"""
+
+    def __init__(self, stored):
+        self.connection = _Connection()
+        self.stored = stored
+        self.inserted = []
+        self.reset_symbols = []
+        self._page = []
+        self._result = []
+
+    def execute(self, sql, params=None):
+        sql = (sql.decode() if isinstance(sql, bytes) else sql).lstrip()
+        self._result = []
+        if sql.startswith('SELECT'):
+            self._result = self.stored
+        elif sql.startswith('INSERT'):
+            self._result = [(args[0],) for args in self._page]  # RETURNING symbol
+            self._page = []
+        elif sql.startswith('DELETE FROM equity_indicator_state'):
+            self.reset_symbols.extend(params[0])
+
+    def mogrify(self, template, args):
+        self.inserted.append(tuple(args))
+        self._page.append(tuple(args))
+        return b'(0)'
+
+    def fetchall(self):
+        return self._result
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Database:
+    def __init__(self, stored):
+        self.cursor_ = _Cursor(stored)
+
+    @contextmanager
+    def connection(self):
+        yield self
+
+    def cursor(self):
+        return self.cursor_
+
+
+class _BarsProvider(MarketDataProvider):
+    """Synthesises one bar per trading day and records each request"""
+
+    name = 'bars'
+
+    def __init__(self):
+        self.calls = []
+
+    def history(self, symbols, start_date, end_date, adjusted=False):
+        self.calls.append((list(symbols), start_date, end_date, adjusted))
+        rows = [
+            (symbol, d, 10.0, 11.0, 9.0, 10.5, 1000)
+            for symbol in symbols for d in get_hkex_trading_days(start_date, end_date)
+        ]
+        return pd.DataFrame(rows, columns=HISTORY_COLUMNS) if rows else empty_history()
+
+    def quotes(self, symbols):
+        return {}
+
+
+class _ThrottledProvider(_BarsProvider):
+    """Swallows errors like the Yahoo provider: the first request fails the given symbols"""
+
+    def __init__(self, failing, listed_from=None):
+        super().__init__()
+        self.failing = set(failing)
+        self.listed_from = listed_from or {}
+
+    def history_result(self, symbols, start_date, end_date, adjusted=False):
+        bars = self.history(symbols, start_date, end_date, adjusted)
+        bars = bars[[symbol not in self.failing and d >= self.listed_from.get(symbol, d)
+                     for symbol, d in zip(bars['symbol'], bars['Date'])]].reset_index(drop=True)
+        failed, self.failing = self.failing & set(symbols), set()
+        return HistoryResult(bars if not bars.empty else empty_history(), failed)
+
+
+def _calculator(stored):
+    os.environ['PRICE_CACHE_ENABLED'] = 'false'
+    os.environ['PRICE_CACHE_DIR'] = tempfile.mkdtemp()  # fresh process-wide cache bound to this db
+    db = _Database(stored)
+    provider = _BarsProvider()
+    return PortfolioCalculator(market_data=provider, db=db), provider, db.cursor_
+
+
+def test_gaps_downloaded_once_and_stored():
+    """Only symbols with gaps are downloaded, in one call; gap bars are written back; stored closes win"""
+    days = get_hkex_trading_days(date(2025, 3, 3), date(2025, 3, 31))
+    stored = [('0700.HK', d, 400.0) for d in days]                 # complete
+    stored += [('0005.HK', d, 80.0) for d in days if d.day < 20]   # tail missing
+    calculator, provider, cursor = _calculator(stored)
+
+    prices = calculator.fetch_historical_prices(['0700.HK', '0005.HK', '0939.HK'], days[0], days[-1])
+
+    assert isinstance(prices, PriceIndex)
+    assert len(provider.calls) == 1
+    symbols, start, end, adjusted = provider.calls[0]
+    assert sorted(symbols) == ['0005.HK', '0939.HK'] and adjusted
+    assert (start, end) == (days[0], days[-1])
+
+    assert prices.asof('0700.HK', days[-1]) == 400.0
+    assert prices.asof('0005.HK', date(2025, 3, 19)) == 80.0
+    assert prices.asof('0005.HK', days[-1]) == 10.5
+    assert prices.dates('0939.HK') == days
+
+    inserted = {(row[0], row[1]) for row in cursor.inserted}
+    assert ('0005.HK', date(2025, 3, 19)) not in inserted
+    assert ('0005.HK', date(2025, 3, 20)) in inserted
+    assert len(inserted) == len([d for d in days if d.day >= 20]) + len(days)
+    # The bars were stored without indicators: their symbols are queued for a full recompute
+    assert cursor.reset_symbols == ['0005.HK', '0939.HK']
+
+
+def test_complete_range_stays_local():
+    """When the database covers the range no download or write happens"""
+    days = get_hkex_trading_days(date(2025, 3, 3), date(2025, 3, 14))
+    calculator, provider, cursor = _calculator([('0700.HK', d, 400.0) for d in days])
+
+    prices = calculator.fetch_historical_prices(['0700.HK'], days[0], days[-1])
+
+    assert provider.calls == []
+    assert cursor.inserted == [] and cursor.reset_symbols == []
+    assert prices.dates('0700.HK') == days
+
+
+def test_failed_download_is_refetched():
+    """Days a failed request returned nothing for are not remembered as empty"""
+    days = get_hkex_trading_days(date(2025, 4, 1), date(2025, 4, 30))
+    empty_ranges.clear()
+
+    # The whole response failed: nothing is recorded, the next call asks again
+    calculator, _, _ = _calculator([])
+    calculator.market_data = provider = _ThrottledProvider(['0700.HK'])
+    assert '0700.HK' not in calculator.fetch_historical_prices(['0700.HK'], days[0], days[-1])
+    prices = calculator.fetch_historical_prices(['0700.HK'], days[0], days[-1])
+    assert [call[1:3] for call in provider.calls] == [(days[0], days[-1])] * 2
+    assert prices.dates('0700.HK') == days
+
+    # One symbol failed, the other answered from its listing day: only the answered symbol's
+    # pre-listing days are skipped on the refetch
+    empty_ranges.clear()
+    calculator, _, _ = _calculator([])
+    calculator.market_data = provider = _ThrottledProvider(['0005.HK'], listed_from={'6181.HK': days[10]})
+    calculator.fetch_historical_prices(['0005.HK', '6181.HK'], days[0], days[-1])
+    assert empty_ranges.days('0005.HK') == set()
+    assert empty_ranges.days('6181.HK') == set(days[:10])
+    empty_ranges.clear()
+
+
+if __name__ == "__main__":
+    test_gaps_downloaded_once_and_stored()
+    test_complete_range_stays_local()
+    test_failed_download_is_refetched()
+    print("✅ Historical fetch tests passed")
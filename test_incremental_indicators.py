@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test that incremental indicator updates match a full recompute
+"""
+
+import sys
+from datetime import date, datetime, timedelta, timezone
+sys.path.append('src')
+from src.price_data_populator import PriceDataPopulator, _TECHNICALS_VALUE_COLUMNS, TECHNICALS_COLUMNS
+from src.hkex_calendar import hkex_calendar, HK_TZ
+from src.incremental_indicators import (
+    IncrementalIndicatorCalculator, IndicatorState, ewm_mean_continue
+)
+import numpy as np
+import pandas as pd
+
+INDICATOR_COLUMNS = sorted({source for column, source in TECHNICALS_COLUMNS
+                            if column in _TECHNICALS_VALUE_COLUMNS})
+
+
+def _bars(n=420, seed=11):
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range('2023-01-02', periods=n)
+    close = 80 + np.cumsum(rng.normal(0, 1.2, n))
+    spread = rng.uniform(0.2, 2.0, n)
+    return pd.DataFrame({
+        'Date': days.date,
+        'Open': close + rng.normal(0, 0.3, n),
+        'High': close + spread,
+        'Low': close - spread,
+        'Close': close,
+        'Volume': rng.integers(10_000, 90_000, n).astype(float),
+    })
+
+
+def test_ewm_continuation_matches_pandas():
+    """Splitting the series across calls reproduces Series.ewm(span).mean()"""
+    values = _bars()['Close'].to_numpy().copy()
+    values[5] = np.nan
+    expected = pd.Series(values).ewm(span=12).mean().to_numpy()
+
+    first, state = ewm_mean_continue(values[:100], 12)
+    second, _ = ewm_mean_continue(values[100:], 12, state)
+    np.testing.assert_array_equal(np.concatenate([first, second]), expected)
+
+
+def test_incremental_matches_full_recompute():
+    """Appending bars in several steps gives the same rows as one full computation"""
+    bars = _bars()
+    populator = PriceDataPopulator.__new__(PriceDataPopulator)
+    calculator = IncrementalIndicatorCalculator(populator)
+
+    full = populator.calculate_technical_indicators(bars.copy())
+
+    initial, state = calculator.initialize('0700.HK', bars.iloc[:300])
+    pieces = [initial]
+    for start, stop in [(300, 301), (301, 360), (360, 420)]:
+        # Overlapping rows already covered by the state are ignored
+        new_rows, state = calculator.update(state, bars.iloc[start - 3:stop])
+        assert len(new_rows) == stop - start
+        pieces.append(new_rows)
+        # State survives a round trip through its JSON representation
+        state = IndicatorState.from_json(state.to_json())
+
+    incremental = pd.concat(pieces, ignore_index=True)
+    assert list(incremental['Date']) == list(full['Date'])
+    assert state.last_trade_date == full['Date'].iloc[-1] and len(state.tail) == 252
+    for column in INDICATOR_COLUMNS:
+        np.testing.assert_allclose(incremental[column].to_numpy(dtype=float),
+                                   full[column].to_numpy(dtype=float),
+                                   rtol=1e-12, atol=1e-9, err_msg=column)
+
+
+def test_no_new_bars_keeps_state():
+    bars = _bars(n=60)
+    calculator = IncrementalIndicatorCalculator(PriceDataPopulator.__new__(PriceDataPopulator))
+    _, state = calculator.initialize('0005.HK', bars)
+    rows, same_state = calculator.update(state, bars.tail(5))
+    assert rows.empty and same_state is state
+
+
+def test_partial_session_is_not_stored():
+    """Runs before the close stop at the previous session, so today's bar is fetched once final"""
+    wednesday = date(2025, 3, 12)
+    assert hkex_calendar.get_last_completed_trading_day(datetime(2025, 3, 12, 11, 0, tzinfo=HK_TZ)) == date(2025, 3, 11)
+    assert hkex_calendar.get_last_completed_trading_day(datetime(2025, 3, 12, 16, 30, tzinfo=HK_TZ)) == wednesday
+    # 09:00 UTC is 17:00 in Hong Kong; Monday morning falls back to Friday
+    assert hkex_calendar.get_last_completed_trading_day(datetime(2025, 3, 12, 9, 0, tzinfo=timezone.utc)) == wednesday
+    assert hkex_calendar.get_last_completed_trading_day(datetime(2025, 3, 17, 9, 30, tzinfo=HK_TZ)) == date(2025, 3, 14)
+
+    populator = PriceDataPopulator.__new__(PriceDataPopulator)
+    populator._fetch_bars = lambda *args: (_ for _ in ()).throw(AssertionError("fetched a partial session"))
+    state = IndicatorState('0700.HK', hkex_calendar.get_last_completed_trading_day())
+    result = populator.populate_symbol_incremental('0700.HK', date.today() + timedelta(days=7), state=state)
+    assert result['mode'] == 'up_to_date' and result['success']
+
+
+if __name__ == "__main__":
+    test_ewm_continuation_matches_pandas()
+    test_incremental_matches_full_recompute()
+    test_no_new_bars_keeps_state()
+    test_partial_session_is_not_stored()
+    print("✅ Incremental indicator tests passed")
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Test batch indicator series against the per-bar TechnicalIndicatorCalculator
+"""
+
+import sys
+import time
+sys.path.append('src')
+from src.strategic_signal_engine import (
+    TechnicalIndicatorCalculator, INDICATOR_FIELDS, INDICATOR_WARMUP, stack_price_frames
+)
+import numpy as np
+import pandas as pd
+
+# Series the strategies read; these follow the per-bar definitions exactly
+SCALAR_FIELDS = ['rsi6', 'rsi12', 'rsi14', 'rsi24', 'macd', 'ema5', 'ema10', 'ema20', 'ema50',
+                 'sma20', 'sma50', 'bb_upper', 'bb_middle', 'bb_lower', 'atr14', 'vr24',
+                 'stoch_k', 'williams_r']
+
+
+def _frame(symbol, n, seed):
+    rng = np.random.default_rng(seed)
+    close = 50 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    spread = close * rng.uniform(0.002, 0.03, n)
+    return pd.DataFrame({
+        'symbol': symbol,
+        'bar_date': pd.bdate_range('2022-01-03', periods=n).date,
+        'open_price': close + rng.normal(0, 0.2, n),
+        'high_price': close + spread,
+        'low_price': close - spread,
+        'close_price': close,
+        'volume': rng.integers(100_000, 2_000_000, n),
+    })
+
+
+def _random_ohlcv(n_symbols, n_bars, seed=0):
+    rng = np.random.default_rng(seed)
+    closes = 50 * np.exp(np.cumsum(rng.normal(0, 0.02, (n_symbols, n_bars)), axis=1))
+    spread = closes * rng.uniform(0.002, 0.03, (n_symbols, n_bars))
+    volumes = rng.integers(100_000, 2_000_000, (n_symbols, n_bars)).astype(float)
+    return closes, closes + spread, closes - spread, volumes
+
+
+def test_series_match_per_bar_calculator():
+    """Every bar of the batch equals calculate_all_indicators on the bars up to it, ragged histories included"""
+    frames = {'0700.HK': _frame('0700.HK', 160, 1), '0005.HK': _frame('0005.HK', 90, 2)}
+    series = TechnicalIndicatorCalculator.calculate_series_for_frames(frames)
+    assert series.closes.shape == (2, 160)
+    assert np.isnan(series.closes[1, :70]).all()
+
+    for row, (symbol, frame) in enumerate(frames.items()):
+        offset = 160 - len(frame)
+        for cut in (50, 51, 75, len(frame)):
+            expected = TechnicalIndicatorCalculator.calculate_all_indicators(frame.iloc[:cut])
+            actual = series.snapshot(row, offset + cut - 1)
+            assert actual.symbol == symbol and actual.bar_date == expected.bar_date
+            assert actual.close_price == expected.close_price
+            for name in SCALAR_FIELDS:
+                assert abs(getattr(actual, name) - getattr(expected, name)) < 1e-9, (symbol, cut, name)
+
+
+def test_full_history_definitions_and_warmup():
+    """Signal lines use real history, indicators are NaN until warmed up, snapshots map NaN to None"""
+    frame = _frame('0388.HK', 120, 4)
+    closes = frame['close_price']
+    series = TechnicalIndicatorCalculator.calculate_series_for_frames({'0388.HK': frame})
+
+    macd = closes.ewm(span=12, adjust=False).mean() - closes.ewm(span=26, adjust=False).mean()
+    macd_sig = macd.iloc[25:].ewm(span=9, adjust=False).mean()
+    np.testing.assert_allclose(series['macd_sig'][0, 33:], macd_sig.iloc[8:], rtol=1e-10)
+    stoch_d = pd.Series(series['stoch_k'][0]).rolling(3).mean()
+    np.testing.assert_allclose(series['stoch_d'][0, 15:], stoch_d.iloc[15:], rtol=1e-10)
+
+    for name in INDICATOR_FIELDS:
+        required = INDICATOR_WARMUP[name]
+        assert np.isnan(series[name][0, :required - 1]).all(), name
+        assert not np.isnan(series[name][0, required - 1:]).any(), name
+    assert 0 <= np.nanmin(series['mfi14']) and np.nanmax(series['mfi14']) <= 100
+    assert 0 <= np.nanmin(series['adx14']) and np.nanmax(series['adx14']) <= 100
+
+    early = series.snapshot(0, 30)
+    assert early.ema50 is None and early.rsi14 is not None
+    assert len(series.snapshots()) == 1
+
+
+def test_hsi_universe_speed():
+    """An HSI-sized universe over four years of bars computes well under a second"""
+    closes, highs, lows, volumes = _random_ohlcv(82, 1000)
+    started = time.perf_counter()
+    series = TechnicalIndicatorCalculator.calculate_series(closes, highs, lows, volumes)
+    elapsed = time.perf_counter() - started
+    assert set(series.values) == set(INDICATOR_FIELDS)
+    assert len(series.snapshots()) == 82
+    assert elapsed < 1.0, elapsed
+
+
+def test_stack_price_frames_right_aligns():
+    symbols, arrays = stack_price_frames({'A': _frame('A', 5, 1), 'B': _frame('B', 3, 2)})
+    assert symbols == ['A', 'B']
+    assert arrays['closes'].shape == (2, 5)
+    assert np.isnan(arrays['closes'][1, :2]).all() and arrays['bar_dates'][1, 0] is None
+    assert arrays['bar_dates'][1, -1] == _frame('B', 3, 2)['bar_date'].iloc[-1]
+
+
+if __name__ == "__main__":
+    test_series_match_per_bar_calculator()
+    test_full_history_definitions_and_warmup()
+    test_hsi_universe_speed()
+    test_stack_price_frames_right_aligns()
+    print("✅ Indicator series tests passed")
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Test the parameter sweep runner: set generation, pool vs inline scores, persistence and resume
+"""
+
+import sys
+import logging
+from contextlib import contextmanager
+sys.path.append('src')
+from src.parameter_sweep import (
+    ParameterSweepRunner, SweepContext, parameter_grid, random_parameter_sets, params_hash,
+    unread_parameters
+)
+from src.strategic_signal_engine import StrategicSignalEngine, TechnicalIndicatorCalculator
+from test_indicator_series import _frame
+
+
+def _frames():
+    return {f"{i:04d}.HK": _frame(f"{i:04d}.HK", 300, i) for i in range(1, 7)}
+
+
+class _SweepDatabase:
+    """StrategicDatabaseManager calls of a sweep plus the parameter_sweep_result table"""
+
+    def __init__(self, fail_save=False):
+        self.runs = []
+        self.completed_runs = []
+        self.results = {}
+        self.fail_save = fail_save
+
+    def create_parameter_set(self, name, params, engine_version="1.0.0"):
+        return f"ps-{params_hash(params)[:8]}"
+
+    def create_signal_run(self, param_set_id, universe_name, start_date, end_date, notes=None):
+        assert start_date is not None and end_date is not None  # NOT NULL columns
+        self.runs.append((param_set_id, notes, start_date, end_date))
+        return f"run-{len(self.runs)}"
+
+    def save_signal_events(self, signals, run_id=None, param_set_id=None):
+        return 0 if self.fail_save else len(signals)
+
+    def complete_signal_run(self, run_id):
+        self.completed_runs.append(run_id)
+        return True
+
+    @contextmanager
+    def connection(self):
+        yield self
+
+    @contextmanager
+    def cursor(self):
+        yield self
+
+    def execute(self, sql, params=None):
+        text = ' '.join(sql.split())
+        self._rows = []
+        if text.startswith('SELECT params_hash FROM parameter_sweep_result'):
+            self._rows = [(key,) for (sweep, key) in self.results if sweep == params[0]]
+        elif text.startswith('INSERT INTO parameter_sweep_result'):
+            self.results[params[:2]] = params[2:]
+        elif not text.startswith('CREATE TABLE'):
+            raise AssertionError(text)
+
+    def fetchall(self):
+        return self._rows
+
+
+def test_parameter_sets():
+    """Grids cover every combination; random samples are distinct and reproducible"""
+    grid = parameter_grid({'breakout_epsilon': [0.0, 0.01], 'volume_threshold': [1.2, 1.5, 2.0]})
+    assert len(grid) == 6 and {'breakout_epsilon': 0.01, 'volume_threshold': 2.0} in grid
+
+    space = {'breakout_epsilon': (0.0, 0.02), 'rsi_oversold': [25, 30, 35]}
+    samples = random_parameter_sets(space, 8, seed=3)
+    assert samples == random_parameter_sets(space, 8, seed=3)
+    assert len({params_hash(p) for p in samples}) == 8
+    assert all(0.0 <= p['breakout_epsilon'] <= 0.02 and p['rsi_oversold'] in (25, 30, 35) for p in samples)
+    assert len(random_parameter_sets({'rsi_oversold': [25, 30]}, 5)) == 2
+
+
+def test_unread_parameters_warn():
+    """Varying a parameter no strategy reads is reported: those sets repeat another run"""
+    assert unread_parameters(parameter_grid({'breakout_epsilon': [0.0, 0.01], 'volume_threshold': [1.5]})) == []
+    sets = parameter_grid({'breakout_epsilon': [0.0, 0.01], 'rsi_oversold': [25, 30], 'atr_multiplier': [2.0]})
+    assert unread_parameters(sets) == ['rsi_oversold']
+
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    logger = logging.getLogger('src.parameter_sweep')
+    logger.addHandler(handler)
+    try:
+        results = ParameterSweepRunner(workers=1).run('unread', sets, _frames())
+    finally:
+        logger.removeHandler(handler)
+
+    warnings = [r.getMessage() for r in records if r.levelno == logging.WARNING]
+    assert warnings == ['Sweep unread: rsi_oversold not read by any strategy; 4 parameter sets give 2 distinct runs']
+    by_epsilon = results.groupby('breakout_epsilon')['objective']
+    assert (by_epsilon.nunique(dropna=False) == 1).all()
+
+
+def test_pool_matches_inline():
+    """Worker processes on shared memory score exactly like the in-process evaluation"""
+    frames = _frames()
+    sets = parameter_grid({'breakout_epsilon': [0.0, 0.005, 0.02]})
+
+    inline = ParameterSweepRunner(workers=1).run('inline', sets, frames)
+    pooled = ParameterSweepRunner(workers=2).run('pooled', sets, frames)
+
+    assert len(inline) == 3 and inline['signals'].sum() > 0
+    key = ['breakout_epsilon', 'signals', 'objective', 'hit_rate_5d', 'avg_mfe']
+    assert (inline.sort_values('breakout_epsilon')[key].to_dict('records')
+            == pooled.sort_values('breakout_epsilon')[key].to_dict('records'))
+    # A looser breakout threshold fires at least as often
+    by_epsilon = inline.set_index('breakout_epsilon')['signals']
+    assert by_epsilon[0.0] >= by_epsilon[0.005] >= by_epsilon[0.02]
+    # Objective ranking
+    assert list(inline['objective'].dropna()) == sorted(inline['objective'].dropna(), reverse=True)
+
+
+def test_resume_and_shared_indicators():
+    """Recorded sets are skipped; indicator series are computed once per sweep"""
+    frames = _frames()
+    start, end = frames['0001.HK']['bar_date'].iloc[[100, 299]]
+    db = _SweepDatabase()
+    runner = ParameterSweepRunner(db)
+
+    calls = []
+    original = TechnicalIndicatorCalculator.calculate_series
+    def counting(*args, **kwargs):
+        calls.append(1)
+        return original(*args, **kwargs)
+    TechnicalIndicatorCalculator.calculate_series = staticmethod(counting)
+    try:
+        first = runner.run('eps', parameter_grid({'breakout_epsilon': [0.0, 0.01]}), frames, (start, end))
+    finally:
+        TechnicalIndicatorCalculator.calculate_series = staticmethod(original)
+
+    assert len(calls) == 1 and len(first) == 2
+    assert db.completed_runs == ['run-1', 'run-2'] and len(db.results) == 2
+    defaults = StrategicSignalEngine().parameter_set
+    assert ('eps', params_hash({**defaults, 'breakout_epsilon': 0.01})) in db.results
+
+    # Interrupted sweep rerun with a larger grid: only the new set is evaluated
+    second = runner.run('eps', parameter_grid({'breakout_epsilon': [0.0, 0.01, 0.03]}), frames, (start, end))
+    assert list(second['breakout_epsilon']) == [0.03] and len(db.runs) == 3
+    assert runner.run('eps', [{'breakout_epsilon': 0.0}], frames).empty
+
+
+def test_open_date_range_and_failed_store():
+    """Open bounds are recorded as the bar dates; sets whose signals fail to store are not recorded"""
+    frames = _frames()
+    first, last = frames['0001.HK']['bar_date'].iloc[[0, -1]]
+    db = _SweepDatabase()
+    ParameterSweepRunner(db).run('open', [{'breakout_epsilon': 0.0}], frames)
+    assert [run[2:] for run in db.runs] == [(first, last)] and db.completed_runs == ['run-1']
+
+    failing = _SweepDatabase(fail_save=True)
+    runner = ParameterSweepRunner(failing)
+    first_try = runner.run('fail', [{'breakout_epsilon': 0.0}], frames, (frames['0001.HK']['bar_date'].iloc[100], None))
+    assert len(first_try) == 1 and first_try['signals'].iloc[0] > 0
+    assert failing.runs[0][3] == last
+    assert failing.completed_runs == [] and failing.results == {}
+    # Nothing was recorded, so the resumed sweep evaluates the set again
+    assert len(runner.run('fail', [{'breakout_epsilon': 0.0}], frames)) == 1
+
+
+if __name__ == "__main__":
+    test_parameter_sets()
+    test_unread_parameters_warn()
+    test_pool_matches_inline()
+    test_resume_and_shared_indicators()
+    test_open_date_range_and_failed_store()
+    print("✅ Parameter sweep tests passed")
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test vectorized daily attribution against the row-by-row calculation it replaces
+"""
+
+import sys
+import json
+from datetime import date
+sys.path.append('src')
+from src.portfolio_calculator import PortfolioCalculator, calculate_daily_contributions, CONTRIBUTOR_COLUMNS
+from src.hkex_calendar import get_hkex_trading_days
+import numpy as np
+import pandas as pd
+
+
+def _reference_attribution(positions, price_data, trading_days, cash_amount):
+    """Per-day position dicts and the sorted top 3 per row, as previously computed"""
+    days = []
+    for trade_date in trading_days:
+        position_values = {}
+        for symbol, quantity in positions.items():
+            bars = price_data.get(symbol)
+            if bars is None:
+                continue
+            available = bars[bars['Date'] <= trade_date]
+            if available.empty:
+                continue
+            price = float(available.iloc[-1]['Close'])
+            position_values[symbol] = {'price': price, 'value': quantity * price}
+        days.append(position_values)
+
+    totals = [sum(p['value'] for p in day.values()) + cash_amount for day in days]
+    result = [[]]
+    for i in range(1, len(days)):
+        total_change = totals[i] - totals[i - 1]
+        contributions = []
+        for symbol, current in days[i].items():
+            if symbol not in days[i - 1]:
+                continue
+            previous = days[i - 1][symbol]
+            value_change = current['value'] - previous['value']
+            price_change = current['price'] - previous['price']
+            contributions.append({
+                'symbol': symbol,
+                'contribution': value_change,
+                'contribution_pct': value_change / total_change * 100 if total_change != 0 else 0,
+                'price_change': price_change,
+                'price_change_pct': price_change / previous['price'] * 100 if previous['price'] != 0 else 0,
+                'position_value': current['value'],
+            })
+        contributions.sort(key=lambda x: abs(x['contribution']), reverse=True)
+        result.append(contributions[:3])
+    return result
+
+
+def _price_data(trading_days, symbols, seed=4):
+    rng = np.random.default_rng(seed)
+    price_data = {}
+    for offset, symbol in enumerate(symbols):
+        days = trading_days[offset * 3:]  # staggered first closes
+        keep = rng.random(len(days)) < 0.8
+        closes = 50 * np.exp(np.cumsum(rng.normal(0, 0.02, len(days))))
+        price_data[symbol] = pd.DataFrame({
+            'Date': [d for d, k in zip(days, keep) if k],
+            'Close': closes[keep],
+        })
+    return price_data
+
+
+def test_matches_row_by_row_attribution():
+    """top_contributors equals the per-row sorted attribution on every day"""
+    trading_days = get_hkex_trading_days(date(2025, 1, 2), date(2025, 4, 30))
+    symbols = [f"{i:04d}.HK" for i in range(1, 9)]
+    positions = {symbol: (i + 1) * 100 for i, symbol in enumerate(symbols)}
+    positions['9999.HK'] = 500  # no price data
+    price_data = _price_data(trading_days, symbols)
+
+    calculator = PortfolioCalculator(market_data=object())
+    df = calculator.calculate_daily_portfolio_values(
+        positions, price_data, trading_days[0], trading_days[-1], cash_amount=10000.0)
+    expected = _reference_attribution(positions, price_data, trading_days, 10000.0)
+
+    assert 'position_values' not in df.columns
+    for actual, reference in zip(df['top_contributors'], expected):
+        assert [c['symbol'] for c in actual] == [c['symbol'] for c in reference]
+        for a, r in zip(actual, reference):
+            assert set(a) == set(r)
+            for field in r:
+                if field != 'symbol':
+                    assert abs(a[field] - r[field]) < 1e-6
+
+    # Stored as JSON by save_portfolio_value_history / analysis_manager
+    assert json.loads(json.dumps(df['top_contributors'].iloc[-1])) == df['top_contributors'].iloc[-1]
+
+    contributors = df.attrs['contributors']
+    assert list(contributors.columns) == CONTRIBUTOR_COLUMNS
+    assert len(contributors) == sum(len(c) for c in expected)
+    assert contributors.groupby('trade_date')['rank'].apply(list).map(lambda r: r == list(range(1, len(r) + 1))).all()
+
+
+def test_fewer_symbols_than_top_k():
+    """With fewer symbols than k every valid contribution is kept, largest first"""
+    days = [date(2025, 3, 3), date(2025, 3, 4), date(2025, 3, 5)]
+    prices = np.array([[10.0, np.nan], [11.0, 20.0], [10.5, 22.0]])
+    quantities = np.array([100.0, 10.0])
+    totals = (np.nan_to_num(prices) * quantities).sum(axis=1)
+    contributors = calculate_daily_contributions(days, ['A', 'B'], prices, quantities, np.diff(totals, prepend=np.nan))
+
+    assert contributors['trade_date'].tolist() == [days[1], days[2], days[2]]
+    assert contributors['symbol'].tolist() == ['A', 'A', 'B']
+    assert contributors['contribution'].tolist() == [100.0, -50.0, 20.0]
+    assert contributors['rank'].tolist() == [1, 1, 2]
+
+
+if __name__ == "__main__":
+    test_matches_row_by_row_attribution()
+    test_fewer_symbols_than_top_k()
+    print("✅ Portfolio attribution tests passed")
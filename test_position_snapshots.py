@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Test checkpointed position snapshots against re-aggregating the state changes
+"""
+
+import sys
+from datetime import date, timedelta
+sys.path.append('src')
+from src.position_snapshots import AnalysisSnapshots, PositionSnapshotStore
+import numpy as np
+
+
+def _brute_force(transactions, start_cash, target_date):
+    """The SUM ... WHERE transaction_date <= %s aggregation the snapshots replace"""
+    cash = start_cash + sum(t[4] for t in transactions if t[1] <= target_date)
+    positions = {}
+    for _, day, symbol, quantity, cash_change in transactions:
+        if day > target_date:
+            continue
+        held, bought_qty, bought_cash = positions.get(symbol, (0, 0, 0.0))
+        if quantity > 0:
+            bought_qty += quantity
+            bought_cash += cash_change
+        positions[symbol] = (held + quantity, bought_qty, bought_cash)
+    open_positions = {
+        symbol: (held, abs(bought_cash / bought_qty) if bought_qty > 0 else 0.0)
+        for symbol, (held, bought_qty, bought_cash) in positions.items() if held > 0
+    }
+    return cash, open_positions
+
+
+def _random_transactions(count, start, seed=11):
+    rng = np.random.default_rng(seed)
+    symbols = ['0700.HK', '0005.HK', '9988.HK']
+    held = {s: 0 for s in symbols}
+    transactions = []
+    for transaction_id in range(1, count + 1):
+        symbol = symbols[rng.integers(len(symbols))]
+        day = start + timedelta(days=int(rng.integers(0, 60)))
+        if held[symbol] > 0 and rng.random() < 0.4:
+            quantity = -int(rng.integers(1, held[symbol] + 1))
+        else:
+            quantity = int(rng.integers(1, 10)) * 100
+        held[symbol] += quantity
+        transactions.append((transaction_id, day, symbol, quantity, -quantity * float(rng.uniform(50, 400))))
+    return transactions
+
+
+def _assert_matches(snapshots, transactions, start_cash, days):
+    for day in days:
+        cash, expected = _brute_force(transactions, start_cash, day)
+        assert abs(snapshots.cash_at(day) - cash) < 1e-6
+        positions = {p['symbol']: (p['current_quantity'], p['avg_cost']) for p in snapshots.positions_at(day)}
+        assert positions.keys() == expected.keys()
+        for symbol, (quantity, avg_cost) in expected.items():
+            assert positions[symbol][0] == quantity
+            assert abs(positions[symbol][1] - avg_cost) < 1e-6
+
+
+def test_snapshots_match_aggregation():
+    """cash_at / positions_at agree with the brute-force aggregation on every day"""
+    start = date(2025, 1, 1)
+    transactions = _random_transactions(80, start)
+    snapshots = AnalysisSnapshots(1, 'test', start, start + timedelta(days=90), 1_000_000,
+                                  transactions, (len(transactions), 80))
+    _assert_matches(snapshots, transactions, 1_000_000, [start + timedelta(days=i) for i in range(-1, 70)])
+
+
+def test_append_in_order_and_back_dated():
+    """Appended transactions, including back-dated ones, keep the snapshots exact"""
+    start = date(2025, 1, 1)
+    transactions = _random_transactions(40, start, seed=5)
+    snapshots = AnalysisSnapshots(1, 'test', start, start + timedelta(days=90), 500_000,
+                                  transactions[:20], (20, 20))
+    for transaction in transactions[20:]:
+        snapshots.append(transaction)
+    assert snapshots.watermark == (40, 40)
+    _assert_matches(snapshots, transactions, 500_000, [start + timedelta(days=i) for i in range(0, 65)])
+
+
+class _Cursor:
+    """Minimal tuple cursor over in-memory analysis and state change rows"""
+
+    def __init__(self, analysis, transactions):
+        self.analysis = analysis
+        self.transactions = transactions
+        self.queries = 0
+        self._result = []
+
+    def execute(self, sql, params):
+        self.queries += 1
+        if 'COUNT(sc.id)' in sql:
+            ids = [t[0] for t in self.transactions]
+            self._result = [self.analysis + (len(ids), max(ids, default=0))]
+        else:
+            self._result = sorted(self.transactions, key=lambda t: (t[1], t[0]))
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def fetchall(self):
+        return self._result
+
+
+def test_store_rebuilds_only_on_watermark_change():
+    """Reads hit the cache until the state changes move on; recorded appends avoid a rebuild"""
+    start = date(2025, 1, 1)
+    transactions = _random_transactions(10, start)
+    cursor = _Cursor(('test', start, start + timedelta(days=90), 100_000), list(transactions))
+    store = PositionSnapshotStore()
+
+    first = store.get(cursor, 1)
+    assert store.get(cursor, 1) is first
+    assert store.stats == {'hits': 1, 'rebuilds': 1, 'appends': 0}
+
+    # Inserted by this process: appended in place
+    new = (11, start + timedelta(days=70), '0700.HK', 100, -30_000.0)
+    cursor.transactions.append(new)
+    store.record_transaction(1, *new)
+    assert store.get(cursor, 1) is first
+    assert store.stats['appends'] == 1 and store.stats['rebuilds'] == 1
+
+    # Inserted elsewhere: the watermark moves and the next read rebuilds
+    cursor.transactions.append((12, start, '0005.HK', 100, -5_000.0))
+    rebuilt = store.get(cursor, 1)
+    assert rebuilt is not first and store.stats['rebuilds'] == 2
+    _assert_matches(rebuilt, cursor.transactions, 100_000, [start + timedelta(days=i) for i in range(0, 75)])
+
+    store.invalidate(1)
+    cursor.analysis = None
+    cursor.execute = lambda sql, params: setattr(cursor, '_result', [])
+    assert store.get(cursor, 1) is None
+
+
+if __name__ == "__main__":
+    test_snapshots_match_aggregation()
+    test_append_in_order_and_back_dated()
+    test_store_rebuilds_only_on_watermark_change()
+    print("✅ Position snapshot tests passed")
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Test the local columnar price cache (read-through, watermark invalidation)
+against an in-memory stand-in for daily_equity_technicals
+"""
+
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+sys.path.append('src')
+from src.price_cache import PriceCache, CACHE_COLUMNS, PYARROW_AVAILABLE, get_price_cache
+import pandas as pd
+
+
+class _TableCursor:
+    def __init__(self, db):
+        self.db = db
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, sql, params):
+        symbols, start, end = params
+        rows = [r for r in self.db.rows
+                if r['symbol'] in symbols and start <= r['trade_date'] <= end]
+        if 'GROUP BY' in sql:
+            self.db.watermark_queries += 1
+            marks = {}
+            for r in rows:
+                key = (r['symbol'], r['trade_date'].replace(day=1))
+                latest, count = marks.get(key, (r['updated_at'], 0))
+                marks[key] = (max(latest, r['updated_at']), count + 1)
+            self._rows = [(s, m, latest, count, self.db.now) for (s, m), (latest, count) in marks.items()]
+        else:
+            self.db.row_queries += 1
+            columns = [c.strip() for c in sql.split('SELECT')[1].split('FROM')[0].split(',')]
+            rows = sorted(rows, key=lambda r: (r['symbol'], r['trade_date']))
+            self._rows = [tuple(r[c] for c in columns) for r in rows]
+
+    def fetchall(self):
+        return self._rows
+
+
+class _FakeDatabase:
+    def __init__(self):
+        self.rows = []
+        self.watermark_queries = 0
+        self.row_queries = 0
+        self.now = datetime(2025, 5, 1)
+        stamp = datetime(2025, 1, 1)
+        for symbol, base in [('0700.HK', 300.0), ('0005.HK', 60.0)]:
+            for i, day in enumerate(pd.bdate_range('2025-01-02', '2025-04-30').date):
+                row = {c: None for c in CACHE_COLUMNS}
+                row.update(symbol=symbol, trade_date=day, updated_at=stamp,
+                           close_price=base + i, open_price=base + i - 0.5, volume=1000 + i)
+                self.rows.append(row)
+
+    @contextmanager
+    def connection(self):
+        db = self
+
+        class _Conn:
+            def cursor(self):
+                return _TableCursor(db)
+        yield _Conn()
+
+
+def test_read_through_and_invalidation():
+    db = _FakeDatabase()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = PriceCache(db, cache_dir, enabled=True)
+        assert cache.enabled == PYARROW_AVAILABLE
+
+        start, end = date(2025, 1, 15), date(2025, 3, 10)
+        cold = cache.read(['0700.HK', '0005.HK'], start, end, columns=['close_price', 'volume'])
+        direct = cache._read_database(['0700.HK', '0005.HK'], start, end, ['close_price', 'volume'])
+        pd.testing.assert_frame_equal(cold.sort_values(['symbol', 'trade_date']).reset_index(drop=True),
+                                      direct.sort_values(['symbol', 'trade_date']).reset_index(drop=True),
+                                      check_dtype=False)
+        assert cold['trade_date'].min().date() >= start and cold['trade_date'].max().date() <= end
+
+        if not PYARROW_AVAILABLE:
+            return
+
+        assert cache.stats['months_refreshed'] == 6  # 2 symbols x Jan..Mar
+        row_queries = db.row_queries
+
+        # Warm read: only the watermark query hits the database
+        warm = cache.read(['0700.HK', '0005.HK'], start, end, columns=['close_price', 'volume'])
+        pd.testing.assert_frame_equal(warm, cold)
+        assert db.row_queries == row_queries and cache.stats['months_hit'] == 6
+
+        # Updating one row invalidates exactly that symbol-month
+        changed = next(r for r in db.rows if r['symbol'] == '0005.HK' and r['trade_date'] == date(2025, 2, 3))
+        changed['close_price'] = 999.0
+        changed['updated_at'] += timedelta(hours=1)
+        refreshed = cache.read(['0005.HK'], date(2025, 2, 1), date(2025, 2, 28))
+        assert cache.stats['months_refreshed'] == 7
+        assert refreshed.loc[refreshed['trade_date'] == '2025-02-03', 'close_price'].item() == 999.0
+
+        # A new process sees the files and manifest on disk
+        reopened = PriceCache(db, cache_dir, enabled=True)
+        again = reopened.read(['0700.HK'], start, end)
+        assert reopened.stats['months_refreshed'] == 0 and len(again) == len(cold[cold['symbol'] == '0700.HK'])
+
+
+def test_late_commit_behind_newer_write():
+    """A long write stamped before the watermark is picked up while the month is unsettled"""
+    if not PYARROW_AVAILABLE:
+        return
+    db = _FakeDatabase()
+    rows = {r['trade_date']: r for r in db.rows if r['symbol'] == '0700.HK' and r['trade_date'].month == 2}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = PriceCache(db, cache_dir, enabled=True)
+
+        # A short write started at 10:05 commits; a long one started at 10:00 is still running
+        db.now = datetime(2025, 5, 1, 10, 6)
+        rows[date(2025, 2, 4)].update(close_price=500.0, updated_at=datetime(2025, 5, 1, 10, 5))
+        first = cache.read(['0700.HK'], date(2025, 2, 1), date(2025, 2, 28))
+        assert first.loc[first['trade_date'] == '2025-02-04', 'close_price'].item() == 500.0
+
+        # The long write commits: same MAX(updated_at) and row count
+        rows[date(2025, 2, 3)].update(close_price=400.0, updated_at=datetime(2025, 5, 1, 10, 0))
+        db.now = datetime(2025, 5, 1, 10, 8)
+        second = cache.read(['0700.HK'], date(2025, 2, 1), date(2025, 2, 28))
+        assert second.loc[second['trade_date'] == '2025-02-03', 'close_price'].item() == 400.0
+
+        # Once settled the month is served from the file again
+        db.now = datetime(2025, 5, 1, 12, 0)
+        cache.read(['0700.HK'], date(2025, 2, 1), date(2025, 2, 28))
+        refreshed = cache.stats['months_refreshed']
+        cache.read(['0700.HK'], date(2025, 2, 1), date(2025, 2, 28))
+        assert cache.stats['months_refreshed'] == refreshed
+
+
+def test_disabled_cache_reads_database():
+    db = _FakeDatabase()
+    cache = PriceCache(db, tempfile.mkdtemp(), enabled=False)
+    frame = cache.read(['0700.HK'], date(2025, 1, 1), date(2025, 1, 31))
+    assert list(frame.columns) == ['symbol', 'trade_date', 'close_price']
+    assert cache.stats['database_reads'] == 1 and len(frame) == 22
+
+
+def test_shared_cache_per_database():
+    """get_price_cache hands each database its own cache and directory"""
+    first, second = _FakeDatabase(), _FakeDatabase()
+    first.db_url = 'postgresql://a/hk_strategy'
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = get_price_cache(first, cache_dir)
+        assert get_price_cache(first, cache_dir) is cache and cache.db is first
+        other = get_price_cache(second, cache_dir)
+        assert other is not cache and other.db is second
+        assert other.cache_dir != cache.cache_dir and os.path.dirname(other.cache_dir) == cache_dir
+
+        # A manager with the same URL shares the cache
+        same = _FakeDatabase()
+        same.db_url = first.db_url
+        assert get_price_cache(same, cache_dir) is cache
+
+
+if __name__ == "__main__":
+    test_read_through_and_invalidation()
+    test_late_commit_behind_newer_write()
+    test_disabled_cache_reads_database()
+    test_shared_cache_per_database()
+    print("✅ Price cache tests passed")
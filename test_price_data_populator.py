@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test the COPY-based bulk loader of PriceDataPopulator without a live database
+"""
+
+import sys
+import csv
+import io
+from contextlib import contextmanager
+sys.path.append('src')
+from src.price_data_populator import PriceDataPopulator, TECHNICALS_COLUMNS
+import numpy as np
+import pandas as pd
+import psycopg2
+
+
+class _RecordingCursor:
+    """Cursor stand-in that records COPY payloads and can reject a batch"""
+
+    def __init__(self, reject_copy=False):
+        self.reject_copy = reject_copy
+        self.statements = []
+        self.copied_rows = []
+        self._result = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, sql, params=None):
+        self.statements.append((sql.strip().split()[0], params))
+        if 'WITH merged AS' in sql:
+            self._result = [('0700.HK', len(self.copied_rows) - 1, 1)]  # pretend one row already existed
+        elif params is not None:
+            self._result = (True,)
+
+    def copy_expert(self, sql, buffer):
+        if self.reject_copy:
+            raise psycopg2.DataError("numeric field overflow")
+        self.copied_rows = list(csv.reader(io.StringIO(buffer.read())))
+
+    def fetchone(self):
+        return self._result
+
+    def fetchall(self):
+        return self._result
+
+
+class _FakeDatabase:
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    @contextmanager
+    def connection(self):
+        class _Conn:
+            def cursor(inner_self):
+                return self.cursor
+        yield _Conn()
+
+
+def _indicator_frame():
+    data = pd.DataFrame({
+        'Date': pd.to_datetime(['2025-03-03', '2025-03-04', '2025-03-05']).date,
+        'Open': [10.0, 10.5, np.nan],
+        'High': [11.0, 11.2, 11.0],
+        'Low': [9.8, 10.1, 10.0],
+        'Close': [10.9, 11.0, 10.4],
+        'Volume': [1000, 2000, 1500],
+    })
+    populator = PriceDataPopulator.__new__(PriceDataPopulator)
+    data = populator.calculate_technical_indicators(data)
+    data.loc[1, 'volume_ratio'] = np.inf
+    return populator, data
+
+
+def test_bulk_copy_payload():
+    """The whole frame is streamed as CSV with NULLs for missing/inf values"""
+    populator, data = _indicator_frame()
+    cursor = _RecordingCursor()
+    populator.db = _FakeDatabase(cursor)
+
+    stats = populator.store_price_data_bulk(populator._build_technicals_frame('0700.HK', data))
+
+    # Row 3 has no open price and is rejected before COPY
+    assert stats['by_symbol'] == {'0700.HK': {'inserted': 1, 'updated': 1, 'failed': 1}}
+    assert (stats['inserted'], stats['updated'], stats['stored'], stats['failed']) == (1, 1, 2, 1)
+    assert len(cursor.copied_rows) == 2
+    header = [column for column, _ in TECHNICALS_COLUMNS]
+    first = dict(zip(header, cursor.copied_rows[0]))
+    second = dict(zip(header, cursor.copied_rows[1]))
+    assert first['symbol'] == '0700.HK' and first['trade_date'] == '2025-03-03'
+    assert first['volume'] == '1000' and first['day_high'] == '11.0'
+    assert first['sma_20'] == ''
+    assert second['volume_ratio'] == ''
+
+
+def test_rejected_batch_falls_back_to_rows():
+    """A batch rejected by COPY is retried row by row inside savepoints"""
+    populator, data = _indicator_frame()
+    cursor = _RecordingCursor(reject_copy=True)
+    populator.db = _FakeDatabase(cursor)
+
+    stats = populator.store_price_data_bulk(populator._build_technicals_frame('0700.HK', data))
+
+    assert stats['fallback_rows'] == 2
+    assert stats['inserted'] == 2 and stats['stored'] == 2
+    row_inserts = [params for verb, params in cursor.statements if verb == 'INSERT' and params]
+    assert [r['trade_date'].isoformat() for r in row_inserts] == ['2025-03-03', '2025-03-04']
+    assert row_inserts[0]['sma_20'] is None and row_inserts[1]['volume_ratio'] is None
+
+
+if __name__ == "__main__":
+    test_bulk_copy_payload()
+    test_rejected_batch_falls_back_to_rows()
+    print("✅ Bulk loader tests passed")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test the sorted per-symbol PriceIndex against the scan-based lookups it replaces
+"""
+
+import sys
+from datetime import date, timedelta
+sys.path.append('src')
+from src.price_index import PriceIndex, FILL_NONE, FILL_FORWARD, FILL_BACKWARD, FILL_FORWARD_BACKWARD
+from src.portfolio_calculator import PortfolioCalculator
+from src.hkex_calendar import get_hkex_trading_days
+import numpy as np
+import pandas as pd
+
+
+def _scan_asof(frame, target):
+    """The original frame[frame['Date'] <= target].iloc[-1] lookup"""
+    available = frame[frame['Date'] <= target]
+    return None if available.empty else float(available.iloc[-1]['Close'])
+
+
+def _bars(dates, start_price=10.0):
+    return pd.DataFrame({'Date': dates, 'Close': start_price + np.arange(len(dates), dtype=float)})
+
+
+def test_asof_matches_scan():
+    """Scalar and vector as-of lookups agree with the row-filter scan"""
+    rng = np.random.default_rng(3)
+    all_days = [date(2024, 1, 1) + timedelta(days=i) for i in range(400)]
+    dates = sorted(rng.choice(all_days[10:], size=150, replace=False).tolist())
+    frame = _bars(dates)
+    index = PriceIndex.from_symbol_frames({'0700.HK': frame})
+
+    vector = index.asof_many('0700.HK', all_days)
+    for day, value in zip(all_days, vector):
+        expected = _scan_asof(frame, day)
+        assert index.asof('0700.HK', day) == expected
+        assert (np.isnan(value) and expected is None) or value == expected
+
+
+def test_fill_policies():
+    """none / ffill / bfill / ffill_bfill resolve gaps as documented"""
+    frame = pd.DataFrame({
+        'symbol': ['A', 'A', 'A'],
+        'date': [date(2025, 1, 3), date(2025, 1, 7), date(2025, 1, 7)],
+        'close_price': [1.0, 2.0, 3.0],
+    })
+    index = PriceIndex.from_frame(frame)
+    days = [date(2025, 1, 2), date(2025, 1, 3), date(2025, 1, 6), date(2025, 1, 8)]
+
+    def resolved(fill):
+        return [None if np.isnan(v) else v for v in index.asof_many('A', days, fill=fill)]
+
+    assert resolved(FILL_NONE) == [None, 1.0, None, None]
+    assert resolved(FILL_FORWARD) == [None, 1.0, 1.0, 2.0]  # duplicate date keeps the first row
+    assert resolved(FILL_BACKWARD) == [1.0, 1.0, 2.0, None]
+    assert resolved(FILL_FORWARD_BACKWARD) == [1.0, 1.0, 1.0, 2.0]
+    assert index.asof('missing', date(2025, 1, 3)) is None
+
+
+def test_to_frame_uses_trading_days():
+    """to_frame emits one forward-filled row per trading day from the first close on"""
+    frame = pd.DataFrame({
+        'symbol': ['A', 'A', 'B'],
+        'date': pd.to_datetime(['2025-01-03', '2025-01-08', '2025-01-02']),
+        'close_price': [1.0, 2.0, 5.0],
+    })
+    trading_days = get_hkex_trading_days(date(2025, 1, 2), date(2025, 1, 10))
+    filled = PriceIndex.from_frame(frame).to_frame(trading_days, fill=FILL_FORWARD)
+
+    a = filled[filled['symbol'] == 'A']
+    assert a['date'].dt.date.tolist() == trading_days[1:]
+    assert a['close_price'].tolist() == [1.0, 1.0, 1.0, 2.0, 2.0, 2.0]
+    assert all(d.weekday() < 5 for d in filled['date'].dt.date)
+    assert len(filled[filled['symbol'] == 'B']) == len(trading_days)
+
+
+def test_daily_portfolio_values_use_asof():
+    """PortfolioCalculator values positions at the latest close on or before each day"""
+    trading_days = get_hkex_trading_days(date(2025, 3, 3), date(2025, 3, 14))
+    sparse = trading_days[::2]
+    price_data = {'0700.HK': _bars(sparse, 100.0), '0005.HK': _bars(trading_days, 50.0)}
+
+    calculator = PortfolioCalculator(market_data=object())
+    values = calculator.calculate_daily_portfolio_values(
+        {'0700.HK': 10, '0005.HK': 100}, price_data, trading_days[0], trading_days[-1], cash_amount=1000.0)
+
+    for _, row in values.iterrows():
+        expected = (10 * _scan_asof(price_data['0700.HK'], row['trade_date'])
+                    + 100 * _scan_asof(price_data['0005.HK'], row['trade_date']))
+        assert abs(row['portfolio_value'] - expected) < 1e-9
+        assert row['total_value'] == row['portfolio_value'] + 1000.0
+
+
+if __name__ == "__main__":
+    test_asof_matches_scan()
+    test_fill_policies()
+    test_to_frame_uses_trading_days()
+    test_daily_portfolio_values_use_asof()
+    print("✅ Price index tests passed")
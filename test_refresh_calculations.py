@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Test the set-based analysis refresh: one aggregate pass, shared price fetches, one UPDATE
+"""
+
+import re
+import sys
+from datetime import date, timedelta
+sys.path.append('src')
+from src.portfolio_analysis_manager import PortfolioAnalysisManager
+import pandas as pd
+
+
+class _Connection:
+    encoding = 'UTF8'
+
+
+class _Cursor:
+    """Answers the two aggregate queries and captures the VALUES rows of the UPDATE"""
+
+    def __init__(self, figures, positions):
+        self.connection = _Connection()
+        self.figures = figures
+        self.positions = positions
+        self.statements = []
+        self.updated_rows = []
+        self._result = []
+
+    def execute(self, sql, params=None):
+        sql = sql.decode() if isinstance(sql, bytes) else sql
+        self.statements.append(sql)
+        if 'FILTER' in sql:
+            self._result = self.figures
+        elif 'HAVING' in sql:
+            self._result = self.positions
+        else:
+            self._result = []
+
+    def mogrify(self, template, args):
+        self.updated_rows.append(tuple(args))
+        return b'(0)'
+
+    def fetchall(self):
+        return self._result
+
+
+class _DictCursor(_Cursor):
+    """Returns rows the way RealDictCursor builds them: one key per result column name"""
+
+    def execute(self, sql, params=None):
+        super().execute(sql, params)
+        if self._result:
+            names = _column_names(sql)
+            self._result = [dict(zip(names, row)) for row in self._result]
+
+
+def _column_names(sql):
+    """Names PostgreSQL gives the select list: the alias, else the function or column name"""
+    select = re.search(r'SELECT(.*?)\bFROM\b', sql, re.S).group(1)
+    columns, depth, current = [], 0, ''
+    for ch in select:
+        depth += (ch == '(') - (ch == ')')
+        if ch == ',' and depth == 0:
+            columns.append(current)
+            current = ''
+        else:
+            current += ch
+    columns.append(current)
+    names = []
+    for column in map(str.strip, columns):
+        alias = re.search(r'\bAS\s+(\w+)$', column, re.I)
+        call = re.match(r'(\w+)\s*\(', column)
+        names.append(alias.group(1) if alias else call.group(1).lower() if call else column.split('.')[-1])
+    return names
+
+
+def _manager(prices):
+    manager = PortfolioAnalysisManager.__new__(PortfolioAnalysisManager)
+    manager.fetches = []
+
+    def fetch(symbols, start_date, end_date):
+        manager.fetches.append((tuple(symbols), start_date, end_date))
+        rows = [p for p in prices if p['symbol'] in symbols and start_date <= p['date'].date() <= end_date]
+        return pd.DataFrame(rows, columns=['symbol', 'date', 'close_price'])
+
+    manager.fetch_bulk_historical_prices = fetch
+    return manager
+
+
+def _inputs():
+    end = date(2025, 6, 30)
+    prices = [
+        {'symbol': '0700.HK', 'date': pd.Timestamp('2025-06-27'), 'close_price': 500.0},
+        {'symbol': '0005.HK', 'date': pd.Timestamp('2025-06-30'), 'close_price': 80.0},
+        {'symbol': '0939.HK', 'date': pd.Timestamp('2024-01-31'), 'close_price': 5.0},
+    ]
+    figures = [
+        (1, end, 100000, 50000, -20000),                   # 0700 + 0005
+        (2, end, 0, 10000, 0),                             # 0700 only
+        (3, date(2024, 1, 31), 1000, 0, 0),                # different window
+        (4, end, 5000, 0, 250),                            # cash only
+        (5, end, 0, 7000, 0),                              # no price at all -> cost basis
+    ]
+    positions = [
+        (1, '0700.HK', 100), (1, '0005.HK', 200),
+        (2, '0700.HK', 10),
+        (3, '0939.HK', 1000),
+        (5, '9999.HK', 10),
+    ]
+    return prices, figures, positions
+
+
+def test_set_based_update():
+    """Analyses sharing an end date share one fetch; every row goes into one UPDATE"""
+    prices, figures, positions = _inputs()
+    manager = _manager(prices)
+    cursor = _Cursor(figures, positions)
+
+    result = manager._update_analyses_calculations(cursor, [1, 2, 3, 4, 5])
+
+    assert result['updated'] == 5
+    assert result['analyses_with_positions'] == 4
+    assert result['price_fetches'] == 2
+    assert len(manager.fetches) == 2
+    assert sum('UPDATE portfolio_analyses' in s for s in cursor.statements) == 1
+
+    rows = {row[0]: row for row in cursor.updated_rows}
+    # id, start_equity, end_equity, end_cash, start_total, end_total, equity_gain, total_gain
+    assert rows[1] == (1, 50000.0, 100 * 500.0 + 200 * 80.0, 80000.0, 150000.0, 80000.0 + 66000.0,
+                       16000.0, 146000.0 - 150000.0)
+    assert rows[2][2] == 10 * 500.0
+    assert rows[3][2] == 1000 * 5.0
+    assert rows[4] == (4, 0.0, 0.0, 5250.0, 5000.0, 5250.0, 0.0, 250.0)
+    assert rows[5][2] == 7000.0
+
+
+def test_dict_cursor_rows():
+    """create_analysis and add_transaction pass a RealDictCursor: its rows give the same update"""
+    prices, figures, positions = _inputs()
+    expected = _Cursor(figures, positions)
+    _manager(prices)._update_analyses_calculations(expected, [1, 2, 3, 4, 5])
+    cursor = _DictCursor(figures, positions)
+
+    result = _manager(prices)._update_analyses_calculations(cursor, [1, 2, 3, 4, 5])
+
+    assert 'error' not in result and result['updated'] == 5
+    assert cursor.updated_rows == expected.updated_rows
+
+
+def test_overlapping_windows_merge():
+    """End dates a few days apart fall into one merged fetch window"""
+    manager = _manager([])
+    positions = {1: [('A', 1.0)], 2: [('B', 1.0)], 3: [('C', 1.0)]}
+    windows = {
+        1: (date(2025, 3, 1), date(2025, 3, 10)),
+        2: (date(2025, 3, 5), date(2025, 3, 14)),
+        3: (date(2025, 5, 1), date(2025, 5, 10)),
+    }
+    index, fetches = manager._fetch_price_windows(positions, windows)
+    assert fetches == 2
+    assert manager.fetches == [
+        (('A', 'B'), date(2025, 3, 1), date(2025, 3, 14)),
+        (('C',), date(2025, 5, 1), date(2025, 5, 10)),
+    ]
+    assert len(index) == 0
+
+
+if __name__ == "__main__":
+    test_set_based_update()
+    test_dict_cursor_rows()
+    test_overlapping_windows_merge()
+    print("✅ Set-based refresh tests passed")
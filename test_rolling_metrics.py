@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Test rolling metrics against per-analysis pandas rolling windows and brute-force drawdowns
+"""
+
+import sys
+from contextlib import contextmanager
+from datetime import date, datetime
+sys.path.append('src')
+from src.rolling_metrics import (
+    compute_rolling_metrics, rolling_metrics_frame, ROLLING_COLUMNS, TRADING_DAYS_PER_YEAR
+)
+from src.timeline_store import TimelineStore
+from src.portfolio_calculator import PortfolioCalculator
+from src.hkex_calendar import get_hkex_trading_days
+import numpy as np
+import pandas as pd
+
+
+def _values(analyses=4, days=300, seed=11, gaps=True):
+    rng = np.random.default_rng(seed)
+    values = 100000 * np.exp(np.cumsum(rng.normal(0.0003, 0.012, (analyses, days)), axis=1))
+    if gaps:
+        values[1, :40] = np.nan      # starts later
+        values[2, days - 50:] = np.nan  # ends earlier
+    benchmark = 20000 * np.exp(np.cumsum(rng.normal(0, 0.01, days)))
+    return values, benchmark
+
+
+def test_matches_pandas_rolling():
+    """Volatility, Sharpe, Sortino and beta equal the per-analysis pandas computation"""
+    values, benchmark = _values()
+    window = 20
+    rf = 0.025 / TRADING_DAYS_PER_YEAR
+    metrics = compute_rolling_metrics(values, benchmark, windows=(window,))[window]
+    bench_returns = pd.Series(benchmark).pct_change()
+
+    for a in range(values.shape[0]):
+        returns = pd.Series(values[a]).pct_change(fill_method=None)
+        rolling = returns.rolling(window)
+        volatility = rolling.std() * np.sqrt(TRADING_DAYS_PER_YEAR)
+        excess = (rolling.mean() - rf) * TRADING_DAYS_PER_YEAR
+        downside = ((returns - rf).clip(upper=0) ** 2).rolling(window).mean() * TRADING_DAYS_PER_YEAR
+        beta = rolling.cov(bench_returns) / bench_returns.rolling(window).var()
+
+        assert np.allclose(metrics['volatility'][a], volatility, equal_nan=True)
+        assert np.allclose(metrics['sharpe_ratio'][a], excess / volatility, equal_nan=True)
+        assert np.allclose(metrics['sortino_ratio'][a], excess / np.sqrt(downside), equal_nan=True)
+        assert np.allclose(metrics['beta'][a], beta, equal_nan=True)
+
+
+def test_drawdown_matches_brute_force():
+    """Max drawdown and days since the window high agree with a direct scan of every window"""
+    values, _ = _values(analyses=3, days=150, seed=5)
+    window = 60
+    metrics = compute_rolling_metrics(values, windows=(window,))[window]
+    assert np.isnan(metrics['beta']).all()
+
+    for a in range(values.shape[0]):
+        for t in range(values.shape[1]):
+            span = values[a, max(0, t - window + 1):t + 1]
+            if t < window - 1 or np.isnan(span).any():
+                assert np.isnan(metrics['max_drawdown_pct'][a, t])
+                continue
+            drawdown = (span / np.maximum.accumulate(span) - 1).min() * 100
+            assert abs(metrics['max_drawdown_pct'][a, t] - drawdown) < 1e-9
+            assert metrics['drawdown_days'][a, t] == len(span) - 1 - np.argmax(span)
+
+
+def test_frame_layout():
+    """One row per analysis, present day and window; benchmark forward fills onto timeline days"""
+    days = get_hkex_trading_days(date(2025, 1, 2), date(2025, 3, 31))
+    values, benchmark = _values(analyses=2, days=len(days), gaps=False)
+    values[1, :40] = np.nan
+    timeline_df = pd.DataFrame([
+        {'analysis_id': 10 + a, 'date': d, 'total_value': values[a, i]}
+        for a in range(2) for i, d in enumerate(days) if not np.isnan(values[a, i])
+    ])
+    benchmark_df = pd.DataFrame({'date': pd.to_datetime(days[::2]), 'close_price': benchmark[::2]})
+
+    frame = rolling_metrics_frame(timeline_df, benchmark_df, windows=(20, 60))
+    assert list(frame.columns) == ROLLING_COLUMNS
+    assert len(frame) == 2 * len(timeline_df)
+    assert frame[(frame['analysis_id'] == 11) & (frame['window'] == 60)]['volatility'].isna().all()
+    assert frame[(frame['analysis_id'] == 10) & (frame['window'] == 20)]['beta'].notna().sum() == len(days) - 20
+
+
+class _Database:
+    """Serves timeline state keys"""
+
+    def __init__(self, keys):
+        self.keys = keys
+
+    @contextmanager
+    def connection(self):
+        yield self
+
+    @contextmanager
+    def cursor(self):
+        yield self
+
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchall(self):
+        return [(analysis_id,) + key for analysis_id, key in self.keys.items()]
+
+
+def test_store_reuses_until_timeline_changes():
+    """Unchanged timeline state is served from memory; a new computed_through recomputes"""
+    days = get_hkex_trading_days(date(2025, 1, 2), date(2025, 3, 31))
+    values, benchmark = _values(analyses=1, days=len(days), gaps=False)
+    timeline_df = pd.DataFrame({'analysis_id': 7, 'date': days, 'total_value': values[0]})
+    benchmark_calls = []
+
+    def fetch(symbols, start, end):
+        benchmark_calls.append(tuple(symbols))
+        return pd.DataFrame({'symbol': symbols[0], 'date': pd.to_datetime(days), 'close_price': benchmark})
+
+    db = _Database({7: (days[-1], datetime(2025, 4, 1, 9, 0))})
+    store = TimelineStore(db, fetch)
+    first = store.rolling_metrics([7], timeline_df)
+    second = store.rolling_metrics([7], timeline_df)
+    assert first.equals(second)
+    assert store.stats['rolling_computed'] == 1 and store.stats['rolling_hits'] == 1
+    assert len(benchmark_calls) == 1
+
+    db.keys[7] = (days[-1], datetime(2025, 4, 2, 9, 0))
+    store.rolling_metrics([7], timeline_df)
+    assert store.stats['rolling_computed'] == 2
+
+
+def test_performance_metrics_leave_input_unchanged():
+    """calculate_performance_metrics no longer adds drawdown columns to the caller's frame"""
+    daily = pd.DataFrame({
+        'trade_date': get_hkex_trading_days(date(2025, 3, 3), date(2025, 3, 7)),
+        'total_value': [100.0, 110.0, 99.0, 105.0, 120.0],
+    })
+    daily['daily_change'] = daily['total_value'].diff()
+    daily['daily_return'] = daily['total_value'].pct_change()
+    columns = list(daily.columns)
+
+    metrics = PortfolioCalculator(market_data=object()).calculate_performance_metrics(daily)
+    assert list(daily.columns) == columns
+    assert metrics.max_drawdown == -11.0
+    assert abs(metrics.max_drawdown_pct - (-10.0)) < 1e-9
+
+
+if __name__ == "__main__":
+    test_matches_pandas_rolling()
+    test_drawdown_matches_brute_force()
+    test_frame_layout()
+    test_store_reuses_until_timeline_changes()
+    test_performance_metrics_leave_input_unchanged()
+    print("✅ Rolling metrics tests passed")
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test what-if scenarios: delta evaluation matches a full rebuild with the changes stored
+"""
+
+import sys
+from datetime import date, timedelta
+sys.path.append('src')
+from src.timeline_engine import PriceMatrix, evaluate_analysis_timeline
+from src.scenario_engine import HypotheticalChange, ScenarioBase, compare_scenarios, SUMMARY_COLUMNS
+from test_timeline_engine import _synthetic_inputs
+import pandas as pd
+
+
+def _stored(change):
+    """The row add_transaction would insert for a hypothetical change"""
+    return {
+        'transaction_date': change.transaction_date, 'symbol': change.symbol,
+        'transaction_type': change.transaction_type, 'quantity_change': change.quantity_change,
+        'cash_change': change.cash_change,
+    }
+
+
+def _base(trading_days, transactions, price_df):
+    symbols = sorted({t['symbol'] for t in transactions})
+    return ScenarioBase(1, 'Synthetic', trading_days, transactions, 100000.0,
+                        PriceMatrix.from_price_frame(price_df, trading_days, symbols))
+
+
+def test_matches_full_rebuild():
+    """BUY/SELL/DIVIDEND/SPLIT on existing and new symbols equal the rebuilt timeline"""
+    trading_days, transactions, price_df = _synthetic_inputs()
+    extra = pd.DataFrame({'symbol': '1299.HK', 'date': pd.to_datetime(trading_days), 'close_price': 80.0})
+    base = _base(trading_days, transactions, price_df)
+
+    changes = [
+        HypotheticalChange('0700.HK', 'BUY', 500, 320.0, trading_days[30]),
+        HypotheticalChange('1299.HK', 'BUY', 1000, 78.5, trading_days[35]),
+        HypotheticalChange('1299.HK', 'SPLIT', 1000, 0.0, trading_days[45]),
+        HypotheticalChange('1299.HK', 'SELL', -300, 41.0, trading_days[50]),
+        HypotheticalChange('0700.HK', 'DIVIDEND', 0, 2.4, trading_days[40]),
+    ]
+    # Quantities are signed by transaction type whatever sign the caller used
+    assert HypotheticalChange('1299.HK', 'SELL', 300, 41.0, trading_days[50]) == changes[3]
+    assert HypotheticalChange.from_dict({'symbol': '0700.HK', 'transaction_type': 'buy', 'quantity_change': -500,
+                                         'price_per_share': 320.0, 'transaction_date': trading_days[30]}) == changes[0]
+    assert base.missing_symbols(changes) == ['1299.HK']
+    base.add_prices(extra, ['1299.HK'])
+    assert base.missing_symbols(changes) == []
+
+    result = base.evaluate(changes, 'What if')
+    all_prices = pd.concat([price_df, extra], ignore_index=True)
+    rebuilt = evaluate_analysis_timeline(
+        1, 'Synthetic', trading_days, transactions + [_stored(c) for c in changes], 100000.0,
+        PriceMatrix.from_price_frame(all_prices, trading_days))
+
+    assert result.delta_from == trading_days[30]
+    assert result.changes == len(changes)
+    for column in ('total_value', 'cash_position', 'equity_value'):
+        assert (result.timeline[column] - rebuilt[column]).abs().max() < 1e-6
+    assert (result.timeline['delta_value'].iloc[:30] == 0).all()
+    assert result.seconds < 0.1
+
+
+def test_validation_and_comparison():
+    """Overselling, dates outside the period or off the calendar and unpriced symbols are reported; scenarios compare side by side"""
+    trading_days, transactions, price_df = _synthetic_inputs(seed=3)
+    base = _base(trading_days, transactions, price_df)
+    held = {}
+    for t in transactions:
+        held[t['symbol']] = held.get(t['symbol'], 0) + t['quantity_change']
+    symbol = max(held, key=held.get)
+    holiday = next(d + timedelta(days=1) for d, after in zip(trading_days, trading_days[1:])
+                   if after - d > timedelta(days=1))
+
+    summary, results = compare_scenarios(base, {
+        'Hold': [],
+        'Oversell': [HypotheticalChange(symbol, 'SELL', -(held[symbol] + 10_000), 10.0, trading_days[-5])],
+        'Too late': [HypotheticalChange(symbol, 'BUY', 10, 10.0, date(2025, 6, 30))],
+        'Weekend': [HypotheticalChange(symbol, 'BUY', 10, 10.0, holiday)],
+        'Unpriced': [HypotheticalChange('0001.HK', 'BUY', 10, 10.0, trading_days[10])],
+    })
+
+    assert list(summary.columns) == SUMMARY_COLUMNS
+    assert summary['scenario'].tolist() == ['Hold', 'Oversell', 'Too late', 'Weekend', 'Unpriced']
+    assert summary['valid'].tolist() == [True, False, False, False, False]
+    assert 'Negative quantity' in results['Oversell'].message
+    assert 'outside the analysis period' in results['Too late'].message
+    assert 'not a trading day' in results['Weekend'].message
+    assert (results['Weekend'].timeline['delta_value'] == 0).all()
+    assert 'No prices' in results['Unpriced'].message
+    assert (results['Hold'].timeline['delta_value'] == 0).all()
+    assert results['Unpriced'].timeline['delta_value'].iloc[-1] == -100.0
+
+
+if __name__ == "__main__":
+    test_matches_full_rebuild()
+    test_validation_and_comparison()
+    print("✅ Scenario engine tests passed")
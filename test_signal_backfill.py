@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test signal backfill: one pass over the history equals per-bar signal generation
+"""
+
+import sys
+import time
+from datetime import date
+sys.path.append('src')
+from src.strategic_signal_engine import StrategicSignalEngine, StrategicSignalManager
+from test_indicator_series import _frame
+import numpy as np
+
+
+def _key(signal):
+    return (signal.symbol, signal.bar_date, signal.strategy_key)
+
+
+class _RecordingDatabase:
+    """Records the StrategicDatabaseManager calls made by a backfill"""
+
+    def __init__(self, fail_save=False):
+        self.calls = []
+        self.saved = []
+        self.fail_save = fail_save
+
+    def create_parameter_set(self, name, params, engine_version="1.0.0"):
+        self.calls.append('create_parameter_set')
+        return 'ps-1'
+
+    def create_signal_run(self, param_set_id, universe_name, start_date, end_date, notes=None):
+        self.calls.append('create_signal_run')
+        return 'run-1'
+
+    def save_signal_events(self, signals, run_id=None, param_set_id=None):
+        self.calls.append('save_signal_events')
+        if self.fail_save:
+            return 0
+        self.saved.append((run_id, param_set_id, list(signals)))
+        return len(signals)
+
+    def complete_signal_run(self, run_id):
+        self.calls.append('complete_signal_run')
+        return True
+
+
+def test_backfill_matches_per_bar_generation():
+    """Every bar's signals equal generate_signals on the history up to that bar"""
+    frames = {'0700.HK': _frame('0700.HK', 140, 1), '0005.HK': _frame('0005.HK', 100, 2)}
+    engine = StrategicSignalEngine()
+
+    backfill = engine.generate_signal_history(frames)
+    expected = []
+    for symbol, frame in frames.items():
+        for cut in range(1, len(frame) + 1):
+            expected.extend(engine.generate_signals(symbol, frame.iloc[:cut]))
+
+    assert sorted(map(_key, backfill)) == sorted(map(_key, expected))
+    assert {s.base_strategy for s in backfill} >= {'BBRK', 'BOSR', 'BMAC'}
+    by_key = {_key(s): s for s in expected}
+    for signal in backfill:
+        reference = by_key[_key(signal)]
+        assert signal.close_at_signal == reference.close_at_signal
+        assert signal.reasons_json == reference.reasons_json
+        for name, value in reference.score_json.items():
+            assert abs(signal.score_json[name] - value) < 1e-9
+    assert [s.bar_date for s in backfill] == sorted(s.bar_date for s in backfill)
+
+
+def test_date_range_and_bulk_store():
+    """Signals are limited to the date range and stored under one completed signal run"""
+    frames = {'0700.HK': _frame('0700.HK', 140, 1), '0005.HK': _frame('0005.HK', 100, 2),
+              '0388.HK': _frame('0388.HK', 30, 3)}
+    start, end = frames['0700.HK']['bar_date'].iloc[[80, 120]]
+    db = _RecordingDatabase()
+
+    result = StrategicSignalManager(db).backfill_signals(list(frames), (start, end), price_data=frames)
+
+    assert db.calls == ['create_parameter_set', 'create_signal_run', 'save_signal_events', 'complete_signal_run']
+    run_id, param_set_id, saved = db.saved[0]
+    assert (run_id, param_set_id) == ('run-1', 'ps-1')
+    assert result['signals'] == len(saved) > 0
+    assert all(start <= s.bar_date <= end for s in saved)
+    assert '0388.HK' not in {s.symbol for s in saved}  # too little history
+    assert result['error'] is None
+
+
+def test_failed_store_leaves_run_incomplete():
+    """A failed bulk insert is reported and the signal run is not completed"""
+    frames = {'0700.HK': _frame('0700.HK', 140, 1)}
+    start, end = frames['0700.HK']['bar_date'].iloc[[80, 120]]
+    db = _RecordingDatabase(fail_save=True)
+
+    result = StrategicSignalManager(db).backfill_signals(list(frames), (start, end), price_data=frames)
+
+    assert db.calls == ['create_parameter_set', 'create_signal_run', 'save_signal_events']
+    assert result['signals'] > 0 and result['run_id'] == 'run-1'
+    assert 'left incomplete' in result['error']
+
+
+def test_decade_backfill_speed():
+    """Ten years of bars for a watchlist backfill in seconds"""
+    frames = {f"{i:04d}.HK": _frame(f"{i:04d}.HK", 2500, i) for i in range(1, 21)}
+    started = time.perf_counter()
+    signals = StrategicSignalEngine().generate_signal_history(frames, start_date=date(2022, 1, 1))
+    elapsed = time.perf_counter() - started
+    assert signals and elapsed < 10, elapsed
+
+
+if __name__ == "__main__":
+    test_backfill_matches_per_bar_generation()
+    test_date_range_and_bulk_store()
+    test_failed_store_leaves_run_incomplete()
+    test_decade_backfill_speed()
+    print("✅ Signal backfill tests passed")
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Test the signal backtester: forward returns, excursions, ATR payoffs and per-run caching
+"""
+
+import sys
+from contextlib import contextmanager
+from datetime import date
+sys.path.append('src')
+from src.ohlcv_bars import OHLCVBars, BAR_COLUMNS
+from src.signal_backtest import (
+    SignalBacktester, signal_outcomes, summarize_outcomes, SIGNAL_COLUMNS, SUMMARY_COLUMNS
+)
+from src.strategic_signal_engine import TechnicalIndicatorCalculator
+import numpy as np
+import pandas as pd
+
+
+def _bars_frame():
+    days = pd.bdate_range('2024-01-01', periods=40).date
+    rows = []
+    for symbol, base in (('0700.HK', 100.0), ('0005.HK', 50.0)):
+        for i, day in enumerate(days):
+            close = base + i  # steadily rising
+            rows.append((symbol, day, close, close + 1.0, close - 2.0, close, 1000))
+    frame = pd.DataFrame(rows, columns=BAR_COLUMNS)
+    return frame.sample(frac=1.0, random_state=0)  # store order does not matter
+
+
+def test_bars_locate_and_atr():
+    """Unsorted rows split into per-symbol blocks; ATR matches calculate_atr"""
+    frame = _bars_frame()
+    duplicate = frame.iloc[[0]].assign(close_price=-1.0)
+    bars = OHLCVBars.from_frame(pd.concat([frame, duplicate]))
+    assert bars.symbols == ['0005.HK', '0700.HK'] and len(bars) == 80
+
+    positions = bars.locate(['0700.HK', '0005.HK', '9999.HK', '0700.HK'],
+                            [date(2024, 1, 3), date(2024, 1, 1), date(2024, 1, 1), date(2023, 1, 1)])
+    assert positions[2] == positions[3] == -1
+    assert bars.arrays['close_price'][positions[0]] == 102.0
+    assert bars.arrays['close_price'][positions[1]] == 50.0
+    assert (bars.arrays['close_price'] == -1.0).sum() == 1  # the later duplicate wins
+
+    rows = bars.rows('0700.HK')
+    highs, lows, closes = (bars.arrays[c][rows] for c in ('high_price', 'low_price', 'close_price'))
+    atr = bars.atr(14)[rows]
+    assert np.isnan(atr[:14]).all()
+    for end in (15, 27, 40):
+        expected = TechnicalIndicatorCalculator.calculate_atr(highs[:end], lows[:end], closes[:end])
+        assert abs(atr[end - 1] - expected) < 1e-9
+    frame_0005 = bars.symbol_frame('0005.HK')
+    assert frame_0005['bar_date'].is_monotonic_increasing and frame_0005['close_price'].iloc[0] == 50.0
+
+
+def test_outcomes_and_summary():
+    """Buy and sell signals score with signed returns; windows stop at the symbol's last bar"""
+    bars = OHLCVBars.from_frame(_bars_frame())
+    days = pd.bdate_range('2024-01-01', periods=40).date
+    signals = pd.DataFrame([
+        ('0700.HK', days[20], 'BBRK5', 'B', 5, 120.0),
+        ('0700.HK', days[20], 'SOBR3', 'S', 3, 120.0),
+        ('0700.HK', days[37], 'BBRK5', 'B', 5, 137.0),   # 2 bars left
+        ('0005.HK', days[10], 'BBRK5', 'B', 5, 60.0),
+        ('0005.HK', date(2023, 6, 1), 'BBRK5', 'B', 5, 1.0),  # no bar in the store
+    ], columns=SIGNAL_COLUMNS)
+
+    outcomes = signal_outcomes(signals, bars)
+    buy, sell, late, other, missing = outcomes.to_dict('records')
+    assert buy['return_1d'] == 1 / 120 and buy['return_20d'] is not None
+    assert abs(buy['return_5d'] - 5 / 120) < 1e-12
+    assert abs(sell['return_5d'] + 5 / 120) < 1e-12
+    # True range is 3.0 on every bar after the first (high - low)
+    assert abs(buy['atr14'] - 3.0) < 1e-12 and abs(buy['payoff_atr_5d'] - 5 / 3) < 1e-12
+    # 19 bars follow: highs reach close + 19 + 1, lows start at close + 1 - 2
+    assert abs(buy['mfe'] - 20 / 120) < 1e-12 and abs(buy['mae'] - (-1 / 120)) < 1e-12
+    assert abs(sell['mae'] - (-20 / 120)) < 1e-12 and abs(sell['mfe'] - 1 / 120) < 1e-12
+    assert np.isnan(late['return_5d']) and not np.isnan(late['return_1d'])
+    assert abs(late['mfe'] - 3 / 137) < 1e-12  # partial window of the 2 remaining bars
+    assert np.isnan(other['atr14']) and not np.isnan(other['return_20d'])
+    assert np.isnan(missing['entry_price']) and np.isnan(missing['mae'])
+
+    summary = summarize_outcomes(outcomes)
+    assert list(summary.columns) == SUMMARY_COLUMNS
+    bbrk = summary[summary['strategy_key'] == 'BBRK5'].iloc[0]
+    assert bbrk['signals'] == 4 and bbrk['evaluated'] == 3
+    assert bbrk['hit_rate_1d'] == 1.0 and bbrk['hit_rate_5d'] == 1.0
+    sobr = summary[summary['strategy_key'] == 'SOBR3'].iloc[0]
+    assert sobr['base_strategy'] == 'SOBR' and sobr['hit_rate_5d'] == 0.0
+    assert np.isnan(sobr['hit_rate_20d'])  # 20 bars are not available yet
+
+
+class _StoreDatabase:
+    """Answers the backtester's signal_run, signal_event and price queries"""
+
+    def __init__(self, signals, bars_frame):
+        self.signals, self.bars_frame = signals, bars_frame
+        self.completed_at = None
+        self.loads = 0
+
+    @contextmanager
+    def connection(self):
+        yield self
+
+    @contextmanager
+    def cursor(self):
+        yield self
+
+    def execute(self, sql, params):
+        text = ' '.join(sql.split())
+        if text.startswith('SELECT COUNT(se.strategy_key)'):
+            self._rows = [(len(self.signals), self.signals['bar_date'].min(), self.signals['bar_date'].max(),
+                           self.completed_at)]
+        elif text.startswith('SELECT COUNT(*), MAX(trade_date)'):
+            _, start, end = params
+            frame = self.bars_frame
+            frame = frame[frame['symbol'].isin(self.signals['symbol']) & (frame['trade_date'] >= start)
+                          & (frame['trade_date'] <= end)]
+            self._rows = [(len(frame), frame['trade_date'].max() if len(frame) else None)]
+        elif 'FROM signal_event' in text:
+            self.loads += 1
+            self._rows = list(self.signals.itertuples(index=False, name=None))
+        elif 'FROM daily_equity_technicals' in text:
+            symbols, start, end = params
+            frame = self.bars_frame
+            frame = frame[frame['symbol'].isin(symbols) & (frame['trade_date'] >= start) & (frame['trade_date'] <= end)]
+            self._rows = list(frame.itertuples(index=False, name=None))
+        else:
+            raise AssertionError(text)
+
+    def fetchone(self):
+        return self._rows[0]
+
+    def fetchall(self):
+        return self._rows
+
+
+def test_backtester_caches_per_run():
+    """A run is computed once until its signals or completion change"""
+    days = pd.bdate_range('2024-01-01', periods=40).date
+    signals = pd.DataFrame([('0700.HK', days[5], 'BBRK5', 'B', 5, 105.0)], columns=SIGNAL_COLUMNS)
+    db = _StoreDatabase(signals, _bars_frame())
+    backtester = SignalBacktester(db)
+
+    first = backtester.backtest_run('run-1')
+    assert backtester.backtest_run('run-1') is first and db.loads == 1
+    db.completed_at = pd.Timestamp('2024-03-01')
+    second = backtester.backtest_run('run-1')
+    assert second is not first and db.loads == 2
+    assert second.summary['hit_rate_20d'].iloc[0] == 1.0
+
+    payload = second.to_dict(include_signals=True)
+    assert payload['signals'] == 1 and payload['evaluated'] == 1
+    assert payload['outcomes'][0]['bar_date'] == days[5].isoformat()
+
+
+def test_new_bars_rescore_recent_signals():
+    """Signals scored before their forward bars existed are re-scored once the bars are stored"""
+    bars = _bars_frame()
+    days = sorted(bars['trade_date'].unique())
+    signals = pd.DataFrame([('0700.HK', days[30], 'BBRK5', 'B', 5, 130.0)], columns=SIGNAL_COLUMNS)
+    db = _StoreDatabase(signals, bars[bars['trade_date'] <= days[33]])
+    backtester = SignalBacktester(db)
+
+    first = backtester.backtest_run('run-1')
+    assert np.isnan(first.outcomes['return_5d'].iloc[0])
+    assert backtester.backtest_run('run-1') is first
+
+    db.bars_frame = bars
+    second = backtester.backtest_run('run-1')
+    assert second is not first and db.loads == 2
+    assert second.outcomes['return_5d'].iloc[0] == 5.0 / 130.0
+
+
+if __name__ == "__main__":
+    test_bars_locate_and_atr()
+    test_outcomes_and_summary()
+    test_backtester_caches_per_run()
+    test_new_bars_rescore_recent_signals()
+    print("✅ Signal backtest tests passed")
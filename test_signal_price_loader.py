@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test the daily_equity_technicals price loader of StrategicSignalManager
+"""
+
+import sys
+from contextlib import contextmanager
+from datetime import timedelta
+sys.path.append('src')
+from src.ohlcv_bars import OHLCVBars, BAR_COLUMNS, OHLCV_COLUMNS
+from src.strategic_signal_engine import (
+    StrategicSignalEngine, StrategicSignalManager, LOOKBACK_BARS, INDICATOR_WARMUP, lookback_days
+)
+from test_indicator_series import _frame
+from test_signal_backfill import _RecordingDatabase, _key
+import numpy as np
+import pandas as pd
+
+
+def _store_frame():
+    days = pd.bdate_range('2022-01-03', periods=400).date
+    frames = [_frame(symbol, n, seed).assign(bar_date=days[-n:])  # histories end on the same day
+              for symbol, n, seed in (('0700.HK', 400, 1), ('0005.HK', 300, 2), ('0388.HK', 40, 3))]
+    frame = pd.concat(frames).rename(columns={'bar_date': 'trade_date'})
+    return frame[BAR_COLUMNS].sample(frac=1.0, random_state=0)
+
+
+class _PriceDatabase(_RecordingDatabase):
+    """Recording signal store that also answers the daily_equity_technicals query"""
+
+    def __init__(self, bars_frame):
+        super().__init__()
+        self.bars_frame = bars_frame
+        self.queries = []
+
+    @contextmanager
+    def connection(self):
+        yield self
+
+    @contextmanager
+    def cursor(self):
+        yield self
+
+    def execute(self, sql, params):
+        assert 'FROM daily_equity_technicals' in sql
+        symbols, start, end = params
+        self.queries.append((symbols, start, end))
+        frame = self.bars_frame
+        frame = frame[frame['symbol'].isin(symbols) & (frame['trade_date'] >= start) & (frame['trade_date'] <= end)]
+        self._rows = list(frame.sort_values(['symbol', 'trade_date']).itertuples(index=False, name=None))
+
+    def fetchall(self):
+        return self._rows
+
+
+def test_lookback_and_matrix():
+    """Lookback covers the longest warm-up; to_matrix is the inverse of from_matrix"""
+    assert LOOKBACK_BARS == max(INDICATOR_WARMUP.values()) >= 50
+    # Weekdays in the lookback window leave room for a week of holidays
+    weekdays = len(pd.bdate_range(pd.Timestamp('2024-06-28') - pd.Timedelta(days=lookback_days(LOOKBACK_BARS)),
+                                  '2024-06-28'))
+    assert weekdays >= LOOKBACK_BARS + 5
+
+    bars = OHLCVBars.from_frame(_store_frame())
+    matrix = bars.to_matrix()
+    assert matrix['closes'].shape == (3, 400)
+    row = bars.symbols.index('0388.HK')
+    assert np.isnan(matrix['closes'][row, :360]).all() and matrix['bar_dates'][row, 359] is None
+    assert (matrix['closes'][row, 360:] == bars.arrays['close_price'][bars.rows('0388.HK')]).all()
+    assert matrix['bar_dates'][row, -1] == bars.symbol_frame('0388.HK')['bar_date'].iloc[-1]
+
+    ordinals = np.zeros(matrix['closes'].shape, dtype=np.int64)
+    known = pd.notna(matrix['bar_dates'])
+    ordinals[known] = [d.toordinal() for d in matrix['bar_dates'][known]]
+    rebuilt = OHLCVBars.from_matrix(bars.symbols, ordinals, {
+        column: matrix[key] for column, key in zip(OHLCV_COLUMNS, ('opens', 'highs', 'lows', 'closes', 'volumes'))})
+    assert (rebuilt.offsets == bars.offsets).all() and (rebuilt.ordinals == bars.ordinals).all()
+
+
+def test_portfolio_signals_from_one_query():
+    """One query for the portfolio; signals equal generate_signals on each symbol's loaded bars"""
+    store = _store_frame()
+    db = _PriceDatabase(store)
+    end = _frame('0700.HK', 400, 1)['bar_date'].iloc[-1]
+    manager = StrategicSignalManager(db)
+
+    results = manager.generate_signals_for_portfolio(['0700.HK', '0005.HK', '0388.HK', '9999.HK'], (None, end))
+
+    assert len(db.queries) == 1
+    symbols, start, query_end = db.queries[0]
+    assert symbols == ['0005.HK', '0388.HK', '0700.HK', '9999.HK']
+    assert query_end == end and start == end - timedelta(days=lookback_days(LOOKBACK_BARS))
+    assert results['0388.HK'] == [] and results['9999.HK'] == []
+
+    engine = StrategicSignalEngine()
+    bars = manager.load_price_bars(['0700.HK', '0005.HK'], end, end)
+    for symbol in ('0700.HK', '0005.HK'):
+        frame = bars.symbol_frame(symbol)
+        assert LOOKBACK_BARS <= len(frame) < 2 * LOOKBACK_BARS
+        expected = engine.generate_signals(symbol, frame)
+        assert sorted(map(_key, results[symbol])) == sorted(map(_key, expected))
+
+
+def test_backfill_loads_from_store():
+    """Backfill without price frames reads the store once and matches the frame-based backfill"""
+    store = _store_frame()
+    days = _frame('0700.HK', 400, 1)['bar_date']
+    date_range = (days.iloc[250], days.iloc[399])
+
+    db = _PriceDatabase(store)
+    loaded = StrategicSignalManager(db).backfill_signals(['0700.HK', '0005.HK'], date_range)
+    assert len(db.queries) == 1 and db.queries[0][1] == date_range[0] - timedelta(days=lookback_days(LOOKBACK_BARS))
+
+    frames = OHLCVBars.from_frame(store[store['trade_date'] >= db.queries[0][1]]).price_frames(['0700.HK', '0005.HK'])
+    reference = _RecordingDatabase()
+    given = StrategicSignalManager(reference).backfill_signals(['0700.HK', '0005.HK'], date_range, price_data=frames)
+
+    assert loaded['signals'] == given['signals'] > 0 and loaded['symbols'] == 2
+    assert sorted(map(_key, db.saved[0][2])) == sorted(map(_key, reference.saved[0][2]))
+
+
+if __name__ == "__main__":
+    test_lookback_and_matrix()
+    test_portfolio_signals_from_one_query()
+    test_backfill_loads_from_store()
+    print("✅ Signal price loader tests passed")
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Test single-flight request coalescing and the coalescing market data provider
+"""
+
+import sys
+import os
+import time
+import tempfile
+import threading
+from datetime import date, timedelta
+sys.path.append('src')
+from src.single_flight import SingleFlight
+from src.market_data import CoalescingMarketDataProvider, ReplayMarketDataProvider
+import pandas as pd
+
+
+class _CountingReplay(ReplayMarketDataProvider):
+    """Replay provider that records every upstream call"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.history_calls = []
+        self.quote_calls = []
+
+    def history(self, symbols, start_date, end_date, adjusted=False):
+        self.history_calls.append(list(symbols))
+        return super().history(symbols, start_date, end_date, adjusted)
+
+    def quotes(self, symbols):
+        self.quote_calls.append(list(symbols))
+        return super().quotes(symbols)
+
+
+class _SharedStore:
+    """Minimal in-memory stand-in for the Redis commands SingleFlight uses"""
+
+    def __init__(self):
+        self.data = {}
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def exists(self, key):
+        return int(key in self.data)
+
+    def lock(self, name, timeout=None, blocking=False):
+        store = self
+
+        class _Lock:
+            def acquire(self):
+                if name in store.data:
+                    return False
+                store.data[name] = 'locked'
+                return True
+
+            def release(self):
+                store.data.pop(name, None)
+        return _Lock()
+
+    def pipeline(self, transaction=False):
+        store = self
+
+        class _Pipe:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                return False
+
+            def set(self, key, value, ex=None):
+                store.data[key] = value
+
+            def execute(self):
+                return []
+        return _Pipe()
+
+
+def _write_bars(directory, symbol, days=10):
+    start = date(2025, 1, 2)
+    pd.DataFrame({
+        'Date': [start + timedelta(days=i) for i in range(days)],
+        'Open': [100.0 + i for i in range(days)],
+        'High': [101.0 + i for i in range(days)],
+        'Low': [99.0 + i for i in range(days)],
+        'Close': [100.5 + i for i in range(days)],
+        'Volume': [1000 + i for i in range(days)],
+    }).to_csv(os.path.join(directory, f"{symbol}.csv"), index=False)
+
+
+def test_concurrent_requests_share_one_fetch():
+    """Eight simultaneous lookups of one key make a single upstream call"""
+    flight = SingleFlight('test', ttl_seconds=60)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return 42
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do('0700.HK', fetch))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [42] * 8
+    assert len(calls) == 1
+    assert flight.stats['misses'] == 1
+    assert flight.stats['joins'] == 7
+
+    assert flight.do('0700.HK', fetch) == 42
+    assert flight.stats['hits'] == 1
+    assert len(calls) == 1
+
+
+def test_errors_reach_joiners_and_are_not_cached():
+    """A failed fetch raises for every waiter and the next call retries"""
+    flight = SingleFlight('test', ttl_seconds=60)
+    started = threading.Event()
+
+    def failing():
+        started.set()
+        time.sleep(0.05)
+        raise RuntimeError("throttled")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do('0700.HK', failing)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait()
+    joiner = threading.Thread(target=call)
+    joiner.start()
+    leader.join()
+    joiner.join()
+
+    assert errors == ["throttled", "throttled"]
+    assert flight.do('0700.HK', lambda: 7) == 7
+
+
+def test_results_shared_across_processes():
+    """A second instance sharing the store reuses the first instance's result"""
+    store = _SharedStore()
+    first = SingleFlight('test', 60, store, encode=str, decode=int)
+    second = SingleFlight('test', 60, store, encode=str, decode=int)
+
+    assert first.do('0700.HK', lambda: 5) == 5
+    assert second.do('0700.HK', lambda: 99) == 5
+    assert second.stats['redis_hits'] == 1
+    assert not any(key.startswith('singleflight:test:lock') for key in store.data)
+
+
+def test_coalescing_provider():
+    """Concurrent sessions fetch each symbol once; overlapping batches only fetch what is new"""
+    with tempfile.TemporaryDirectory() as directory:
+        for symbol in ('0700.HK', '0005.HK', '0388.HK'):
+            _write_bars(directory, symbol)
+
+        upstream = _CountingReplay(directory, latency_seconds=0.1)
+        provider = CoalescingMarketDataProvider(upstream)
+        start, end = date(2025, 1, 2), date(2025, 1, 11)
+
+        frames = []
+        threads = [threading.Thread(target=lambda: frames.append(provider.history(['0700.HK', '0005.HK'], start, end)))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(upstream.history_calls) == 1
+        assert all(len(frame) == 20 for frame in frames)
+
+        history = provider.history(['0700.HK', '0388.HK'], start, end)
+        assert upstream.history_calls[-1] == ['0388.HK']
+        assert sorted(history['symbol'].unique()) == ['0388.HK', '0700.HK']
+
+        provider.quotes(['0700.HK'])
+        provider.quotes(['0700.HK'])
+        assert len(upstream.quote_calls) == 1
+        assert provider.stats['quotes'] == {**provider.stats['quotes'], 'hits': 1, 'misses': 1}
+
+
+if __name__ == "__main__":
+    test_concurrent_requests_share_one_fetch()
+    test_errors_reach_joiners_and_are_not_cached()
+    test_results_shared_across_processes()
+    test_coalescing_provider()
+    print("✅ Single-flight coalescing tests passed")
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Test the vectorized timeline engine against a straightforward day-by-day calculation
+"""
+
+import sys
+import random
+sys.path.append('src')
+from src.timeline_engine import (PriceMatrix, AnalysisSpec, evaluate_analysis_timeline,
+                                 evaluate_analyses, group_transactions)
+from src.hkex_calendar import get_hkex_trading_days
+from datetime import date, timedelta
+import pandas as pd
+
+
+def _reference_timeline(trading_days, transactions, start_cash, price_df):
+    """Day-by-day reference: exact close, else latest before, else earliest after"""
+    positions = {}
+    cash = float(start_cash)
+    results = []
+    for day in trading_days:
+        for t in transactions:
+            if t['transaction_date'] == day:
+                positions[t['symbol']] = positions.get(t['symbol'], 0) + t['quantity_change']
+                cash += float(t['cash_change'])
+        equity = 0.0
+        for symbol, quantity in positions.items():
+            symbol_prices = price_df[price_df['symbol'] == symbol]
+            before = symbol_prices[symbol_prices['date'].dt.date <= day]
+            after = symbol_prices[symbol_prices['date'].dt.date >= day]
+            if not before.empty:
+                equity += quantity * float(before.iloc[-1]['close_price'])
+            elif not after.empty:
+                equity += quantity * float(after.iloc[0]['close_price'])
+        results.append((day, cash, equity))
+    return results
+
+
+def _synthetic_inputs(seed=7):
+    rng = random.Random(seed)
+    trading_days = get_hkex_trading_days(date(2025, 1, 2), date(2025, 3, 31))
+    symbols = ['0005.HK', '0700.HK', '0939.HK', '9988.HK']
+
+    rows = []
+    for symbol in symbols[:-1]:  # 9988.HK has no prices at all
+        for day in pd.date_range('2025-01-10', '2025-03-31'):
+            if rng.random() < 0.7:
+                rows.append({'symbol': symbol, 'date': day, 'close_price': rng.uniform(5, 500)})
+    price_df = pd.DataFrame(rows).sort_values(['symbol', 'date']).reset_index(drop=True)
+
+    transactions = []
+    for _ in range(40):
+        day = date(2025, 1, 1) + timedelta(days=rng.randint(0, 89))
+        quantity = rng.randint(-200, 400)
+        transactions.append({
+            'transaction_date': day,
+            'symbol': rng.choice(symbols),
+            'transaction_type': 'BUY' if quantity > 0 else 'SELL',
+            'quantity_change': quantity,
+            'cash_change': -quantity * rng.uniform(5, 500),
+        })
+    transactions.sort(key=lambda t: t['transaction_date'])
+    return trading_days, transactions, price_df
+
+
+def test_matches_reference_calculation():
+    """Vectorized equity/cash/total must match the day-by-day calculation"""
+    trading_days, transactions, price_df = _synthetic_inputs()
+    price_matrix = PriceMatrix.from_price_frame(price_df, trading_days)
+
+    timeline = evaluate_analysis_timeline(1, 'Synthetic', trading_days, transactions, 100000.0, price_matrix)
+    expected = _reference_timeline(trading_days, transactions, 100000.0, price_df)
+
+    assert len(timeline) == len(trading_days)
+    for (_, row), (day, cash, equity) in zip(timeline.iterrows(), expected):
+        assert row['date'] == day
+        assert abs(row['cash_position'] - cash) < 1e-6
+        assert abs(row['equity_value'] - equity) < 1e-6
+        assert abs(row['total_value'] - (cash + equity)) < 1e-6
+
+
+def test_transaction_details_and_columns():
+    """Output frame keeps the timeline columns and readable transaction details"""
+    trading_days = get_hkex_trading_days(date(2025, 2, 3), date(2025, 2, 7))
+    price_df = pd.DataFrame({
+        'symbol': ['0700.HK'] * 2,
+        'date': pd.to_datetime(['2025-02-03', '2025-02-05']),
+        'close_price': [400.0, 410.0],
+    })
+    transactions = [
+        {'transaction_date': date(2025, 2, 4), 'symbol': '0700.HK', 'transaction_type': 'BUY',
+         'quantity_change': 100, 'cash_change': -40000},
+        {'transaction_date': None, 'symbol': None, 'transaction_type': None,
+         'quantity_change': None, 'cash_change': None},
+    ]
+    price_matrix = PriceMatrix.from_price_frame(price_df, trading_days)
+    timeline = evaluate_analysis_timeline(9, 'Details', trading_days, transactions, 50000, price_matrix)
+
+    assert list(timeline.columns) == ['analysis_id', 'analysis_name', 'date', 'total_value',
+                                      'cash_position', 'equity_value', 'transaction_details']
+    assert timeline['transaction_details'].tolist() == [None, 'BUY 0700.HK (100)', None, None, None]
+    assert timeline['equity_value'].tolist() == [0.0, 40000.0, 41000.0, 41000.0, 41000.0]
+    assert timeline['cash_position'].tolist() == [50000.0] + [10000.0] * 4
+
+
+def test_batch_evaluation_parallel_matches_serial():
+    """Process-pool evaluation over shared memory returns the serial frames in spec order"""
+    trading_days, _, price_df = _synthetic_inputs()
+    rows = []
+    for analysis_id in (5, 3, 8, 1, 7, 2):
+        _, transactions, _ = _synthetic_inputs(seed=analysis_id)
+        rows.extend(dict(t, analysis_id=analysis_id) for t in transactions)
+    grouped = group_transactions(rows)
+    assert list(grouped) == [5, 3, 8, 1, 7, 2]
+
+    price_matrix = PriceMatrix.from_price_frame(price_df, trading_days)
+    specs = [AnalysisSpec(analysis_id, f'A{analysis_id}', trading_days, grouped[analysis_id], 100000.0)
+             for analysis_id in grouped]
+
+    serial, serial_timings = evaluate_analyses(specs, price_matrix, workers=1)
+    parallel, timings = evaluate_analyses(specs, price_matrix, workers=3, parallel_min=2)
+
+    assert serial_timings.mode == 'serial'
+    assert timings.mode == 'process_pool' and timings.workers == 3
+    assert [t['analysis_id'] for t in timings.analyses] == [5, 3, 8, 1, 7, 2]
+    assert all(t['days'] == len(trading_days) and t['seconds'] >= 0 for t in timings.analyses)
+    for left, right in zip(serial, parallel):
+        pd.testing.assert_frame_equal(left, right)
+
+
+if __name__ == "__main__":
+    test_matches_reference_calculation()
+    print("✅ Vectorized timeline matches reference calculation")
+    test_transaction_details_and_columns()
+    print("✅ Timeline columns and transaction details are correct")
+    test_batch_evaluation_parallel_matches_serial()
+    print("✅ Parallel batch evaluation matches serial evaluation")
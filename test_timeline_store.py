@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Test incremental timeline materialization: resuming from any day matches a full recompute
+"""
+
+import sys
+from datetime import date, timedelta
+sys.path.append('src')
+from src.timeline_engine import PriceMatrix, evaluate_analysis_timeline, opening_state
+from src.timeline_store import TimelineStore, plan_resume, PRICE_LOOKBACK_DAYS
+from test_timeline_engine import _synthetic_inputs
+import pandas as pd
+
+
+class _StoredCloses:
+    """Answers TimelineStore's carry-in close query from a price frame"""
+
+    def __init__(self, price_df):
+        self.price_df = price_df
+
+    def execute(self, sql, params):
+        assert 'DISTINCT ON' in sql
+        symbols, first_dates, before = params
+        rows = []
+        for symbol, first_date in zip(symbols, first_dates):
+            closes = self.price_df[(self.price_df['symbol'] == symbol)
+                                   & (self.price_df['date'].dt.date >= first_date)
+                                   & (self.price_df['date'].dt.date < before)]
+            if not closes.empty:
+                rows.append((symbol, closes['date'].iloc[-1].date(), closes['close_price'].iloc[-1]))
+        self._rows = rows
+
+    def fetchall(self):
+        return self._rows
+
+
+def _resume(trading_days, transactions, start_cash, price_df, resume):
+    """Evaluate trading_days[resume:] from the state carried out of the first days"""
+    days = trading_days[resume:]
+
+    def fetch_prices(symbols, start, end):  # stored closes inside the window only
+        dates = price_df['date'].dt.date
+        return price_df[price_df['symbol'].isin(symbols) & (dates >= start) & (dates <= end)]
+
+    store = TimelineStore(None, fetch_prices)
+    plan = {'start_date': trading_days[0], 'trading_days': trading_days, 'resume': resume,
+            'symbols': sorted({t['symbol'] for t in transactions})}
+    window = store._fetch_window(_StoredCloses(price_df), [plan])
+    opening_cash, opening_positions = opening_state(transactions, trading_days[:resume])
+    return evaluate_analysis_timeline(
+        1, 'Synthetic', days, transactions, start_cash + opening_cash,
+        PriceMatrix.from_price_frame(window, days), opening_positions
+    )
+
+
+def _assert_same(left, right):
+    assert list(left['date']) == list(right['date'])
+    for column in ('total_value', 'cash_position', 'equity_value'):
+        assert (left[column].reset_index(drop=True) - right[column].reset_index(drop=True)).abs().max() < 1e-6
+    assert list(left['transaction_details']) == list(right['transaction_details'])
+
+
+def test_suffix_recompute_matches_full():
+    """Every resume point reproduces the tail of the full timeline"""
+    trading_days, transactions, price_df = _synthetic_inputs()
+    full = evaluate_analysis_timeline(1, 'Synthetic', trading_days, transactions, 100000.0,
+                                      PriceMatrix.from_price_frame(price_df, trading_days))
+
+    for resume in range(len(trading_days)):
+        _assert_same(_resume(trading_days, transactions, 100000.0, price_df, resume), full.iloc[resume:])
+
+
+def test_resume_across_suspension():
+    """A symbol without closes for longer than the look-back carries in its pre-suspension close"""
+    trading_days, transactions, price_df = _synthetic_inputs(seed=5)
+    suspended = (price_df['symbol'] == '0700.HK') & (price_df['date'] > '2025-02-03')
+    resumed_trading = price_df['date'] > '2025-03-14'
+    price_df = price_df[~suspended | resumed_trading].reset_index(drop=True)
+    transactions = [t for t in transactions if t['symbol'] != '0700.HK']
+    transactions.insert(0, {'transaction_date': date(2025, 1, 2), 'symbol': '0700.HK', 'transaction_type': 'BUY',
+                            'quantity_change': 100, 'cash_change': -10000.0})
+    full = evaluate_analysis_timeline(1, 'Synthetic', trading_days, transactions, 100000.0,
+                                      PriceMatrix.from_price_frame(price_df, trading_days))
+
+    for resume_day in (date(2025, 2, 24), date(2025, 3, 3), date(2025, 3, 14), date(2025, 3, 17)):
+        resume = trading_days.index(resume_day)
+        assert resume_day - timedelta(days=PRICE_LOOKBACK_DAYS) > date(2025, 2, 3)
+        _assert_same(_resume(trading_days, transactions, 100000.0, price_df, resume), full.iloc[resume:])
+
+
+def test_append_one_day_at_a_time():
+    """Appending day by day, as refresh_all_analyses_for_portfolio does, builds the full timeline"""
+    trading_days, transactions, price_df = _synthetic_inputs(seed=3)
+    full = evaluate_analysis_timeline(1, 'Synthetic', trading_days, transactions, 50000.0,
+                                      PriceMatrix.from_price_frame(price_df, trading_days))
+
+    stored = [full.iloc[:20]]
+    computed_through = trading_days[19]
+    for _ in range(len(trading_days) - 20):
+        resume = plan_resume(trading_days, computed_through)
+        assert resume == trading_days.index(computed_through) + 1
+        stored.append(_resume(trading_days, transactions, 50000.0, price_df, resume).iloc[:1])
+        computed_through = trading_days[resume]
+    _assert_same(pd.concat(stored, ignore_index=True), full)
+
+
+def test_plan_resume():
+    """Resume index follows new days, price corrections and back-dated invalidation"""
+    days = [date(2025, 3, 3), date(2025, 3, 4), date(2025, 3, 5), date(2025, 3, 6), date(2025, 3, 7)]
+    assert plan_resume(days, None) == 0
+    assert plan_resume(days, date(2025, 3, 5)) == 3
+    assert plan_resume(days, date(2025, 3, 7)) == len(days)
+    assert plan_resume(days, date(2025, 3, 7), correction_date=date(2025, 3, 4)) == 1
+    assert plan_resume(days, date(2025, 3, 4), correction_date=date(2025, 3, 6)) == 2
+    # invalidate_from leaves computed_through at the last day kept (a weekend gap is fine)
+    assert plan_resume(days, date(2025, 3, 2)) == 0
+
+
+if __name__ == "__main__":
+    test_suffix_recompute_matches_full()
+    test_resume_across_suspension()
+    test_append_one_day_at_a_time()
+    test_plan_resume()
+    print("✅ Timeline store tests passed")